@@ -0,0 +1,158 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Conditional GET requests for the REST API
+
+Responses of detail endpoints carry strong ``ETag`` and ``Last-Modified``
+validators, while responses of list endpoints only carry an ``ETag``, since
+the most recent modification date of a list does not change when one of its
+items is deleted. Clients that send them back in the ``If-None-Match`` and
+``If-Modified-Since`` headers get a ``304 Not Modified`` response when
+nothing has changed in the meantime.
+
+Validators are computed from a last modification date, which is read with a
+cheap query, without serializing the response.
+
+"""
+
+from calendar import timegm
+import hashlib
+
+from django.db.models import Count
+from django.db.models import Max
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.http import quote_etag
+
+
+def get_etag(*tokens) -> str:
+    """Return a quoted ETag for the input tokens
+
+    >>> get_etag("tracks", 1, "2018-05-14T15:41:00+00:00")
+    '"93a3ac9b8627984d1feb12cf9495c5d1"'
+
+    """
+
+    data = "|".join(str(token) for token in tokens)
+    return quote_etag(hashlib.md5(data.encode()).hexdigest())
+
+
+class ConditionalGetMixin(object):
+    """Answer conditional GET requests of the ``list`` and ``retrieve`` actions
+
+    Views define ``get_version_queryset``, which returns the same items as
+    ``get_queryset``, annotated with their ``last_modified`` date. Only the
+    ``version_fields`` of those items are loaded.
+
+    The ETag of an item depends on its primary key and last modification
+    date, while the ETag of a list depends on the number of items and on
+    their most recent modification date. Both also depend on the requesting
+    user, on the query parameters, such as the page cursor, and on the media
+    type of the response.
+
+    """
+
+    version_fields = ("pk",)
+
+    def get_version_queryset(self):
+        raise NotImplementedError
+
+    def get_version_object(self):
+        """Return the requested item, with only its ``version_fields``"""
+        queryset = self.filter_queryset(self.get_version_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        item = get_object_or_404(
+            queryset.only(*self.version_fields),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(self.request, item)
+        return item
+
+    def get_object_version(self):
+        """Return the last modification date of the requested item
+
+        Views may return ``None`` when the item's representation changes
+        without the item being modified, in which case no validators are
+        sent.
+
+        """
+
+        return self.get_version_object().last_modified
+
+    def get_collection_version(self):
+        """Return the number of listed items and their last modification
+
+        As with ``get_object_version``, views may return ``None`` in order
+        not to send validators, e.g. when the listed items are too many to be
+        counted on each request.
+
+        """
+
+        queryset = self.filter_queryset(self.get_version_queryset())
+        aggregates = queryset.order_by().aggregate(
+            num_items=Count("pk"),
+            last_modified=Max("last_modified"),
+        )
+        return aggregates["num_items"], aggregates["last_modified"]
+
+    def retrieve(self, request, *args, **kwargs):
+        last_modified = self.get_object_version()
+        if last_modified is None:
+            result = super().retrieve(request, *args, **kwargs)
+        else:
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            result = self._get_conditional_response(
+                super().retrieve,
+                (self.kwargs[lookup_url_kwarg], last_modified.isoformat()),
+                last_modified,
+                request, *args, **kwargs
+            )
+        return result
+
+    def list(self, request, *args, **kwargs):
+        version = self.get_collection_version()
+        if version is None:
+            result = super().list(request, *args, **kwargs)
+        else:
+            num_items, last_modified = version
+            result = self._get_conditional_response(
+                super().list,
+                (
+                    num_items,
+                    last_modified.isoformat() if last_modified else None,
+                ),
+                None,
+                request, *args, **kwargs
+            )
+        return result
+
+    def _get_conditional_response(self, handler, version, last_modified,
+                                  request, *args, **kwargs):
+        etag = get_etag(
+            self.basename,
+            self.action,
+            *version,
+            request.user.pk,
+            request.get_full_path(),
+            request.accepted_media_type
+        )
+        timestamp = (
+            timegm(last_modified.utctimetuple()) if last_modified is not None
+            else None
+        )
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        response["ETag"] = etag
+        if timestamp is not None:
+            response["Last-Modified"] = http_date(timestamp)
+        return response
@@ -0,0 +1,32 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from rest_framework import pagination
+
+
+class CursorPagination(pagination.CursorPagination):
+    """Cursor pagination in the order given by the view's ``cursor_ordering``
+
+    Pages are fetched by filtering on the first field of the ordering, which
+    must not be null, rather than by counting and skipping all of the
+    previous rows. Only the first field is used for filtering: items that
+    share its value with the last item of the previous page are skipped with
+    an offset instead. Views should end their ordering with the primary key,
+    so that those items are always returned in the same order.
+
+    Backed by an index on the ordering fields, the cost of a page does not
+    depend on how deep it is, but it does grow with the number of items
+    that share the same value of the first field, such as segments that
+    start at the same time.
+
+    """
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(view.cursor_ordering)
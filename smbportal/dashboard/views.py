@@ -26,7 +26,7 @@ from django.http import HttpResponse
 
 from dashboard import exporter
 from prizes.models import Winner
-from tracks.models import CollectedPoint
+from tracks.collectedpoints import get_collected_points
 from tracks.models import Segment
 from tracks.models import Track
 from vehicles.models import Bike
@@ -221,16 +221,9 @@ def _get_points(start_date: dt.datetime, end_date: dt.datetime,
                 vehicle_types: List[str], tracks: List[Track]):
     output_dir = pathlib.Path(tempfile.mkdtemp())
     output_path = output_dir / "points.csv"
-    points_qs = CollectedPoint.objects.all()
-    if start_date is not None:
-        points_qs = points_qs.filter(timestamp__gte=start_date)
-    if end_date is not None:
-        points_qs = points_qs.filter(timestamp__lte=end_date)
-    if len(tracks) != 0:
-        points_qs = points_qs.filter(track__in=tracks)
-    if len(vehicle_types) != 0:
-        points_qs = points_qs.filter(vehicle_type__in=vehicle_types)
-    exporter.export_collected_points(points_qs, output_path)
+    points = get_collected_points(
+        start_date, end_date, vehicle_types, tracks)
+    exporter.export_collected_points(points, output_path)
     contents = io.BytesIO()
     with output_path.open("rb") as fh:
         contents.write(fh.read())
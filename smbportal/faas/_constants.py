@@ -25,6 +25,21 @@ class VehicleType(Enum):
     unknown = 9
 
 
+# mapping between the vehicle modes sent by the smb-app and the vehicle types
+# used in the portal DB. It is based on the structure of the java enum used in
+# the app's source code:
+#
+# https://github.com/geosolutions-it/smb-app/blob/72b3a336f97c600fee9b63d63af46a955076f6e9/app/src/main/java/it/geosolutions/savemybike/model/Vehicle.java#L14
+SMB_APP_VEHICLE_MODES = {
+    "1": VehicleType.foot,
+    "2": VehicleType.bike,
+    "3": VehicleType.bus,
+    "4": VehicleType.car,
+    "5": VehicleType.average_motorbike,  # moped
+    "6": VehicleType.train,
+}
+
+
 class Pollutant(Enum):
     so2 = 1
     nox = 2
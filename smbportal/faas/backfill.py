@@ -0,0 +1,378 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Recalculation of segment metrics for existing tracks
+
+Whenever the coefficients in ``faas._constants`` change, the emissions, costs
+and health of stored segments, as well as the ``aggregated_*`` data of their
+tracks, may be calculated again with a ``TrackMetricsBackfill``.
+
+The ``tracks_track`` table is split into ranges of ``batch_size`` ids, which
+are recalculated by a pool of processes, each with its own database
+connection. Each range is recalculated in its own transaction, so that
+interrupting the backfill only loses the ranges that were in progress.
+Ranges may finish in any order, so the ``resume_from_id`` of the backfill's
+progress is the first id of the earliest range that is not done yet, which
+is where a later run may safely start again.
+
+Only the aggregated data of the tracks in a range is loaded into memory,
+which allows recalculating any number of tracks and segments. The aggregated
+data before and after the recalculation are compared, so that a *dry run*,
+which rolls back every transaction, reports what would change.
+
+"""
+
+from collections import namedtuple
+from concurrent import futures
+import heapq
+import logging
+import math
+import signal
+import threading
+import time
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import Tuple
+
+from . import datareceiver
+from . import queries
+from . import segmentmetrics
+
+logger = logging.getLogger(__name__)
+
+AGGREGATED_FIELDS = [
+    "aggregated_emissions",
+    "aggregated_costs",
+    "aggregated_health",
+]
+
+# relative difference below which aggregated values are considered unchanged
+RELATIVE_TOLERANCE = 1e-9
+
+# maximum number of changed track ids reported by each batch
+MAX_REPORTED_CHANGES = 20
+
+BatchResult = namedtuple("BatchResult", [
+    "first_track_id",
+    "last_track_id",
+    "num_tracks",
+    "num_segments",
+    "changed_track_ids",
+    "num_changed",
+    "totals",
+])
+
+BackfillProgress = namedtuple("BackfillProgress", [
+    "num_batches",
+    "num_tracks",
+    "num_segments",
+    "num_changed",
+    "failed_batches",
+    "resume_from_id",
+    "fraction_done",
+    "elapsed_seconds",
+    "tracks_per_second",
+    "segments_per_second",
+])
+
+
+def get_id_ranges(start_id: int, end_id: int,
+                  batch_size: int) -> Iterator[Tuple[int, int]]:
+    """Split an inclusive range of ids into ranges of ``batch_size`` ids
+
+    >>> list(get_id_ranges(1, 10, 4))
+    [(1, 4), (5, 8), (9, 10)]
+
+    """
+
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    for first_id in range(start_id, end_id + 1, batch_size):
+        yield first_id, min(first_id + batch_size - 1, end_id)
+
+
+def diff_aggregated_data(previous: Dict[int, tuple], current: Dict[int, tuple],
+                         relative_tolerance: float = RELATIVE_TOLERANCE):
+    """Compare the aggregated data of tracks before and after recalculation
+
+    ``previous`` and ``current`` map track ids to tuples with the values of
+    ``AGGREGATED_FIELDS``. Returns the ids of the tracks whose data changed
+    and a mapping of ``(field, key)`` tuples to the ``[previous, current]``
+    totals of all the tracks.
+
+    >>> changed, totals = diff_aggregated_data(
+    ...     {1: ({"co2": 2.0}, None, None), 2: (None, None, None)},
+    ...     {1: ({"co2": 3.0}, None, None), 2: (None, None, None)},
+    ... )
+    >>> changed
+    [1]
+    >>> totals
+    {('aggregated_emissions', 'co2'): [2.0, 3.0]}
+
+    """
+
+    changed = []
+    totals = {}
+    for track_id, previous_values in previous.items():
+        current_values = current.get(track_id, (None,) * len(previous_values))
+        is_changed = False
+        for field, old, new in zip(
+                AGGREGATED_FIELDS, previous_values, current_values):
+            old = old or {}
+            new = new or {}
+            if set(old) != set(new):
+                is_changed = True
+            for key in set(old) | set(new):
+                old_value = old.get(key) or 0
+                new_value = new.get(key) or 0
+                total = totals.setdefault((field, key), [0, 0])
+                total[0] += old_value
+                total[1] += new_value
+                if not math.isclose(
+                        old_value, new_value, rel_tol=relative_tolerance):
+                    is_changed = True
+        if is_changed:
+            changed.append(track_id)
+    return changed, totals
+
+
+# database connection of the current backfill process, set by `_init_process`
+_db_connection = None
+
+
+def _init_process(db_settings: dict):
+    global _db_connection
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _db_connection = datareceiver.get_db_connection(**db_settings)
+
+
+def recompute_batch(first_track_id: int, last_track_id: int,
+                    dry_run: bool = False,
+                    db_connection=None) -> BatchResult:
+    """Recalculate the segment metrics of a range of tracks
+
+    The whole range is recalculated in a single transaction, which is rolled
+    back if ``dry_run`` is true. ``db_connection`` defaults to the
+    connection of the current backfill process.
+
+    """
+
+    db_connection = db_connection or _db_connection
+    range_params = {
+        "first_track_id": first_track_id,
+        "last_track_id": last_track_id,
+    }
+    try:
+        with db_connection.cursor() as cursor:
+            previous = _get_aggregated_data(cursor, range_params)
+            segmentmetrics.delete_segments_data(
+                first_track_id, last_track_id, cursor)
+            num_segments = segmentmetrics.insert_tracks_segments_data(
+                list(previous), cursor)
+            segmentmetrics.update_tracks_aggregated_segment_data(
+                first_track_id, last_track_id, cursor)
+            current = _get_aggregated_data(cursor, range_params)
+        if dry_run:
+            db_connection.rollback()
+        else:
+            db_connection.commit()
+    except Exception:
+        db_connection.rollback()
+        raise
+    changed, totals = diff_aggregated_data(previous, current)
+    return BatchResult(
+        first_track_id=first_track_id,
+        last_track_id=last_track_id,
+        num_tracks=len(previous),
+        num_segments=num_segments,
+        changed_track_ids=changed[:MAX_REPORTED_CHANGES],
+        num_changed=len(changed),
+        totals=totals
+    )
+
+
+def _get_aggregated_data(cursor, range_params: dict) -> Dict[int, tuple]:
+    queries.registry.execute(
+        cursor, "get-tracks-aggregated-data.sql", range_params)
+    return {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+
+
+class TrackMetricsBackfill(object):
+    """Recalculate the segment metrics of all tracks with a process pool
+
+    :arg db_settings: keyword arguments for ``datareceiver.get_db_connection``,
+        which is called once by the backfill itself and once in each process
+    :arg batch_size: number of track ids in each batch
+    :arg num_processes: number of processes
+    :arg max_in_flight: maximum number of batches that are pending at the same
+        time. Defaults to twice the number of processes
+    :arg dry_run: whether to roll back the recalculation of every batch
+    :arg executor: executor used for processing batches. Defaults to a
+        ``concurrent.futures.ProcessPoolExecutor``
+
+    """
+
+    def __init__(self, db_settings: dict, batch_size: int = 500,
+                 num_processes: int = 4, max_in_flight: int = None,
+                 dry_run: bool = False, executor=None):
+        if num_processes < 1:
+            raise ValueError("num_processes must be at least 1")
+        self.db_settings = db_settings
+        self.batch_size = batch_size
+        self.num_processes = num_processes
+        self.max_in_flight = max_in_flight or 2 * num_processes
+        self.dry_run = dry_run
+        self.executor = executor
+        self.totals = {}
+        self.changed_track_ids = []
+        self._stop_event = threading.Event()
+        self._start_id = None
+        self._end_id = None
+        self._resume_from_id = None
+        self._finished_ranges = []  # heap of ranges beyond `_resume_from_id`
+        self._num_batches = 0
+        self._num_tracks = 0
+        self._num_segments = 0
+        self._num_changed = 0
+        self._failed_batches = []
+        self._started_at = None
+
+    def run(self, start_id: int = None, end_id: int = None,
+            progress_callback: Callable[[BackfillProgress], None] = None
+            ) -> BackfillProgress:
+        """Recalculate the tracks with ids between ``start_id`` and ``end_id``
+
+        Both ends default to the ids of the first and last tracks.
+        ``progress_callback`` is called with the current progress whenever a
+        batch is done. Returns the final progress.
+
+        """
+
+        self._stop_event.clear()
+        self._started_at = time.monotonic()
+        self._start_id, self._end_id = self._get_id_bounds(start_id, end_id)
+        self._resume_from_id = self._start_id
+        if self._start_id is None or self._start_id > self._end_id:
+            logger.info("There are no tracks to recalculate")
+            self._end_id = None
+            return self.get_progress()
+        id_ranges = get_id_ranges(
+            self._start_id, self._end_id, self.batch_size)
+        executor = self.executor or futures.ProcessPoolExecutor(
+            max_workers=self.num_processes,
+            initializer=_init_process,
+            initargs=(self.db_settings,)
+        )
+        pending = {}
+        try:
+            while True:
+                while (not self._stop_event.is_set() and
+                       len(pending) < self.max_in_flight):
+                    id_range = next(id_ranges, None)
+                    if id_range is None:
+                        break
+                    future = executor.submit(
+                        recompute_batch, *id_range, dry_run=self.dry_run)
+                    pending[future] = id_range
+                if len(pending) == 0:
+                    break
+                done, _ = futures.wait(
+                    list(pending), return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    self._finish_batch(future, pending.pop(future))
+                    if progress_callback is not None:
+                        progress_callback(self.get_progress())
+        finally:
+            if self.executor is None:
+                executor.shutdown(wait=True)
+        return self.get_progress()
+
+    def stop(self, *args):
+        """Stop submitting batches and return once pending ones are done"""
+        logger.info("Stopping backfill...")
+        self._stop_event.set()
+
+    def get_progress(self) -> BackfillProgress:
+        elapsed = time.monotonic() - self._started_at
+        if self._end_id is None:
+            fraction_done = 1.0
+        else:
+            fraction_done = (
+                (self._resume_from_id - self._start_id) /
+                (self._end_id + 1 - self._start_id)
+            )
+        return BackfillProgress(
+            num_batches=self._num_batches,
+            num_tracks=self._num_tracks,
+            num_segments=self._num_segments,
+            num_changed=self._num_changed,
+            failed_batches=list(self._failed_batches),
+            resume_from_id=self._resume_from_id,
+            fraction_done=fraction_done,
+            elapsed_seconds=elapsed,
+            tracks_per_second=self._num_tracks / elapsed if elapsed else 0,
+            segments_per_second=self._num_segments / elapsed if elapsed else 0
+        )
+
+    def _get_id_bounds(self, start_id: int, end_id: int):
+        if start_id is not None and end_id is not None:
+            return start_id, end_id
+        db_connection = datareceiver.get_db_connection(**self.db_settings)
+        try:
+            with db_connection.cursor() as cursor:
+                queries.registry.execute(
+                    cursor,
+                    "get-track-id-bounds.sql",
+                    {"start_id": start_id or 0}
+                )
+                first_id, last_id = cursor.fetchone()
+        finally:
+            db_connection.close()
+        return (
+            first_id if start_id is None else start_id,
+            last_id if end_id is None else end_id
+        )
+
+    def _finish_batch(self, future: futures.Future, id_range: tuple):
+        try:
+            result = future.result()
+        except Exception:
+            logger.exception("Could not recalculate tracks {} to {}".format(
+                *id_range))
+            self._failed_batches.append(id_range)
+        else:
+            self._num_batches += 1
+            self._num_tracks += result.num_tracks
+            self._num_segments += result.num_segments
+            self._num_changed += result.num_changed
+            available = MAX_REPORTED_CHANGES - len(self.changed_track_ids)
+            self.changed_track_ids.extend(
+                result.changed_track_ids[:max(available, 0)])
+            for field_key, (previous, current) in result.totals.items():
+                total = self.totals.setdefault(field_key, [0, 0])
+                total[0] += previous
+                total[1] += current
+            self._advance_resume_id(id_range)
+
+    def _advance_resume_id(self, id_range: tuple):
+        """Move ``_resume_from_id`` past contiguous finished ranges
+
+        Batches may finish in any order, so ranges that finish before the
+        ones preceding them are kept aside until those finish too. A failed
+        batch keeps the resume id from moving past it.
+
+        """
+
+        heapq.heappush(self._finished_ranges, id_range)
+        while (len(self._finished_ranges) > 0 and
+               self._finished_ranges[0][0] == self._resume_from_id):
+            _, last_id = heapq.heappop(self._finished_ranges)
+            self._resume_from_id = last_id + 1
@@ -0,0 +1,323 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Batch ingestion of several track uploads
+
+The smb-app sends bursts of uploads when it gets back online after a while.
+``handle_track_uploads`` ingests such a burst in a single transaction,
+creating the database records of all its tracks with a few set-based
+statements.
+
+"""
+
+from collections import namedtuple
+import contextlib
+from concurrent import futures
+import functools
+import logging
+from typing import List
+
+from . import datareceiver
+from . import metrics
+from . import segmentmetrics
+from . import sensorarrays
+from . import simplification
+from . import storage
+
+logger = logging.getLogger(__name__)
+
+UploadResult = namedtuple("UploadResult", [
+    "object_key",
+    "status",  # one of `INGESTED`, `SKIPPED` or `FAILED`
+    "track_id",
+    "error",
+])
+
+INGESTED = "ingested"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+# an upload of a batch that has been read and is waiting to be saved
+_PendingUpload = namedtuple("_PendingUpload", [
+    "object_key",
+    "owner_uuid",
+    "session_id",
+    "track_data",
+    "timer",
+])
+
+
+def handle_track_uploads(s3_bucket_name: str, object_keys: List[str],
+                         db_connection, decimation: dict = None,
+                         sensor_arrays: bool = False,
+                         object_store: storage.ObjectStore = None,
+                         max_downloads: int = 4,
+                         metrics_sinks: list = None,
+                         validation: dict = None) -> List[UploadResult]:
+    """Ingest several track uploads into smb database, in a single transaction
+
+    Compared to calling ``datareceiver.handle_track_upload`` for each
+    upload, track owners and already ingested sessions are looked up once
+    for the whole batch, the points of all tracks are loaded with a single
+    COPY and segments, segment data and track aggregates are generated by a
+    single statement each.
+
+    Uploads are downloaded and parsed into columns concurrently, up to
+    ``max_downloads`` at a time. See ``datareceiver.IngestionOptions`` for
+    the meaning of ``decimation``, ``sensor_arrays`` and ``validation`` and
+    ``datareceiver.handle_track_upload`` for the meaning of
+    ``object_store`` and ``metrics_sinks``. Uploads that cannot be read, that
+    are not valid or whose owner is unknown fail without affecting the
+    batch, while uploads whose session has already been ingested are
+    skipped.
+
+    The batch is saved inside a savepoint. If saving it fails, the
+    transaction is rolled back to the savepoint and tracks are saved again
+    one at a time, each inside its own savepoint, so that a bad upload does
+    not prevent the others from being ingested.
+
+    Returns an ``UploadResult`` for each object key, in the same order.
+
+    """
+
+    object_store = object_store or storage.get_object_store()
+    results = {}
+    owners = {}
+    for object_key in object_keys:
+        try:
+            owners[object_key] = datareceiver.get_track_owner_uuid(object_key)
+        except AttributeError:
+            results[object_key] = UploadResult(
+                object_key, FAILED, None,
+                "Could not determine track owner for object {}".format(
+                    object_key)
+            )
+    with futures.ThreadPoolExecutor(max_workers=max_downloads) as executor:
+        read_results = executor.map(
+            functools.partial(
+                _read_upload,
+                s3_bucket_name,
+                object_store=object_store,
+                options=datareceiver.IngestionOptions(
+                    columnar=True, decimation=decimation,
+                    validation=validation
+                ),
+                metrics_sinks=metrics_sinks
+            ),
+            owners.keys(),
+            owners.values()
+        )
+        uploads = []
+        for read_result in read_results:
+            if isinstance(read_result, UploadResult):
+                results[read_result.object_key] = read_result
+            else:
+                uploads.append(read_result)
+    if len(uploads) > 0:
+        with datareceiver._borrow_connection(db_connection) as connection:
+            results.update(
+                _save_uploads(uploads, connection, sensor_arrays))
+    for upload in uploads:
+        result = results[upload.object_key]
+        metrics.emit(
+            upload.timer.get_metrics(
+                upload.object_key, result.track_id,
+                succeeded=result.status != FAILED
+            ),
+            sinks=metrics_sinks
+        )
+    return [results[object_key] for object_key in object_keys]
+
+
+def _read_upload(s3_bucket_name: str, object_key: str, owner_uuid: str,
+                 object_store: storage.ObjectStore = None,
+                 options: datareceiver.IngestionOptions = None,
+                 metrics_sinks: list = None):
+    """Download and parse an upload of a batch
+
+    Returns either a ``_PendingUpload`` or, if the upload cannot be read, an
+    ``UploadResult`` with the error.
+
+    """
+
+    timer = metrics.StageTimer()
+    try:
+        with timer.stage("download"):
+            archive = datareceiver.download_track_data(
+                s3_bucket_name, object_key, object_store=object_store)
+        with archive:
+            session_id, track_data, _, _ = datareceiver.read_track_data(
+                archive, object_key, options=options, timer=timer)
+    except Exception as exc:
+        logger.exception("Could not read {}".format(object_key))
+        metrics.emit(
+            timer.get_metrics(object_key, succeeded=False),
+            sinks=metrics_sinks
+        )
+        return UploadResult(
+            object_key, FAILED, None,
+            "{}: {}".format(type(exc).__name__, exc)
+        )
+    return _PendingUpload(
+        object_key, owner_uuid, session_id, track_data, timer)
+
+
+def _save_uploads(uploads: List[_PendingUpload], db_connection,
+                  sensor_arrays: bool = False) -> dict:
+    """Create the database records of a batch of uploads
+
+    Returns a dict with the ``UploadResult`` of each upload's object key.
+
+    """
+
+    results = {}
+    batch = []
+    batch_sessions = set()
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            batch_timer = metrics.StageTimer()
+            with batch_timer.stage("owner_lookup"):
+                user_ids = datareceiver.get_track_owner_internal_ids(
+                    set(upload.owner_uuid for upload in uploads), cursor)
+                ingested = datareceiver.get_track_ids_by_sessions(
+                    [upload.session_id for upload in uploads], cursor)
+            for upload in uploads:
+                if upload.owner_uuid not in user_ids:
+                    results[upload.object_key] = UploadResult(
+                        upload.object_key, FAILED, None,
+                        "Could not determine track owner internal ID"
+                    )
+                elif upload.session_id in ingested:
+                    logger.info("Session {} has already been ingested".format(
+                        upload.session_id))
+                    results[upload.object_key] = UploadResult(
+                        upload.object_key, SKIPPED,
+                        ingested[upload.session_id], None
+                    )
+                elif upload.session_id not in batch_sessions:
+                    # later uploads of the same session are duplicates
+                    batch_sessions.add(upload.session_id)
+                    batch.append(upload)
+            try:
+                with _savepoint(cursor, "track_uploads"):
+                    track_ids = _save_upload_batch(
+                        batch, user_ids, cursor, sensor_arrays, batch_timer)
+            except Exception:
+                logger.exception(
+                    "Could not save a batch of {} uploads, saving them one at "
+                    "a time...".format(len(batch)))
+                track_ids = []
+                for upload in batch:
+                    try:
+                        with _savepoint(cursor, "track_upload"):
+                            track_ids.extend(
+                                _save_upload_batch(
+                                    [upload], user_ids, cursor,
+                                    sensor_arrays, upload.timer
+                                )
+                            )
+                    except Exception as exc:
+                        logger.exception("Could not save {}".format(
+                            upload.object_key))
+                        track_ids.append(None)
+                        results[upload.object_key] = UploadResult(
+                            upload.object_key, FAILED, None,
+                            "{}: {}".format(type(exc).__name__, exc)
+                        )
+            else:
+                _apportion_stage_seconds(batch, batch_timer)
+    session_results = {}
+    for upload, track_id in zip(batch, track_ids):
+        if track_id is not None:
+            results[upload.object_key] = UploadResult(
+                upload.object_key, INGESTED, track_id, None)
+        session_results[upload.session_id] = results[upload.object_key]
+    for upload in uploads:
+        if upload.object_key not in results:
+            result = session_results[upload.session_id]
+            results[upload.object_key] = result._replace(
+                object_key=upload.object_key,
+                status=SKIPPED if result.status == INGESTED else result.status
+            )
+    return results
+
+
+def _save_upload_batch(batch: List[_PendingUpload], user_ids: dict,
+                       db_cursor, sensor_arrays: bool,
+                       timer: metrics.StageTimer) -> List[int]:
+    """Create the database records of several uploads' tracks
+
+    Each step is performed by a single statement for all tracks. Returns
+    the ids of the new tracks, in the same order as ``batch``.
+
+    """
+
+    if len(batch) == 0:
+        return []
+    with timer.stage("point_insert"):
+        track_ids = datareceiver.insert_tracks(
+            [upload.session_id for upload in batch],
+            [user_ids[upload.owner_uuid] for upload in batch],
+            db_cursor
+        )
+        tracks = [
+            (track_id, upload.track_data)
+            for track_id, upload in zip(track_ids, batch)
+        ]
+        datareceiver.insert_tracks_collected_point_columns(tracks, db_cursor)
+        if sensor_arrays:
+            for track_id, track_data in tracks:
+                sensorarrays.insert_track_channels(
+                    track_id, track_data, db_cursor)
+    with timer.stage("segmentation"):
+        segments = datareceiver.insert_tracks_segments(
+            track_ids, [upload.owner_uuid for upload in batch], db_cursor)
+        simplification.update_segments_geometry(track_ids, db_cursor)
+    with timer.stage("metrics"):
+        segmentmetrics.insert_tracks_segments_data(track_ids, db_cursor)
+    with timer.stage("aggregate_update"):
+        segmentmetrics.update_tracks_aggregated_data(track_ids, db_cursor)
+    for upload, track_id in zip(batch, track_ids):
+        upload.timer.num_segments = sum(
+            1 for _, segment_track_id in segments
+            if segment_track_id == track_id
+        )
+    return track_ids
+
+
+def _apportion_stage_seconds(batch: List[_PendingUpload],
+                             batch_timer: metrics.StageTimer):
+    """Split the time spent saving a batch among its uploads
+
+    Each upload gets a share that is proportional to its number of points.
+
+    """
+
+    total_points = sum(upload.timer.num_points or 0 for upload in batch)
+    for upload in batch:
+        share = (
+            (upload.timer.num_points or 0) / total_points if total_points > 0
+            else 1 / len(batch)
+        )
+        for stage, seconds in batch_timer.stage_seconds.items():
+            upload.timer.stage_seconds[stage] = (
+                upload.timer.stage_seconds.get(stage, 0.0) + seconds * share)
+
+
+@contextlib.contextmanager
+def _savepoint(db_cursor, name: str):
+    """Roll back to a savepoint if the enclosed block raises an exception"""
+    db_cursor.execute("SAVEPOINT {}".format(name))
+    try:
+        yield
+    except Exception:
+        db_cursor.execute("ROLLBACK TO SAVEPOINT {}".format(name))
+        raise
+    db_cursor.execute("RELEASE SAVEPOINT {}".format(name))
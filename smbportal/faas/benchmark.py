@@ -0,0 +1,298 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Ingestion throughput benchmark
+
+Synthetic uploads (see the ``faas.synthetic`` module) are ingested one at a
+time by ``datareceiver.handle_track_upload``, reading them from an in-memory
+object store, so that parsing, collected point insertion, segmentation and
+segment metrics are measured against a real database while S3 is left out.
+Run it against a local PostGIS database with:
+
+    python -m faas.benchmark --owner-uuid <keycloak UID> \\
+        --dbname smbportal --user smbportal > results.json
+
+Results are written as JSON, with overall points/s and tracks/s and, for
+each of the ``metrics.STAGES``, the p50, p95 and p99 of the time spent per
+track. When a previous results file is passed with ``--baseline``, the
+command exits with an error if throughput has dropped by more than
+``--tolerance``, so that regressions may be caught before deploying.
+
+Benchmark tracks are deleted once they have been measured, unless
+``--keep-tracks`` is specified.
+
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import List
+
+import numpy as np
+
+from . import datareceiver
+from . import metrics
+from . import storage
+from . import synthetic
+
+BUCKET = "smb-benchmark"
+
+# fraction of the baseline's throughput that may be lost before a result is
+# reported as a regression
+DEFAULT_TOLERANCE = 0.2
+
+# stages whose baseline p50 is shorter than this are too noisy to be compared
+MIN_COMPARED_SECONDS = 0.005
+
+
+def run_benchmark(db_connection, owner_uuid: str, num_tracks: int = 20,
+                  num_points: int = 2000, first_session_id: int = None,
+                  keep_tracks: bool = False,
+                  options: datareceiver.IngestionOptions = None,
+                  **generator_options) -> dict:
+    """Ingest synthetic tracks and return the benchmark results
+
+    ``owner_uuid`` is the keycloak UID of an existing user, who owns the
+    benchmark tracks. Session ids start from ``first_session_id``, which
+    defaults to the current time in milliseconds, like the smb-app's
+    session ids. ``options`` are passed on to
+    ``datareceiver.handle_track_upload`` and ``generator_options`` to
+    ``synthetic.generate_points``.
+
+    """
+
+    first_session_id = first_session_id or int(time.time() * 1000)
+    first_seed = generator_options.get("seed", 0)
+    object_store = storage.InMemoryObjectStore()
+    object_keys = []
+    for index in range(num_tracks):
+        object_key = "cognito/smb/{}/benchmark-{}.zip".format(
+            owner_uuid, index)
+        points = synthetic.generate_points(
+            num_points,
+            session_id=first_session_id + index,
+            **dict(generator_options, seed=first_seed + index)
+        )
+        object_store.put(BUCKET, object_key, synthetic.build_upload(points))
+        object_keys.append(object_key)
+    sink = metrics.InMemorySink()
+    failures = []
+    start = time.perf_counter()
+    for object_key in object_keys:
+        try:
+            datareceiver.handle_track_upload(
+                BUCKET, object_key, db_connection,
+                options=options, object_store=object_store,
+                metrics_sinks=[sink]
+            )
+        except Exception as exc:
+            failures.append("{}: {}".format(type(exc).__name__, exc))
+    elapsed = time.perf_counter() - start
+    if not keep_tracks:
+        for record in sink.records:
+            if record.track_id is not None:
+                datareceiver._delete_track(record.track_id, db_connection)
+    results = summarize(sink.records, elapsed)
+    results["failures"] = failures
+    results["options"] = dict(
+        generator_options,
+        num_tracks=num_tracks,
+        num_points=num_points,
+        ingestion_options={
+            name: value for name, value in (
+                options or datareceiver.IngestionOptions()).as_dict().items()
+            if isinstance(value, (bool, int, float, str, dict, type(None)))
+        }
+    )
+    return results
+
+
+def summarize(records: List[metrics.IngestionMetrics],
+              elapsed_seconds: float) -> dict:
+    """Aggregate the metrics of the benchmark's ingestions
+
+    >>> record = metrics.IngestionMetrics(
+    ...     "key", 1, True, 1000, 2, 0.5, {"parse": 0.1, "metrics": 0.2})
+    >>> results = summarize([record, record._replace(succeeded=False)], 2)
+    >>> results["tracks_per_second"], results["points_per_second"]
+    (0.5, 500.0)
+    >>> results["stages"]["parse"]
+    {'p50': 0.1, 'p95': 0.1, 'p99': 0.1, 'points_per_second': 10000.0}
+
+    """
+
+    succeeded = [record for record in records if record.succeeded]
+    num_points = sum(record.num_points or 0 for record in succeeded)
+    stages = {}
+    for stage in metrics.STAGES:
+        seconds = [
+            record.stage_seconds[stage] for record in succeeded
+            if stage in record.stage_seconds
+        ]
+        if len(seconds) == 0:
+            continue
+        p50, p95, p99 = np.percentile(seconds, [50, 95, 99]).tolist()
+        total_seconds = sum(seconds)
+        stages[stage] = {
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+            "points_per_second": (
+                num_points / total_seconds if total_seconds > 0 else None),
+        }
+    totals = [record.total_seconds for record in succeeded]
+    p50, p95, p99 = (
+        np.percentile(totals, [50, 95, 99]).tolist() if len(totals) > 0
+        else (None, None, None)
+    )
+    return {
+        "num_tracks": len(succeeded),
+        "num_failed": len(records) - len(succeeded),
+        "num_points": num_points,
+        "elapsed_seconds": elapsed_seconds,
+        "tracks_per_second": len(succeeded) / elapsed_seconds,
+        "points_per_second": num_points / elapsed_seconds,
+        "total_p50": p50,
+        "total_p95": p95,
+        "total_p99": p99,
+        "stages": stages,
+    }
+
+
+def get_regressions(results: dict, baseline: dict,
+                    tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Compare benchmark results with a baseline
+
+    Returns a description of each throughput figure that is worse than the
+    baseline's by more than ``tolerance``. Stages that took less than
+    ``MIN_COMPARED_SECONDS`` in the baseline are not compared.
+
+    >>> baseline = {"points_per_second": 1000, "stages": {
+    ...     "parse": {"p50": 0.2, "points_per_second": 5000},
+    ...     "owner_lookup": {"p50": 0.001, "points_per_second": 10 ** 6}}}
+    >>> results = {"points_per_second": 900, "stages": {
+    ...     "parse": {"p50": 0.5, "points_per_second": 2000},
+    ...     "owner_lookup": {"p50": 0.002, "points_per_second": 5 * 10 ** 5}}}
+    >>> get_regressions(results, baseline)
+    ['parse: 2000 points/s, baseline was 5000 points/s']
+
+    """
+
+    figures = [("overall", results, baseline)]
+    for stage, stage_results in results["stages"].items():
+        stage_baseline = baseline.get("stages", {}).get(stage)
+        if (stage_baseline is not None and
+                stage_baseline["p50"] >= MIN_COMPARED_SECONDS):
+            figures.append((stage, stage_results, stage_baseline))
+    regressions = []
+    for name, current, previous in figures:
+        current_value = current.get("points_per_second")
+        previous_value = previous.get("points_per_second")
+        if current_value is None or not previous_value:
+            continue
+        if current_value < previous_value * (1 - tolerance):
+            regressions.append(
+                "{}: {:.0f} points/s, baseline was {:.0f} points/s".format(
+                    name, current_value, previous_value)
+            )
+    return regressions
+
+
+def _get_parser():
+    parser = argparse.ArgumentParser(
+        description="Measure ingestion throughput with synthetic tracks"
+    )
+    parser.add_argument(
+        "--owner-uuid",
+        required=True,
+        help="Keycloak UID of the user that owns the benchmark tracks"
+    )
+    parser.add_argument("--dbname", default=os.getenv("PGDATABASE"))
+    parser.add_argument("--user", default=os.getenv("PGUSER"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD"))
+    parser.add_argument(
+        "--host", default=os.getenv("PGHOST", "localhost"))
+    parser.add_argument("--port", default=os.getenv("PGPORT", "5432"))
+    parser.add_argument("--tracks", type=int, default=20)
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--sampling-seconds", type=float, default=1)
+    parser.add_argument(
+        "--vehicle-modes",
+        default="2",
+        help="Comma separated list of smb-app vehicle modes, which are "
+             "switched evenly along each track"
+    )
+    parser.add_argument(
+        "--gps-noise",
+        type=float,
+        default=2.0,
+        help="Standard deviation of the GPS error, in meters"
+    )
+    parser.add_argument(
+        "--sensor-noise",
+        type=float,
+        default=1.0,
+        help="Scale of the spread of the other sensors' values"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--columnar", action="store_true")
+    parser.add_argument("--decimate", action="store_true")
+    parser.add_argument("--sensor-arrays", action="store_true")
+    parser.add_argument("--validate", action="store_true")
+    parser.add_argument("--keep-tracks", action="store_true")
+    parser.add_argument(
+        "--baseline",
+        help="JSON file with the results of a previous run. Exit with an "
+             "error if throughput is worse than the baseline's"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    return parser
+
+
+def main(argv=None):
+    args = _get_parser().parse_args(argv)
+    db_connection = datareceiver.get_db_connection(
+        args.dbname, args.user, args.password, host=args.host,
+        port=args.port
+    )
+    try:
+        results = run_benchmark(
+            db_connection,
+            args.owner_uuid,
+            num_tracks=args.tracks,
+            num_points=args.points,
+            keep_tracks=args.keep_tracks,
+            options=datareceiver.IngestionOptions(
+                columnar=args.columnar,
+                decimation={} if args.decimate else None,
+                sensor_arrays=args.sensor_arrays,
+                validation={} if args.validate else None
+            ),
+            sampling_seconds=args.sampling_seconds,
+            vehicle_modes=tuple(args.vehicle_modes.split(",")),
+            gps_noise=args.gps_noise,
+            sensor_noise=args.sensor_noise,
+            seed=args.seed
+        )
+    finally:
+        db_connection.close()
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_handler:
+            results["regressions"] = get_regressions(
+                results, json.load(baseline_handler), args.tolerance)
+    print(json.dumps(results, indent=2))
+    return 0 if not results["failures"] and not results.get(
+        "regressions") else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
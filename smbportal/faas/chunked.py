@@ -0,0 +1,195 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Chunked ingestion of very long tracks
+
+Instead of creating all of a track's database records in a single
+transaction, ``save_track_chunks`` streams the track's points into the
+database in chunks, each in its own transaction. Memory usage and the time
+locks are held for then do not depend on the length of the track.
+
+"""
+
+import itertools
+import logging
+from typing import Iterable
+from typing import List
+
+from . import datareceiver
+from . import metrics
+from . import queries
+from . import segmentmetrics
+from . import simplification
+
+logger = logging.getLogger(__name__)
+
+# number of collected points that ``save_track_chunks`` inserts in each
+# transaction
+POINTS_PER_CHUNK = 50000
+
+
+def save_track_chunks(session_id, points: Iterable[tuple],
+                      owner_uuid: str, db_connection,
+                      points_per_chunk: int = POINTS_PER_CHUNK,
+                      timer: metrics.StageTimer = None) -> int:
+    """Create the database records for a track, one chunk of points at a time
+
+    ``points`` are ``datareceiver.PointData`` tuples, which are consumed
+    lazily. Each chunk of ``points_per_chunk`` points is processed in its
+    own transaction: it is copied into the staging table (see
+    ``datareceiver.insert_collected_points_bulk``), from where it is used
+    to:
+
+    -  extend the track's last segment and create new segments, whenever
+       the vehicle type changes (see ``insert-staged-track-segments.sql``);
+    -  calculate emissions, costs and health for the segments that have
+       been completed, i.e. all but the last one, which may still be
+       extended by the next chunk;
+    -  extend the track's geometry and update its length, end date and
+       aggregated segment data.
+
+    The track's start date is only set once the last chunk has been stored,
+    so that the API does not list a partially ingested track (see
+    ``tracks.models.TrackQuerySet.exclude_in_progress``).
+
+    Points are expected to be in chronological order, as sent by the
+    smb-app. Segments are then the same as those created by
+    ``datareceiver.save_track``.
+
+    Since chunks are committed as they go, the track is deleted if any of
+    them fails.
+
+    """
+
+    timer = timer or metrics.StageTimer()
+    points = iter(points)
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            with timer.stage("owner_lookup"):
+                user_id = datareceiver.get_track_owner_internal_id(
+                    owner_uuid, cursor)
+            with timer.stage("point_insert"):
+                track_id = datareceiver._insert_track(
+                    session_id, user_id, cursor)
+    try:
+        open_segment_id = None
+        segment_ids = set()
+        num_points = 0
+        while True:
+            with db_connection:
+                with db_connection.cursor() as cursor:
+                    with timer.stage("point_insert"):
+                        num_staged = _stage_collected_points(
+                            track_id,
+                            itertools.islice(points, points_per_chunk),
+                            num_points,
+                            cursor
+                        )
+                    if num_staged == 0:
+                        break
+                    num_points += num_staged
+                    with timer.stage("segmentation"):
+                        segments = _insert_staged_segments(
+                            track_id, owner_uuid, open_segment_id, cursor)
+                    chunk_segment_ids = [id_ for id_, _, _ in segments]
+                    completed_ids = chunk_segment_ids[:-1]
+                    if (open_segment_id is not None and
+                            open_segment_id not in chunk_segment_ids):
+                        completed_ids.insert(0, open_segment_id)
+                    open_segment_id = chunk_segment_ids[-1]
+                    segment_ids.update(chunk_segment_ids)
+                    with timer.stage("metrics"):
+                        _insert_completed_segments_data(
+                            track_id, completed_ids, cursor)
+                    with timer.stage("aggregate_update"):
+                        queries.registry.execute(
+                            cursor,
+                            "update-staged-track-aggregates.sql",
+                            {"track_id": track_id}
+                        )
+                        segmentmetrics.update_tracks_aggregated_segment_data(
+                            track_id, track_id, cursor)
+                    with timer.stage("point_insert"):
+                        queries.registry.execute(
+                            cursor, "insert-collectedpoint-from-staging.sql")
+            logger.debug("Inserted {} points of track {}".format(
+                num_points, track_id))
+        with db_connection:
+            with db_connection.cursor() as cursor:
+                with timer.stage("metrics"):
+                    _insert_completed_segments_data(
+                        track_id, [open_segment_id], cursor)
+                with timer.stage("aggregate_update"):
+                    segmentmetrics.update_tracks_aggregated_segment_data(
+                        track_id, track_id, cursor)
+                    queries.registry.execute(
+                        cursor,
+                        "finish-chunked-track.sql",
+                        {"track_id": track_id}
+                    )
+    except Exception:
+        datareceiver._delete_track(track_id, db_connection)
+        raise
+    timer.num_segments = len(segment_ids)
+    return track_id
+
+
+def _stage_collected_points(track_id: int, points: Iterable[tuple],
+                            first_seq: int, db_cursor) -> int:
+    """Copy points into the staging table
+
+    Returns the number of staged points.
+
+    """
+
+    num_staged = [0]
+
+    def get_rows():
+        for seq, pt in enumerate(points, start=first_seq):
+            num_staged[0] += 1
+            yield datareceiver._get_staging_row(seq, track_id, pt)
+
+    queries.registry.execute(db_cursor, "create-collectedpoint-staging.sql")
+    queries.registry.copy(
+        db_cursor,
+        "copy-collectedpoint-staging.sql",
+        datareceiver._CopyStream(get_rows())
+    )
+    return num_staged[0]
+
+
+def _insert_staged_segments(track_id: int, owner_uuid: str,
+                            open_segment_id: int, db_cursor) -> List[tuple]:
+    """Segment the staged points of a track
+
+    Returns ``(segment_id, vehicle_type, end_date)`` tuples for the segments
+    that have been created or extended, in chronological order.
+
+    """
+
+    queries.registry.execute(
+        db_cursor,
+        "insert-staged-track-segments.sql",
+        {
+            "track_id": track_id,
+            "user_uuid": owner_uuid,
+            "open_segment_id": open_segment_id,
+        }
+    )
+    return db_cursor.fetchall()
+
+
+def _insert_completed_segments_data(track_id: int, segment_ids: List[int],
+                                    db_cursor):
+    if len(segment_ids) > 0:
+        simplification.update_segments_geometry(
+            [track_id], db_cursor, segment_ids=segment_ids)
+        segmentmetrics.insert_tracks_segments_data(
+            [track_id], db_cursor, segment_ids=segment_ids)
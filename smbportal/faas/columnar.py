@@ -0,0 +1,143 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Columnar parsing of track data
+
+Instead of producing one ``PointData`` tuple of strings for each line of
+track data, the functions in this module load a whole upload into typed
+NumPy arrays, one for each field sent by the smb-app. Lines are split by
+the ``csv`` module, whose reader is implemented in C, and each column is
+then converted by NumPy as a whole:
+
+- numeric fields are converted to floats and integers;
+- ``timeStamp`` values, which are sent as milliseconds since the epoch, are
+  converted to ``datetime64[ms]`` values (in UTC);
+- ``vehicleMode`` values are converted to the integer codes of the relevant
+  ``VehicleType``.
+
+"""
+
+from collections import OrderedDict
+import csv
+from typing import Dict
+from typing import Iterable
+
+import numpy as np
+
+from . import _constants
+from ._constants import VehicleType
+
+# types of each field sent by the smb-app, in the same order as they are
+# found in the track data
+COLUMN_TYPES = OrderedDict([
+    ("accelerationX", np.float64),
+    ("accelerationY", np.float64),
+    ("accelerationZ", np.float64),
+    ("accuracy", np.float64),
+    ("batConsumptionPerHour", np.float64),
+    ("batteryLevel", np.float64),
+    ("deviceBearing", np.float64),
+    ("devicePitch", np.float64),
+    ("deviceRoll", np.float64),
+    ("elevation", np.float64),
+    ("gps_bearing", np.float64),
+    ("humidity", np.float64),
+    ("latitude", np.float64),
+    ("longitude", np.float64),
+    ("lumen", np.float64),
+    ("pressure", np.float64),
+    ("proximity", np.float64),
+    ("sessionId", np.int64),
+    ("speed", np.float64),
+    ("temperature", np.float64),
+    ("timeStamp", "datetime64[ms]"),
+    ("vehicleMode", np.int8),
+    ("serialVersionUID", np.dtype("U32")),
+])
+
+TrackColumns = Dict[str, np.ndarray]
+
+# types of the values that need some further conversion
+_RAW_TYPES = {
+    "timeStamp": np.int64,
+    "vehicleMode": np.dtype("U8"),
+}
+
+# names of the vehicle types, indexed by their code
+_VEHICLE_TYPE_NAMES = np.array(
+    [""] + [VehicleType(code).name for code in range(1, len(VehicleType) + 1)]
+)
+
+
+def parse_track_data(lines: Iterable[str]) -> TrackColumns:
+    """Parse lines of track data into a mapping of typed arrays
+
+    As with ``datareceiver.parse_track_data``, the first line is considered
+    to be a header and is ignored, as are empty lines.
+
+    """
+
+    reader = csv.reader(lines)
+    next(reader, None)
+    # rows with extra fields add columns that are ignored, while rows that
+    # lack some field leave out the same columns of all other rows
+    columns = list(zip(*[row for row in reader if row]))
+    num_fields = len(COLUMN_TYPES)
+    if len(columns) == 0:
+        columns = [()] * num_fields
+    elif len(columns) < num_fields:
+        raise ValueError(
+            "Track data has {} fields instead of {}".format(
+                len(columns), num_fields)
+        )
+    result = {}
+    for (name, type_), values in zip(COLUMN_TYPES.items(), columns):
+        raw_column = np.array(values, dtype=_RAW_TYPES.get(name, type_))
+        if name == "vehicleMode":
+            column = get_vehicle_type_codes(raw_column)
+        else:
+            column = raw_column.astype(type_)
+        result[name] = column
+    return result
+
+
+def get_vehicle_type_codes(raw_vehicle_modes: np.ndarray) -> np.ndarray:
+    """Map the vehicle modes sent by the smb-app to ``VehicleType`` codes
+
+    >>> get_vehicle_type_codes(np.array(["1", "2", "2", "8"]))
+    array([1, 2, 2, 9], dtype=int8)
+
+    """
+
+    distinct, inverse = np.unique(raw_vehicle_modes, return_inverse=True)
+    codes = np.array(
+        [
+            _constants.SMB_APP_VEHICLE_MODES.get(
+                mode, VehicleType.unknown).value
+            for mode in distinct
+        ],
+        dtype=COLUMN_TYPES["vehicleMode"]
+    )
+    return codes[inverse.reshape(-1)]
+
+
+def get_vehicle_type_names(vehicle_type_codes: np.ndarray) -> np.ndarray:
+    """Return the names of the vehicle types with the input codes
+
+    >>> get_vehicle_type_names(np.array([1, 2, 9]))
+    array(['foot', 'bike', 'unknown'], dtype='<U17')
+
+    """
+
+    return _VEHICLE_TYPE_NAMES[vehicle_type_codes]
+
+
+def get_num_points(track_data: TrackColumns) -> int:
+    return len(track_data["timeStamp"])
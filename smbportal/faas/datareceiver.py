@@ -28,25 +28,50 @@ Workflow is something like:
 
 """
 
+import codecs
+import contextlib
 from collections import namedtuple
 import datetime as dt
+import functools
 import io
+import itertools
 import logging
-import os
-import pathlib
 import re
+import time
+from typing import Iterable
+from typing import Iterator
 from typing import List
+from typing import Union
 import zipfile
 
-import boto3
+import numpy as np
 import psycopg2
 import pytz
 
 from . import _constants
+from . import chunked
+from . import columnar as columnar_parser
+from . import decimation as point_decimation
+from . import failures
+from . import ledger
+from . import metrics
+from . import pool
+from . import queries
+from . import segmentmetrics
+from . import sensorarrays
+from . import simplification
+from . import storage
+from . import validation as track_validation
 from ._constants import VehicleType
 
 logger = logging.getLogger(__name__)
 
+# size of the chunks used when downloading and decompressing track data
+CHUNK_SIZE = 64 * 1024
+
+# downloaded track data files larger than this are spooled to disk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
 _DATA_FIELDS = [
     "accelerationX",
     "accelerationY",
@@ -74,244 +99,639 @@ _DATA_FIELDS = [
 ]
 
 PointData = namedtuple("PointData", _DATA_FIELDS)
-SegmentInfo = namedtuple("SegmentInfo", [
-    "id",
+
+# order of the columns in the collected points' staging table. It must be kept
+# in sync with the `copy-collectedpoint-staging.sql` query
+_COPY_COLUMNS = [
+    "seq",
     "vehicle_type",
-    "length_km",
-    "duration_hours",
-    "speed_km_h"
-])
+    "track_id",
+    "longitude",
+    "latitude",
+    "accelerationx",
+    "accelerationy",
+    "accelerationz",
+    "accuracy",
+    "batconsumptionperhour",
+    "batterylevel",
+    "devicebearing",
+    "devicepitch",
+    "deviceroll",
+    "elevation",
+    "gps_bearing",
+    "humidity",
+    "lumen",
+    "pressure",
+    "proximity",
+    "speed",
+    "temperature",
+    "sessionid",
+    "timestamp",
+]
+
+_COPY_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    "\t": "\\t",
+    "\n": "\\n",
+    "\r": "\\r",
+})
+
+
+class IngestionOptions(object):
+    """Options that select how ``handle_track_upload`` ingests a track
+
+    :arg bulk_insert: whether collected points are loaded with PostgreSQL's
+        COPY instead of issuing one INSERT statement per point
+    :arg columnar: whether the whole track data is parsed into typed arrays
+        (see the ``faas.columnar`` module), which are then loaded with COPY.
+        Otherwise track data is parsed lazily, while collected points are
+        being inserted
+    :arg decimation: keyword arguments for ``decimation.decimate``. If not
+        ``None``, points are decimated before being inserted (see the
+        ``faas.decimation`` module)
+    :arg sensor_arrays: whether collected points are also stored as compact
+        per-track sensor channels (see the ``faas.sensorarrays`` module)
+    :arg use_ledger: whether the ingestion is registered in the ingestion
+        ledger (see the ``faas.ledger`` module). Uploads that have already
+        been ingested are then skipped without being downloaded and failed
+        ingestions are resumed from the stage that failed
+    :arg points_per_chunk: if not ``None``, track data is streamed into the
+        database in chunks of that many points, each in its own transaction
+        (see ``chunked.save_track_chunks``), so that very long tracks are
+        ingested with bounded memory
+    :arg validation: keyword arguments for ``validation.validate``. If not
+        ``None``, track data is checked before any database record is
+        created (see the ``faas.validation`` module)
+    :arg reject_invalid: whether invalid tracks raise
+        ``validation.InvalidTrackError``, in which case they are never
+        retried. Otherwise they are stored with their points, flagged as not
+        valid and without segments, since calculating segment data would
+        only waste time
+    :arg retry_policy: if not ``None``, a failed ingestion is recorded in
+        the failure store and scheduled for a retry according to the policy
+        (see the ``faas.failures`` module)
+
+    Decimation, sensor arrays and validation need the whole track, so they
+    imply ``columnar``. Chunked ingestion cannot be combined with them, nor
+    with ``columnar`` and ``use_ledger``, in which case ``ValueError`` is
+    raised.
+
+    """
+
+    def __init__(self, bulk_insert: bool = True, columnar: bool = False,
+                 decimation: dict = None, sensor_arrays: bool = False,
+                 use_ledger: bool = False, points_per_chunk: int = None,
+                 validation: dict = None, reject_invalid: bool = True,
+                 retry_policy: failures.RetryPolicy = None):
+        self.bulk_insert = bulk_insert
+        self.columnar = columnar
+        self.decimation = decimation
+        self.sensor_arrays = sensor_arrays
+        self.use_ledger = use_ledger
+        self.points_per_chunk = points_per_chunk
+        self.validation = validation
+        self.reject_invalid = reject_invalid
+        self.retry_policy = retry_policy
+        if points_per_chunk is not None:
+            if points_per_chunk < 1:
+                raise ValueError("points_per_chunk must be at least 1")
+            if self.parses_columns or use_ledger:
+                raise ValueError(
+                    "Chunked ingestion cannot be combined with columnar "
+                    "parsing, decimation, sensor arrays, the ingestion "
+                    "ledger or validation"
+                )
+
+    def __repr__(self):
+        return "{}({})".format(
+            type(self).__name__,
+            ", ".join(
+                "{}={!r}".format(name, value)
+                for name, value in self.as_dict().items()
+            )
+        )
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, IngestionOptions) and
+            self.as_dict() == other.as_dict()
+        )
+
+    @property
+    def parses_columns(self) -> bool:
+        """Whether the whole track data is parsed into typed arrays"""
+        return (
+            self.columnar or self.decimation is not None or
+            self.sensor_arrays or self.validation is not None
+        )
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
 
+    def replace(self, **changes) -> "IngestionOptions":
+        """Return new options with some of the values changed
 
-def get_db_connection(dbname, user, password, host="localhost", port="5432"):
-    return psycopg2.connect(
+        >>> IngestionOptions().replace(columnar=True).columnar
+        True
+
+        """
+
+        return IngestionOptions(**dict(self.as_dict(), **changes))
+
+
+def get_db_connection(dbname, user, password, host="localhost", port="5432",
+                      prepare_statements=False):
+    """Connect to the database
+
+    If ``prepare_statements`` is true, the most frequently used queries are
+    turned into server-side prepared statements on the new connection.
+
+    """
+
+    connection = psycopg2.connect(
         host=host,
         port=port,
         dbname=dbname,
         user=user,
         password=password
     )
+    if prepare_statements:
+        queries.registry.prepare(connection)
+    return connection
+
+
+def get_db_connection_pool(dbname, user, password, host="localhost",
+                           port="5432", min_size=1, max_size=10, timeout=30,
+                           health_check_interval=30,
+                           prepare_statements=True) -> pool.ConnectionPool:
+    """Create a pool of database connections
+
+    The returned pool may be passed to ``handle_track_upload`` instead of a
+    single connection.
+
+    """
+
+    return pool.ConnectionPool(
+        functools.partial(
+            get_db_connection, dbname, user, password, host=host, port=port),
+        min_size=min_size,
+        max_size=max_size,
+        timeout=timeout,
+        health_check_interval=health_check_interval,
+        prepare_statements=prepare_statements
+    )
 
 
 def handle_track_upload(s3_bucket_name: str, object_key: str,
-                        db_connection) -> int:
-    """Ingest track data into smb database"""
-    try:
-        track_owner = get_track_owner_uuid(object_key)
-    except AttributeError:
-        raise RuntimeError(
-            "Could not determine track owner for object {}".format(object_key))
-    logger.debug("Retrieving data from S3 bucket...")
-    raw_data = retrieve_track_data(s3_bucket_name, object_key)
-    logger.debug("Parsing retrieved track data...")
-    parsed_data = parse_track_data(raw_data)
-    logger.debug("Performing calculations and creating database records...")
-    with db_connection:  # changes are committed when `with` block exits
-        with db_connection.cursor() as cursor:
-            user_id = get_track_owner_internal_id(track_owner, cursor)
-            track_id = insert_track(parsed_data, user_id, cursor)
-            insert_collected_points(track_id, parsed_data, cursor)
-            insert_segments(track_id, track_owner, cursor)
-            segments_info = get_segments_info(track_id, cursor)
-            for index, info in enumerate(segments_info):
-                emissions = calculate_emissions(
-                    info.vehicle_type, info.length_km)
-                costs = calculate_costs(
-                    info.vehicle_type, info.length_km, info.duration_hours)
-                duration_minutes = info.duration_hours * 60
-                health = calculate_health(
-                    info.vehicle_type, duration_minutes, info.speed_km_h)
-                insert_segment_data(info.id, emissions, costs, health, cursor)
-            update_track_aggregated_data(track_id, cursor)
-    return track_id
+                        db_connection, options: IngestionOptions = None,
+                        object_store: storage.ObjectStore = None,
+                        metrics_sinks: list = None) -> int:
+    """Ingest track data into smb database
 
+    ``db_connection`` may be either a database connection or a
+    ``pool.ConnectionPool``, in which case a connection is borrowed from the
+    pool only while the database records are being created.
 
-def update_track_aggregated_data(track_id, db_cursor):
-    query_kwargs = {"track_id": track_id}
-    queries = [
-        "update-track-aggregated-emissions.sql",
-        "update-track-aggregated-costs.sql",
-        "update-track-aggregated-health.sql",
-        "update-track-info.sql",
-    ]
-    for query_file in queries:
-        db_cursor.execute(_get_query(query_file), query_kwargs)
+    ``options`` is an ``IngestionOptions`` that selects how the track is
+    ingested. When the ingestion ledger is used and the upload is being
+    ingested by someone else at the same time, ``None`` is returned.
+    Otherwise, if the upload's session has already been ingested, e.g.
+    because the same upload was queued twice, the id of the existing track
+    is returned without creating any records.
 
+    Track data is read from ``object_store``, which defaults to the store
+    returned by ``storage.get_object_store``, normally S3.
 
-def insert_segment_data(segment_id, emissions, costs, health, db_cursor):
-    _perform_segment_insert(
-        "insert-emission.sql", segment_id, emissions, db_cursor)
-    _perform_segment_insert(
-        "insert-cost.sql", segment_id, costs, db_cursor)
-    _perform_segment_insert(
-        "insert-health.sql", segment_id, health, db_cursor)
+    The time spent in each ingestion stage is measured and sent to
+    ``metrics_sinks``, which default to the sinks configured in the
+    ``faas.metrics`` module.
 
+    """
 
-def get_segments_info(track_id, db_cursor):
-    db_cursor.execute(
-        _get_query("get-segment-info.sql"),
-        {"track_id": track_id}
-    )
-    result = []
-    for row in db_cursor.fetchall():
-        segment_id, vehicle_type, length_meters, duration = row
-        length_km = length_meters / 1000
-        duration_hours = duration.days * 24 + duration.seconds / (60 * 60)
-        avg_speed = length_km / duration_hours  # km/h
-        result.append(
-            SegmentInfo(
-                id=segment_id,
-                vehicle_type=VehicleType[vehicle_type],
-                length_km=length_km,
-                duration_hours=duration_hours,
-                speed_km_h=avg_speed
+    options = options or IngestionOptions()
+    timer = metrics.StageTimer()
+    try:
+        try:
+            track_owner = get_track_owner_uuid(object_key)
+        except AttributeError:
+            raise RuntimeError(
+                "Could not determine track owner for object {}".format(
+                    object_key))
+        if options.use_ledger:
+            track_id = _handle_track_upload_with_ledger(
+                s3_bucket_name, object_key, track_owner, db_connection,
+                options, object_store=object_store, timer=timer
             )
+        else:
+            logger.debug("Retrieving data from S3 bucket...")
+            with timer.stage("download"):
+                archive = download_track_data(
+                    s3_bucket_name, object_key, object_store=object_store)
+            with archive:
+                (session_id, track_data, point_inserter,
+                 validation_result) = read_track_data(
+                    archive, object_key, options=options, timer=timer)
+                logger.debug(
+                    "Performing calculations and creating database "
+                    "records...")
+                with _borrow_connection(db_connection) as connection:
+                    with timer.stage("owner_lookup"):
+                        track_id = _get_ingested_track_id(
+                            session_id, connection)
+                    if track_id is not None:
+                        logger.info(
+                            "Session {} has already been ingested".format(
+                                session_id))
+                    elif options.points_per_chunk is not None:
+                        track_id = chunked.save_track_chunks(
+                            session_id, track_data, track_owner, connection,
+                            points_per_chunk=options.points_per_chunk,
+                            timer=timer
+                        )
+                    else:
+                        track_id = save_track(
+                            session_id, track_data, track_owner, connection,
+                            point_inserter=point_inserter,
+                            validation_result=validation_result, timer=timer
+                        )
+    except Exception as exc:
+        metrics.emit(
+            timer.get_metrics(object_key, succeeded=False),
+            sinks=metrics_sinks
         )
-    return result
+        retry_policy = options.retry_policy
+        if retry_policy is not None:
+            if isinstance(exc, track_validation.InvalidTrackError):
+                # invalid track data will not become valid by retrying
+                retry_policy = retry_policy._replace(max_attempts=1)
+            _record_failure(
+                s3_bucket_name, object_key, timer.failed_stage, exc,
+                db_connection, retry_policy
+            )
+        raise
+    metrics.emit(timer.get_metrics(object_key, track_id), sinks=metrics_sinks)
+    return track_id
 
 
-def _perform_segment_insert(query_filename, segment_id, query_params: dict,
-                            db_cursor):
-    all_query_params = query_params.copy()
-    all_query_params["segment_id"] = segment_id
-    db_cursor.execute(
-        _get_query(query_filename),
-        all_query_params
-    )
+def _record_failure(s3_bucket_name: str, object_key: str, stage: str,
+                    exception: Exception, db_connection,
+                    retry_policy: failures.RetryPolicy):
+    """Record a failed ingestion, without masking the original exception"""
+    try:
+        with _borrow_connection(db_connection) as connection:
+            status = failures.record_failure(
+                s3_bucket_name, object_key, stage, exception, connection,
+                policy=retry_policy
+            )
+    except Exception:
+        logger.exception("Could not record failed ingestion of {}".format(
+            object_key))
+    else:
+        if status == failures.DEAD:
+            logger.warning(
+                "Giving up on {} after {} attempts".format(
+                    object_key, retry_policy.max_attempts)
+            )
 
 
-def calculate_emissions(vehicle_type: VehicleType,
-                        segment_length:float) -> dict:
-    result = {}
-    for pollutant, coeffs in _constants.EMISSIONS.items():
-        emitted = (
-            (coeffs.get(vehicle_type, 0) * segment_length) /
-            _constants.AVERAGE_PASSENGER_COUNT.get(vehicle_type, 1)
-        )
-        reference = (
-            (coeffs[VehicleType.car] * segment_length) /
-            _constants.AVERAGE_PASSENGER_COUNT[VehicleType.car]
+def _handle_track_upload_with_ledger(s3_bucket_name: str, object_key: str,
+                                     owner_uuid: str, db_connection,
+                                     options: IngestionOptions,
+                                     object_store=None,
+                                     timer: metrics.StageTimer = None) -> int:
+    etag = ledger.get_object_etag(
+        s3_bucket_name, object_key, object_store=object_store)
+    with _borrow_connection(db_connection) as connection:
+        record = ledger.start_ingestion(
+            s3_bucket_name, object_key, etag, connection)
+        if record is None:
+            logger.info("Skipping duplicate delivery of {}".format(object_key))
+            return ledger.get_ingested_track_id(object_key, etag, connection)
+    try:
+        if record.stage != "":
+            logger.debug("Resuming ingestion after {!r} stage...".format(
+                record.stage))
+            with _borrow_connection(db_connection) as connection:
+                track_id = save_track_stages(
+                    record, record.session_id, None, owner_uuid, connection,
+                    timer=timer
+                )
+        else:
+            start = time.perf_counter()
+            with timer.stage("download"):
+                archive = download_track_data(
+                    s3_bucket_name, object_key, object_store=object_store)
+            with archive:
+                timings = {"download": time.perf_counter() - start}
+                (session_id, track_data, point_inserter,
+                 validation_result) = read_track_data(
+                    archive, object_key, options=options, timer=timer)
+                with _borrow_connection(db_connection) as connection:
+                    with connection:
+                        with connection.cursor() as cursor:
+                            track_id = ledger.get_track_id_by_session(
+                                session_id, cursor)
+                    if track_id is not None:
+                        logger.info(
+                            "Session {} has already been ingested".format(
+                                session_id))
+                        ledger.finish_ingestion(
+                            record.id, connection, status=ledger.SKIPPED,
+                            track_id=track_id, timings=timings
+                        )
+                        return track_id
+                    track_id = save_track_stages(
+                        record, session_id, track_data, owner_uuid,
+                        connection, point_inserter=point_inserter,
+                        timings=timings, validation_result=validation_result,
+                        timer=timer
+                    )
+        with _borrow_connection(db_connection) as connection:
+            ledger.finish_ingestion(record.id, connection)
+    except Exception as exc:
+        with _borrow_connection(db_connection) as connection:
+            ledger.finish_ingestion(
+                record.id, connection, status=ledger.FAILED,
+                error="{}: {}".format(type(exc).__name__, exc)
+            )
+        raise
+    return track_id
+
+
+def read_track_data(archive, object_key: str,
+                    options: IngestionOptions = None,
+                    timer: metrics.StageTimer = None):
+    """Prepare the track data of a downloaded archive for insertion
+
+    Returns a tuple with the track's session id, its track data, the
+    function that must be used for inserting track data as collected points
+    and the ``validation.ValidationResult`` of the track, if it has been
+    validated, or ``None``. Unless ``options`` need the whole track data
+    (see ``IngestionOptions.parses_columns``), track data is an iterator
+    that reads the archive lazily, so the archive must be kept open until
+    the points have been inserted.
+
+    Track data is validated after being parsed, before being decimated. If
+    the track is not valid and invalid tracks are rejected,
+    ``validation.InvalidTrackError`` is raised.
+
+    Reading is timed with ``timer``, which also gets the number of points.
+
+    """
+
+    options = options or IngestionOptions()
+    timer = timer or metrics.StageTimer()
+    lines = timer.iter_stage("unzip", iter_track_data_lines(archive))
+    validation_result = None
+    if options.parses_columns:
+        logger.debug("Parsing retrieved track data...")
+        with timer.stage("parse"):
+            track_data = columnar_parser.parse_track_data(lines)
+        if options.validation is not None:
+            with timer.stage("validation"):
+                validation_result = track_validation.validate(
+                    track_data, **options.validation)
+                if (options.reject_invalid and
+                        not validation_result.is_valid):
+                    raise track_validation.InvalidTrackError(
+                        validation_result.errors)
+        if options.decimation is not None:
+            with timer.stage("decimation"):
+                track_data = point_decimation.decimate(
+                    track_data, **options.decimation)
+        timer.num_points = columnar_parser.get_num_points(track_data)
+        session_ids = track_data["sessionId"][:1].tolist()
+        point_inserter = (
+            insert_collected_point_columns_and_channels
+            if options.sensor_arrays else insert_collected_point_columns
         )
-        saved = reference - emitted if vehicle_type != VehicleType.car else 0
-        result.update({
-            pollutant.name: emitted,
-            "{}_saved".format(pollutant.name): saved
-        })
-    return result
-
-
-def calculate_costs(vehicle_type: VehicleType, length_km: float,
-                    duration_hours: float):
-    public_transports = [
-        vehicle_type.bus,
-        vehicle_type.train,
-    ]
-    if vehicle_type in public_transports:
-        costs = _calculate_costs_public_transportation(
-            vehicle_type, length_km, duration_hours)
     else:
-        costs = _calculate_costs_private_vehicle(
-            vehicle_type, length_km, duration_hours)
-    result = {
-        "fuel_cost": costs[0],
-        "time_cost": costs[1],
-        "depreciation_cost": costs[2],
-        "operation_cost": costs[3],
-        "total_cost": costs[4],
-    }
-    return result
+        points = timer.iter_stage("parse", iter_track_points(lines))
+        first_point = next(points, None)
+        session_ids = [first_point.sessionId] if first_point else []
+        track_data = _count_points(
+            itertools.chain([first_point], points), timer)
+        point_inserter = (
+            insert_collected_points_bulk if options.bulk_insert
+            else insert_collected_points
+        )
+    if len(session_ids) == 0:
+        raise RuntimeError(
+            "Could not find track data in object {}".format(object_key))
+    return session_ids[0], track_data, point_inserter, validation_result
+
 
+def _count_points(points: Iterable[PointData],
+                  timer: metrics.StageTimer) -> Iterator[PointData]:
+    timer.num_points = 0
+    for point in points:
+        timer.num_points += 1
+        yield point
 
-def _calculate_costs_private_vehicle(vehicle_type: VehicleType,
-                                     length_km: float, duration_hours: float):
-    """Calculate monetary costs associated with using a private vehicle
 
-    - Fuel, depreciation and operation costs do not take into account the
-      passenger count as these costs are usually supported solely by the
-      vehicle's owner, even if there are other passengers aboard
-    - The total cost may be enlarged according to the vehicle type, in order
-      to provide an account of other costs
+def save_track(session_id, track_data, owner_uuid: str, db_connection,
+               point_inserter=None,
+               validation_result: track_validation.ValidationResult = None,
+               timer: metrics.StageTimer = None) -> int:
+    """Create the database records for a track, in a single transaction
+
+    ``point_inserter`` is the function used to insert ``track_data`` as
+    collected points. It defaults to ``insert_collected_points_bulk``.
+
+    If ``validation_result`` is not ``None``, it is stored in the track.
+    Segments of tracks that are not valid are not created.
 
     """
 
-    fuel_cost = _get_fuel_cost(length_km, vehicle_type)
-    time_cost = duration_hours * _constants.TIME_COST_PER_HOUR_EURO
-    depreciation_cost = (
-            length_km * _constants.DEPRECIATION_COST.get(vehicle_type, 0))
-    operation_cost = length_km * _constants.OPERATION_COST.get(vehicle_type, 0)
-    total_cost = (
-            sum((fuel_cost, time_cost, depreciation_cost, operation_cost)) *
-            (1 + _constants.TOTAL_COST_OVERHEAD.get(vehicle_type, 0))
-    )
+    point_inserter = point_inserter or insert_collected_points_bulk
+    timer = timer or metrics.StageTimer()
+    with db_connection:  # changes are committed when `with` block exits
+        with db_connection.cursor() as cursor:
+            with timer.stage("owner_lookup"):
+                user_id = get_track_owner_internal_id(owner_uuid, cursor)
+            with timer.stage("point_insert"):
+                track_id = _insert_track(session_id, user_id, cursor)
+                point_inserter(track_id, track_data, cursor)
+            if validation_result is None or validation_result.is_valid:
+                with timer.stage("segmentation"):
+                    segment_ids = insert_segments(
+                        track_id, owner_uuid, cursor)
+                    timer.num_segments = len(segment_ids)
+                    simplification.update_segments_geometry(
+                        [track_id], cursor)
+                with timer.stage("metrics"):
+                    segmentmetrics.insert_segments_data(track_id, cursor)
+            with timer.stage("aggregate_update"):
+                update_track_aggregated_data(track_id, cursor)
+                if validation_result is not None:
+                    update_track_validation(
+                        track_id, validation_result, cursor)
+    return track_id
 
-    return fuel_cost, time_cost, depreciation_cost, operation_cost, total_cost
 
+def _get_ingested_track_id(session_id, db_connection) -> int:
+    """Return the id of the track of a session, if it has been ingested"""
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            return ledger.get_track_id_by_session(session_id, cursor)
 
-def _calculate_costs_public_transportation(vehicle_type: VehicleType,
-                                           length_km:float,
-                                           duration_hours: float):
-    fuel_cost = 0
-    time_cost = duration_hours * _constants.TIME_COST_PER_HOUR_EURO
-    depreciation_cost = 0
-    operation_cost = 0
-    total_cost = (
-            sum((fuel_cost, time_cost, depreciation_cost, operation_cost)) *
-            (1 + _constants.TOTAL_COST_OVERHEAD.get(vehicle_type, 0))
-    )
-    return fuel_cost, time_cost, depreciation_cost, operation_cost, total_cost
 
+def _delete_track(track_id: int, db_connection):
+    """Delete a partially ingested track, logging any error"""
 
-def _get_fuel_cost(length, vehicle_type):
     try:
-        volume_spent = length * _constants.FUEL_CONSUMPTION[vehicle_type]
-        monetary_cost = volume_spent * _constants.FUEL_PRICE[vehicle_type]
-    except KeyError:
-        monetary_cost = 0
-    return monetary_cost
+        with db_connection:
+            with db_connection.cursor() as cursor:
+                _execute(cursor, "delete-track.sql", {"track_id": track_id})
+    except Exception:
+        logger.exception(
+            "Could not delete partially ingested track {}".format(track_id))
+
+
+def save_track_stages(record: ledger.LedgerRecord, session_id, track_data,
+                      owner_uuid: str, db_connection, point_inserter=None,
+                      timings: dict = None, validation_result=None,
+                      timer: metrics.StageTimer = None) -> int:
+    """Create the database records for a track, one transaction per stage
+
+    Stages that ``record`` reports as completed are skipped. Each stage is
+    recorded in the ingestion ledger in the same transaction that performs
+    it. ``track_data`` and ``validation_result`` are only used by the
+    ``points`` stage. As in ``save_track``, tracks that are not valid get no
+    segments: their aggregates are updated in the ``points`` stage, which is
+    then recorded as the ``aggregates`` stage.
 
+    """
 
-def calculate_health(vehicle_type, duration_minutes, speed_km_h):
-    return {
-        "calories_consumed": _get_consumed_calories(
-            speed_km_h, duration_minutes, vehicle_type),
-        # "benefit_index": None  # TODO
-    }
+    point_inserter = point_inserter or insert_collected_points_bulk
+    timer = timer or metrics.StageTimer()
+    track_id = record.track_id
+    completed = (
+        ledger.STAGES.index(record.stage) + 1 if record.stage != "" else 0)
+    stage_timings = dict(timings or {})
+    for stage in ledger.STAGES[completed:]:
+        start = time.perf_counter()
+        recorded_stage = stage
+        with db_connection:
+            with db_connection.cursor() as cursor:
+                if stage == "points":
+                    with timer.stage("owner_lookup"):
+                        user_id = get_track_owner_internal_id(
+                            owner_uuid, cursor)
+                    with timer.stage("point_insert"):
+                        track_id = _insert_track(session_id, user_id, cursor)
+                        point_inserter(track_id, track_data, cursor)
+                    if validation_result is not None:
+                        with timer.stage("aggregate_update"):
+                            update_track_validation(
+                                track_id, validation_result, cursor)
+                            if not validation_result.is_valid:
+                                update_track_aggregated_data(track_id, cursor)
+                                recorded_stage = ledger.STAGES[-1]
+                elif stage == "segments":
+                    with timer.stage("segmentation"):
+                        segment_ids = insert_segments(
+                            track_id, owner_uuid, cursor)
+                        timer.num_segments = len(segment_ids)
+                        simplification.update_segments_geometry(
+                            [track_id], cursor)
+                elif stage == "metrics":
+                    with timer.stage("metrics"):
+                        segmentmetrics.insert_segments_data(track_id, cursor)
+                elif stage == "aggregates":
+                    with timer.stage("aggregate_update"):
+                        update_track_aggregated_data(track_id, cursor)
+                stage_timings[stage] = time.perf_counter() - start
+                ledger.record_stage(
+                    record.id, recorded_stage, cursor, track_id=track_id,
+                    session_id=session_id, timings=stage_timings
+                )
+        if recorded_stage == ledger.STAGES[-1]:
+            break
+        stage_timings = {}
+    return track_id
 
 
-def _get_consumed_calories(speed_km_h, duration_minutes, vehicle_type):
-    try:
-        steps = _constants.CALORY_CONSUMPTION[vehicle_type]["steps"]
-    except KeyError:
-        result = 0
+@contextlib.contextmanager
+def _borrow_connection(db_connection):
+    if isinstance(db_connection, pool.ConnectionPool):
+        with db_connection.connection() as pooled_connection:
+            yield pooled_connection
     else:
-        for step in steps:
-            if speed_km_h < step["speed"]:
-                consumption_per_minute = step["calories"]
-                break
-        else:
-            consumption_per_minute = steps[-1]["calories"]
-        result = consumption_per_minute * duration_minutes
-    return result
+        yield db_connection
 
 
-def insert_segments(track_id: str, owner_uuid: str, db_cursor):
-    db_cursor.execute(
-        _get_query("insert-track-segments.sql"),
+def update_track_aggregated_data(track_id, db_cursor):
+    segmentmetrics.update_track_aggregated_data(track_id, db_cursor)
+
+
+def update_track_validation(
+        track_id, validation_result: track_validation.ValidationResult,
+        db_cursor):
+    _execute(
+        db_cursor,
+        "update-track-validation.sql",
         {
-            "user_uuid": owner_uuid,
             "track_id": track_id,
+            "is_valid": validation_result.is_valid,
+            "validation_error": "; ".join(validation_result.errors),
         }
     )
-    segment_ids = db_cursor.fetchall()
-    return [item[0] for item in segment_ids]
 
 
-def insert_track(track_data: List[PointData], owner: str, db_cursor) -> int:
-    """Insert track data into the main database"""
-    session_id = list(set([pt.sessionId for pt in track_data]))[0]
-    query = _get_query("insert-track.sql")
-    db_cursor.execute(
-        query,
+def insert_segments(track_id: str, owner_uuid: str, db_cursor):
+    segments = insert_tracks_segments([track_id], [owner_uuid], db_cursor)
+    return [segment_id for segment_id, _ in segments]
+
+
+def insert_tracks_segments(track_ids: List[int], owner_uuids: List[str],
+                           db_cursor) -> List[tuple]:
+    """Generate the segments of several tracks with a single statement
+
+    Returns a list of ``(segment_id, track_id)`` tuples.
+
+    """
+
+    _execute(
+        db_cursor,
+        "insert-track-segments.sql",
+        {
+            "track_ids": list(track_ids),
+            "user_uuids": list(owner_uuids),
+        }
+    )
+    return [
+        (segment_id, track_id)
+        for segment_id, _, track_id in db_cursor.fetchall()
+    ]
+
+
+def insert_tracks(session_ids: List[int], owner_ids: List[int],
+                  db_cursor) -> List[int]:
+    """Insert several tracks with a single statement
+
+    Returns the ids of the new tracks, in the same order as ``session_ids``.
+
+    """
+
+    _execute(
+        db_cursor,
+        "insert-tracks.sql",
+        {
+            "session_ids": list(session_ids),
+            "owner_ids": list(owner_ids),
+            "created_at": dt.datetime.now(pytz.utc),
+        }
+    )
+    track_ids = dict((session_id, id_) for id_, session_id in
+                     db_cursor.fetchall())
+    return [track_ids[session_id] for session_id in session_ids]
+
+
+def _insert_track(session_id, owner: str, db_cursor) -> int:
+    _execute(
+        db_cursor,
+        "insert-track.sql",
         (owner, session_id, dt.datetime.now(pytz.utc))
     )
     track_id = db_cursor.fetchone()[0]
@@ -320,62 +740,292 @@ def insert_track(track_data: List[PointData], owner: str, db_cursor) -> int:
 
 def insert_collected_points(track_id: str, track_data: List[PointData],
                             db_cursor):
-    query = _get_query("insert-collectedpoint.sql")
     for pt in track_data:
-        vehicle_type = _get_vehicle_type(pt.vehicleMode)
-        db_cursor.execute(
-            query,
-            {
-                "vehicle_type": vehicle_type.name,
-                "track_id": track_id,
-                "longitude": pt.longitude,
-                "latitude": pt.latitude,
-                "accelerationx": pt.accelerationX,
-                "accelerationy": pt.accelerationY,
-                "accelerationz": pt.accelerationZ,
-                "accuracy": pt.accuracy,
-                "batconsumptionperhour": pt.batConsumptionPerHour,
-                "batterylevel": pt.batteryLevel,
-                "devicebearing": pt.deviceBearing,
-                "devicepitch": pt.devicePitch,
-                "deviceroll": pt.deviceRoll,
-                "elevation": pt.elevation,
-                "gps_bearing": pt.gps_bearing,
-                "humidity": pt.humidity,
-                "lumen": pt.lumen,
-                "pressure": pt.pressure,
-                "proximity": pt.proximity,
-                "speed": pt.speed,
-                "temperature": pt.temperature,
-                "sessionid": pt.sessionId,
-                "timestamp": dt.datetime.fromtimestamp(
-                    int(pt.timeStamp) / 1000,
-                    pytz.utc
-                ),
-            }
+        _execute(
+            db_cursor,
+            "insert-collectedpoint.sql",
+            _get_collected_point_params(track_id, pt)
         )
 
 
-def retrieve_track_data(s3_bucket: str, object_key: str) -> str:
+def insert_collected_points_bulk(track_id: str, track_data: List[PointData],
+                                 db_cursor):
+    """Insert collected points by means of PostgreSQL's COPY
+
+    Points are streamed into a temporary staging table and then moved over to
+    the ``tracks_collectedpoint`` table with a single ``INSERT ... SELECT``
+    statement, which is also where the point geometries get built. The staging
+    table is emptied by the same statement, so this function may be called
+    several times inside the same transaction.
+
+    This has the same semantics as ``insert_collected_points`` but it needs
+    only three round trips to the database, regardless of the number of
+    points.
+
+    """
+
+    rows = (
+        _get_staging_row(index, track_id, pt)
+        for index, pt in enumerate(track_data)
+    )
+    _copy_collected_points(rows, db_cursor)
+
+
+def insert_collected_point_columns(track_id: str,
+                                   track_data: columnar_parser.TrackColumns,
+                                   db_cursor):
+    """Insert collected points that have been parsed into columns
+
+    Points are loaded by means of PostgreSQL's COPY, in the same way as
+    ``insert_collected_points_bulk`` does.
+
+    """
+
+    _copy_collected_points(
+        _get_column_copy_rows(track_id, track_data), db_cursor)
+
+
+def insert_tracks_collected_point_columns(tracks: List[tuple], db_cursor):
+    """Insert the collected points of several tracks with a single COPY
+
+    ``tracks`` is a list of ``(track_id, track_data)`` tuples, where track
+    data has been parsed into columns.
+
+    """
+
+    rows = []
+    first_seq = 0
+    for track_id, track_data in tracks:
+        rows.append(_get_column_copy_rows(track_id, track_data, first_seq))
+        first_seq += columnar_parser.get_num_points(track_data)
+    _copy_collected_points(itertools.chain.from_iterable(rows), db_cursor)
+
+
+def _get_column_copy_rows(track_id: str,
+                          track_data: columnar_parser.TrackColumns,
+                          first_seq: int = 0) -> Iterator[str]:
+    num_points = columnar_parser.get_num_points(track_data)
+    columns = {
+        "seq": range(first_seq, first_seq + num_points),
+        "vehicle_type": columnar_parser.get_vehicle_type_names(
+            track_data["vehicleMode"]).tolist(),
+        "track_id": itertools.repeat(track_id, num_points),
+        "timestamp": np.datetime_as_string(
+            track_data["timeStamp"], unit="ms", timezone="UTC").tolist(),
+    }
+    for field_name in _DATA_FIELDS:
+        column_name = field_name.lower()
+        if column_name in _COPY_COLUMNS and column_name not in columns:
+            columns[column_name] = track_data[field_name].tolist()
+    return (
+        _get_copy_row(values)
+        for values in zip(*(columns[name] for name in _COPY_COLUMNS))
+    )
+
+
+def insert_collected_point_columns_and_channels(
+        track_id: str, track_data: columnar_parser.TrackColumns, db_cursor):
+    """Insert collected points both as rows and as sensor channels
+
+    Rows are still needed for generating the track's segments. They may
+    later be removed with the ``compactcollectedpoints`` management command.
+
+    """
+
+    insert_collected_point_columns(track_id, track_data, db_cursor)
+    sensorarrays.insert_track_channels(track_id, track_data, db_cursor)
+
+
+def _copy_collected_points(rows: Iterable[str], db_cursor):
+    _execute(db_cursor, "create-collectedpoint-staging.sql")
+    queries.registry.copy(
+        db_cursor, "copy-collectedpoint-staging.sql", _CopyStream(rows))
+    _execute(db_cursor, "insert-collectedpoint-from-staging.sql")
+
+
+def _get_collected_point_params(track_id: str, pt: PointData) -> dict:
+    vehicle_type = _get_vehicle_type(pt.vehicleMode)
+    return {
+        "vehicle_type": vehicle_type.name,
+        "track_id": track_id,
+        "longitude": pt.longitude,
+        "latitude": pt.latitude,
+        "accelerationx": pt.accelerationX,
+        "accelerationy": pt.accelerationY,
+        "accelerationz": pt.accelerationZ,
+        "accuracy": pt.accuracy,
+        "batconsumptionperhour": pt.batConsumptionPerHour,
+        "batterylevel": pt.batteryLevel,
+        "devicebearing": pt.deviceBearing,
+        "devicepitch": pt.devicePitch,
+        "deviceroll": pt.deviceRoll,
+        "elevation": pt.elevation,
+        "gps_bearing": pt.gps_bearing,
+        "humidity": pt.humidity,
+        "lumen": pt.lumen,
+        "pressure": pt.pressure,
+        "proximity": pt.proximity,
+        "speed": pt.speed,
+        "temperature": pt.temperature,
+        "sessionid": pt.sessionId,
+        "timestamp": dt.datetime.fromtimestamp(
+            int(pt.timeStamp) / 1000,
+            pytz.utc
+        ),
+    }
+
+
+def _get_staging_row(seq: int, track_id: str, pt: PointData) -> str:
+    params = _get_collected_point_params(track_id, pt)
+    params["seq"] = seq
+    return _get_copy_row(params[name] for name in _COPY_COLUMNS)
+
+
+def _get_copy_row(values) -> str:
+    r"""Format values as a line of PostgreSQL's COPY text format
+
+    >>> _get_copy_row([1, "bike", None, "a\tb"])
+    '1\tbike\t\\N\ta\\tb\n'
+
+    """
+
+    fields = []
+    for value in values:
+        if value is None:
+            fields.append("\\N")
+        else:
+            if isinstance(value, dt.datetime):
+                value = value.isoformat()
+            fields.append(str(value).translate(_COPY_ESCAPES))
+    return "\t".join(fields) + "\n"
+
+
+class _CopyStream(io.TextIOBase):
+    """A read-only file-like object that is fed by an iterator of lines
+
+    This allows streaming COPY data to the database without having to build
+    the whole payload in memory beforehand.
+
+    """
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = ""
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._lines)
+            except StopIteration:
+                break
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def retrieve_track_data(s3_bucket: str, object_key: str,
+                        object_store: storage.ObjectStore = None) -> str:
     """Download track data file from S3 and return the data"""
-    s3 = boto3.resource("s3")
-    obj = s3.Object(s3_bucket, object_key)
-    response = obj.get()
-    input_buffer = io.BytesIO(response["Body"].read())
+    with download_track_data(
+            s3_bucket, object_key, object_store=object_store) as archive:
+        return "".join(iter_track_data_chunks(archive))
+
+
+def download_track_data(s3_bucket: str, object_key: str,
+                        chunk_size: int = CHUNK_SIZE,
+                        object_store: storage.ObjectStore = None):
+    """Download track data file from S3 into a spooled temporary file
+
+    The downloaded file is kept in memory only as long as it is smaller than
+    ``SPOOL_MAX_SIZE``, otherwise it is transparently moved to disk. The
+    returned file must be closed by the caller, so this is typically used as
+    a context manager.
+
+    """
+
+    object_store = object_store or storage.get_object_store()
+    return object_store.download(
+        s3_bucket, object_key, chunk_size=chunk_size,
+        spool_max_size=SPOOL_MAX_SIZE
+    )
+
+
+def iter_track_data_chunks(archive,
+                           chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yield decoded text chunks of every member of the input zip archive"""
     # TODO: do some integrity checks to the data
-    result = ""
-    with zipfile.ZipFile(input_buffer) as zip_handler:
+    with zipfile.ZipFile(archive) as zip_handler:
         for member_name in zip_handler.namelist():
-            result += zip_handler.read(member_name).decode("utf-8")
-    return result
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            with zip_handler.open(member_name) as member:
+                for chunk in iter(lambda: member.read(chunk_size), b""):
+                    yield decoder.decode(chunk)
+            yield decoder.decode(b"", final=True)
+
+
+def iter_track_data_lines(archive,
+                          chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yield lines of text from the members of the input zip archive
 
+    Lines are split in the same way as if all of the archive's members had
+    been concatenated together and then passed to ``str.splitlines()``, but
+    only one chunk of data is kept in memory at any time.
 
-def parse_track_data(raw_track_data: str) -> List[PointData]:
-    result = []
-    for index, line in enumerate(raw_track_data.splitlines()):
+    """
+
+    pending = ""
+    for chunk in iter_track_data_chunks(archive, chunk_size=chunk_size):
+        lines = (pending + chunk).splitlines(keepends=True)
+        pending = lines.pop() if lines else ""
+        if pending != "" and _is_complete_line(pending):
+            lines.append(pending)
+            pending = ""
+        for line in lines:
+            yield line.splitlines()[0]
+    if pending != "":
+        yield pending.splitlines()[0]
+
+
+def _is_complete_line(line: str) -> bool:
+    """Check whether a line ends with a line break
+
+    A line ending with a carriage return is not considered complete because
+    it may be followed by a line feed in the next chunk of data.
+
+    >>> _is_complete_line("abc\\n")
+    True
+    >>> _is_complete_line("abc")
+    False
+    >>> _is_complete_line("abc\\r")
+    False
+
+    """
+
+    return line.splitlines() != [line] and not line.endswith("\r")
+
+
+def parse_track_data(raw_track_data: Union[str, Iterable[str]]
+                     ) -> List[PointData]:
+    """Parse track data
+
+    Input may be either the whole track data or an iterable with its lines.
+
+    """
+
+    if isinstance(raw_track_data, str):
+        raw_track_data = raw_track_data.splitlines()
+    return list(iter_track_points(raw_track_data))
+
+
+def iter_track_points(lines: Iterable[str]) -> Iterator[PointData]:
+    """Lazily parse lines of track data into points"""
+    for index, line in enumerate(lines):
         if index > 0 and line != "":  # ignoring first line, it is file header
-            result.append(parse_track_data_line(line))
-    return result
+            yield parse_track_data_line(line)
 
 
 def parse_track_data_line(line: str) -> PointData:
@@ -389,22 +1039,36 @@ def get_track_owner_uuid(object_key: str) -> str:
 
 
 def get_track_owner_internal_id(keycloak_uuid: str, db_cursor):
-    db_cursor.execute(
-        "SELECT user_id FROM bossoidc_keycloak WHERE \"UID\" = %s",
-        (keycloak_uuid,)
-    )
+    _execute(db_cursor, "get-track-owner-id.sql", (keycloak_uuid,))
     try:
         return db_cursor.fetchone()[0]
     except TypeError:
         raise RuntimeError("Could not determine track owner internal ID")
 
 
-def _get_query(filename) -> str:
-    base_dir = pathlib.Path(os.path.abspath(__file__)).parent
-    query_path = base_dir / "sqlqueries" / filename
-    with query_path.open(encoding="utf-8") as fh:
-        query = fh.read()
-    return query
+def get_track_owner_internal_ids(keycloak_uuids: Iterable[str],
+                                 db_cursor) -> dict:
+    """Return a dict with the internal ID of each known track owner"""
+    _execute(
+        db_cursor,
+        "get-track-owner-ids.sql",
+        {"user_uuids": list(keycloak_uuids)}
+    )
+    return dict(db_cursor.fetchall())
+
+
+def get_track_ids_by_sessions(session_ids: Iterable[int], db_cursor) -> dict:
+    """Return a dict with the ids of the tracks of already ingested sessions"""
+    _execute(
+        db_cursor,
+        "get-track-ids-by-sessions.sql",
+        {"session_ids": list(session_ids)}
+    )
+    return dict(db_cursor.fetchall())
+
+
+def _execute(db_cursor, query_filename, params=None):
+    queries.registry.execute(db_cursor, query_filename, params)
 
 
 def _get_vehicle_type(raw_vehicle_type: str) -> VehicleType:
@@ -421,11 +1085,5 @@ def _get_vehicle_type(raw_vehicle_type: str) -> VehicleType:
     'bike'
 
     """
-    return {
-        "1": VehicleType.foot,
-        "2": VehicleType.bike,
-        "3": VehicleType.bus,
-        "4": VehicleType.car,
-        "5": VehicleType.average_motorbike,  # moped
-        "6": VehicleType.train,
-    }.get(raw_vehicle_type, VehicleType.unknown)
+    return _constants.SMB_APP_VEHICLE_MODES.get(
+        raw_vehicle_type, VehicleType.unknown)
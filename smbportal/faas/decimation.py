@@ -0,0 +1,213 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Decimation of GPS points before they are stored
+
+The smb-app samples the device's position once per second, even when it is
+not moving. Decimation removes the points that add little information, in
+two passes, which are performed independently for each run of points with
+the same vehicle type:
+
+-  stationary points are collapsed: whenever the device stays within
+   ``stationary_radius`` meters of a point for at least
+   ``stationary_seconds``, only the points where it arrived and where it left
+   are kept;
+-  the remaining points are simplified with a time-aware variant of the
+   Douglas-Peucker algorithm, where the distance of a point is measured from
+   the position interpolated at the point's time between the two points
+   being kept (the *synchronized euclidean distance*). This keeps points
+   where the speed changes, not only the ones where the direction changes.
+   Tolerances are set for each vehicle type.
+
+The first and last points of each run are always kept. Since segments are
+made from runs of points with the same vehicle type, the points that mark a
+``vehicleMode`` change are kept and segment start and end dates are not
+changed by decimation. Neither is track duration.
+
+Decimation works on the typed arrays produced by ``faas.columnar``.
+
+"""
+
+import numpy as np
+
+from . import columnar
+from ._constants import VehicleType
+
+# maximum distance, in meters, of a dropped point from the simplified line
+TOLERANCES = {
+    VehicleType.foot: 3,
+    VehicleType.bike: 5,
+    VehicleType.bus: 10,
+    VehicleType.car: 10,
+    VehicleType.average_motorbike: 10,
+    VehicleType.train: 20,
+}
+
+DEFAULT_TOLERANCE = 5
+
+STATIONARY_RADIUS = 5  # meters
+
+STATIONARY_SECONDS = 10
+
+_EARTH_RADIUS = 6371008.8  # meters
+
+
+def decimate(track_data: columnar.TrackColumns, tolerances: dict = None,
+             stationary_radius: float = STATIONARY_RADIUS,
+             stationary_seconds: float = STATIONARY_SECONDS
+             ) -> columnar.TrackColumns:
+    """Return the track data without the points that decimation drops
+
+    ``tolerances`` maps ``VehicleType`` members to tolerances, in meters. It
+    defaults to ``TOLERANCES``. Vehicle types not included in it use
+    ``DEFAULT_TOLERANCE``.
+
+    """
+
+    mask = get_decimation_mask(
+        track_data,
+        tolerances=tolerances,
+        stationary_radius=stationary_radius,
+        stationary_seconds=stationary_seconds
+    )
+    return {name: column[mask] for name, column in track_data.items()}
+
+
+def get_decimation_mask(track_data: columnar.TrackColumns,
+                        tolerances: dict = None,
+                        stationary_radius: float = STATIONARY_RADIUS,
+                        stationary_seconds: float = STATIONARY_SECONDS
+                        ) -> np.ndarray:
+    """Return a boolean array that is true for the points that are kept"""
+    tolerances = TOLERANCES if tolerances is None else tolerances
+    num_points = columnar.get_num_points(track_data)
+    keep = np.zeros(num_points, dtype=bool)
+    if num_points == 0:
+        return keep
+    x, y = _project(track_data["longitude"], track_data["latitude"])
+    seconds = track_data["timeStamp"].astype(np.int64) / 1000
+    vehicle_modes = track_data["vehicleMode"]
+    for start, end in _get_runs(vehicle_modes):
+        run = slice(start, end)
+        run_keep = _collapse_stationary(
+            x[run], y[run], seconds[run], stationary_radius,
+            stationary_seconds
+        )
+        indexes = np.flatnonzero(run_keep)
+        tolerance = tolerances.get(
+            VehicleType(int(vehicle_modes[start])), DEFAULT_TOLERANCE)
+        simplified = _simplify(
+            x[run][indexes], y[run][indexes], seconds[run][indexes],
+            tolerance
+        )
+        keep[start + indexes[simplified]] = True
+    return keep
+
+
+def _project(longitudes: np.ndarray, latitudes: np.ndarray):
+    """Project coordinates to a plane, in meters
+
+    An equirectangular projection centered on the track is accurate enough
+    for the short distances between consecutive points.
+
+    """
+
+    latitudes = np.radians(latitudes)
+    scale = np.cos(np.mean(latitudes)) if len(latitudes) > 0 else 1
+    x = _EARTH_RADIUS * np.radians(longitudes) * scale
+    y = _EARTH_RADIUS * latitudes
+    return x, y
+
+
+def _get_runs(values: np.ndarray):
+    """Return the start and end indexes of runs of equal values
+
+    >>> _get_runs(np.array([1, 1, 2, 2, 2, 1]))
+    [(0, 2), (2, 5), (5, 6)]
+
+    """
+
+    boundaries = np.flatnonzero(values[1:] != values[:-1]) + 1
+    starts = [0] + boundaries.tolist()
+    ends = boundaries.tolist() + [len(values)]
+    return list(zip(starts, ends))
+
+
+def _collapse_stationary(x: np.ndarray, y: np.ndarray, seconds: np.ndarray,
+                         radius: float, min_seconds: float) -> np.ndarray:
+    """Keep only the arrival and departure points of stationary periods
+
+    >>> x = np.array([0., 1, 0, 1, 0, 20, 40])
+    >>> y = np.zeros(7)
+    >>> _collapse_stationary(x, y, np.arange(7.) * 5, 5, 10)
+    array([ True, False, False, False,  True,  True,  True])
+
+    """
+
+    num_points = len(x)
+    keep = np.ones(num_points, dtype=bool)
+    x = x.tolist()
+    y = y.tolist()
+    seconds = seconds.tolist()
+    squared_radius = radius ** 2
+    anchor = 0
+    for index in range(1, num_points + 1):
+        is_outside = (
+            index == num_points or
+            (x[index] - x[anchor]) ** 2 + (y[index] - y[anchor]) ** 2 >
+            squared_radius
+        )
+        if is_outside:
+            last = index - 1
+            if seconds[last] - seconds[anchor] >= min_seconds:
+                keep[anchor + 1:last] = False
+            anchor = index
+    return keep
+
+
+def _simplify(x: np.ndarray, y: np.ndarray, seconds: np.ndarray,
+              tolerance: float) -> np.ndarray:
+    """Time-aware Douglas-Peucker simplification
+
+    Returns the indexes of the points that are kept.
+
+    >>> x = np.array([0., 10, 20, 30])
+    >>> y = np.array([0., 0, 0, 0])
+    >>> _simplify(x, y, np.array([0., 1, 2, 3]), 1).tolist()
+    [0, 3]
+    >>> _simplify(x, y, np.array([0., 1, 10, 11]), 1).tolist()
+    [0, 1, 2, 3]
+
+    """
+
+    num_points = len(x)
+    keep = np.zeros(num_points, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, num_points - 1)]
+    while len(stack) > 0:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        inner = slice(start + 1, end)
+        elapsed = seconds[end] - seconds[start]
+        if elapsed > 0:
+            ratio = (seconds[inner] - seconds[start]) / elapsed
+        else:
+            ratio = np.zeros(end - start - 1)
+        expected_x = x[start] + (x[end] - x[start]) * ratio
+        expected_y = y[start] + (y[end] - y[start]) * ratio
+        distances = np.hypot(x[inner] - expected_x, y[inner] - expected_y)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.flatnonzero(keep)
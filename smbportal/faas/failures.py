@@ -0,0 +1,264 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Store of failed track ingestions
+
+Ingestions that fail are recorded in the ``tracks_ingestionfailure`` table,
+with one record per S3 object holding the stage that failed (see
+``metrics.STAGES``), the type and message of the exception and the number of
+failed attempts so far.
+
+Failures are retried with exponential backoff: after the n-th failed
+attempt, the next one is scheduled ``base_delay * 2 ** (n - 1)`` seconds
+later, capped at ``max_delay``. Delays are randomly shortened by up to
+``jitter`` (a fraction of the delay), so that uploads that failed together,
+e.g. during a database outage, are not all retried at the same instant.
+Once ``max_attempts`` attempts have failed, the record becomes a *dead
+letter*, which is only retried if it is explicitly replayed.
+
+Due failures are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` and are
+leased for ``lease_seconds``, so any number of retry schedulers (see
+``worker.RetryScheduler``) may run concurrently.
+
+"""
+
+from collections import namedtuple
+import random
+from typing import List
+
+from . import queries
+
+RETRYING = "retrying"
+DEAD = "dead"
+RESOLVED = "resolved"
+
+STATUSES = [
+    RETRYING,
+    DEAD,
+    RESOLVED,
+]
+
+# maximum length of the ``exception`` column
+MAX_EXCEPTION_LENGTH = 255
+
+RetryPolicy = namedtuple("RetryPolicy", [
+    "base_delay",  # seconds to wait before the first retry
+    "max_delay",
+    "max_attempts",  # attempts after which a failure becomes a dead letter
+    "jitter",  # fraction of the delay that may be randomly removed
+])
+
+DEFAULT_RETRY_POLICY = RetryPolicy(
+    base_delay=60,
+    max_delay=6 * 60 * 60,
+    max_attempts=8,
+    jitter=0.5
+)
+
+IngestionFailure = namedtuple("IngestionFailure", [
+    "id",
+    "bucket",
+    "object_key",
+    "status",
+    "stage",
+    "exception",
+    "error",
+    "attempts",
+    "first_failed_at",
+    "last_failed_at",
+    "next_attempt_at",
+])
+
+DueFailure = namedtuple("DueFailure", [
+    "id",
+    "bucket",
+    "object_key",
+    "stage",
+    "attempts",
+])
+
+
+def get_delay(policy: RetryPolicy, attempts: int,
+              random_value: float = None) -> float:
+    """Return the number of seconds to wait after a failed attempt
+
+    >>> policy = RetryPolicy(
+    ...     base_delay=10, max_delay=60, max_attempts=5, jitter=0.5)
+    >>> [get_delay(policy, attempts, 0) for attempts in range(1, 6)]
+    [10.0, 20.0, 40.0, 60.0, 60.0]
+    >>> get_delay(policy, 3, random_value=1)
+    20.0
+
+    """
+
+    if random_value is None:
+        random_value = random.random()
+    delay = min(
+        policy.max_delay, policy.base_delay * 2 ** max(0, attempts - 1))
+    return delay * (1 - policy.jitter * random_value)
+
+
+def record_failure(s3_bucket: str, object_key: str, stage: str,
+                   exception: Exception, db_connection,
+                   policy: RetryPolicy = DEFAULT_RETRY_POLICY) -> str:
+    """Record a failed ingestion attempt and schedule the next one
+
+    Returns the new status of the failure, which is ``DEAD`` once the
+    policy's maximum number of attempts has been reached.
+
+    """
+
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            queries.registry.execute(
+                cursor,
+                "record-ingestion-failure.sql",
+                {
+                    "bucket": s3_bucket,
+                    "object_key": object_key,
+                    "stage": stage or "",
+                    "exception": type(exception).__name__[
+                        :MAX_EXCEPTION_LENGTH],
+                    "error": str(exception),
+                }
+            )
+            failure_id, attempts = cursor.fetchone()
+            status = DEAD if attempts >= policy.max_attempts else RETRYING
+            queries.registry.execute(
+                cursor,
+                "schedule-ingestion-failure.sql",
+                {
+                    "failure_id": failure_id,
+                    "status": status,
+                    "delay": get_delay(policy, attempts),
+                }
+            )
+    return status
+
+
+def claim_due_failures(limit: int, db_connection,
+                       lease_seconds: float = 15 * 60) -> List[DueFailure]:
+    """Lease up to ``limit`` failures whose next attempt is due"""
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            queries.registry.execute(
+                cursor,
+                "claim-ingestion-failures.sql",
+                {"limit": limit, "lease_seconds": lease_seconds}
+            )
+            failures = [DueFailure(*row) for row in cursor.fetchall()]
+    return sorted(failures, key=lambda failure: failure.id)
+
+
+def count_due_failures(db_connection) -> int:
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            queries.registry.execute(
+                cursor, "count-due-ingestion-failures.sql")
+            return cursor.fetchone()[0]
+
+
+def resolve_failure(failure_id: int, db_connection, track_id: int = None):
+    """Mark a failure as resolved, after a successful retry"""
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            queries.registry.execute(
+                cursor,
+                "resolve-ingestion-failure.sql",
+                {"failure_id": failure_id, "track_id": track_id}
+            )
+
+
+def list_failures(db_connection, statuses: List[str] = None,
+                  stage: str = None, key_prefix: str = "",
+                  limit: int = 100) -> List[IngestionFailure]:
+    """Return the most recent failures that match the input filters
+
+    ``statuses`` defaults to ``[DEAD]``.
+
+    """
+
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            queries.registry.execute(
+                cursor,
+                "list-ingestion-failures.sql",
+                dict(
+                    _get_filter_params(statuses, stage, key_prefix),
+                    limit=limit
+                )
+            )
+            return [IngestionFailure(*row) for row in cursor.fetchall()]
+
+
+def replay_failures(db_connection, statuses: List[str] = None,
+                    stage: str = None, key_prefix: str = "") -> int:
+    """Schedule the failures that match the input filters for a new attempt
+
+    Replayed failures start over with zero attempts and are due immediately.
+    Returns the number of replayed failures.
+
+    """
+
+    return _update_failures(
+        "replay-ingestion-failures.sql", db_connection, statuses, stage,
+        key_prefix
+    )
+
+
+def purge_failures(db_connection, statuses: List[str] = None,
+                   stage: str = None, key_prefix: str = "") -> int:
+    """Delete the failures that match the input filters
+
+    Returns the number of deleted failures.
+
+    """
+
+    return _update_failures(
+        "purge-ingestion-failures.sql", db_connection, statuses, stage,
+        key_prefix
+    )
+
+
+def _update_failures(query_filename: str, db_connection,
+                     statuses: List[str], stage: str,
+                     key_prefix: str) -> int:
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            queries.registry.execute(
+                cursor,
+                query_filename,
+                _get_filter_params(statuses, stage, key_prefix)
+            )
+            return cursor.rowcount
+
+
+def _get_filter_params(statuses: List[str], stage: str,
+                       key_prefix: str) -> dict:
+    """Return the query parameters of the failure filters
+
+    >>> print(_get_filter_params(None, None, "user_1/")["key_pattern"])
+    user\\_1/%
+
+    """
+
+    statuses = statuses or [DEAD]
+    for status in statuses:
+        if status not in STATUSES:
+            raise ValueError("Invalid status: {!r}".format(status))
+    escaped_prefix = (
+        key_prefix.replace("\\", "\\\\").replace("%", "\\%").replace(
+            "_", "\\_")
+    )
+    return {
+        "statuses": list(statuses),
+        "stage": stage or None,
+        "key_pattern": escaped_prefix + "%",
+    }
@@ -0,0 +1,151 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Ledger of track ingestions
+
+SNS delivers its notifications at least once, so the same upload may be
+announced more than once. The ledger keeps one record for each S3 object
+version, identified by its key and ETag, with the ingestion's status, number
+of attempts, last completed stage and per-stage timings. Before downloading
+anything, the ingestion pipeline registers the upload in the ledger and skips
+it if it has already been ingested or is currently being ingested.
+
+Ingestions that use the ledger commit each of the ``STAGES`` separately, so
+that a failed ingestion can be resumed from the first stage that was not
+completed.
+
+"""
+
+from collections import namedtuple
+import json
+
+from . import queries
+from . import storage
+
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+# ingestion stages that are committed separately, in the order they run
+STAGES = [
+    "points",
+    "segments",
+    "metrics",
+    "aggregates",
+]
+
+# seconds after which an ingestion that is still processing is considered
+# abandoned, so that a new delivery of the same upload may take it over
+STALE_AFTER = 15 * 60
+
+LedgerRecord = namedtuple("LedgerRecord", [
+    "id",
+    "stage",
+    "track_id",
+    "session_id",
+    "attempts",
+])
+
+
+def get_object_etag(s3_bucket: str, object_key: str,
+                    object_store: storage.ObjectStore = None) -> str:
+    """Return the ETag of an S3 object, without downloading it"""
+    object_store = object_store or storage.get_object_store()
+    return object_store.get_etag(s3_bucket, object_key)
+
+
+def start_ingestion(s3_bucket: str, object_key: str, etag: str, db_connection,
+                    stale_after: float = STALE_AFTER) -> LedgerRecord:
+    """Register an ingestion attempt in the ledger
+
+    Returns ``None`` when the upload must not be ingested, either because it
+    already has been or because another attempt is currently in progress.
+
+    """
+
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            queries.registry.execute(
+                cursor,
+                "start-ingestion.sql",
+                {
+                    "bucket": s3_bucket,
+                    "object_key": object_key,
+                    "etag": etag,
+                    "stale_after": stale_after,
+                }
+            )
+            row = cursor.fetchone()
+    return LedgerRecord(*row) if row is not None else None
+
+
+def get_ingested_track_id(object_key: str, etag: str, db_connection) -> int:
+    """Return the track created by a previous ingestion of an upload"""
+
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            queries.registry.execute(
+                cursor,
+                "get-ingestion-track-id.sql",
+                {"object_key": object_key, "etag": etag}
+            )
+            row = cursor.fetchone()
+    return row[0] if row is not None else None
+
+
+def get_track_id_by_session(session_id, db_cursor) -> int:
+    queries.registry.execute(
+        db_cursor,
+        "get-track-id-by-session.sql",
+        {"session_id": session_id}
+    )
+    row = db_cursor.fetchone()
+    return row[0] if row is not None else None
+
+
+def record_stage(record_id: int, stage: str, db_cursor, track_id: int = None,
+                 session_id=None, timings: dict = None):
+    """Mark a stage as completed
+
+    This is meant to be called with the cursor used for the stage itself,
+    so that the ledger is updated in the same transaction.
+
+    """
+
+    queries.registry.execute(
+        db_cursor,
+        "update-ingestion-stage.sql",
+        {
+            "record_id": record_id,
+            "stage": stage,
+            "track_id": track_id,
+            "session_id": session_id,
+            "timings": json.dumps(timings or {}),
+        }
+    )
+
+
+def finish_ingestion(record_id: int, db_connection, status: str = DONE,
+                     error: str = "", track_id: int = None,
+                     timings: dict = None):
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            queries.registry.execute(
+                cursor,
+                "finish-ingestion.sql",
+                {
+                    "record_id": record_id,
+                    "status": status,
+                    "error": error,
+                    "track_id": track_id,
+                    "timings": json.dumps(timings or {}),
+                }
+            )
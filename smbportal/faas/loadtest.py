@@ -0,0 +1,125 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Load testing of track ingestion
+
+Recorded uploads are replayed from an object store, typically a
+``storage.LocalObjectStore``, through the same pipeline that ingests uploads
+from S3. All the uploads found in the bucket are queued at once and then
+ingested by an ``IngestionWorker`` as fast as it can.
+
+Run it with:
+
+    python -m faas.loadtest /path/to/recorded/uploads \\
+        --bucket smb-uploads --dbname smbportal --user smbportal
+
+Where ``/path/to/recorded/uploads/smb-uploads`` holds the uploaded files,
+keeping the same keys as in S3 (e.g. ``cognito/smb/<user-uuid>/...``).
+
+"""
+
+import argparse
+import json
+import logging
+import os
+
+from . import datareceiver
+from . import storage
+from . import worker
+
+
+def replay_uploads(object_store: storage.ObjectStore, bucket: str,
+                   db_settings: dict, prefix: str = "",
+                   num_processes: int = 4, max_in_flight: int = None,
+                   options: datareceiver.IngestionOptions = None,
+                   executor=None) -> worker.WorkerStats:
+    """Ingest every upload stored in a bucket and return the worker's stats
+
+    ``db_settings`` and ``options`` are passed on to the
+    ``worker.IngestionWorker``.
+
+    """
+
+    job_queue = worker.InMemoryJobQueue()
+    for key in object_store.list_objects(bucket, prefix=prefix):
+        job_queue.put(bucket, key)
+    logging.getLogger(__name__).info("Replaying {} uploads...".format(
+        job_queue.pending_count()))
+    ingestion_worker = worker.IngestionWorker(
+        job_queue,
+        db_settings,
+        num_processes=num_processes,
+        max_in_flight=max_in_flight,
+        poll_interval=0.1,
+        options=options,
+        object_store=object_store,
+        executor=executor
+    )
+    return ingestion_worker.run(stop_when_empty=True)
+
+
+def _get_parser():
+    parser = argparse.ArgumentParser(
+        description="Replay recorded track uploads through the ingestion "
+                    "pipeline"
+    )
+    parser.add_argument(
+        "root",
+        help="Directory with the recorded uploads. Each of its "
+             "subdirectories is a bucket"
+    )
+    parser.add_argument("--bucket", required=True)
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--dbname", default=os.getenv("PGDATABASE"))
+    parser.add_argument("--user", default=os.getenv("PGUSER"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD"))
+    parser.add_argument(
+        "--host", default=os.getenv("PGHOST", "localhost"))
+    parser.add_argument("--port", default=os.getenv("PGPORT", "5432"))
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--max-in-flight", type=int)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--columnar", action="store_true")
+    parser.add_argument("--decimate", action="store_true")
+    parser.add_argument("--sensor-arrays", action="store_true")
+    parser.add_argument("--use-ledger", action="store_true")
+    return parser
+
+
+def main(argv=None):
+    args = _get_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    stats = replay_uploads(
+        storage.LocalObjectStore(args.root),
+        args.bucket,
+        {
+            "dbname": args.dbname,
+            "user": args.user,
+            "password": args.password,
+            "host": args.host,
+            "port": args.port,
+            "max_size": args.pool_size,
+        },
+        prefix=args.prefix,
+        num_processes=args.processes,
+        max_in_flight=args.max_in_flight,
+        options=datareceiver.IngestionOptions(
+            columnar=args.columnar,
+            decimation={} if args.decimate else None,
+            sensor_arrays=args.sensor_arrays,
+            use_ledger=args.use_ledger
+        )
+    )
+    print(json.dumps(stats._asdict(), indent=2))
+    return 0 if stats.failed == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
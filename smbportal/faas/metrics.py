@@ -0,0 +1,303 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Timing instrumentation of track ingestion
+
+Each ingestion is timed with a ``StageTimer``, which measures the time
+spent in each of the ``STAGES``. Stages may be nested, in which case the time
+spent in the inner stage is not counted for the outer one. This is what
+happens when track data is streamed: reading points (``parse``) pulls lines
+out of the zip archive (``unzip``) while points are being inserted
+(``point_insert``).
+
+When the ingestion is over an ``IngestionMetrics`` record is sent to the
+metrics sinks, which are set with ``set_sinks``. Available sinks are:
+
+-  ``LoggingSink``, which writes one log line for each record;
+-  ``PrometheusSink``, which aggregates records into histograms that can be
+   rendered in Prometheus' text format or served over HTTP;
+-  ``InMemorySink``, which stores records in a list.
+
+"""
+
+from collections import namedtuple
+import contextlib
+import http.server
+import json
+import logging
+import threading
+import time
+from typing import Iterable
+from typing import Iterator
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+STAGES = [
+    "download",
+    "unzip",
+    "parse",
+    "validation",
+    "decimation",
+    "owner_lookup",
+    "point_insert",
+    "segmentation",
+    "metrics",
+    "aggregate_update",
+]
+
+IngestionMetrics = namedtuple("IngestionMetrics", [
+    "object_key",
+    "track_id",
+    "succeeded",
+    "num_points",
+    "num_segments",
+    "total_seconds",
+    "stage_seconds",
+])
+
+
+class StageTimer(object):
+    """Measure the time spent in each ingestion stage"""
+
+    def __init__(self):
+        self.stage_seconds = {}
+        self.num_points = None
+        self.num_segments = None
+        self.failed_stage = None  # innermost stage that raised an exception
+        self._stack = []  # list of [stage, start time] lists
+        self._created_at = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        now = time.perf_counter()
+        if len(self._stack) > 0:
+            self._accumulate(self._stack[-1], now)
+        self._stack.append([name, now])
+        try:
+            yield
+        except Exception:
+            if self.failed_stage is None:
+                self.failed_stage = name
+            raise
+        finally:
+            now = time.perf_counter()
+            self._accumulate(self._stack.pop(), now)
+            if len(self._stack) > 0:
+                self._stack[-1][1] = now
+
+    def iter_stage(self, name: str, iterable: Iterable) -> Iterator:
+        """Yield the items of an iterable, timing them as the input stage"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def get_metrics(self, object_key: str = None, track_id: int = None,
+                    succeeded: bool = True) -> IngestionMetrics:
+        return IngestionMetrics(
+            object_key=object_key,
+            track_id=track_id,
+            succeeded=succeeded,
+            num_points=self.num_points,
+            num_segments=self.num_segments,
+            total_seconds=time.perf_counter() - self._created_at,
+            stage_seconds=dict(self.stage_seconds),
+        )
+
+    def _accumulate(self, frame: list, now: float):
+        name, start = frame
+        self.stage_seconds[name] = (
+            self.stage_seconds.get(name, 0.0) + now - start)
+
+
+class LoggingSink(object):
+    """Write a JSON log line for each ingestion"""
+
+    def __init__(self, sink_logger: logging.Logger = logger,
+                 level: int = logging.INFO):
+        self.logger = sink_logger
+        self.level = level
+
+    def record(self, metrics: IngestionMetrics):
+        self.logger.log(self.level, "Ingestion metrics: {}".format(
+            json.dumps(metrics._asdict(), sort_keys=True)))
+
+
+class InMemorySink(object):
+    """Keep ingestion metrics in a list"""
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, metrics: IngestionMetrics):
+        with self._lock:
+            self.records.append(metrics)
+
+    def clear(self):
+        with self._lock:
+            self.records = []
+
+
+class PrometheusSink(object):
+    """Aggregate ingestion metrics into Prometheus histograms and counters"""
+
+    DEFAULT_BUCKETS = (
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, namespace: str = "smb_ingestion",
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.buckets = sorted(buckets)
+        self._stages = {}  # maps stage names to histograms
+        self._total = _Histogram(self.buckets)
+        self._tracks = {"succeeded": 0, "failed": 0}
+        self._points = 0
+        self._segments = 0
+        self._lock = threading.Lock()
+
+    def record(self, metrics: IngestionMetrics):
+        with self._lock:
+            status = "succeeded" if metrics.succeeded else "failed"
+            self._tracks[status] += 1
+            self._points += metrics.num_points or 0
+            self._segments += metrics.num_segments or 0
+            self._total.observe(metrics.total_seconds)
+            for stage, seconds in metrics.stage_seconds.items():
+                histogram = self._stages.setdefault(
+                    stage, _Histogram(self.buckets))
+                histogram.observe(seconds)
+
+    def render(self) -> str:
+        """Return the metrics in Prometheus' text exposition format"""
+        name = self.namespace
+        with self._lock:
+            lines = [
+                "# HELP {}_tracks_total Ingested tracks".format(name),
+                "# TYPE {}_tracks_total counter".format(name),
+            ]
+            for status, count in sorted(self._tracks.items()):
+                lines.append('{}_tracks_total{{status="{}"}} {}'.format(
+                    name, status, count))
+            lines.extend([
+                "# HELP {}_points_total Ingested points".format(name),
+                "# TYPE {}_points_total counter".format(name),
+                "{}_points_total {}".format(name, self._points),
+                "# HELP {}_segments_total Created segments".format(name),
+                "# TYPE {}_segments_total counter".format(name),
+                "{}_segments_total {}".format(name, self._segments),
+                "# HELP {}_seconds Time spent ingesting a track".format(name),
+                "# TYPE {}_seconds histogram".format(name),
+            ])
+            lines.extend(self._total.render("{}_seconds".format(name)))
+            lines.extend([
+                "# HELP {}_stage_seconds Time spent in each ingestion "
+                "stage".format(name),
+                "# TYPE {}_stage_seconds histogram".format(name),
+            ])
+            for stage in sorted(self._stages, key=_get_stage_position):
+                lines.extend(self._stages[stage].render(
+                    "{}_stage_seconds".format(name),
+                    labels='stage="{}"'.format(stage)
+                ))
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9100,
+              address: str = "") -> http.server.HTTPServer:
+        """Serve the metrics over HTTP from a background thread
+
+        Call ``shutdown()`` on the returned server to stop serving.
+
+        """
+
+        sink = self
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = sink.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        server = http.server.HTTPServer((address, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        return server
+
+
+class _Histogram(object):
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for index, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.counts[index] += 1
+
+    def render(self, name: str, labels: str = "") -> List[str]:
+        prefix = labels + "," if labels != "" else ""
+        suffix = "{" + labels + "}" if labels != "" else ""
+        lines = []
+        for upper_bound, count in zip(self.buckets, self.counts):
+            lines.append('{}_bucket{{{}le="{}"}} {}'.format(
+                name, prefix, upper_bound, count))
+        lines.extend([
+            '{}_bucket{{{}le="+Inf"}} {}'.format(name, prefix, self.count),
+            "{}_sum{} {}".format(name, suffix, self.sum),
+            "{}_count{} {}".format(name, suffix, self.count),
+        ])
+        return lines
+
+
+def _get_stage_position(stage: str):
+    try:
+        return STAGES.index(stage), stage
+    except ValueError:
+        return len(STAGES), stage
+
+
+_sinks = [LoggingSink(level=logging.DEBUG)]
+
+
+def get_sinks() -> list:
+    return list(_sinks)
+
+
+def set_sinks(sinks: Iterable):
+    """Replace the sinks that receive ingestion metrics"""
+    _sinks[:] = list(sinks)
+
+
+def emit(metrics: IngestionMetrics, sinks: Iterable = None):
+    """Send ingestion metrics to ``sinks``, or to the configured sinks"""
+
+    for sink in (_sinks if sinks is None else sinks):
+        try:
+            sink.record(metrics)
+        except Exception:
+            logger.exception("Could not record ingestion metrics")
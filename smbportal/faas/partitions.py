@@ -0,0 +1,218 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Monthly partitions of the ``tracks_collectedpoint`` table
+
+Collected points are stored in a table that is partitioned by range of
+``timestamp``, with one partition for each month, named after it (e.g.
+``tracks_collectedpoint_y2018m05``). Months are delimited in UTC. Points
+whose month has no partition yet, or that have no timestamp, are stored in
+the ``tracks_collectedpoint_default`` partition.
+
+Partitions are created by the ``tracks_create_collectedpoint_partitions``
+database function. Attaching a partition locks the whole partitioned table,
+so ingestion never creates partitions: the partitions of the upcoming months
+are created ahead of time, out of band, by ``create_upcoming_partitions``.
+When a partition is created, the points of its month are moved out of the
+default partition. Indexes are defined on the partitioned table, so each new
+partition gets the same indexes.
+
+Points stored before the table was partitioned are kept in the
+``tracks_collectedpoint_legacy`` table until they are moved over with
+``move_legacy_points``.
+
+Old partitions are removed with ``detach_partition``, which detaches them
+from the partitioned table and moves them to an archive schema, without
+having to delete any rows.
+
+"""
+
+from collections import namedtuple
+import datetime as dt
+import re
+from typing import List
+
+from psycopg2 import sql
+
+from . import queries
+
+PARTITIONED_TABLE = "tracks_collectedpoint"
+
+DEFAULT_ARCHIVE_SCHEMA = "archive"
+
+DEFAULT_MONTHS_AHEAD = 2
+
+PartitionInfo = namedtuple("PartitionInfo", [
+    "name",
+    "month",
+    "bounds",
+    "estimated_rows",
+    "size_bytes",
+])
+
+_PARTITION_NAME_RE = re.compile(
+    r"^{}_y(?P<year>\d{{4}})m(?P<month>\d{{2}})$".format(PARTITIONED_TABLE))
+
+
+def get_partition_name(month: dt.date) -> str:
+    """Return the name of the partition that holds a month's points
+
+    >>> get_partition_name(dt.date(2018, 5, 17))
+    'tracks_collectedpoint_y2018m05'
+
+    """
+
+    return "{}_y{:04d}m{:02d}".format(
+        PARTITIONED_TABLE, month.year, month.month)
+
+
+def get_partition_month(partition_name: str) -> dt.date:
+    """Return the first day of a partition's month
+
+    Returns ``None`` for partitions that do not hold a single month, such as
+    the default partition.
+
+    >>> get_partition_month("tracks_collectedpoint_y2018m05")
+    datetime.date(2018, 5, 1)
+    >>> get_partition_month("tracks_collectedpoint_default") is None
+    True
+
+    """
+
+    match = _PARTITION_NAME_RE.match(partition_name)
+    if match is None:
+        return None
+    return dt.date(int(match.group("year")), int(match.group("month")), 1)
+
+
+def create_partitions(first_timestamp: dt.datetime,
+                      last_timestamp: dt.datetime, db_cursor) -> int:
+    """Create the partitions for the months between two timestamps
+
+    Returns the number of partitions that have been created.
+
+    """
+
+    queries.registry.execute(
+        db_cursor,
+        "create-collectedpoint-partitions.sql",
+        {"first_timestamp": first_timestamp, "last_timestamp": last_timestamp}
+    )
+    return db_cursor.fetchone()[0]
+
+
+def create_upcoming_partitions(db_connection,
+                               num_months: int = DEFAULT_MONTHS_AHEAD,
+                               today: dt.date = None) -> int:
+    """Create the partitions of the current month and of the next ones
+
+    This is meant to be run periodically, e.g. daily, in its own
+    transaction, so that ingestions find their month's partition already
+    attached. Returns the number of partitions that have been created.
+
+    """
+
+    today = today or dt.datetime.now(dt.timezone.utc).date()
+    first_month = today.replace(day=1)
+    last_month = _add_months(first_month, num_months)
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            return create_partitions(
+                dt.datetime(
+                    first_month.year, first_month.month, 1,
+                    tzinfo=dt.timezone.utc
+                ),
+                dt.datetime(
+                    last_month.year, last_month.month, 1,
+                    tzinfo=dt.timezone.utc
+                ),
+                cursor
+            )
+
+
+def _add_months(month: dt.date, num_months: int) -> dt.date:
+    """Return the first day of the month ``num_months`` after ``month``
+
+    >>> _add_months(dt.date(2018, 11, 1), 2)
+    datetime.date(2019, 1, 1)
+
+    """
+
+    index = month.year * 12 + month.month - 1 + num_months
+    return dt.date(index // 12, index % 12 + 1, 1)
+
+
+def estimate_legacy_points(db_cursor) -> int:
+    """Return the planner's estimate of the number of legacy points"""
+    queries.registry.execute(db_cursor, "estimate-legacy-collectedpoints.sql")
+    row = db_cursor.fetchone()
+    return row[0] if row is not None else 0
+
+
+def move_legacy_points(db_connection, batch_size: int = 50000) -> int:
+    """Move a batch of points from the legacy table to the partitioned one
+
+    Points are moved in order of id, in a single transaction, after creating
+    any partitions they need. Returns the number of points that have been
+    moved, which is zero once the legacy table is empty.
+
+    """
+
+    params = {"batch_size": batch_size}
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            queries.registry.execute(
+                cursor, "create-legacy-collectedpoint-partitions.sql", params)
+            queries.registry.execute(
+                cursor, "move-legacy-collectedpoints.sql", params)
+            return cursor.rowcount
+
+
+def list_partitions(db_cursor) -> List[PartitionInfo]:
+    queries.registry.execute(db_cursor, "list-collectedpoint-partitions.sql")
+    return [
+        PartitionInfo(
+            name=name,
+            month=get_partition_month(name),
+            bounds=bounds,
+            estimated_rows=estimated_rows,
+            size_bytes=size_bytes
+        ) for name, bounds, estimated_rows, size_bytes in db_cursor.fetchall()
+    ]
+
+
+def detach_partition(partition_name: str, db_connection,
+                     archive_schema: str = DEFAULT_ARCHIVE_SCHEMA,
+                     drop: bool = False):
+    """Remove a partition from the partitioned table
+
+    The partition is moved to ``archive_schema``, where it may be dumped
+    with ``pg_dump --table`` and later dropped, or it is dropped right away
+    if ``drop`` is true. Either way no rows need to be deleted.
+
+    """
+
+    partition = sql.Identifier(partition_name)
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            cursor.execute(
+                sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+                    sql.Identifier(PARTITIONED_TABLE), partition)
+            )
+            if drop:
+                cursor.execute(sql.SQL("DROP TABLE {}").format(partition))
+            else:
+                schema = sql.Identifier(archive_schema)
+                cursor.execute(
+                    sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(schema))
+                cursor.execute(
+                    sql.SQL("ALTER TABLE {} SET SCHEMA {}").format(
+                        partition, schema)
+                )
@@ -0,0 +1,242 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Database connection pooling for track ingestion
+
+Connections are kept open between ingestions, so a burst of SNS
+notifications does not pay for connection establishment on each track. Since
+connections are reused, so are any server-side prepared statements that have
+been created on them (see ``faas.queries``).
+
+"""
+
+from collections import namedtuple
+import contextlib
+import logging
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+from . import queries
+
+logger = logging.getLogger(__name__)
+
+PoolStats = namedtuple("PoolStats", [
+    "size",
+    "idle",
+    "in_use",
+    "waiting",
+    "max_size",
+    "acquisitions",
+    "saturated_acquisitions",
+    "timeouts",
+    "discarded",
+    "total_wait_seconds",
+    "max_wait_seconds",
+])
+
+
+class PoolTimeoutError(RuntimeError):
+    pass
+
+
+class ConnectionPool(object):
+    """A thread-safe pool of database connections
+
+    :arg connection_factory: a callable that returns a new DB connection
+    :arg min_size: number of connections that are opened when the pool is
+        created and that are always kept open
+    :arg max_size: maximum number of connections that may be open at the
+        same time. When all of them are in use, callers wait for one to be
+        returned to the pool
+    :arg timeout: maximum number of seconds to wait for a connection
+    :arg health_check_interval: connections that have been idle for longer
+        than this number of seconds are checked before being handed out
+    :arg prepare_statements: whether to create the query registry's
+        server-side prepared statements on each new connection
+
+    """
+
+    def __init__(self, connection_factory, min_size: int = 1,
+                 max_size: int = 10, timeout: float = 30,
+                 health_check_interval: float = 30,
+                 prepare_statements: bool = True,
+                 query_registry: queries.QueryRegistry = queries.registry):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError(
+                "Invalid pool size: min_size={} max_size={}".format(
+                    min_size, max_size))
+        self.connection_factory = connection_factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.prepare_statements = prepare_statements
+        self.query_registry = query_registry
+        self._idle = []  # list of (connection, last_used) tuples
+        self._in_use = set()
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._stats = {
+            "acquisitions": 0,
+            "saturated_acquisitions": 0,
+            "timeouts": 0,
+            "discarded": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+        for _ in range(min_size):
+            self._idle.append((self._open_connection(), time.monotonic()))
+            self._size += 1
+
+    @contextlib.contextmanager
+    def connection(self, timeout: float = None):
+        """Borrow a connection from the pool
+
+        The connection is returned to the pool when the ``with`` block exits.
+
+        """
+
+        db_connection = self.getconn(timeout=timeout)
+        try:
+            yield db_connection
+        finally:
+            self.putconn(db_connection)
+
+    def getconn(self, timeout: float = None):
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        saturated = False
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                if len(self._idle) > 0:
+                    db_connection, last_used = self._idle.pop()
+                    break
+                elif self._size < self.max_size:
+                    db_connection, last_used = None, None
+                    self._size += 1
+                    break
+                saturated = True
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        "Timed out waiting for a database connection")
+                self._waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+        try:
+            if db_connection is None:
+                db_connection = self._open_connection()
+            elif not self._is_healthy(db_connection, last_used):
+                self._close_connection(db_connection)
+                with self._condition:
+                    self._stats["discarded"] += 1
+                db_connection = self._open_connection()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        waited = time.monotonic() - start
+        with self._condition:
+            self._in_use.add(db_connection)
+            self._stats["acquisitions"] += 1
+            self._stats["saturated_acquisitions"] += int(saturated)
+            self._stats["total_wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(
+                self._stats["max_wait_seconds"], waited)
+        return db_connection
+
+    def putconn(self, db_connection, discard: bool = False):
+        """Return a connection to the pool
+
+        Connections that are closed, or that cannot be reset to an idle
+        state, are discarded.
+
+        """
+
+        if not discard and not db_connection.closed:
+            try:
+                status = db_connection.get_transaction_status()
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    db_connection.rollback()
+            except psycopg2.Error:
+                logger.exception("Could not reset database connection")
+                discard = True
+        discard = discard or bool(db_connection.closed)
+        with self._condition:
+            self._in_use.discard(db_connection)
+            if discard or self._closed:
+                self._size -= 1
+                self._stats["discarded"] += int(discard)
+            else:
+                self._idle.append((db_connection, time.monotonic()))
+            self._condition.notify()
+        if discard or self._closed:
+            self._close_connection(db_connection)
+
+    def close(self):
+        """Close all idle connections and stop handing out new ones"""
+        with self._condition:
+            self._closed = True
+            idle = [item[0] for item in self._idle]
+            self._idle = []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for db_connection in idle:
+            self._close_connection(db_connection)
+
+    def get_stats(self) -> PoolStats:
+        with self._condition:
+            return PoolStats(
+                size=self._size,
+                idle=len(self._idle),
+                in_use=len(self._in_use),
+                waiting=self._waiting,
+                max_size=self.max_size,
+                **self._stats
+            )
+
+    def _open_connection(self):
+        db_connection = self.connection_factory()
+        if self.prepare_statements:
+            self.query_registry.prepare(db_connection)
+        return db_connection
+
+    def _is_healthy(self, db_connection, last_used: float) -> bool:
+        if db_connection.closed:
+            return False
+        idle_time = time.monotonic() - last_used
+        if idle_time < self.health_check_interval:
+            return True
+        try:
+            with db_connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            db_connection.rollback()
+        except psycopg2.Error:
+            logger.warning("Discarding unhealthy database connection")
+            return False
+        return True
+
+    @staticmethod
+    def _close_connection(db_connection):
+        try:
+            db_connection.close()
+        except psycopg2.Error:
+            pass
@@ -0,0 +1,190 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Registry of the SQL queries used for ingesting track data
+
+All the ``sqlqueries/*.sql`` files are read once, when this module is
+imported. Queries are then executed through the registry, which keeps count
+of how many times each one has been run and of the cumulative time spent
+running it.
+
+The most frequently used queries may also be turned into server-side prepared
+statements. Call ``registry.prepare(db_connection)`` once for each database
+connection and afterwards any of the prepared queries that get executed with
+a cursor of that connection are run as ``EXECUTE`` statements. Prepared
+statements live only as long as the database session, so the registry must
+not be used with connections that are reset (e.g. with ``DISCARD ALL``)
+without calling ``prepare`` again.
+
+"""
+
+from collections import namedtuple
+import logging
+import pathlib
+import re
+import threading
+import time
+from typing import Dict
+from typing import Iterable
+import weakref
+
+logger = logging.getLogger(__name__)
+
+QUERIES_DIR = pathlib.Path(__file__).parent / "sqlqueries"
+
+# queries that are executed once for each track ingested by
+# ``datareceiver.handle_track_upload``
+PREPARED_QUERIES = [
+    "get-track-id-by-session.sql",
+    "get-track-owner-id.sql",
+    "insert-track.sql",
+    "insert-segments-data.sql",
+    "update-track-aggregated-data.sql",
+]
+
+QueryStats = namedtuple("QueryStats", [
+    "calls",
+    "total_seconds",
+])
+
+_PLACEHOLDER_RE = re.compile(r"%\((\w+)\)s|%s")
+
+
+class PreparedQuery(object):
+    """A query converted to the syntax used by PostgreSQL's PREPARE
+
+    psycopg2 placeholders (either ``%(name)s`` or ``%s``) are replaced by
+    PostgreSQL's positional parameters (``$1``, ``$2``, etc).
+
+    >>> prepared = PreparedQuery("q", "SELECT %(a)s, %(b)s, %(a)s")
+    >>> prepared.prepare_statement
+    'PREPARE q AS SELECT $1, $2, $1'
+    >>> prepared.execute_statement
+    'EXECUTE q (%(a)s, %(b)s)'
+
+    """
+
+    def __init__(self, name: str, query: str):
+        self.name = name
+        self.parameter_names = []
+        self.is_positional = False
+        converted = _PLACEHOLDER_RE.sub(self._replace_placeholder, query)
+        self.prepare_statement = "PREPARE {} AS {}".format(name, converted)
+        if len(self.parameter_names) == 0:
+            self.execute_statement = "EXECUTE {}".format(name)
+        else:
+            placeholders = (
+                ["%s"] * len(self.parameter_names) if self.is_positional else
+                ["%({})s".format(i) for i in self.parameter_names]
+            )
+            self.execute_statement = "EXECUTE {} ({})".format(
+                name, ", ".join(placeholders))
+
+    def _replace_placeholder(self, match):
+        parameter_name = match.group(1)
+        if parameter_name is None:
+            self.is_positional = True
+            self.parameter_names.append(len(self.parameter_names))
+            position = len(self.parameter_names)
+        else:
+            if parameter_name not in self.parameter_names:
+                self.parameter_names.append(parameter_name)
+            position = self.parameter_names.index(parameter_name) + 1
+        return "${}".format(position)
+
+
+class QueryRegistry(object):
+
+    def __init__(self, queries_dir: pathlib.Path = QUERIES_DIR,
+                 prepared_queries: Iterable[str] = PREPARED_QUERIES):
+        self.queries = {}
+        for path in sorted(queries_dir.glob("*.sql")):
+            with path.open(encoding="utf-8") as fh:
+                self.queries[path.name] = fh.read()
+        self.prepared_queries = {}
+        for filename in prepared_queries:
+            statement_name = "faas_{}".format(
+                re.sub(r"\W", "_", pathlib.Path(filename).stem))
+            self.prepared_queries[filename] = PreparedQuery(
+                statement_name, self.get(filename))
+        self._prepared_connections = weakref.WeakSet()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename: str) -> str:
+        try:
+            return self.queries[filename]
+        except KeyError:
+            raise RuntimeError("Unknown query {!r}".format(filename))
+
+    def prepare(self, db_connection):
+        """Create server-side prepared statements on the input connection
+
+        The transaction opened by the ``PREPARE`` statements is committed,
+        so this must not be called while other changes are pending.
+
+        """
+
+        if db_connection not in self._prepared_connections:
+            with db_connection.cursor() as cursor:
+                for prepared in self.prepared_queries.values():
+                    cursor.execute(prepared.prepare_statement)
+            db_connection.commit()
+            self._prepared_connections.add(db_connection)
+
+    def is_prepared(self, db_connection) -> bool:
+        return db_connection in self._prepared_connections
+
+    def execute(self, db_cursor, filename: str, params=None):
+        """Execute a query and record its execution statistics
+
+        If the query has been prepared on the cursor's connection, then the
+        prepared statement is executed instead.
+
+        """
+
+        prepared = self.prepared_queries.get(filename)
+        if prepared is not None and self.is_prepared(db_cursor.connection):
+            query = prepared.execute_statement
+        else:
+            query = self.get(filename)
+        start = time.perf_counter()
+        try:
+            db_cursor.execute(query, params)
+        finally:
+            self._record(filename, time.perf_counter() - start)
+
+    def copy(self, db_cursor, filename: str, input_file):
+        """Execute a COPY ... FROM STDIN query and record its statistics"""
+        start = time.perf_counter()
+        try:
+            db_cursor.copy_expert(self.get(filename), input_file)
+        finally:
+            self._record(filename, time.perf_counter() - start)
+
+    def get_stats(self) -> Dict[str, QueryStats]:
+        """Return the number of executions and cumulative time of queries"""
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    def _record(self, filename: str, elapsed_seconds: float):
+        with self._lock:
+            calls, total_seconds = self._stats.get(filename, (0, 0.0))
+            self._stats[filename] = QueryStats(
+                calls=calls + 1,
+                total_seconds=total_seconds + elapsed_seconds
+            )
+
+
+registry = QueryRegistry()
@@ -0,0 +1,161 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Set-based calculation of segment emissions, costs and health
+
+The coefficient tables defined in ``faas._constants`` are turned into a
+lookup table, with one row for each vehicle type, which is sent to the
+database together with the query that calculates segment data. This way the
+emissions, costs and health of all of a track's segments are calculated and
+inserted with a single statement, regardless of the number of segments.
+
+The integration tests check the results of the ``insert-segments-data.sql``
+query against a Python implementation of the same formulas.
+
+"""
+
+from typing import List
+
+from . import _constants
+from . import queries
+from ._constants import Pollutant
+from ._constants import VehicleType
+
+PUBLIC_TRANSPORTS = [
+    VehicleType.bus,
+    VehicleType.train,
+]
+
+
+def get_coefficients() -> dict:
+    """Return the lookup table of coefficients, as query parameters
+
+    Each parameter is a list with one item per vehicle type, except for the
+    calory consumption steps, which are stored with one item per step.
+
+    """
+
+    result = {
+        "vehicle_type": [],
+        "passengers": [],
+        "fuel_consumption": [],
+        "fuel_price": [],
+        "depreciation_cost": [],
+        "operation_cost": [],
+        "total_cost_overhead": [],
+        "step_vehicle_type": [],
+        "step_position": [],
+        "step_speed": [],
+        "step_calories": [],
+    }
+    result.update({pollutant.name: [] for pollutant in Pollutant})
+    for vehicle_type in VehicleType:
+        is_public = vehicle_type in PUBLIC_TRANSPORTS
+        has_fuel = (
+            not is_public and
+            vehicle_type in _constants.FUEL_CONSUMPTION and
+            vehicle_type in _constants.FUEL_PRICE
+        )
+        result["vehicle_type"].append(vehicle_type.name)
+        result["passengers"].append(
+            _constants.AVERAGE_PASSENGER_COUNT.get(vehicle_type, 1))
+        for pollutant, coeffs in _constants.EMISSIONS.items():
+            result[pollutant.name].append(coeffs.get(vehicle_type, 0))
+        result["fuel_consumption"].append(
+            _constants.FUEL_CONSUMPTION[vehicle_type] if has_fuel else None)
+        result["fuel_price"].append(
+            _constants.FUEL_PRICE[vehicle_type] if has_fuel else None)
+        result["depreciation_cost"].append(
+            0 if is_public else
+            _constants.DEPRECIATION_COST.get(vehicle_type, 0)
+        )
+        result["operation_cost"].append(
+            0 if is_public else
+            _constants.OPERATION_COST.get(vehicle_type, 0)
+        )
+        result["total_cost_overhead"].append(
+            _constants.TOTAL_COST_OVERHEAD.get(vehicle_type, 0))
+        calory_consumption = _constants.CALORY_CONSUMPTION.get(
+            vehicle_type, {})
+        for position, step in enumerate(calory_consumption.get("steps", [])):
+            result["step_vehicle_type"].append(vehicle_type.name)
+            result["step_position"].append(position)
+            result["step_speed"].append(step["speed"])
+            result["step_calories"].append(step["calories"])
+    return result
+
+
+COEFFICIENTS = get_coefficients()
+
+
+def insert_segments_data(track_id, db_cursor):
+    """Calculate and insert emissions, costs and health for track segments"""
+    return insert_tracks_segments_data([track_id], db_cursor)
+
+
+def insert_tracks_segments_data(track_ids: List[int], db_cursor,
+                                segment_ids: List[int] = None) -> int:
+    """Insert emissions, costs and health for the segments of several tracks
+
+    All segments are processed by a single statement. If ``segment_ids`` is
+    not ``None``, only those segments of the tracks are processed. Returns
+    the number of processed segments.
+
+    """
+
+    query_params = COEFFICIENTS.copy()
+    query_params.update({
+        "track_ids": list(track_ids),
+        "segment_ids": (
+            list(segment_ids) if segment_ids is not None else None),
+        "time_cost_per_hour": _constants.TIME_COST_PER_HOUR_EURO,
+    })
+    queries.registry.execute(
+        db_cursor, "insert-segments-data.sql", query_params)
+    return db_cursor.fetchone()[0]
+
+
+def update_track_aggregated_data(track_id, db_cursor):
+    """Update a track's geometry, dates and aggregated segment data"""
+    update_tracks_aggregated_data([track_id], db_cursor)
+
+
+def update_tracks_aggregated_data(track_ids: List[int], db_cursor):
+    """Update the geometry, dates and aggregated data of several tracks"""
+    queries.registry.execute(
+        db_cursor,
+        "update-track-aggregated-data.sql",
+        {"track_ids": list(track_ids)}
+    )
+
+
+def delete_segments_data(first_track_id, last_track_id, db_cursor):
+    """Delete emissions, costs and health of a range of tracks' segments"""
+    queries.registry.execute(
+        db_cursor,
+        "delete-segments-data.sql",
+        {"first_track_id": first_track_id, "last_track_id": last_track_id}
+    )
+
+
+def update_tracks_aggregated_segment_data(first_track_id, last_track_id,
+                                          db_cursor):
+    """Update the aggregated segment data of a range of tracks
+
+    Unlike ``update_track_aggregated_data``, track geometry and dates are
+    left untouched, so collected points are not read.
+
+    """
+
+    queries.registry.execute(
+        db_cursor,
+        "update-tracks-aggregated-segment-data.sql",
+        {"first_track_id": first_track_id, "last_track_id": last_track_id}
+    )
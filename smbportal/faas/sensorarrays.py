@@ -0,0 +1,281 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Compact storage of collected points as per-track sensor arrays
+
+Storing each collected point in its own row takes around 250 bytes per
+sample, most of which is spent on fields that are only ever read in bulk
+exports. As an alternative, the points of a track may be stored in the
+``tracks_sensorchannel`` table, with one row per track and *channel* (e.g.
+timestamps, longitudes, humidity), holding a typed array with the
+channel's values for all points, in order.
+
+Arrays are stored as zlib-compressed little-endian binary data. Coordinates
+are kept as double precision numbers, but the other sensor readings are
+stored as single precision numbers, which is more than enough for the
+accuracy of the smartphone sensors that produce them. Timestamps are
+stored as milliseconds since the epoch and are delta-encoded before being
+compressed, since samples are taken at regular intervals. Missing values
+are stored as NaN.
+
+Channels are named after the fields of ``tracks.models.CollectedPoint``.
+
+New tracks are stored as sensor channels at ingestion time, when enabled,
+while existing tracks are compacted in batches with ``compact_tracks``.
+Since segments are generated from the ``tracks_collectedpoint`` rows, these
+are only deleted once a track has been compacted, if requested.
+
+"""
+
+from collections import OrderedDict
+from collections import namedtuple
+import datetime as dt
+from typing import Dict
+from typing import List
+import zlib
+
+import numpy as np
+import psycopg2
+
+from . import columnar
+from . import queries
+from ._constants import VehicleType
+
+ZLIB = "zlib"
+ZLIB_DELTA = "zlib+delta"
+
+COMPRESSION_LEVEL = 6
+
+ChannelDef = namedtuple("ChannelDef", [
+    "column",  # name of the column in ``columnar.TrackColumns``
+    "dtype",
+    "encoding",
+])
+
+CHANNELS = OrderedDict([
+    ("timestamp", ChannelDef("timeStamp", "<i8", ZLIB_DELTA)),
+    ("longitude", ChannelDef("longitude", "<f8", ZLIB)),
+    ("latitude", ChannelDef("latitude", "<f8", ZLIB)),
+    ("vehicle_type", ChannelDef("vehicleMode", "|i1", ZLIB)),
+    ("sessionid", ChannelDef("sessionId", "<i8", ZLIB)),
+    ("accelerationx", ChannelDef("accelerationX", "<f4", ZLIB)),
+    ("accelerationy", ChannelDef("accelerationY", "<f4", ZLIB)),
+    ("accelerationz", ChannelDef("accelerationZ", "<f4", ZLIB)),
+    ("accuracy", ChannelDef("accuracy", "<f4", ZLIB)),
+    ("batconsumptionperhour",
+     ChannelDef("batConsumptionPerHour", "<f4", ZLIB)),
+    ("batterylevel", ChannelDef("batteryLevel", "<f4", ZLIB)),
+    ("devicebearing", ChannelDef("deviceBearing", "<f4", ZLIB)),
+    ("devicepitch", ChannelDef("devicePitch", "<f4", ZLIB)),
+    ("deviceroll", ChannelDef("deviceRoll", "<f4", ZLIB)),
+    ("elevation", ChannelDef("elevation", "<f4", ZLIB)),
+    ("gps_bearing", ChannelDef("gps_bearing", "<f4", ZLIB)),
+    ("humidity", ChannelDef("humidity", "<f4", ZLIB)),
+    ("lumen", ChannelDef("lumen", "<f4", ZLIB)),
+    ("pressure", ChannelDef("pressure", "<f4", ZLIB)),
+    ("proximity", ChannelDef("proximity", "<f4", ZLIB)),
+    ("speed", ChannelDef("speed", "<f4", ZLIB)),
+    ("temperature", ChannelDef("temperature", "<f4", ZLIB)),
+])
+
+# sensor channels that are stored in the columns of the same name of
+# ``tracks_collectedpoint``
+SENSOR_CHANNELS = list(CHANNELS)[5:]
+
+EncodedChannel = namedtuple("EncodedChannel", [
+    "name",
+    "dtype",
+    "encoding",
+    "num_values",
+    "data",
+])
+
+CompactionResult = namedtuple("CompactionResult", [
+    "last_track_id",
+    "num_candidates",
+    "num_tracks",
+    "num_points",
+    "num_bytes",
+    "num_deleted_rows",
+])
+
+
+def encode(values: np.ndarray, dtype: str, encoding: str = ZLIB) -> bytes:
+    """Encode an array as compressed binary data
+
+    >>> values = np.array([1000, 2000, 3000])
+    >>> decode(encode(values, "<i8", ZLIB_DELTA), "<i8", ZLIB_DELTA).tolist()
+    [1000, 2000, 3000]
+
+    """
+
+    values = np.asarray(values).astype(dtype)
+    if encoding == ZLIB_DELTA:
+        # the first value is its delta from zero. np.diff's prepend argument
+        # would need numpy 1.16
+        values = np.concatenate((values[:1], np.diff(values)))
+    elif encoding != ZLIB:
+        raise ValueError("Invalid encoding: {!r}".format(encoding))
+    return zlib.compress(values.tobytes(), COMPRESSION_LEVEL)
+
+
+def decode(data: bytes, dtype: str, encoding: str = ZLIB) -> np.ndarray:
+    """Decode an array that was encoded with ``encode``"""
+    values = np.frombuffer(zlib.decompress(bytes(data)), dtype=dtype)
+    if encoding == ZLIB_DELTA:
+        values = np.cumsum(values, dtype=values.dtype)
+    elif encoding != ZLIB:
+        raise ValueError("Invalid encoding: {!r}".format(encoding))
+    return values
+
+
+def encode_track(track_data: columnar.TrackColumns) -> List[EncodedChannel]:
+    """Encode the columns of parsed track data as sensor channels"""
+    num_points = columnar.get_num_points(track_data)
+    result = []
+    for name, channel in CHANNELS.items():
+        values = track_data[channel.column]
+        if channel.column == "timeStamp":
+            values = values.astype("datetime64[ms]").astype(np.int64)
+        result.append(
+            EncodedChannel(
+                name=name,
+                dtype=channel.dtype,
+                encoding=channel.encoding,
+                num_values=num_points,
+                data=encode(values, channel.dtype, channel.encoding)
+            )
+        )
+    return result
+
+
+def decode_channels(channels: List[EncodedChannel]) -> Dict[str, np.ndarray]:
+    return {
+        channel.name: decode(channel.data, channel.dtype, channel.encoding)
+        for channel in channels
+    }
+
+
+def insert_track_channels(track_id: int, track_data: columnar.TrackColumns,
+                          db_cursor):
+    """Store the points of a track as sensor channels"""
+    _insert_channels(track_id, encode_track(track_data), db_cursor)
+
+
+def compact_track(track_id: int, db_cursor) -> List[EncodedChannel]:
+    """Store the collected points of a track as sensor channels
+
+    Returns the channels that have been stored, which is an empty list when
+    the track has no collected points. Collected points are left untouched.
+
+    """
+
+    queries.registry.execute(
+        db_cursor, "get-track-point-columns.sql", {"track_id": track_id})
+    rows = db_cursor.fetchall()
+    if len(rows) == 0:
+        return []
+    channels = encode_track(_get_track_columns(rows))
+    _insert_channels(track_id, channels, db_cursor)
+    return channels
+
+
+def compact_tracks(db_connection, after_track_id: int = 0,
+                   batch_size: int = 100, before: dt.datetime = None,
+                   delete_rows: bool = False) -> CompactionResult:
+    """Compact a batch of tracks, in a single transaction
+
+    Tracks are processed in order of id, starting after ``after_track_id``.
+    If ``before`` is not ``None``, only tracks that ended before it are
+    processed. Tracks that already have sensor channels are not compacted
+    again. If ``delete_rows`` is true, the collected point rows of the
+    processed tracks are deleted once they are stored as sensor channels.
+
+    """
+
+    result = CompactionResult(None, 0, 0, 0, 0, 0)
+    with db_connection:
+        with db_connection.cursor() as cursor:
+            queries.registry.execute(
+                cursor,
+                "get-compaction-candidate-tracks.sql",
+                {
+                    "after_track_id": after_track_id,
+                    "batch_size": batch_size,
+                    "before": before,
+                }
+            )
+            candidates = cursor.fetchall()
+            track_ids = []
+            for track_id, already_compacted in candidates:
+                if not already_compacted:
+                    channels = compact_track(track_id, cursor)
+                    if len(channels) == 0:
+                        continue
+                    result = result._replace(
+                        num_tracks=result.num_tracks + 1,
+                        num_points=(
+                            result.num_points + channels[0].num_values),
+                        num_bytes=result.num_bytes + sum(
+                            len(channel.data) for channel in channels)
+                    )
+                track_ids.append(track_id)
+            if delete_rows and len(track_ids) > 0:
+                queries.registry.execute(
+                    cursor,
+                    "delete-track-collectedpoints.sql",
+                    {"track_ids": track_ids}
+                )
+                result = result._replace(num_deleted_rows=cursor.rowcount)
+                # vertex timestamps of the API are read from the deleted rows
+                queries.registry.execute(
+                    cursor, "touch-tracks.sql", {"track_ids": track_ids})
+    return result._replace(
+        last_track_id=candidates[-1][0] if len(candidates) > 0 else None,
+        num_candidates=len(candidates)
+    )
+
+
+def _get_track_columns(rows: list) -> columnar.TrackColumns:
+    """Convert rows of ``get-track-point-columns.sql`` to track columns"""
+    names = list(CHANNELS)
+    columns = list(zip(*rows)) if len(rows) > 0 else [()] * len(names)
+    result = {}
+    for name, values in zip(names, columns):
+        channel = CHANNELS[name]
+        if name == "vehicle_type":
+            values = [
+                VehicleType[value].value if value else 0 for value in values]
+            array = np.array(values, dtype=channel.dtype)
+        elif np.dtype(channel.dtype).kind == "f":
+            array = np.array(values, dtype=np.float64)
+        else:
+            array = np.array(
+                [value or 0 for value in values], dtype=np.int64)
+        if name == "timestamp":
+            array = array.astype("datetime64[ms]")
+        result[channel.column] = array
+    return result
+
+
+def _insert_channels(track_id: int, channels: List[EncodedChannel],
+                     db_cursor):
+    queries.registry.execute(
+        db_cursor,
+        "insert-sensor-channels.sql",
+        {
+            "track_id": track_id,
+            "names": [channel.name for channel in channels],
+            "dtypes": [channel.dtype for channel in channels],
+            "encodings": [channel.encoding for channel in channels],
+            "num_values": [channel.num_values for channel in channels],
+            "data": [psycopg2.Binary(channel.data) for channel in channels],
+        }
+    )
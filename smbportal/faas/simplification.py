@@ -0,0 +1,91 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Simplified segment geometries
+
+Segment geometries are simplified with ``ST_SimplifyPreserveTopology`` for
+maps shown at a given web map zoom level, using a tolerance of about one
+pixel at that zoom level. Simplified geometries are precomputed during
+ingestion for each of the ``ZOOM_LEVELS``, and stored in the
+``geom_z<zoom level>`` columns of ``tracks_segment``.
+
+"""
+
+from typing import List
+
+from . import queries
+
+# zoom levels whose simplified geometries are stored with each segment
+ZOOM_LEVELS = (10, 13, 16)
+
+MAX_ZOOM_LEVEL = 24
+
+# approximate length of a degree of latitude, in meters
+METERS_PER_DEGREE = 111_195
+
+# width of web map tiles, in pixels
+TILE_SIZE = 256
+
+
+def get_tolerance(zoom: int) -> float:
+    """Return the simplification tolerance for a zoom level, in degrees
+
+    This is the size of a pixel at the zoom level, along the equator.
+
+    >>> get_tolerance(0) == 360 / 256
+    True
+    >>> get_tolerance(16) < 0.0001
+    True
+
+    """
+
+    return 360 / (TILE_SIZE * 2 ** zoom)
+
+
+def get_meters_tolerance(meters: float) -> float:
+    """Convert a simplification tolerance from meters to degrees"""
+    return meters / METERS_PER_DEGREE
+
+
+def get_precomputed_zoom(zoom: int):
+    """Return the most detailed precomputed zoom level needed for ``zoom``
+
+    Returns ``None`` when no precomputed geometry is detailed enough.
+
+    >>> [get_precomputed_zoom(zoom) for zoom in (5, 10, 11, 16, 17)]
+    [10, 10, 13, 16, None]
+
+    """
+
+    for zoom_level in ZOOM_LEVELS:
+        if zoom_level >= zoom:
+            return zoom_level
+    return None
+
+
+def update_segments_geometry(track_ids: List[int], db_cursor,
+                             segment_ids: List[int] = None):
+    """Store the simplified geometries of the segments of several tracks
+
+    If ``segment_ids`` is not ``None``, only those segments are updated.
+
+    """
+
+    query_params = {
+        "tolerance_z{}".format(zoom): get_tolerance(zoom)
+        for zoom in ZOOM_LEVELS
+    }
+    query_params.update({
+        "track_ids": list(track_ids),
+        "segment_ids": (
+            list(segment_ids) if segment_ids is not None else None),
+    })
+    queries.registry.execute(
+        db_cursor, "update-segments-simplified-geometry.sql", query_params)
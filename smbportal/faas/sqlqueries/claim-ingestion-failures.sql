@@ -0,0 +1,19 @@
+UPDATE tracks_ingestionfailure AS failure
+SET
+  next_attempt_at = now() + %(lease_seconds)s * interval '1 second'
+FROM (
+  SELECT id
+  FROM tracks_ingestionfailure
+  WHERE status = 'retrying'
+    AND next_attempt_at <= now()
+  ORDER BY next_attempt_at
+  LIMIT %(limit)s
+  FOR UPDATE SKIP LOCKED
+) AS due
+WHERE failure.id = due.id
+RETURNING
+  failure.id,
+  failure.bucket,
+  failure.object_key,
+  failure.stage,
+  failure.attempts
@@ -0,0 +1,50 @@
+WITH dead AS (
+  -- jobs that keep being claimed without finishing, e.g. because processing
+  -- them kills the worker, are given up
+  UPDATE tracks_ingestionjob AS job
+  SET
+    status = 'dead',
+    finished_at = now(),
+    error = 'Gave up after ' || job.attempts || ' attempts'
+  FROM (
+    SELECT id
+    FROM tracks_ingestionjob
+    WHERE attempts >= %(max_attempts)s
+      AND (
+        status = 'pending'
+        OR (
+          status = 'processing' AND
+          claimed_at < now() - %(visibility_timeout)s * interval '1 second'
+        )
+      )
+    FOR UPDATE SKIP LOCKED
+  ) AS exhausted
+  WHERE job.id = exhausted.id
+)
+UPDATE tracks_ingestionjob AS job
+SET
+  status = 'processing',
+  claimed_at = now(),
+  attempts = job.attempts + 1
+FROM (
+  SELECT id
+  FROM tracks_ingestionjob
+  WHERE attempts < %(max_attempts)s
+    AND (
+      status = 'pending'
+      OR (
+        status = 'processing' AND
+        claimed_at < now() - %(visibility_timeout)s * interval '1 second'
+      )
+    )
+  ORDER BY id
+  LIMIT %(limit)s
+  FOR UPDATE SKIP LOCKED
+) AS claimable
+WHERE job.id = claimable.id
+RETURNING
+  job.id,
+  job.bucket,
+  job.object_key,
+  job.enqueued_at,
+  job.attempts
@@ -0,0 +1,26 @@
+COPY faas_collectedpoint_staging (
+  seq,
+  vehicle_type,
+  track_id,
+  longitude,
+  latitude,
+  accelerationx,
+  accelerationy,
+  accelerationz,
+  accuracy,
+  batconsumptionperhour,
+  batterylevel,
+  devicebearing,
+  devicepitch,
+  deviceroll,
+  elevation,
+  gps_bearing,
+  humidity,
+  lumen,
+  pressure,
+  proximity,
+  speed,
+  temperature,
+  sessionid,
+  timestamp
+) FROM STDIN
@@ -0,0 +1,4 @@
+SELECT count(*)
+FROM tracks_ingestionfailure
+WHERE status = 'retrying'
+  AND next_attempt_at <= now()
@@ -0,0 +1,3 @@
+SELECT count(*)
+FROM tracks_ingestionjob
+WHERE status = 'pending'
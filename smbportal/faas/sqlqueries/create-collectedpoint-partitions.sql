@@ -0,0 +1,4 @@
+SELECT tracks_create_collectedpoint_partitions(
+  %(first_timestamp)s,
+  %(last_timestamp)s
+)
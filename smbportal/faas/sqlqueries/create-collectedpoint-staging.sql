@@ -0,0 +1,26 @@
+CREATE TEMPORARY TABLE IF NOT EXISTS faas_collectedpoint_staging (
+  seq integer,
+  vehicle_type varchar(50),
+  track_id integer,
+  longitude double precision,
+  latitude double precision,
+  accelerationx double precision,
+  accelerationy double precision,
+  accelerationz double precision,
+  accuracy double precision,
+  batconsumptionperhour double precision,
+  batterylevel double precision,
+  devicebearing double precision,
+  devicepitch double precision,
+  deviceroll double precision,
+  elevation double precision,
+  gps_bearing double precision,
+  humidity double precision,
+  lumen double precision,
+  pressure double precision,
+  proximity double precision,
+  speed double precision,
+  temperature double precision,
+  sessionid bigint,
+  timestamp timestamp with time zone
+) ON COMMIT DELETE ROWS
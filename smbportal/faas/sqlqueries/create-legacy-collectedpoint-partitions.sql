@@ -0,0 +1,7 @@
+SELECT tracks_create_collectedpoint_partitions(min(timestamp), max(timestamp))
+FROM (
+  SELECT timestamp
+  FROM tracks_collectedpoint_legacy
+  ORDER BY id
+  LIMIT %(batch_size)s
+) AS batch
@@ -0,0 +1,21 @@
+WITH segments AS (
+  SELECT id
+  FROM tracks_segment
+  WHERE track_id BETWEEN %(first_track_id)s AND %(last_track_id)s
+), deleted_emissions AS (
+  DELETE FROM tracks_emission
+  WHERE segment_id IN (SELECT id FROM segments)
+  RETURNING segment_id
+), deleted_costs AS (
+  DELETE FROM tracks_cost
+  WHERE segment_id IN (SELECT id FROM segments)
+  RETURNING segment_id
+), deleted_health AS (
+  DELETE FROM tracks_health
+  WHERE segment_id IN (SELECT id FROM segments)
+  RETURNING segment_id
+)
+SELECT
+  (SELECT count(*) FROM deleted_emissions),
+  (SELECT count(*) FROM deleted_costs),
+  (SELECT count(*) FROM deleted_health)
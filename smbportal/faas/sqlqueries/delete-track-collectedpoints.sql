@@ -0,0 +1,2 @@
+DELETE FROM tracks_collectedpoint
+WHERE track_id = ANY(%(track_ids)s)
@@ -0,0 +1,37 @@
+WITH segments AS (
+  SELECT id
+  FROM tracks_segment
+  WHERE track_id = %(track_id)s
+), deleted_emissions AS (
+  DELETE FROM tracks_emission
+  WHERE segment_id IN (SELECT id FROM segments)
+), deleted_costs AS (
+  DELETE FROM tracks_cost
+  WHERE segment_id IN (SELECT id FROM segments)
+), deleted_health AS (
+  DELETE FROM tracks_health
+  WHERE segment_id IN (SELECT id FROM segments)
+), deleted_segments AS (
+  DELETE FROM tracks_segment
+  WHERE track_id = %(track_id)s
+), deleted_points AS (
+  DELETE FROM tracks_collectedpoint
+  WHERE track_id = %(track_id)s
+), deleted_channels AS (
+  DELETE FROM tracks_sensorchannel
+  WHERE track_id = %(track_id)s
+), detached_jobs AS (
+  UPDATE tracks_ingestionjob
+  SET track_id = NULL
+  WHERE track_id = %(track_id)s
+), detached_records AS (
+  UPDATE tracks_ingestionrecord
+  SET track_id = NULL
+  WHERE track_id = %(track_id)s
+), detached_failures AS (
+  UPDATE tracks_ingestionfailure
+  SET track_id = NULL
+  WHERE track_id = %(track_id)s
+)
+DELETE FROM tracks_track
+WHERE id = %(track_id)s
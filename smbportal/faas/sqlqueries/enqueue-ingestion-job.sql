@@ -0,0 +1,17 @@
+INSERT INTO tracks_ingestionjob (
+  bucket,
+  object_key,
+  status,
+  enqueued_at,
+  attempts,
+  error
+)
+VALUES (
+  %(bucket)s,
+  %(object_key)s,
+  'pending',
+  now(),
+  0,
+  ''
+)
+RETURNING id
@@ -0,0 +1,3 @@
+SELECT GREATEST(reltuples, 0)::bigint
+FROM pg_class
+WHERE oid = to_regclass('tracks_collectedpoint_legacy')
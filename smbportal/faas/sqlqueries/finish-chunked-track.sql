@@ -0,0 +1,15 @@
+WITH segments AS (
+  SELECT MIN(start_date) AS "start"
+  FROM tracks_segment
+  WHERE track_id = %(track_id)s
+)
+UPDATE tracks_track AS t SET
+  start_date = s.start,
+  duration =
+    extract(day from t.end_date - s.start) * 24 * 60 +
+    extract(hour from t.end_date - s.start) * 60 +
+    extract(minute from t.end_date - s.start) +
+    extract(second from t.end_date - s.start) / 60,
+  updated_at = now()
+FROM segments AS s
+WHERE t.id = %(track_id)s
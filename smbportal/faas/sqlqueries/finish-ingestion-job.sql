@@ -0,0 +1,7 @@
+UPDATE tracks_ingestionjob
+SET
+  status = %(status)s,
+  finished_at = now(),
+  error = %(error)s,
+  track_id = %(track_id)s
+WHERE id = %(job_id)s
@@ -0,0 +1,10 @@
+UPDATE tracks_ingestionrecord
+SET
+  status = %(status)s,
+  error = %(error)s,
+  finished_at = now(),
+  track_id = coalesce(%(track_id)s, track_id),
+  timings = timings || %(timings)s::jsonb || jsonb_build_object(
+    'total', extract(epoch FROM now() - started_at)
+  )
+WHERE id = %(record_id)s
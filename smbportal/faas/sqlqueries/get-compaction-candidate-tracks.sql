@@ -0,0 +1,10 @@
+SELECT
+  t.id,
+  EXISTS (
+    SELECT 1 FROM tracks_sensorchannel AS c WHERE c.track_id = t.id
+  ) AS already_compacted
+FROM tracks_track AS t
+WHERE t.id > %(after_track_id)s
+  AND (%(before)s::timestamptz IS NULL OR t.end_date < %(before)s::timestamptz)
+ORDER BY t.id
+LIMIT %(batch_size)s
@@ -0,0 +1,4 @@
+SELECT track_id
+FROM tracks_ingestionrecord
+WHERE object_key = %(object_key)s
+  AND etag = %(etag)s
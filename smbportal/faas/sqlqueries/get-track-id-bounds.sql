@@ -0,0 +1,3 @@
+SELECT min(id), max(id)
+FROM tracks_track
+WHERE id >= %(start_id)s
@@ -0,0 +1,3 @@
+SELECT id
+FROM tracks_track
+WHERE session_id = %(session_id)s
@@ -0,0 +1,3 @@
+SELECT session_id, id
+FROM tracks_track
+WHERE session_id = ANY(%(session_ids)s)
@@ -0,0 +1,3 @@
+SELECT user_id
+FROM bossoidc_keycloak
+WHERE "UID" = %s
@@ -0,0 +1,3 @@
+SELECT "UID", user_id
+FROM bossoidc_keycloak
+WHERE "UID" = ANY(%(user_uuids)s)
@@ -0,0 +1,26 @@
+SELECT
+  (extract(epoch FROM timestamp) * 1000)::bigint,
+  ST_X(the_geom),
+  ST_Y(the_geom),
+  vehicle_type,
+  sessionid,
+  accelerationx,
+  accelerationy,
+  accelerationz,
+  accuracy,
+  batconsumptionperhour,
+  batterylevel,
+  devicebearing,
+  devicepitch,
+  deviceroll,
+  elevation,
+  gps_bearing,
+  humidity,
+  lumen,
+  pressure,
+  proximity,
+  speed,
+  temperature
+FROM tracks_collectedpoint
+WHERE track_id = %(track_id)s
+ORDER BY timestamp, id
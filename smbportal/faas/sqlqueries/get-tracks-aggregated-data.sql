@@ -0,0 +1,8 @@
+SELECT
+  id,
+  aggregated_emissions,
+  aggregated_costs,
+  aggregated_health
+FROM tracks_track
+WHERE id BETWEEN %(first_track_id)s AND %(last_track_id)s
+ORDER BY id
@@ -0,0 +1,53 @@
+WITH staged AS (
+  DELETE FROM faas_collectedpoint_staging
+  RETURNING *
+)
+INSERT INTO tracks_collectedpoint (
+  vehicle_type,
+  track_id,
+  the_geom,
+  accelerationx,
+  accelerationy,
+  accelerationz,
+  accuracy,
+  batconsumptionperhour,
+  batterylevel,
+  devicebearing,
+  devicepitch,
+  deviceroll,
+  elevation,
+  gps_bearing,
+  humidity,
+  lumen,
+  pressure,
+  proximity,
+  speed,
+  temperature,
+  sessionid,
+  timestamp
+)
+SELECT
+  vehicle_type,
+  track_id,
+  ST_SetSRID(ST_MakePoint(longitude, latitude), 4326),
+  accelerationx,
+  accelerationy,
+  accelerationz,
+  accuracy,
+  batconsumptionperhour,
+  batterylevel,
+  devicebearing,
+  devicepitch,
+  deviceroll,
+  elevation,
+  gps_bearing,
+  humidity,
+  lumen,
+  pressure,
+  proximity,
+  speed,
+  temperature,
+  sessionid,
+  timestamp
+FROM staged
+ORDER BY seq
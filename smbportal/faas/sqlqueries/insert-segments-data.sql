@@ -0,0 +1,196 @@
+WITH coefficients AS (
+  SELECT *
+  FROM unnest(
+    %(vehicle_type)s::text[],
+    %(passengers)s::double precision[],
+    %(so2)s::double precision[],
+    %(nox)s::double precision[],
+    %(co)s::double precision[],
+    %(co2)s::double precision[],
+    %(pm10)s::double precision[],
+    %(fuel_consumption)s::double precision[],
+    %(fuel_price)s::double precision[],
+    %(depreciation_cost)s::double precision[],
+    %(operation_cost)s::double precision[],
+    %(total_cost_overhead)s::double precision[]
+  ) AS c (
+    vehicle_type,
+    passengers,
+    so2,
+    nox,
+    co,
+    co2,
+    pm10,
+    fuel_consumption,
+    fuel_price,
+    depreciation_cost,
+    operation_cost,
+    total_cost_overhead
+  )
+), calory_steps AS (
+  SELECT *
+  FROM unnest(
+    %(step_vehicle_type)s::text[],
+    %(step_position)s::integer[],
+    %(step_speed)s::double precision[],
+    %(step_calories)s::double precision[]
+  ) AS s (vehicle_type, position, speed, calories)
+), segment_durations AS (
+  SELECT
+    id,
+    vehicle_type,
+    ST_Length(geom::geography) / 1000 AS length_km,
+    floor(extract(epoch FROM end_date - start_date)) AS duration_seconds
+  FROM tracks_segment
+  WHERE track_id = ANY(%(track_ids)s)
+    AND (
+      %(segment_ids)s::integer[] IS NULL OR
+      id = ANY(%(segment_ids)s::integer[])
+    )
+), segment_info AS (
+  SELECT
+    id,
+    vehicle_type,
+    length_km,
+    floor(duration_seconds / 86400) * 24 +
+      (duration_seconds - floor(duration_seconds / 86400) * 86400) / 3600
+      AS duration_hours
+  FROM segment_durations
+), segment_speeds AS (
+  SELECT
+    *,
+    CASE WHEN duration_hours > 0
+      THEN length_km / duration_hours
+      ELSE 0
+    END AS speed_km_h
+  FROM segment_info
+), segment_data AS (
+  SELECT
+    i.id,
+    i.vehicle_type,
+    i.length_km,
+    i.duration_hours,
+    i.speed_km_h,
+    c.passengers,
+    c.so2,
+    c.nox,
+    c.co,
+    c.co2,
+    c.pm10,
+    c.fuel_consumption,
+    c.fuel_price,
+    c.depreciation_cost,
+    c.operation_cost,
+    c.total_cost_overhead,
+    ref.passengers AS ref_passengers,
+    ref.so2 AS ref_so2,
+    ref.nox AS ref_nox,
+    ref.co AS ref_co,
+    ref.co2 AS ref_co2,
+    ref.pm10 AS ref_pm10,
+    COALESCE(
+      (
+        SELECT s.calories
+        FROM calory_steps AS s
+        WHERE s.vehicle_type = i.vehicle_type AND i.speed_km_h < s.speed
+        ORDER BY s.position
+        LIMIT 1
+      ),
+      (
+        SELECT s.calories
+        FROM calory_steps AS s
+        WHERE s.vehicle_type = i.vehicle_type
+        ORDER BY s.position DESC
+        LIMIT 1
+      )
+    ) AS calories_per_minute
+  FROM segment_speeds AS i
+    JOIN coefficients AS c ON (c.vehicle_type = i.vehicle_type)
+    CROSS JOIN coefficients AS ref
+  WHERE ref.vehicle_type = 'car'
+), segment_costs AS (
+  SELECT
+    id,
+    COALESCE(length_km * fuel_consumption * fuel_price, 0) AS fuel_cost,
+    duration_hours * %(time_cost_per_hour)s AS time_cost,
+    length_km * depreciation_cost AS depreciation_cost,
+    length_km * operation_cost AS operation_cost,
+    total_cost_overhead
+  FROM segment_data
+), inserted_emissions AS (
+  INSERT INTO tracks_emission (
+    so2,
+    so2_saved,
+    nox,
+    nox_saved,
+    co2,
+    co2_saved,
+    co,
+    co_saved,
+    pm10,
+    pm10_saved,
+    segment_id
+  )
+  SELECT
+    (so2 * length_km) / passengers,
+    CASE WHEN vehicle_type = 'car' THEN 0
+      ELSE (ref_so2 * length_km) / ref_passengers -
+        (so2 * length_km) / passengers
+    END,
+    (nox * length_km) / passengers,
+    CASE WHEN vehicle_type = 'car' THEN 0
+      ELSE (ref_nox * length_km) / ref_passengers -
+        (nox * length_km) / passengers
+    END,
+    (co2 * length_km) / passengers,
+    CASE WHEN vehicle_type = 'car' THEN 0
+      ELSE (ref_co2 * length_km) / ref_passengers -
+        (co2 * length_km) / passengers
+    END,
+    (co * length_km) / passengers,
+    CASE WHEN vehicle_type = 'car' THEN 0
+      ELSE (ref_co * length_km) / ref_passengers -
+        (co * length_km) / passengers
+    END,
+    (pm10 * length_km) / passengers,
+    CASE WHEN vehicle_type = 'car' THEN 0
+      ELSE (ref_pm10 * length_km) / ref_passengers -
+        (pm10 * length_km) / passengers
+    END,
+    id
+  FROM segment_data
+  RETURNING segment_id
+), inserted_costs AS (
+  INSERT INTO tracks_cost (
+    fuel_cost,
+    time_cost,
+    depreciation_cost,
+    operation_cost,
+    total_cost,
+    segment_id
+  )
+  SELECT
+    fuel_cost,
+    time_cost,
+    depreciation_cost,
+    operation_cost,
+    (fuel_cost + time_cost + depreciation_cost + operation_cost) *
+      (1 + total_cost_overhead),
+    id
+  FROM segment_costs
+  RETURNING segment_id
+), inserted_health AS (
+  INSERT INTO tracks_health (
+    calories_consumed,
+    segment_id
+  )
+  SELECT
+    COALESCE(calories_per_minute * (duration_hours * 60), 0),
+    id
+  FROM segment_data
+  RETURNING segment_id
+)
+SELECT
+  (SELECT count(*) FROM inserted_emissions),
+  (SELECT count(*) FROM inserted_costs),
+  (SELECT count(*) FROM inserted_health)
@@ -0,0 +1,16 @@
+INSERT INTO tracks_sensorchannel (
+  track_id,
+  name,
+  dtype,
+  encoding,
+  num_values,
+  data
+)
+SELECT %(track_id)s, c.*
+FROM unnest(
+  %(names)s::text[],
+  %(dtypes)s::text[],
+  %(encodings)s::text[],
+  %(num_values)s::integer[],
+  %(data)s::bytea[]
+) AS c (name, dtype, encoding, num_values, data)
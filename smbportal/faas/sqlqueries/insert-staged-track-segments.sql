@@ -0,0 +1,65 @@
+WITH runs AS (
+  SELECT
+    seq,
+    timestamp,
+    vehicle_type,
+    ST_SetSRID(ST_MakePoint(longitude, latitude), 4326) AS the_geom,
+    SUM(CASE WHEN changed THEN 0 ELSE 1 END) OVER (ORDER BY timestamp, seq) AS clustr
+  FROM (
+    SELECT
+      seq,
+      timestamp,
+      vehicle_type,
+      longitude,
+      latitude,
+      vehicle_type = lag(vehicle_type, 1) OVER (ORDER BY timestamp, seq) AS changed
+    FROM faas_collectedpoint_staging
+    WHERE track_id = %(track_id)s
+  ) AS sq
+), chunk_segments AS (
+  SELECT
+    clustr,
+    vehicle_type,
+    ST_MakeLine(the_geom ORDER BY timestamp, seq) AS geom,
+    MIN(timestamp) AS "start",
+    MAX(timestamp) AS "end"
+  FROM runs
+  GROUP BY
+    clustr,
+    vehicle_type
+), extended AS (
+  -- the first run of the chunk continues the track's last segment when it
+  -- has the same vehicle type
+  UPDATE tracks_segment AS s SET
+    geom = ST_MakeLine(s.geom, c.geom),
+    end_date = GREATEST(s.end_date, c.end)
+  FROM chunk_segments AS c
+  WHERE s.id = %(open_segment_id)s
+    AND c.clustr = 1
+    AND c.vehicle_type = s.vehicle_type
+  RETURNING s.id, s.vehicle_type, s.end_date
+), inserted AS (
+  INSERT INTO tracks_segment (
+    track_id,
+    user_uuid,
+    vehicle_type,
+    geom,
+    start_date,
+    end_date
+  )
+  SELECT
+    %(track_id)s,
+    %(user_uuid)s,
+    vehicle_type,
+    geom,
+    "start",
+    "end"
+  FROM chunk_segments
+  WHERE clustr > 1 OR NOT EXISTS (SELECT 1 FROM extended)
+  ORDER BY clustr
+  RETURNING id, vehicle_type, end_date
+)
+SELECT id, vehicle_type, end_date FROM extended
+UNION ALL
+SELECT id, vehicle_type, end_date FROM inserted
+ORDER BY end_date, id
@@ -1,3 +1,10 @@
+WITH owners AS (
+  SELECT *
+  FROM unnest(
+    %(track_ids)s::integer[],
+    %(user_uuids)s::text[]
+  ) AS o (track_id, user_uuid)
+)
 INSERT INTO tracks_segment (
   track_id,
   user_uuid,
@@ -7,32 +14,34 @@ INSERT INTO tracks_segment (
   end_date
 )
 SELECT
-  track_id AS track_id,
-  %(user_uuid)s AS user_uuid,
-  vehicle_type AS vehicle_type,
-  ST_MakeLine(the_geom) AS geom,
-  MIN(timestamp) AS start,
-  MAX(timestamp) AS end
+  sq2.track_id AS track_id,
+  o.user_uuid AS user_uuid,
+  sq2.vehicle_type AS vehicle_type,
+  ST_MakeLine(sq2.the_geom ORDER BY sq2.timestamp) AS geom,
+  MIN(sq2.timestamp) AS start,
+  MAX(sq2.timestamp) AS end
 FROM (
   SELECT
     track_id,
     the_geom,
     timestamp,
     vehicle_type,
-    SUM(CASE WHEN changed THEN 0 ELSE 1 END) OVER (ORDER BY timestamp ASC) AS clustr
+    SUM(CASE WHEN changed THEN 0 ELSE 1 END) OVER (PARTITION BY track_id ORDER BY timestamp ASC) AS clustr
     FROM (
       SELECT
         track_id,
         timestamp,
         the_geom,
         vehicle_type,
-        vehicle_type = lag(vehicle_type, 1) OVER (ORDER BY timestamp ASC) AS changed
+        vehicle_type = lag(vehicle_type, 1) OVER (PARTITION BY track_id ORDER BY timestamp ASC) AS changed
       FROM tracks_collectedpoint
-      WHERE track_id = %(track_id)s
+      WHERE track_id = ANY(%(track_ids)s)
     ) AS sq
   ) as sq2
+  JOIN owners AS o ON (o.track_id = sq2.track_id)
 GROUP BY
-  clustr,
-  vehicle_type,
-  track_id
-RETURNING id, vehicle_type
\ No newline at end of file
+  sq2.clustr,
+  sq2.vehicle_type,
+  sq2.track_id,
+  o.user_uuid
+RETURNING id, vehicle_type, track_id
@@ -1,3 +1,3 @@
-INSERT INTO tracks_track (owner_id, session_id, created_at)
-VALUES (%s, %s, %s)
+INSERT INTO tracks_track (owner_id, session_id, created_at, updated_at)
+VALUES (%s, %s, %s, now())
 RETURNING id
@@ -0,0 +1,8 @@
+INSERT INTO tracks_track (owner_id, session_id, created_at, updated_at)
+SELECT t.owner_id, t.session_id, %(created_at)s, now()
+FROM unnest(
+  %(owner_ids)s::integer[],
+  %(session_ids)s::bigint[]
+) WITH ORDINALITY AS t (owner_id, session_id, position)
+ORDER BY t.position
+RETURNING id, session_id
@@ -0,0 +1,9 @@
+SELECT
+  child.relname,
+  pg_get_expr(child.relpartbound, child.oid),
+  GREATEST(child.reltuples, 0)::bigint,
+  pg_total_relation_size(child.oid)
+FROM pg_inherits AS i
+  JOIN pg_class AS child ON (i.inhrelid = child.oid)
+WHERE i.inhparent = 'tracks_collectedpoint'::regclass
+ORDER BY child.relname
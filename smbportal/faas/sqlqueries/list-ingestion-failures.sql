@@ -0,0 +1,18 @@
+SELECT
+  id,
+  bucket,
+  object_key,
+  status,
+  stage,
+  exception,
+  error,
+  attempts,
+  first_failed_at,
+  last_failed_at,
+  next_attempt_at
+FROM tracks_ingestionfailure
+WHERE status = ANY(%(statuses)s)
+  AND (%(stage)s::text IS NULL OR stage = %(stage)s::text)
+  AND object_key LIKE %(key_pattern)s
+ORDER BY last_failed_at DESC, id DESC
+LIMIT %(limit)s
@@ -0,0 +1,13 @@
+WITH batch AS (
+  SELECT id
+  FROM tracks_collectedpoint_legacy
+  ORDER BY id
+  LIMIT %(batch_size)s
+), moved AS (
+  DELETE FROM tracks_collectedpoint_legacy AS legacy
+  USING batch
+  WHERE legacy.id = batch.id
+  RETURNING legacy.*
+)
+INSERT INTO tracks_collectedpoint
+SELECT * FROM moved
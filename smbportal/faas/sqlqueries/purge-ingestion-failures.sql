@@ -0,0 +1,4 @@
+DELETE FROM tracks_ingestionfailure
+WHERE status = ANY(%(statuses)s)
+  AND (%(stage)s::text IS NULL OR stage = %(stage)s::text)
+  AND object_key LIKE %(key_pattern)s
@@ -0,0 +1,41 @@
+INSERT INTO tracks_ingestionfailure AS failure (
+  bucket,
+  object_key,
+  status,
+  stage,
+  exception,
+  error,
+  attempts,
+  first_failed_at,
+  last_failed_at
+)
+VALUES (
+  %(bucket)s,
+  %(object_key)s,
+  'retrying',
+  %(stage)s,
+  %(exception)s,
+  %(error)s,
+  1,
+  now(),
+  now()
+)
+ON CONFLICT (bucket, object_key) DO UPDATE
+SET
+  status = 'retrying',
+  stage = excluded.stage,
+  exception = excluded.exception,
+  error = excluded.error,
+  attempts = CASE
+    WHEN failure.status = 'resolved' THEN 1
+    ELSE failure.attempts + 1
+  END,
+  first_failed_at = CASE
+    WHEN failure.status = 'resolved' THEN now()
+    ELSE failure.first_failed_at
+  END,
+  last_failed_at = now(),
+  track_id = NULL
+RETURNING
+  id,
+  attempts
@@ -0,0 +1,6 @@
+UPDATE tracks_ingestionjob
+SET
+  status = 'pending',
+  claimed_at = NULL
+WHERE id = ANY(%(job_ids)s)
+  AND status = 'processing'
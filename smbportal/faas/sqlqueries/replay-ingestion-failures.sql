@@ -0,0 +1,8 @@
+UPDATE tracks_ingestionfailure
+SET
+  status = 'retrying',
+  attempts = 0,
+  next_attempt_at = now()
+WHERE status = ANY(%(statuses)s)
+  AND (%(stage)s::text IS NULL OR stage = %(stage)s::text)
+  AND object_key LIKE %(key_pattern)s
@@ -0,0 +1,6 @@
+UPDATE tracks_ingestionfailure
+SET
+  status = 'resolved',
+  next_attempt_at = NULL,
+  track_id = %(track_id)s
+WHERE id = %(failure_id)s
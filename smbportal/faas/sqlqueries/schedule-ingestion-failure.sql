@@ -0,0 +1,5 @@
+UPDATE tracks_ingestionfailure
+SET
+  status = %(status)s,
+  next_attempt_at = now() + %(delay)s * interval '1 second'
+WHERE id = %(failure_id)s
@@ -0,0 +1,6 @@
+-- the visibility timeout of a job runs from the moment its processing
+-- starts, rather than from when it was claimed
+UPDATE tracks_ingestionjob
+SET claimed_at = now()
+WHERE id = ANY(%(job_ids)s)
+  AND status = 'processing'
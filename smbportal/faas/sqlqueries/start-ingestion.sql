@@ -0,0 +1,40 @@
+INSERT INTO tracks_ingestionrecord AS record (
+  bucket,
+  object_key,
+  etag,
+  status,
+  stage,
+  attempts,
+  error,
+  started_at,
+  timings
+)
+VALUES (
+  %(bucket)s,
+  %(object_key)s,
+  %(etag)s,
+  'processing',
+  '',
+  1,
+  '',
+  now(),
+  '{}'
+)
+ON CONFLICT (object_key, etag) DO UPDATE
+SET
+  status = 'processing',
+  attempts = record.attempts + 1,
+  error = '',
+  started_at = now(),
+  finished_at = NULL
+WHERE record.status = 'failed'
+  OR (
+    record.status = 'processing' AND
+    record.started_at < now() - %(stale_after)s * interval '1 second'
+  )
+RETURNING
+  id,
+  stage,
+  track_id,
+  session_id,
+  attempts
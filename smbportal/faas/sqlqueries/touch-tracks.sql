@@ -0,0 +1,3 @@
+UPDATE tracks_track SET
+  updated_at = now()
+WHERE id = ANY(%(track_ids)s)
@@ -0,0 +1,7 @@
+UPDATE tracks_ingestionrecord
+SET
+  stage = %(stage)s,
+  track_id = coalesce(%(track_id)s, track_id),
+  session_id = coalesce(%(session_id)s, session_id),
+  timings = timings || %(timings)s::jsonb
+WHERE id = %(record_id)s
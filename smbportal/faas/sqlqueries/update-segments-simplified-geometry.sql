@@ -0,0 +1,9 @@
+UPDATE tracks_segment SET
+  geom_z10 = ST_SimplifyPreserveTopology(geom, %(tolerance_z10)s),
+  geom_z13 = ST_SimplifyPreserveTopology(geom, %(tolerance_z13)s),
+  geom_z16 = ST_SimplifyPreserveTopology(geom, %(tolerance_z16)s)
+WHERE track_id = ANY(%(track_ids)s)
+  AND (
+    %(segment_ids)s::integer[] IS NULL OR
+    id = ANY(%(segment_ids)s::integer[])
+  )
@@ -0,0 +1,37 @@
+WITH chunk AS (
+  SELECT
+    ST_MakeLine(
+      ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
+      ORDER BY timestamp, seq
+    ) AS geom,
+    MAX(timestamp) AS "end"
+  FROM faas_collectedpoint_staging
+  WHERE track_id = %(track_id)s
+), joined AS (
+  SELECT
+    t.id,
+    CASE WHEN t.geom IS NULL
+      THEN c.geom
+      ELSE ST_MakeLine(t.geom, c.geom)
+    END AS geom,
+    -- only the new part of the line is measured, including the edge that
+    -- connects it to the previous chunk
+    CASE WHEN t.geom IS NULL
+      THEN c.geom
+      ELSE ST_MakeLine(ST_EndPoint(t.geom), c.geom)
+    END AS new_part,
+    COALESCE(GREATEST(t.end_date, c.end), c.end) AS "end",
+    COALESCE(t.length, 0) AS previous_length
+  FROM tracks_track AS t
+    CROSS JOIN chunk AS c
+  WHERE t.id = %(track_id)s
+)
+UPDATE tracks_track AS t SET
+  geom = j.geom,
+  length = j.previous_length + st_length(j.new_part::geography),
+  -- the start date is only set by finish-chunked-track.sql, once the last
+  -- chunk has been stored, so that the track is not listed before that
+  end_date = j.end,
+  updated_at = now()
+FROM joined AS j
+WHERE t.id = j.id
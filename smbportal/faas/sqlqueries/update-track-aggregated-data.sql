@@ -0,0 +1,72 @@
+WITH points AS (
+  SELECT
+    track_id,
+    st_makeline(the_geom ORDER BY timestamp ) AS geom,
+    MIN(timestamp) AS "start",
+    MAX(timestamp) AS "end",
+    extract(day from MAX(timestamp) - MIN(timestamp)) * 24 * 60 +
+      extract(hour from MAX(timestamp) - MIN(timestamp)) * 60 +
+      extract(minute from MAX(timestamp) - MIN(timestamp)) +
+      extract(second from MAX(timestamp) - MIN(timestamp)) / 60  AS "duration"
+  FROM tracks_collectedpoint
+  WHERE track_id = ANY(%(track_ids)s)
+  GROUP BY track_id
+), emissions AS (
+  SELECT
+    s.track_id,
+    SUM(e.so2) AS so2,
+    SUM(e.so2_saved) AS so2_saved,
+    SUM(e.nox) AS nox,
+    SUM(e.nox_saved) AS nox_saved,
+    SUM(e.co) AS co,
+    SUM(e.co_saved) AS co_saved,
+    SUM(e.co2) AS co2,
+    SUM(e.co2_saved) AS co2_saved,
+    SUM(e.pm10) AS pm10,
+    SUM(e.pm10_saved) AS pm10_saved
+  FROM tracks_emission AS e
+    JOIN tracks_segment AS s ON (e.segment_id = s.id)
+  WHERE s.track_id = ANY(%(track_ids)s)
+  GROUP BY s.track_id
+), costs AS (
+  SELECT
+    s.track_id,
+    SUM(c.fuel_cost) AS fuel_cost,
+    SUM(c.time_cost) AS time_cost,
+    SUM(c.depreciation_cost) AS depreciation_cost,
+    SUM(c.operation_cost) AS operation_cost,
+    SUM(c.total_cost) AS total_cost
+  FROM tracks_cost AS c
+    JOIN tracks_segment AS s ON (c.segment_id = s.id)
+  WHERE s.track_id = ANY(%(track_ids)s)
+  GROUP BY s.track_id
+), health AS (
+  SELECT
+    s.track_id,
+    SUM(h.calories_consumed) AS calories_consumed
+  FROM tracks_health AS h
+    JOIN tracks_segment AS s ON (h.segment_id = s.id)
+  WHERE s.track_id = ANY(%(track_ids)s)
+  GROUP BY s.track_id
+)
+UPDATE tracks_track AS t SET
+  geom = p.geom,
+  length = st_length(p.geom::geography),
+  start_date = p.start,
+  end_date = p.end,
+  duration = p.duration,
+  aggregated_emissions = (
+    SELECT to_jsonb(e) - 'track_id' FROM emissions AS e
+    WHERE e.track_id = t.id
+  ),
+  aggregated_costs = (
+    SELECT to_jsonb(c) - 'track_id' FROM costs AS c
+    WHERE c.track_id = t.id
+  ),
+  aggregated_health = (
+    SELECT to_jsonb(h) - 'track_id' FROM health AS h
+    WHERE h.track_id = t.id
+  ),
+  updated_at = now()
+FROM points AS p
+WHERE t.id = p.track_id
@@ -0,0 +1,382 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Object storage backends for retrieving uploaded track data
+
+The smb-app uploads track data to AWS S3, which is what ``S3ObjectStore``
+reads from. ``LocalObjectStore`` reads objects from a local directory, with
+one subdirectory per bucket, and ``InMemoryObjectStore`` keeps them in a
+dictionary. The latter two make it possible to run the ingestion pipeline
+without access to AWS, for example in tests, benchmarks and load tests.
+
+Stores are selected with ``get_object_store``, which accepts URLs like
+``s3://``, ``file:///some/directory`` and ``memory://``. The store used by
+default is set with ``set_default_object_store`` and is S3 unless changed.
+
+"""
+
+from concurrent import futures
+import hashlib
+import io
+import os
+import pathlib
+import tempfile
+import threading
+from typing import Iterable
+from typing import Iterator
+from typing import Tuple
+import urllib.parse
+
+import boto3
+
+# size of the chunks used for streaming reads
+CHUNK_SIZE = 64 * 1024
+
+# downloaded objects larger than this are spooled to disk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+class ObjectNotFoundError(RuntimeError):
+    pass
+
+
+class ObjectStore(object):
+    """Base class for object stores
+
+    Subclasses implement ``get_size``, ``get_etag``, ``read_range``,
+    ``iter_chunks``, ``list_objects`` and ``put``. Downloading, seekable
+    ranged access and concurrent prefetching are built on top of those.
+
+    """
+
+    def get_size(self, bucket: str, key: str) -> int:
+        raise NotImplementedError
+
+    def get_etag(self, bucket: str, key: str) -> str:
+        raise NotImplementedError
+
+    def read_range(self, bucket: str, key: str, start: int,
+                   length: int) -> bytes:
+        """Read up to ``length`` bytes of an object, starting at ``start``"""
+        raise NotImplementedError
+
+    def iter_chunks(self, bucket: str, key: str,
+                    chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Stream the contents of an object"""
+        raise NotImplementedError
+
+    def list_objects(self, bucket: str, prefix: str = "") -> Iterator[str]:
+        """Yield the keys of a bucket's objects, sorted by key"""
+        raise NotImplementedError
+
+    def put(self, bucket: str, key: str, data: bytes):
+        raise NotImplementedError
+
+    def download(self, bucket: str, key: str, chunk_size: int = CHUNK_SIZE,
+                 spool_max_size: int = SPOOL_MAX_SIZE):
+        """Download an object into a spooled temporary file
+
+        The returned file must be closed by the caller.
+
+        """
+
+        spooled = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+        try:
+            for chunk in self.iter_chunks(bucket, key, chunk_size):
+                spooled.write(chunk)
+        except Exception:
+            spooled.close()
+            raise
+        spooled.seek(0)
+        return spooled
+
+    def open_ranged(self, bucket: str, key: str,
+                    buffer_size: int = CHUNK_SIZE) -> io.BufferedReader:
+        """Return a seekable file object that reads the object on demand
+
+        Only the requested byte ranges are fetched, which is useful for
+        formats like zip, whose table of contents is at the end of the file.
+
+        """
+
+        return io.BufferedReader(
+            _RangedReader(self, bucket, key), buffer_size=buffer_size)
+
+    def prefetch(self, objects: Iterable[Tuple[str, str]],
+                 max_workers: int = 4, chunk_size: int = CHUNK_SIZE):
+        """Download several objects concurrently
+
+        Yields ``(bucket, key, file)`` tuples in the same order as the input
+        ``(bucket, key)`` tuples. At most ``max_workers`` downloads are
+        performed ahead of the object that is currently being yielded. Each
+        yielded file must be closed by the caller.
+
+        """
+
+        objects = iter(objects)
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = []
+            try:
+                for bucket, key in objects:
+                    pending.append((bucket, key, executor.submit(
+                        self.download, bucket, key, chunk_size)))
+                    if len(pending) >= max_workers:
+                        bucket, key, future = pending.pop(0)
+                        yield bucket, key, future.result()
+                while len(pending) > 0:
+                    bucket, key, future = pending.pop(0)
+                    yield bucket, key, future.result()
+            finally:
+                for _, _, future in pending:
+                    if not future.cancel():
+                        try:
+                            future.result().close()
+                        except Exception:
+                            pass
+
+
+class _RangedReader(io.RawIOBase):
+    """A seekable raw file object backed by ranged reads of an object"""
+
+    def __init__(self, store: ObjectStore, bucket: str, key: str):
+        self.store = store
+        self.bucket = bucket
+        self.key = key
+        self.size = store.get_size(bucket, key)
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        else:
+            raise ValueError("Invalid whence: {}".format(whence))
+        self.position = max(0, self.position)
+        return self.position
+
+    def readinto(self, buffer):
+        length = min(len(buffer), self.size - self.position)
+        if length <= 0:
+            return 0
+        data = self.store.read_range(
+            self.bucket, self.key, self.position, length)
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+class S3ObjectStore(ObjectStore):
+    """Read objects from AWS S3
+
+    The boto3 resource is created lazily, so that stores can be sent to
+    other processes, which then create their own.
+
+    """
+
+    def __init__(self, **session_kwargs):
+        self.session_kwargs = session_kwargs
+        self._local = threading.local()
+
+    def __getstate__(self):
+        return {"session_kwargs": self.session_kwargs}
+
+    def __setstate__(self, state):
+        self.__init__(**state["session_kwargs"])
+
+    @property
+    def resource(self):
+        # boto3 resources are not thread safe, so each thread gets its own
+        resource = getattr(self._local, "resource", None)
+        if resource is None:
+            session = boto3.session.Session(**self.session_kwargs)
+            resource = session.resource("s3")
+            self._local.resource = resource
+        return resource
+
+    def get_size(self, bucket: str, key: str) -> int:
+        return self.resource.Object(bucket, key).content_length
+
+    def get_etag(self, bucket: str, key: str) -> str:
+        return self.resource.Object(bucket, key).e_tag
+
+    def read_range(self, bucket: str, key: str, start: int,
+                   length: int) -> bytes:
+        if length <= 0:
+            return b""
+        response = self.resource.Object(bucket, key).get(
+            Range="bytes={}-{}".format(start, start + length - 1))
+        return response["Body"].read()
+
+    def iter_chunks(self, bucket: str, key: str,
+                    chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        response = self.resource.Object(bucket, key).get()
+        yield from response["Body"].iter_chunks(chunk_size)
+
+    def list_objects(self, bucket: str, prefix: str = "") -> Iterator[str]:
+        for summary in self.resource.Bucket(bucket).objects.filter(
+                Prefix=prefix):
+            yield summary.key
+
+    def put(self, bucket: str, key: str, data: bytes):
+        self.resource.Object(bucket, key).put(Body=data)
+
+
+class LocalObjectStore(ObjectStore):
+    """Read objects from a local directory
+
+    Each bucket is a subdirectory of ``root`` and object keys are paths
+    relative to the bucket's directory.
+
+    """
+
+    def __init__(self, root):
+        self.root = pathlib.Path(root)
+
+    def get_path(self, bucket: str, key: str) -> pathlib.Path:
+        bucket_path = (self.root / bucket).resolve()
+        path = (bucket_path / key).resolve()
+        if bucket_path not in path.parents:
+            raise ValueError("Invalid object key {!r}".format(key))
+        return path
+
+    def get_size(self, bucket: str, key: str) -> int:
+        return self._stat(bucket, key).st_size
+
+    def get_etag(self, bucket: str, key: str) -> str:
+        # like many web servers do, avoid hashing the whole file
+        stat_result = self._stat(bucket, key)
+        return '"{:x}-{:x}"'.format(stat_result.st_mtime_ns,
+                                    stat_result.st_size)
+
+    def read_range(self, bucket: str, key: str, start: int,
+                   length: int) -> bytes:
+        with self._open(bucket, key) as fh:
+            fh.seek(start)
+            return fh.read(length)
+
+    def iter_chunks(self, bucket: str, key: str,
+                    chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with self._open(bucket, key) as fh:
+            yield from iter(lambda: fh.read(chunk_size), b"")
+
+    def list_objects(self, bucket: str, prefix: str = "") -> Iterator[str]:
+        bucket_path = self.root / bucket
+        keys = (
+            path.relative_to(bucket_path).as_posix()
+            for path in bucket_path.rglob("*") if path.is_file()
+        )
+        yield from sorted(key for key in keys if key.startswith(prefix))
+
+    def put(self, bucket: str, key: str, data: bytes):
+        path = self.get_path(bucket, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+    def _stat(self, bucket: str, key: str) -> os.stat_result:
+        try:
+            return self.get_path(bucket, key).stat()
+        except FileNotFoundError:
+            raise ObjectNotFoundError("{}/{}".format(bucket, key))
+
+    def _open(self, bucket: str, key: str):
+        try:
+            return self.get_path(bucket, key).open("rb")
+        except FileNotFoundError:
+            raise ObjectNotFoundError("{}/{}".format(bucket, key))
+
+
+class InMemoryObjectStore(ObjectStore):
+    """Keep objects in memory"""
+
+    def __init__(self, objects: dict = None):
+        self.objects = {}  # maps (bucket, key) tuples to bytes
+        for (bucket, key), data in (objects or {}).items():
+            self.put(bucket, key, data)
+
+    def get_size(self, bucket: str, key: str) -> int:
+        return len(self._get(bucket, key))
+
+    def get_etag(self, bucket: str, key: str) -> str:
+        # this is what S3 uses for objects that are not multipart uploads
+        return '"{}"'.format(hashlib.md5(self._get(bucket, key)).hexdigest())
+
+    def read_range(self, bucket: str, key: str, start: int,
+                   length: int) -> bytes:
+        return self._get(bucket, key)[start:start + length]
+
+    def iter_chunks(self, bucket: str, key: str,
+                    chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        data = self._get(bucket, key)
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    def list_objects(self, bucket: str, prefix: str = "") -> Iterator[str]:
+        yield from sorted(
+            key for object_bucket, key in self.objects
+            if object_bucket == bucket and key.startswith(prefix)
+        )
+
+    def put(self, bucket: str, key: str, data: bytes):
+        self.objects[(bucket, key)] = bytes(data)
+
+    def _get(self, bucket: str, key: str) -> bytes:
+        try:
+            return self.objects[(bucket, key)]
+        except KeyError:
+            raise ObjectNotFoundError("{}/{}".format(bucket, key))
+
+
+_default_store = None
+
+
+def get_object_store(url: str = None) -> ObjectStore:
+    """Return an object store
+
+    ``url`` may be one of ``s3://``, ``file:///path/to/root`` or
+    ``memory://``. Without a URL, the default object store is returned.
+
+    >>> get_object_store("file:///tmp/uploads").root.as_posix()
+    '/tmp/uploads'
+    >>> type(get_object_store("memory://")).__name__
+    'InMemoryObjectStore'
+
+    """
+
+    global _default_store
+    if url is None:
+        if _default_store is None:
+            _default_store = S3ObjectStore()
+        return _default_store
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme == "s3":
+        return S3ObjectStore()
+    elif parsed.scheme == "file":
+        return LocalObjectStore(parsed.netloc + parsed.path)
+    elif parsed.scheme == "memory":
+        return InMemoryObjectStore()
+    else:
+        raise ValueError("Unsupported object store URL {!r}".format(url))
+
+
+def set_default_object_store(store: ObjectStore):
+    global _default_store
+    _default_store = store
@@ -0,0 +1,142 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Generation of synthetic track uploads
+
+Points are generated as the smb-app would send them: the device moves along
+a random walk at a speed that depends on the current vehicle mode, and its
+position is sampled every ``sampling_seconds``. Reported positions are
+perturbed with gaussian noise of ``gps_noise`` meters, while the other
+sensors report plausible values with a spread that is scaled by
+``sensor_noise``.
+
+Generated tracks pass the default checks of the ``faas.validation`` module,
+as long as noise is kept low enough for the sampling rate.
+
+"""
+
+import datetime as dt
+import io
+import math
+import random
+import zipfile
+
+from .datareceiver import PointData
+
+START_LONGITUDE = 10.5082121
+START_LATITUDE = 43.8424541
+
+# approximate length of a degree of latitude, in meters
+DEGREE = 111_195
+
+# average speed of each of the smb-app's vehicle modes, in m/s
+VEHICLE_SPEEDS = {
+    "1": 1.4,  # foot
+    "2": 5.0,  # bike
+    "3": 8.0,  # bus
+    "4": 14.0,  # car
+    "5": 9.0,  # moped
+    "6": 25.0,  # train
+}
+
+
+def generate_points(count, session_id=1, start=None, sampling_seconds=1,
+                    vehicle_modes=("2",), gps_noise=2.0, sensor_noise=1.0,
+                    seed=0):
+    """Generate synthetic track points
+
+    Vehicle modes are switched evenly along the track, in the order given by
+    ``vehicle_modes``, which may repeat modes in order to switch more often.
+
+    """
+
+    return list(
+        iter_points(
+            count, session_id=session_id, start=start,
+            sampling_seconds=sampling_seconds, vehicle_modes=vehicle_modes,
+            gps_noise=gps_noise, sensor_noise=sensor_noise, seed=seed
+        )
+    )
+
+
+def iter_points(count, session_id=1, start=None, sampling_seconds=1,
+                vehicle_modes=("2",), gps_noise=2.0, sensor_noise=1.0,
+                seed=0):
+    """Yield the same points as ``generate_points``, one at a time"""
+    rng = random.Random(seed)
+    start = start or dt.datetime(2018, 5, 14, 15, 41, tzinfo=dt.timezone.utc)
+    start_millis = int(start.timestamp() * 1000)
+    longitude = START_LONGITUDE
+    latitude = START_LATITUDE
+    bearing = rng.uniform(0, 360)
+    mode_length = math.ceil(count / len(vehicle_modes))
+    for index in range(count):
+        vehicle_mode = vehicle_modes[index // mode_length]
+        speed = VEHICLE_SPEEDS.get(vehicle_mode, 5.0) * rng.uniform(0.8, 1.2)
+        bearing = (bearing + rng.gauss(0, 10)) % 360
+        meters_per_longitude = DEGREE * math.cos(math.radians(latitude))
+        step = speed * sampling_seconds
+        longitude += step * math.sin(math.radians(bearing)) / (
+            meters_per_longitude)
+        latitude += step * math.cos(math.radians(bearing)) / DEGREE
+        values = {
+            "accelerationX": rng.gauss(0, sensor_noise),
+            "accelerationY": rng.gauss(0, sensor_noise),
+            "accelerationZ": rng.gauss(9.8, sensor_noise),
+            "accuracy": rng.uniform(3, 3 + 12 * sensor_noise),
+            "batConsumptionPerHour": rng.uniform(0, 5),
+            "batteryLevel": 100 - index * 50 / count,
+            "deviceBearing": (bearing + rng.gauss(0, 20 * sensor_noise)) % 360,
+            "devicePitch": rng.uniform(-90, 90),
+            "deviceRoll": rng.uniform(-180, 180),
+            "elevation": 15 + rng.gauss(0, 2 * sensor_noise),
+            "gps_bearing": bearing,
+            "humidity": 50 + rng.gauss(0, 5 * sensor_noise),
+            "latitude": latitude + rng.gauss(0, gps_noise) / DEGREE,
+            "longitude": longitude + rng.gauss(0, gps_noise) / (
+                meters_per_longitude),
+            "lumen": rng.uniform(0, 1000),
+            "pressure": 1010 + rng.gauss(0, 3 * sensor_noise),
+            "proximity": rng.uniform(0, 5),
+            "sessionId": session_id,
+            "speed": max(0.0, speed + rng.gauss(0, sensor_noise)),
+            "temperature": 20 + rng.gauss(0, 2 * sensor_noise),
+            "timeStamp": start_millis + int(
+                index * sampling_seconds * 1000),
+            "vehicleMode": vehicle_mode,
+            "serialVersionUID": 1,
+        }
+        yield PointData(**{name: str(value) for name, value in values.items()})
+
+
+def build_upload(points) -> bytes:
+    """Return a zip archive with track points, as uploaded by the smb-app"""
+    lines = [",".join(PointData._fields)]
+    lines.extend(",".join(point) for point in points)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_handler:
+        zip_handler.writestr("track.csv", "\n".join(lines))
+    return buffer.getvalue()
+
+
+def write_upload(points, path):
+    """Write a zip archive with track points to a file, one line at a time
+
+    Unlike ``build_upload``, this does not keep the points in memory, so it
+    is suitable for very long tracks. ``path`` is a ``pathlib.Path``.
+
+    """
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(str(path), "w", zipfile.ZIP_DEFLATED) as zip_handler:
+        with zip_handler.open("track.csv", "w") as member:
+            member.write(",".join(PointData._fields).encode())
+            for point in points:
+                member.write(b"\n" + ",".join(point).encode())
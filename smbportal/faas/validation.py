@@ -0,0 +1,187 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Validation of track data before it is stored
+
+Validation works on the typed arrays produced by ``faas.columnar`` and each
+check is a handful of vectorized operations over the whole track, so it is
+cheap compared to storing the points and calculating segment data. A track
+is invalid when:
+
+-  it has fewer than ``min_points`` points;
+-  its timestamps go back in time more than ``max_regressions`` times;
+-  for some vehicle type, the speed between consecutive points exceeds the
+   vehicle type's maximum speed for more than ``max_speeding_ratio`` of the
+   time steps with that vehicle type;
+-  it has more than ``max_jumps`` GPS jumps, that is, consecutive points
+   that are more than ``jump_distance`` meters apart and that imply a speed
+   higher than ``jump_speed``, which no vehicle can reach;
+-  the accuracy of more than ``max_inaccurate_ratio`` of its points is
+   worse than ``max_accuracy`` meters.
+
+Speeds are measured in km/h.
+
+"""
+
+from collections import namedtuple
+from typing import List
+
+import numpy as np
+
+from . import columnar
+from ._constants import VehicleType
+
+MIN_POINTS = 10
+
+MAX_REGRESSIONS = 0
+
+# maximum plausible speed of each vehicle type
+MAX_SPEEDS = {
+    VehicleType.foot: 30,
+    VehicleType.bike: 70,
+    VehicleType.bus: 130,
+    VehicleType.car: 250,
+    VehicleType.average_motorbike: 120,
+    VehicleType.train: 400,
+}
+
+# maximum speed of vehicle types not included in ``MAX_SPEEDS``
+DEFAULT_MAX_SPEED = 400
+
+MAX_SPEEDING_RATIO = 0.1
+
+JUMP_DISTANCE = 500  # meters
+
+JUMP_SPEED = 1000
+
+MAX_JUMPS = 2
+
+MAX_ACCURACY = 50  # meters
+
+MAX_INACCURATE_RATIO = 0.5
+
+_EARTH_RADIUS = 6371008.8  # meters
+
+ValidationResult = namedtuple("ValidationResult", [
+    "is_valid",
+    "errors",
+])
+
+
+class InvalidTrackError(RuntimeError):
+
+    def __init__(self, errors: List[str]):
+        super().__init__("Invalid track: {}".format("; ".join(errors)))
+        self.errors = errors
+
+
+def validate(track_data: columnar.TrackColumns,
+             min_points: int = MIN_POINTS,
+             max_regressions: int = MAX_REGRESSIONS,
+             max_speeds: dict = None,
+             max_speeding_ratio: float = MAX_SPEEDING_RATIO,
+             jump_distance: float = JUMP_DISTANCE,
+             jump_speed: float = JUMP_SPEED,
+             max_jumps: int = MAX_JUMPS,
+             max_accuracy: float = MAX_ACCURACY,
+             max_inaccurate_ratio: float = MAX_INACCURATE_RATIO
+             ) -> ValidationResult:
+    """Check whether track data is plausible
+
+    ``max_speeds`` maps ``VehicleType`` members to speeds, in km/h. It
+    defaults to ``MAX_SPEEDS``. Vehicle types not included in it use
+    ``DEFAULT_MAX_SPEED``.
+
+    """
+
+    max_speeds = MAX_SPEEDS if max_speeds is None else max_speeds
+    num_points = columnar.get_num_points(track_data)
+    if num_points < min_points:
+        return ValidationResult(False, [
+            "too few points: {} (at least {} are required)".format(
+                num_points, min_points)
+        ])
+    errors = []
+    milliseconds = np.diff(track_data["timeStamp"].astype(np.int64))
+    num_regressions = int(np.count_nonzero(milliseconds < 0))
+    if num_regressions > max_regressions:
+        errors.append(
+            "timestamps go back in time {} times".format(num_regressions))
+    distances = get_step_distances(
+        track_data["longitude"], track_data["latitude"])
+    speeds = np.full(num_points - 1, np.nan)
+    moving = milliseconds > 0
+    speeds[moving] = distances[moving] / milliseconds[moving] * 3600
+    errors.extend(
+        _check_speeds(
+            speeds, track_data["vehicleMode"][1:], max_speeds,
+            max_speeding_ratio
+        )
+    )
+    is_jump = (distances > jump_distance) & ~(speeds <= jump_speed)
+    num_jumps = int(np.count_nonzero(is_jump))
+    if num_jumps > max_jumps:
+        errors.append(
+            "{} GPS jumps of more than {} m".format(num_jumps, jump_distance))
+    inaccurate_ratio = np.count_nonzero(
+        track_data["accuracy"] > max_accuracy) / num_points
+    if inaccurate_ratio > max_inaccurate_ratio:
+        errors.append(
+            "accuracy is worse than {} m for {:.0%} of points".format(
+                max_accuracy, inaccurate_ratio)
+        )
+    return ValidationResult(len(errors) == 0, errors)
+
+
+def get_step_distances(longitudes: np.ndarray,
+                       latitudes: np.ndarray) -> np.ndarray:
+    """Return the distance between consecutive points, in meters
+
+    >>> get_step_distances(np.array([0., 0, 1]), np.array([0., 1, 1])).round()
+    array([111195., 111178.])
+
+    """
+
+    longitudes = np.radians(longitudes)
+    latitudes = np.radians(latitudes)
+    half_chord = (
+        np.sin(np.diff(latitudes) / 2) ** 2 +
+        np.cos(latitudes[:-1]) * np.cos(latitudes[1:]) *
+        np.sin(np.diff(longitudes) / 2) ** 2
+    )
+    return 2 * _EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(half_chord, 0, 1)))
+
+
+def _check_speeds(speeds: np.ndarray, vehicle_modes: np.ndarray,
+                  max_speeds: dict, max_speeding_ratio: float) -> List[str]:
+    """Check the speed of the time steps of each vehicle type
+
+    ``vehicle_modes`` holds the vehicle type code of each time step.
+
+    """
+
+    errors = []
+    measured = ~np.isnan(speeds)
+    for code in np.unique(vehicle_modes[measured]).tolist():
+        vehicle_type = VehicleType(code) if code != 0 else None
+        max_speed = max_speeds.get(vehicle_type, DEFAULT_MAX_SPEED)
+        steps = measured & (vehicle_modes == code)
+        speeding_ratio = np.count_nonzero(
+            speeds[steps] > max_speed) / np.count_nonzero(steps)
+        if speeding_ratio > max_speeding_ratio:
+            errors.append(
+                "speed exceeds {} km/h for {} during {:.0%} of the "
+                "track".format(
+                    max_speed,
+                    vehicle_type.name if vehicle_type else "unknown vehicle",
+                    speeding_ratio
+                )
+            )
+    return errors
@@ -0,0 +1,701 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Concurrent ingestion of queued track uploads
+
+An ``IngestionWorker`` claims ``(bucket, object_key)`` jobs from a job queue
+and hands them over to a pool of processes, each of which calls
+``datareceiver.handle_track_upload`` using its own database connection pool.
+Parsing track data is CPU-bound while downloading it and writing it to the
+database is I/O-bound, so running more processes than there are CPUs lets
+the I/O of some jobs overlap with the parsing of others.
+
+Backpressure is achieved by never claiming more than ``max_in_flight`` jobs at
+a time: jobs that are not yet claimed stay in the queue, where other workers
+may pick them up.
+
+A ``RetryScheduler`` retries the ingestions that were recorded in the failure
+store (see the ``faas.failures`` module) once their next attempt is due.
+
+The ``PostgresJobQueue`` stores jobs in the ``tracks_ingestionjob`` table.
+Jobs are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of
+workers may drain the same table concurrently. Jobs whose worker died while
+processing them are claimed again once ``visibility_timeout`` has elapsed
+since their processing started, up to ``max_attempts`` times. If a worker
+process dies, the jobs of the broken process pool are queued again and a new
+pool is started.
+
+"""
+
+from collections import deque
+from collections import namedtuple
+from concurrent import futures
+from concurrent.futures.process import BrokenProcessPool
+import datetime as dt
+import logging
+import signal
+import threading
+import time
+from typing import List
+
+import pytz
+
+from . import datareceiver
+from . import failures
+from . import metrics
+from . import queries
+
+logger = logging.getLogger(__name__)
+
+Job = namedtuple("Job", [
+    "id",
+    "bucket",
+    "object_key",
+    "enqueued_at",
+    "attempts",
+])
+
+JobResult = namedtuple("JobResult", [
+    "track_id",
+    "processing_seconds",
+    "metrics",
+])
+
+WorkerStats = namedtuple("WorkerStats", [
+    "processed",
+    "failed",
+    "in_flight",
+    "elapsed_seconds",
+    "jobs_per_second",
+    "latency_p50",
+    "latency_p95",
+    "latency_p99",
+    "processing_p50",
+    "processing_p95",
+    "processing_p99",
+])
+
+# number of recent jobs considered when calculating latency percentiles
+LATENCY_WINDOW = 1000
+
+# number of times a job may be claimed before it is given up
+MAX_JOB_ATTEMPTS = 5
+
+
+class PostgresJobQueue(object):
+    """A durable job queue backed by the ``tracks_ingestionjob`` table
+
+    :arg db_connection: database connection used exclusively by the queue
+    :arg visibility_timeout: number of seconds after which a job that is
+        still being processed may be claimed again
+    :arg max_attempts: number of times a job may be claimed. Jobs that are
+        still not finished by then are marked as dead
+
+    """
+
+    def __init__(self, db_connection, visibility_timeout: float = 15 * 60,
+                 max_attempts: int = MAX_JOB_ATTEMPTS):
+        self.db_connection = db_connection
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+
+    def put(self, bucket: str, object_key: str) -> int:
+        with self.db_connection:
+            with self.db_connection.cursor() as cursor:
+                queries.registry.execute(
+                    cursor,
+                    "enqueue-ingestion-job.sql",
+                    {"bucket": bucket, "object_key": object_key}
+                )
+                return cursor.fetchone()[0]
+
+    def claim(self, limit: int) -> List[Job]:
+        """Mark up to ``limit`` jobs as being processed and return them"""
+        with self.db_connection:
+            with self.db_connection.cursor() as cursor:
+                queries.registry.execute(
+                    cursor,
+                    "claim-ingestion-jobs.sql",
+                    {
+                        "limit": limit,
+                        "visibility_timeout": self.visibility_timeout,
+                        "max_attempts": self.max_attempts,
+                    }
+                )
+                jobs = [Job(*row) for row in cursor.fetchall()]
+        return sorted(jobs, key=lambda job: job.id)
+
+    def start(self, jobs: List[Job]):
+        """Restart the visibility timeout of jobs whose processing started"""
+        self._update_jobs("start-ingestion-jobs.sql", jobs)
+
+    def release(self, jobs: List[Job]):
+        """Queue jobs again, without waiting for their visibility timeout"""
+        self._update_jobs("release-ingestion-jobs.sql", jobs)
+
+    def complete(self, job: Job, track_id: int = None):
+        self._finish(job, "done", track_id=track_id)
+
+    def fail(self, job: Job, error: str):
+        self._finish(job, "failed", error=error)
+
+    def pending_count(self) -> int:
+        with self.db_connection:
+            with self.db_connection.cursor() as cursor:
+                queries.registry.execute(
+                    cursor, "count-pending-ingestion-jobs.sql")
+                return cursor.fetchone()[0]
+
+    def _update_jobs(self, query_filename: str, jobs: List[Job]):
+        with self.db_connection:
+            with self.db_connection.cursor() as cursor:
+                queries.registry.execute(
+                    cursor,
+                    query_filename,
+                    {"job_ids": [job.id for job in jobs]}
+                )
+
+    def _finish(self, job: Job, status: str, track_id: int = None,
+                error: str = ""):
+        with self.db_connection:
+            with self.db_connection.cursor() as cursor:
+                queries.registry.execute(
+                    cursor,
+                    "finish-ingestion-job.sql",
+                    {
+                        "job_id": job.id,
+                        "status": status,
+                        "track_id": track_id,
+                        "error": error,
+                    }
+                )
+
+
+class InMemoryJobQueue(object):
+    """A non-durable job queue, useful for testing and for one-off runs"""
+
+    def __init__(self, max_attempts: int = MAX_JOB_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self.pending = deque()
+        self.processing = {}
+        self.done = {}
+        self.failed = {}
+        self.dead = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def put(self, bucket: str, object_key: str) -> int:
+        with self._lock:
+            job = Job(
+                id=self._next_id,
+                bucket=bucket,
+                object_key=object_key,
+                enqueued_at=dt.datetime.now(pytz.utc),
+                attempts=0
+            )
+            self._next_id += 1
+            self.pending.append(job)
+        return job.id
+
+    def claim(self, limit: int) -> List[Job]:
+        jobs = []
+        with self._lock:
+            while len(self.pending) > 0 and len(jobs) < limit:
+                job = self.pending.popleft()
+                if job.attempts >= self.max_attempts:
+                    self.dead[job.id] = (
+                        job, "Gave up after {} attempts".format(job.attempts))
+                    continue
+                job = job._replace(attempts=job.attempts + 1)
+                self.processing[job.id] = job
+                jobs.append(job)
+        return jobs
+
+    def start(self, jobs: List[Job]):
+        pass
+
+    def release(self, jobs: List[Job]):
+        with self._lock:
+            for job in reversed(jobs):
+                self.pending.appendleft(self.processing.pop(job.id))
+
+    def complete(self, job: Job, track_id: int = None):
+        with self._lock:
+            self.done[job.id] = self.processing.pop(job.id), track_id
+
+    def fail(self, job: Job, error: str):
+        with self._lock:
+            self.failed[job.id] = self.processing.pop(job.id), error
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self.pending)
+
+
+# connection pool of the current worker process, set by `_init_process`
+_connection_pool = None
+
+
+def _init_process(db_settings: dict):
+    global _connection_pool
+    # a Ctrl-C in the terminal reaches every process of the group, but only
+    # the parent should react to it, after letting in-flight jobs finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _connection_pool = datareceiver.get_db_connection_pool(**db_settings)
+
+
+def process_job(job: Job, options: datareceiver.IngestionOptions = None,
+                object_store=None) -> JobResult:
+    """Ingest the track upload referenced by a job
+
+    This runs inside a worker process, using the process' connection pool.
+    The ingestion's metrics are returned to the parent process, which sends
+    them to its own metrics sinks. The metrics of failed ingestions are sent
+    to the worker process' sinks instead.
+
+    """
+
+    start = time.perf_counter()
+    collector = metrics.InMemorySink()
+    try:
+        track_id = datareceiver.handle_track_upload(
+            job.bucket,
+            job.object_key,
+            _connection_pool,
+            options=options,
+            object_store=object_store,
+            metrics_sinks=[collector]
+        )
+    except Exception:
+        for record in collector.records:
+            metrics.emit(record)
+        raise
+    return JobResult(
+        track_id=track_id,
+        processing_seconds=time.perf_counter() - start,
+        metrics=collector.records[0] if collector.records else None
+    )
+
+
+class IngestionWorker(object):
+    """Drain a job queue by ingesting its track uploads in a process pool
+
+    :arg job_queue: queue to claim jobs from, such as a ``PostgresJobQueue``
+    :arg db_settings: keyword arguments for
+        ``datareceiver.get_db_connection_pool``, which is called once in each
+        worker process
+    :arg num_processes: number of worker processes
+    :arg max_in_flight: maximum number of jobs that are claimed but not yet
+        finished. Defaults to twice the number of processes, so that each
+        process has a job waiting as soon as it finishes the current one
+    :arg poll_interval: number of seconds to wait before checking an empty
+        queue again
+    :arg options: ``datareceiver.IngestionOptions`` of the ingestions
+    :arg object_store: store that track uploads are read from. Defaults to
+        the store returned by ``storage.get_object_store``
+    :arg executor: executor used for processing jobs. Defaults to a
+        ``concurrent.futures.ProcessPoolExecutor``. Process pools that break
+        because one of their processes died are replaced with a new one
+
+    """
+
+    def __init__(self, job_queue, db_settings: dict, num_processes: int = 4,
+                 max_in_flight: int = None, poll_interval: float = 5,
+                 options: datareceiver.IngestionOptions = None,
+                 object_store=None, executor=None):
+        if num_processes < 1:
+            raise ValueError("num_processes must be at least 1")
+        self.job_queue = job_queue
+        self.db_settings = db_settings
+        self.num_processes = num_processes
+        self.max_in_flight = max_in_flight or 2 * num_processes
+        self.poll_interval = poll_interval
+        self.options = options or datareceiver.IngestionOptions()
+        self.object_store = object_store
+        self.executor = executor
+        self._stop_event = threading.Event()
+        self._in_flight = {}  # maps futures to (job, claim time) tuples
+        self._not_started = set()  # futures that are waiting for a process
+        self._processed = 0
+        self._failed = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._processing_times = deque(maxlen=LATENCY_WINDOW)
+        self._started_at = None
+        self._lock = threading.Lock()
+
+    def run(self, stop_when_empty: bool = False,
+            handle_signals: bool = True) -> WorkerStats:
+        """Process jobs until ``stop()`` is called
+
+        If ``stop_when_empty`` is true, the worker also stops once the queue
+        is empty and all claimed jobs have been processed. If
+        ``handle_signals`` is true, SIGINT and SIGTERM stop the worker
+        gracefully, that is, after finishing any in-flight jobs.
+
+        """
+
+        self._stop_event.clear()
+        self._started_at = time.monotonic()
+        previous_handlers = self._install_signal_handlers(handle_signals)
+        executor = self.executor or self._create_executor()
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    claimed = self._claim_jobs(executor)
+                except BrokenProcessPool:
+                    executor = self._replace_executor(executor)
+                    continue
+                if len(self._in_flight) == 0:
+                    if stop_when_empty and claimed == 0:
+                        break
+                    self._stop_event.wait(self.poll_interval)
+                else:
+                    done, _ = futures.wait(
+                        list(self._in_flight),
+                        timeout=self.poll_interval,
+                        return_when=futures.FIRST_COMPLETED
+                    )
+                    self._start_jobs()
+                    if self._finish_jobs(done):
+                        executor = self._replace_executor(executor)
+            logger.info("Waiting for {} in-flight jobs to finish...".format(
+                len(self._in_flight)))
+            while len(self._in_flight) > 0:
+                done, _ = futures.wait(
+                    list(self._in_flight),
+                    return_when=futures.FIRST_COMPLETED
+                )
+                self._start_jobs()
+                self._finish_jobs(done)
+        finally:
+            if executor is not self.executor:
+                executor.shutdown(wait=True)
+            self._restore_signal_handlers(previous_handlers)
+        stats = self.get_stats()
+        logger.info("Ingestion worker stopped: {}".format(stats))
+        return stats
+
+    def stop(self, *args):
+        """Stop claiming new jobs and exit once in-flight jobs are done"""
+        logger.info("Stopping ingestion worker...")
+        self._stop_event.set()
+
+    def get_stats(self) -> WorkerStats:
+        with self._lock:
+            elapsed = (
+                0 if self._started_at is None
+                else time.monotonic() - self._started_at
+            )
+            finished = self._processed + self._failed
+            latencies = sorted(self._latencies)
+            processing_times = sorted(self._processing_times)
+            return WorkerStats(
+                processed=self._processed,
+                failed=self._failed,
+                in_flight=len(self._in_flight),
+                elapsed_seconds=elapsed,
+                jobs_per_second=finished / elapsed if elapsed > 0 else 0,
+                latency_p50=_percentile(latencies, 50),
+                latency_p95=_percentile(latencies, 95),
+                latency_p99=_percentile(latencies, 99),
+                processing_p50=_percentile(processing_times, 50),
+                processing_p95=_percentile(processing_times, 95),
+                processing_p99=_percentile(processing_times, 99),
+            )
+
+    def _create_executor(self) -> futures.Executor:
+        return futures.ProcessPoolExecutor(
+            max_workers=self.num_processes,
+            initializer=_init_process,
+            initargs=(self.db_settings,)
+        )
+
+    def _replace_executor(self, executor) -> futures.Executor:
+        """Replace a process pool that broke because a process died
+
+        Every job of a broken pool is done, either with its result or with
+        ``BrokenProcessPool``, in which case it is queued again.
+
+        """
+
+        logger.error(
+            "A worker process terminated abruptly, restarting the process "
+            "pool...")
+        if executor is not self.executor:
+            executor.shutdown(wait=True)
+        self._start_jobs()
+        self._finish_jobs(list(self._in_flight))
+        return self._create_executor()
+
+    def _claim_jobs(self, executor) -> int:
+        free_slots = self.max_in_flight - len(self._in_flight)
+        if free_slots <= 0:
+            return 0
+        jobs = self.job_queue.claim(free_slots)
+        for index, job in enumerate(jobs):
+            logger.debug("Submitting job {}...".format(job.id))
+            try:
+                future = executor.submit(
+                    process_job, job, self.options, self.object_store)
+            except BrokenProcessPool:
+                self.job_queue.release(jobs[index:])
+                raise
+            with self._lock:
+                self._in_flight[future] = job, time.monotonic()
+            self._not_started.add(future)
+        self._start_jobs()
+        return len(jobs)
+
+    def _start_jobs(self):
+        """Let the queue know about the jobs whose processing started"""
+        started = [
+            future for future in self._not_started
+            if future.running() or future.done()
+        ]
+        if len(started) > 0:
+            self._not_started.difference_update(started)
+            self.job_queue.start(
+                [self._in_flight[future][0] for future in started])
+
+    def _finish_jobs(self, done_futures) -> bool:
+        """Finish processed jobs
+
+        Returns whether any of the jobs was interrupted because the process
+        pool broke, in which case they are queued again.
+
+        """
+
+        broken = False
+        for future in done_futures:
+            with self._lock:
+                job, claimed_at = self._in_flight.pop(future)
+            self._not_started.discard(future)
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                logger.warning(
+                    "Processing of job {} was interrupted, queueing it "
+                    "again...".format(job.id))
+                self.job_queue.release([job])
+                broken = True
+                continue
+            except Exception as exc:
+                logger.exception("Could not ingest {}/{}".format(
+                    job.bucket, job.object_key))
+                self.job_queue.fail(job, "{}: {}".format(
+                    type(exc).__name__, exc))
+                with self._lock:
+                    self._failed += 1
+            else:
+                self.job_queue.complete(job, track_id=result.track_id)
+                if result.metrics is not None:
+                    metrics.emit(result.metrics)
+                with self._lock:
+                    self._processed += 1
+                    self._processing_times.append(result.processing_seconds)
+            with self._lock:
+                self._latencies.append(time.monotonic() - claimed_at)
+        return broken
+
+    def _install_signal_handlers(self, handle_signals: bool) -> dict:
+        return _install_signal_handlers(self.stop, handle_signals)
+
+    @staticmethod
+    def _restore_signal_handlers(previous_handlers: dict):
+        _restore_signal_handlers(previous_handlers)
+
+
+RetryStats = namedtuple("RetryStats", [
+    "resolved",
+    "failed",
+    "in_flight",
+    "elapsed_seconds",
+])
+
+
+class RetryScheduler(object):
+    """Retry failed ingestions once they are due, with bounded concurrency
+
+    Retries call ``datareceiver.handle_track_upload`` with the scheduler's
+    retry policy, so a retry that fails again is recorded in the failure
+    store and rescheduled with a longer delay, or becomes a dead letter.
+
+    :arg db_settings: keyword arguments for
+        ``datareceiver.get_db_connection_pool``
+    :arg policy: retry policy of the failures that are retried
+    :arg max_concurrency: maximum number of retries that run at the same
+        time. Failures are only claimed when a slot is free, so that a large
+        backlog of failures does not overwhelm the database once it recovers
+    :arg poll_interval: number of seconds to wait before checking for due
+        failures again
+    :arg lease_seconds: number of seconds after which a failure that is
+        still being retried may be claimed again
+    :arg options: ``datareceiver.IngestionOptions`` of the retries, whose
+        retry policy is replaced by ``policy``
+    :arg object_store: store that track uploads are read from. Defaults to
+        the store returned by ``storage.get_object_store``
+    :arg connection_pool: pool of database connections. Defaults to a pool
+        created with ``db_settings``
+
+    """
+
+    def __init__(self, db_settings: dict = None,
+                 policy: failures.RetryPolicy = failures.DEFAULT_RETRY_POLICY,
+                 max_concurrency: int = 4, poll_interval: float = 5,
+                 lease_seconds: float = 15 * 60,
+                 options: datareceiver.IngestionOptions = None,
+                 object_store=None, connection_pool=None):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.policy = policy
+        self.max_concurrency = max_concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.options = (
+            options or datareceiver.IngestionOptions()).replace(
+                retry_policy=policy)
+        self.object_store = object_store
+        # one more connection than retries, for claiming failures
+        self.connection_pool = (
+            connection_pool or datareceiver.get_db_connection_pool(
+                max_size=max_concurrency + 1, **db_settings)
+        )
+        self._stop_event = threading.Event()
+        self._in_flight = {}  # maps futures to failures
+        self._resolved = 0
+        self._failed = 0
+        self._started_at = None
+
+    def run(self, stop_when_idle: bool = False,
+            handle_signals: bool = True) -> RetryStats:
+        """Retry due failures until ``stop()`` is called
+
+        If ``stop_when_idle`` is true, the scheduler also stops once no
+        failures are due and all claimed failures have been retried. If
+        ``handle_signals`` is true, SIGINT and SIGTERM stop the scheduler
+        gracefully, that is, after finishing any in-flight retries.
+
+        """
+
+        self._stop_event.clear()
+        self._started_at = time.monotonic()
+        previous_handlers = _install_signal_handlers(
+            self.stop, handle_signals)
+        try:
+            with futures.ThreadPoolExecutor(
+                    max_workers=self.max_concurrency) as executor:
+                while not self._stop_event.is_set():
+                    claimed = self._claim_failures(executor)
+                    if len(self._in_flight) == 0:
+                        if stop_when_idle and claimed == 0:
+                            break
+                        self._stop_event.wait(self.poll_interval)
+                    else:
+                        done, _ = futures.wait(
+                            list(self._in_flight),
+                            timeout=self.poll_interval,
+                            return_when=futures.FIRST_COMPLETED
+                        )
+                        self._finish_retries(done)
+                self._finish_retries(
+                    futures.as_completed(list(self._in_flight)))
+        finally:
+            _restore_signal_handlers(previous_handlers)
+        stats = self.get_stats()
+        logger.info("Retry scheduler stopped: {}".format(stats))
+        return stats
+
+    def stop(self, *args):
+        """Stop claiming failures and exit once in-flight retries are done"""
+        logger.info("Stopping retry scheduler...")
+        self._stop_event.set()
+
+    def get_stats(self) -> RetryStats:
+        return RetryStats(
+            resolved=self._resolved,
+            failed=self._failed,
+            in_flight=len(self._in_flight),
+            elapsed_seconds=(
+                0 if self._started_at is None
+                else time.monotonic() - self._started_at
+            )
+        )
+
+    def _claim_failures(self, executor) -> int:
+        free_slots = self.max_concurrency - len(self._in_flight)
+        if free_slots <= 0:
+            return 0
+        with self.connection_pool.connection() as connection:
+            due = failures.claim_due_failures(
+                free_slots, connection, lease_seconds=self.lease_seconds)
+        for failure in due:
+            logger.debug("Retrying {}/{} after {} attempts...".format(
+                failure.bucket, failure.object_key, failure.attempts))
+            future = executor.submit(
+                datareceiver.handle_track_upload,
+                failure.bucket,
+                failure.object_key,
+                self.connection_pool,
+                options=self.options,
+                object_store=self.object_store
+            )
+            self._in_flight[future] = failure
+        return len(due)
+
+    def _finish_retries(self, done_futures):
+        for future in done_futures:
+            failure = self._in_flight.pop(future)
+            try:
+                track_id = future.result()
+            except Exception:
+                logger.exception("Retry of {}/{} failed".format(
+                    failure.bucket, failure.object_key))
+                self._failed += 1
+            else:
+                if track_id is None:
+                    # the upload is being ingested by someone else, as
+                    # reported by the ledger: leave it until its lease expires
+                    continue
+                with self.connection_pool.connection() as connection:
+                    failures.resolve_failure(
+                        failure.id, connection, track_id=track_id)
+                self._resolved += 1
+
+
+def _install_signal_handlers(handler, handle_signals: bool) -> dict:
+    previous = {}
+    is_main_thread = threading.current_thread() is threading.main_thread()
+    if handle_signals and is_main_thread:
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            previous[signal_number] = signal.signal(signal_number, handler)
+    return previous
+
+
+def _restore_signal_handlers(previous_handlers: dict):
+    for signal_number, handler in previous_handlers.items():
+        signal.signal(signal_number, handler)
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Return the nearest-rank percentile of a sorted list of values
+
+    >>> _percentile([1, 2, 3, 4], 50)
+    2
+    >>> _percentile([1, 2, 3, 4], 99)
+    4
+    >>> _percentile([], 50) is None
+    True
+
+    """
+
+    if len(sorted_values) == 0:
+        return None
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
@@ -12,6 +12,7 @@ import logging
 import pytz
 from datetime import datetime as dt
 
+from django.db.models import F
 from rest_framework.decorators import action
 from rest_framework import (
     mixins,
@@ -20,6 +21,8 @@ from rest_framework import (
 from rest_framework import status
 from rest_framework.response import Response
 
+from base.conditional import ConditionalGetMixin
+
 from .. import models
 from .. import utils
 from . import serializers
@@ -30,12 +33,32 @@ logger = logging.getLogger(__name__)
 # FIXME: account for different user profiles
 
 
-class CompetitionViewSet(viewsets.ReadOnlyModelViewSet):
+class CompetitionViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = serializers.CompetitionDetailSerializer
     queryset = models.Competition.objects.all()
     required_permissions = (
         "profiles.can_list_competitions",
     )
+    version_fields = ("pk", "start_date", "end_date")
+
+    def get_version_queryset(self):
+        return models.Competition.objects.annotate(
+            last_modified=F("updated_at"))
+
+    def get_object_version(self):
+        competition = self.get_version_object()
+        # the leaderboard of open competitions is computed on the fly
+        return None if competition.is_open() else competition.last_modified
+
+    def get_collection_version(self):
+        now = dt.now(pytz.utc)
+        open_competitions = self.get_version_queryset().filter(
+            start_date__lt=now, end_date__gte=now)
+        if open_competitions.exists():
+            result = None
+        else:
+            result = super().get_collection_version()
+        return result
 
     def get_serializer_class(self):
         if self.action in ["list", "current_competitions"]:
@@ -9,7 +9,34 @@
 #########################################################################
 
 from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete
 
 
 class PrizesConfig(AppConfig):
     name = "prizes"
+
+    def ready(self):
+        from . import models
+        from . import signals
+        for model in (models.Sponsor, models.Prize, models.CompetitionPrize,
+                      models.Winner):
+            for signal in (post_save, pre_delete):
+                signal.connect(
+                    signals.touch_competitions,
+                    sender=model,
+                    dispatch_uid="touch_competitions_{}".format(
+                        model.__name__)
+                )
+        m2m_changed.connect(
+            signals.touch_sponsored_competitions,
+            sender=models.Competition.sponsors.through,
+            dispatch_uid="touch_sponsored_competitions"
+        )
+        post_save.connect(
+            signals.touch_leaderboard_competitions,
+            sender=get_user_model(),
+            dispatch_uid="touch_leaderboard_competitions"
+        )
@@ -0,0 +1,20 @@
+# Generated by Django 2.0 on 2026-10-18 18:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prizes', '0014_competition_regions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='competition',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='updated at'),
+            preserve_default=False,
+        ),
+    ]
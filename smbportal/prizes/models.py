@@ -252,6 +252,10 @@ class Competition(models.Model):
             "Winners are assigned from the score in this leaderboard"
         )
     )
+    updated_at = models.DateTimeField(
+        _("updated at"),
+        auto_now=True,
+    )
     sponsors = models.ManyToManyField(
         "Sponsor",
         blank=True,
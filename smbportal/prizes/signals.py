@@ -0,0 +1,90 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Keep the modification date of competitions up to date
+
+The API representation of a competition includes its prizes, sponsors,
+winners and the usernames of its leaderboard. Whenever any of those
+changes, the ``updated_at`` date of the affected competitions is bumped,
+so that clients do not keep cached representations (see
+``base.conditional``).
+
+"""
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import models
+
+
+def touch_competitions(sender, instance, **kwargs):
+    """Bump the modification date of competitions that show ``instance``
+
+    This is connected to ``pre_delete`` as well, since the related rows are
+    gone by the time ``post_delete`` is sent.
+
+    """
+
+    if sender == models.Sponsor:
+        competitions = models.Competition.objects.filter(
+            Q(sponsors=instance) |
+            Q(competitionprize__prize__sponsor=instance)
+        )
+    elif sender == models.Prize:
+        competitions = models.Competition.objects.filter(
+            competitionprize__prize=instance)
+    elif sender == models.CompetitionPrize:
+        competitions = models.Competition.objects.filter(
+            pk=instance.competition_id)
+    elif sender == models.Winner:
+        competitions = models.Competition.objects.filter(
+            competitionparticipant=instance.participant_id)
+    else:
+        competitions = models.Competition.objects.none()
+    _touch(competitions)
+
+
+def touch_sponsored_competitions(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    """Bump the modification date of competitions whose sponsors changed"""
+    if not reverse and action in ("post_add", "post_remove", "post_clear"):
+        competitions = models.Competition.objects.filter(pk=instance.pk)
+    elif reverse and action in ("post_add", "post_remove"):
+        competitions = models.Competition.objects.filter(pk__in=pk_set)
+    elif reverse and action == "pre_clear":
+        competitions = models.Competition.objects.filter(sponsors=instance)
+    else:
+        competitions = models.Competition.objects.none()
+    _touch(competitions)
+
+
+def touch_leaderboard_competitions(sender, instance, update_fields=None,
+                                   **kwargs):
+    """Bump the modification date of competitions that list a user
+
+    Only the closing leaderboard is considered, since competitions that are
+    still open are not cached.
+
+    """
+
+    if update_fields is None or "username" in update_fields:
+        _touch(
+            models.Competition.objects.filter(
+                closing_leaderboard__contains=[{"user": instance.pk}])
+        )
+
+
+def _touch(competitions):
+    # distinct rows cannot be updated, so filter by primary key instead
+    models.Competition.objects.filter(
+        pk__in=competitions.values("pk")
+    ).update(
+        updated_at=timezone.now()
+    )
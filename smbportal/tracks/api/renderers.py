@@ -0,0 +1,65 @@
+#########################################################################
+#
+# Copyright 2019, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from collections import namedtuple
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+
+from .. import polyline
+
+PolylineOptions = namedtuple("PolylineOptions", [
+    "precision",
+    "timestamps",
+])
+
+
+class PolylineJSONRenderer(JSONRenderer):
+    """Render JSON where segment geometries are encoded polylines
+
+    This renderer is selected with the ``format=polyline`` query parameter
+    or by accepting its media type.
+
+    """
+
+    media_type = "application/vnd.smb.polyline+json"
+    format = "polyline"
+
+
+def get_polyline_options(request):
+    """Return how geometries are to be encoded as polylines
+
+    The ``precision`` query parameter sets the number of decimal digits of
+    encoded coordinates and ``timestamps=true`` requests the delta-encoded
+    timestamps of each vertex as well.
+
+    Returns ``None`` if the polyline renderer was not selected.
+
+    """
+
+    renderer = getattr(request, "accepted_renderer", None)
+    if not isinstance(renderer, PolylineJSONRenderer):
+        return None
+    precision = request.query_params.get(
+        "precision", polyline.DEFAULT_PRECISION)
+    try:
+        precision = int(precision)
+    except ValueError:
+        precision = None
+    if precision is None or not 0 <= precision <= polyline.MAX_PRECISION:
+        raise ValidationError({
+            "precision": "must be an integer between 0 and {}".format(
+                polyline.MAX_PRECISION)
+        })
+    timestamps = request.query_params.get("timestamps", "").lower()
+    return PolylineOptions(
+        precision=precision,
+        timestamps=timestamps in ("1", "true", "yes"),
+    )
@@ -18,6 +18,7 @@ from rest_framework import serializers
 
 from profiles.api.fields import SmbUserHyperlinkedRelatedField
 from .. import models
+from .. import polyline
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +38,12 @@ class TrackListSerializer(serializers.ModelSerializer):
     length_meters = serializers.FloatField(source="length")
 
     def get_vehicle_types(self, obj):
-        unique_types = set(obj.segments.values_list("vehicle_type", flat=True))
+        try:
+            # annotated by the track viewsets' queryset
+            unique_types = obj.vehicle_types
+        except AttributeError:
+            unique_types = set(
+                obj.segments.values_list("vehicle_type", flat=True))
         return list(unique_types)
 
     def get_segments(self, obj):
@@ -186,8 +192,42 @@ class SegmentSerializer(serializers.ModelSerializer):
         read_only=True
     )
 
+    def to_representation(self, instance):
+        result = super().to_representation(instance)
+        polyline_options = self.context.get("polyline")
+        if polyline_options is not None and polyline_options.timestamps:
+            result["timestamps"] = self._get_encoded_timestamps(instance)
+        return result
+
     def get_geom(self, obj):
-        return obj.geom.geojson
+        geom = self._get_geometry(obj)
+        polyline_options = self.context.get("polyline")
+        if polyline_options is None:
+            result = geom.geojson
+        else:
+            result = polyline.encode(geom.coords, polyline_options.precision)
+        return result
+
+    def _get_geometry(self, obj):
+        geom = getattr(obj, "simplified_geom", None)
+        return geom if geom is not None else obj.geom
+
+    def _get_encoded_timestamps(self, obj):
+        """Return the delta-encoded timestamps of the segment's vertices
+
+        Timestamps are in milliseconds since the epoch. They are ``None``
+        when they do not match the vertices, e.g. because the segment's
+        collected points have been compacted.
+
+        """
+
+        timestamps = getattr(obj, "vertex_timestamps", None)
+        if (timestamps is None or
+                len(timestamps) != self._get_geometry(obj).num_points):
+            result = None
+        else:
+            result = polyline.encode_values(timestamps)
+        return result
 
     def get_emissions(self, obj):
         try:
@@ -9,12 +9,32 @@
 #########################################################################
 
 import logging
+import math
 
+from django.contrib.gis.db.models import LineStringField
+from django.contrib.gis.db.models.functions import GeoFunc
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Prefetch
+from django.db.models import Q
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import BigIntegerField
+from django.db.models import F
+from django.db.models import Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins
 from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from base.conditional import ConditionalGetMixin
+from base.pagination import CursorPagination
+from faas import simplification
 
 from .. import models
+from . import renderers
 from . import serializers
 
 logger = logging.getLogger(__name__)
@@ -23,7 +43,188 @@ logger = logging.getLogger(__name__)
 # FIXME: account for different user profiles
 
 
-class MySegmentViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
+SIMPLIFIED_GEOMETRY_FIELDS = tuple(
+    "geom_z{}".format(zoom) for zoom in simplification.ZOOM_LEVELS)
+
+# timestamps of the collected points that make up a segment's geometry, in
+# milliseconds since the epoch
+VERTEX_TIMESTAMPS_SQL = """
+SELECT array_agg(
+  (extract(epoch FROM p.timestamp) * 1000)::bigint ORDER BY p.timestamp
+)
+FROM tracks_collectedpoint AS p
+WHERE p.track_id = tracks_segment.track_id
+  AND p.timestamp BETWEEN tracks_segment.start_date AND tracks_segment.end_date
+"""
+
+
+class SimplifyPreserveTopology(GeoFunc):
+    function = "ST_SimplifyPreserveTopology"
+
+
+def get_simplified_geometry(request):
+    """Return the segment geometry requested by the query parameters
+
+    The ``zoom`` parameter requests geometries simplified for maps at that
+    zoom level, which are read from the precomputed ``geom_z<zoom level>``
+    fields whenever one is available. The ``simplify`` parameter requests
+    geometries simplified with an arbitrary tolerance, in meters.
+
+    Returns ``None`` when neither parameter is present.
+
+    """
+
+    zoom = request.query_params.get("zoom")
+    tolerance = request.query_params.get("simplify")
+    if zoom is not None and tolerance is not None:
+        raise ValidationError(
+            "zoom and simplify cannot be used at the same time")
+    if zoom is not None:
+        try:
+            zoom = int(zoom)
+        except ValueError:
+            zoom = None
+        if zoom is None or not 0 <= zoom <= simplification.MAX_ZOOM_LEVEL:
+            raise ValidationError({
+                "zoom": "must be an integer between 0 and {}".format(
+                    simplification.MAX_ZOOM_LEVEL)
+            })
+        precomputed_zoom = simplification.get_precomputed_zoom(zoom)
+        if precomputed_zoom is None:
+            result = _simplify(simplification.get_tolerance(zoom))
+        else:
+            # segments ingested before the precomputed geometries were
+            # introduced are simplified on the fly
+            result = Coalesce(
+                "geom_z{}".format(precomputed_zoom),
+                _simplify(simplification.get_tolerance(precomputed_zoom)),
+                output_field=LineStringField()
+            )
+    elif tolerance is not None:
+        try:
+            tolerance = float(tolerance)
+        except ValueError:
+            tolerance = None
+        if tolerance is None or not math.isfinite(tolerance) or tolerance <= 0:
+            raise ValidationError({"simplify": "must be a positive number"})
+        result = _simplify(simplification.get_meters_tolerance(tolerance))
+    else:
+        result = None
+    return result
+
+
+def _simplify(tolerance: float):
+    return SimplifyPreserveTopology(
+        "geom", Value(tolerance), output_field=LineStringField())
+
+
+def get_segment_queryset(simplified_geometry=None, timestamps=False):
+    """Return segments together with their emission, cost and health
+
+    If ``simplified_geometry`` is not ``None``, it is annotated as
+    ``simplified_geom`` and the full geometry is not loaded. If
+    ``timestamps`` is true, the timestamps of the vertices of each segment's
+    geometry are annotated as ``vertex_timestamps``.
+
+    """
+
+    queryset = models.Segment.objects.select_related(
+        "emission", "cost", "health"
+    ).defer(
+        *SIMPLIFIED_GEOMETRY_FIELDS
+    )
+    if simplified_geometry is not None:
+        queryset = queryset.annotate(
+            simplified_geom=simplified_geometry
+        ).defer(
+            "geom"
+        )
+    if timestamps:
+        queryset = queryset.annotate(
+            vertex_timestamps=RawSQL(
+                VERTEX_TIMESTAMPS_SQL,
+                (),
+                output_field=ArrayField(BigIntegerField())
+            )
+        )
+    return queryset
+
+
+def get_track_versions():
+    """Return tracks annotated with their last modification date"""
+    return models.Track.objects.exclude_in_progress().annotate(
+        last_modified=F("updated_at"))
+
+
+def get_segment_versions():
+    """Return segments annotated with their last modification date
+
+    Segments are only modified together with their track, whose
+    modification date is used.
+
+    """
+
+    return models.Segment.objects.annotate(
+        last_modified=F("track__updated_at"))
+
+
+def get_track_queryset(segments=None):
+    """Return tracks ready to be serialized without further queries
+
+    Segments are prefetched together with their emission, cost and health
+    and the distinct vehicle types of each track's segments are annotated
+    as ``vehicle_types``. ``segments`` is the queryset used for the
+    prefetched segments, which defaults to ``get_segment_queryset()``.
+    Tracks that are still being ingested are excluded.
+
+    """
+
+    segments = segments if segments is not None else get_segment_queryset()
+    return models.Track.objects.exclude_in_progress().select_related(
+        "owner__keycloak"
+    ).annotate(
+        vehicle_types=ArrayAgg(
+            "segments__vehicle_type",
+            distinct=True,
+            filter=Q(segments__isnull=False)
+        )
+    ).prefetch_related(
+        Prefetch("segments", queryset=segments)
+    )
+
+
+class SegmentGeometryMixin(object):
+    """Serialize segment geometries as requested by the query parameters
+
+    Geometries may be simplified, as explained in
+    ``get_simplified_geometry``, and they are encoded as polylines when the
+    ``PolylineJSONRenderer`` is selected, as explained in
+    ``renderers.get_polyline_options``.
+
+    """
+
+    renderer_classes = tuple(api_settings.DEFAULT_RENDERER_CLASSES) + (
+        renderers.PolylineJSONRenderer,
+    )
+
+    def get_segments(self):
+        simplified_geometry = get_simplified_geometry(self.request)
+        polyline_options = renderers.get_polyline_options(self.request)
+        timestamps = (
+            polyline_options is not None and polyline_options.timestamps)
+        if timestamps and simplified_geometry is not None:
+            raise ValidationError(
+                "timestamps cannot be combined with simplified geometries")
+        return get_segment_queryset(simplified_geometry, timestamps=timestamps)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["polyline"] = renderers.get_polyline_options(self.request)
+        return context
+
+
+class MySegmentViewSet(ConditionalGetMixin, SegmentGeometryMixin,
+                       mixins.ListModelMixin, mixins.RetrieveModelMixin,
                        mixins.DestroyModelMixin, viewsets.GenericViewSet):
     required_permissions = (
         "tracks.can_list_own_segments",
@@ -31,8 +232,15 @@ class MySegmentViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
     )
 
     def get_queryset(self):
-        return models.Segment.objects.filter(
-            track__owner=self.request.user)
+        return self.get_segments().filter(track__owner=self.request.user)
+
+    def get_version_queryset(self):
+        return get_segment_versions().filter(track__owner=self.request.user)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        models.Track.objects.filter(pk=instance.track_id).update(
+            updated_at=timezone.now())
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -42,7 +250,8 @@ class MySegmentViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
         return result
 
 
-class MyTrackViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
+class MyTrackViewSet(ConditionalGetMixin, SegmentGeometryMixin,
+                     mixins.ListModelMixin, mixins.RetrieveModelMixin,
                      mixins.DestroyModelMixin, viewsets.GenericViewSet):
     required_permissions = (
         "tracks.can_list_own_tracks",
@@ -57,7 +266,14 @@ class MyTrackViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
     )
 
     def get_queryset(self):
-        return models.Track.objects.filter(owner=self.request.user)
+        return get_track_queryset(
+            self.get_segments()
+        ).filter(
+            owner=self.request.user
+        )
+
+    def get_version_queryset(self):
+        return get_track_versions().filter(owner=self.request.user)
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -67,12 +283,14 @@ class MyTrackViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
         return result
 
 
-class TrackViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
+class TrackViewSet(ConditionalGetMixin, SegmentGeometryMixin,
+                   mixins.ListModelMixin, mixins.RetrieveModelMixin,
                    viewsets.GenericViewSet):
     required_permissions = (
         "tracks.can_list_tracks",
     )
-    queryset = models.Track.objects.all()
+    pagination_class = CursorPagination
+    cursor_ordering = ("-start_date", "-id")
     filter_backends = (
         DjangoFilterBackend,
     )
@@ -81,6 +299,21 @@ class TrackViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
         "is_valid",
     )
 
+    def get_queryset(self):
+        queryset = get_track_queryset(self.get_segments())
+        if self.action == "list":
+            # the cursor cannot point at a null start date, which some older
+            # tracks were stored without
+            queryset = queryset.filter(start_date__isnull=False)
+        return queryset
+
+    def get_version_queryset(self):
+        return get_track_versions()
+
+    def get_collection_version(self):
+        # counting all tracks on each page would defeat cursor pagination
+        return None
+
     def get_serializer_class(self):
         if self.action == "list":
             result = serializers.TrackListSerializer
@@ -89,10 +322,22 @@ class TrackViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
         return result
 
 
-class SegmentViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
+class SegmentViewSet(ConditionalGetMixin, SegmentGeometryMixin,
+                     mixins.ListModelMixin, mixins.RetrieveModelMixin,
                      viewsets.GenericViewSet):
     serializer_class = serializers.SegmentSerializer
     required_permissions = (
         "tracks.can_list_segments",
     )
-    queryset = models.Segment.objects.all()
+    pagination_class = CursorPagination
+    cursor_ordering = ("start_date", "id")
+
+    def get_queryset(self):
+        return self.get_segments()
+
+    def get_version_queryset(self):
+        return get_segment_versions()
+
+    def get_collection_version(self):
+        # counting all segments on each page would defeat cursor pagination
+        return None
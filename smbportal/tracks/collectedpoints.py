@@ -0,0 +1,235 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Read access to collected points, regardless of how they are stored
+
+The points of a track are stored either as rows of the
+``tracks_collectedpoint`` table or, once the track has been compacted, as
+sensor channels (see the ``faas.sensorarrays`` module). The
+``get_collected_points`` function hides this difference from consumers,
+such as ``dashboard.exporter.export_collected_points``, by yielding objects
+that have the same attributes as ``CollectedPoint`` instances.
+
+"""
+
+from collections import namedtuple
+import datetime as dt
+import heapq
+from itertools import count
+import struct
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+import numpy as np
+
+from django.db.models import F
+
+from faas import sensorarrays
+from faas._constants import VehicleType
+
+from .models import CollectedPoint
+from .models import SensorChannel
+from .models import Track
+
+CompactPoint = namedtuple("CompactPoint", [
+    "id",
+    "track_id",
+    "vehicle_type",
+    "the_geom",
+    "sessionid",
+    "timestamp",
+] + sensorarrays.SENSOR_CHANNELS)
+
+
+class PointGeometry(object):
+    """Minimal stand-in for the ``Point`` geometry of a collected point"""
+
+    def __init__(self, x: float, y: float):
+        self.x = x
+        self.y = y
+
+    @property
+    def wkb(self) -> bytes:
+        return struct.pack("<BIdd", 1, 1, self.x, self.y)
+
+
+def get_collected_points(start_date: Optional[dt.datetime] = None,
+                         end_date: Optional[dt.datetime] = None,
+                         vehicle_types: List[str] = None,
+                         tracks: list = None) -> Iterator:
+    """Iterate over the collected points that match the input filters
+
+    Points of tracks that are still stored as rows are yielded as
+    ``CollectedPoint`` instances and points of compacted tracks are yielded
+    as ``CompactPoint`` instances. Both are merged in order of timestamp,
+    with points that have no timestamp at the end, like the ordering of
+    ``CollectedPoint``.
+
+    """
+
+    vehicle_types = vehicle_types or []
+    tracks = tracks or []
+    points_qs = CollectedPoint.objects.exclude(
+        track__sensor_channels__isnull=False)
+    channels_qs = SensorChannel.objects.all()
+    if start_date is not None:
+        points_qs = points_qs.filter(timestamp__gte=start_date)
+        channels_qs = channels_qs.filter(track__end_date__gte=start_date)
+    if end_date is not None:
+        points_qs = points_qs.filter(timestamp__lte=end_date)
+        channels_qs = channels_qs.filter(track__start_date__lte=end_date)
+    if len(tracks) != 0:
+        points_qs = points_qs.filter(track__in=tracks)
+        channels_qs = channels_qs.filter(track__in=tracks)
+    if len(vehicle_types) != 0:
+        points_qs = points_qs.filter(vehicle_type__in=vehicle_types)
+    compact_tracks = Track.objects.filter(
+        pk__in=channels_qs.values("track_id")
+    ).order_by(
+        F("start_date").asc(nulls_first=True), "id"
+    ).values_list(
+        "id", "start_date"
+    )
+    return _merge_points(
+        points_qs.iterator(),
+        (
+            (
+                track_start_date,
+                _iter_compact_points(
+                    channels_qs.filter(track_id=track_id), start_date,
+                    end_date, vehicle_types
+                )
+            ) for track_id, track_start_date in compact_tracks.iterator()
+        )
+    )
+
+
+def _merge_points(points: Iterator, compact_tracks: Iterator) -> Iterator:
+    """Merge row points with the points of compacted tracks by timestamp
+
+    ``compact_tracks`` yields ``(start_date, points)`` tuples in order of
+    start date. Since no point of a track is older than its start date, the
+    points of a compacted track are only decoded once the merge reaches its
+    start date, so that only tracks that overlap in time are held in memory.
+
+    """
+
+    heap = []
+    counter = count()
+    _push_next_point(heap, points, counter)
+    next_track = next(compact_tracks, None)
+    while len(heap) > 0 or next_track is not None:
+        while next_track is not None and (
+                len(heap) == 0 or
+                _get_start_key(next_track[0]) <= heap[0][0]):
+            _push_next_point(heap, next_track[1], counter)
+            next_track = next(compact_tracks, None)
+        if len(heap) > 0:
+            _, _, point, source = heapq.heappop(heap)
+            yield point
+            _push_next_point(heap, source, counter)
+
+
+def _push_next_point(heap: list, source: Iterator, counter: Iterator):
+    point = next(source, None)
+    if point is not None:
+        # the counter keeps points with the same timestamp in source order
+        heapq.heappush(
+            heap, (_get_sort_key(point.timestamp), next(counter), point,
+                   source)
+        )
+
+
+def _get_sort_key(timestamp: Optional[dt.datetime]) -> tuple:
+    return (0, timestamp) if timestamp is not None else (1,)
+
+
+def _get_start_key(start_date: Optional[dt.datetime]) -> tuple:
+    return (0, start_date) if start_date is not None else (-1,)
+
+
+def _iter_compact_points(channels_qs, start_date: Optional[dt.datetime],
+                         end_date: Optional[dt.datetime],
+                         vehicle_types: List[str]) -> Iterator[CompactPoint]:
+    """Yield the points of a compacted track in order of timestamp"""
+    track_id = None
+    encoded_channels = []
+    for channel in channels_qs.order_by("name"):
+        track_id = channel.track_id
+        encoded_channels.append(
+            sensorarrays.EncodedChannel(
+                name=channel.name,
+                dtype=channel.dtype,
+                encoding=channel.encoding,
+                num_values=channel.num_values,
+                data=channel.data
+            )
+        )
+    if track_id is None:
+        return
+    columns = sensorarrays.decode_channels(encoded_channels)
+    mask = _get_point_mask(columns, start_date, end_date, vehicle_types)
+    order = np.argsort(columns["timestamp"][mask], kind="mergesort")
+    yield from _get_compact_points(
+        track_id,
+        {name: values[mask][order] for name, values in columns.items()}
+    )
+
+
+def _get_point_mask(columns: dict, start_date: Optional[dt.datetime],
+                    end_date: Optional[dt.datetime],
+                    vehicle_types: List[str]) -> np.ndarray:
+    timestamps = columns["timestamp"]
+    mask = np.ones(len(timestamps), dtype=bool)
+    if start_date is not None:
+        mask &= timestamps >= _to_epoch_milliseconds(start_date)
+    if end_date is not None:
+        mask &= timestamps <= _to_epoch_milliseconds(end_date)
+    if len(vehicle_types) != 0:
+        codes = [VehicleType[name].value for name in vehicle_types]
+        mask &= np.isin(columns["vehicle_type"], codes)
+    return mask
+
+
+def _get_compact_points(track_id: int,
+                        columns: dict) -> Iterator[CompactPoint]:
+    sensor_values = zip(*(
+        _to_list(columns[name]) for name in sensorarrays.SENSOR_CHANNELS))
+    rows = zip(
+        columns["timestamp"].tolist(),
+        columns["longitude"].tolist(),
+        columns["latitude"].tolist(),
+        columns["vehicle_type"].tolist(),
+        columns["sessionid"].tolist(),
+        sensor_values
+    )
+    for timestamp, x, y, vehicle_type, session_id, sensors in rows:
+        yield CompactPoint(
+            None,
+            track_id,
+            VehicleType(vehicle_type).name if vehicle_type != 0 else None,
+            PointGeometry(x, y),
+            session_id,
+            dt.datetime.fromtimestamp(timestamp / 1000, tz=dt.timezone.utc),
+            *sensors
+        )
+
+
+def _to_list(values: np.ndarray) -> list:
+    """Convert an array to a list of floats, with missing values as None"""
+    return [
+        None if value != value else value for value in values.tolist()]
+
+
+def _to_epoch_milliseconds(timestamp: dt.datetime) -> int:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=dt.timezone.utc)
+    return int(timestamp.timestamp() * 1000)
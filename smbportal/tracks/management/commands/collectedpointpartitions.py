@@ -0,0 +1,100 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import datetime as dt
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from faas import datareceiver
+from faas import partitions
+from .runingestionworker import get_db_settings
+
+
+def _parse_month(value):
+    return dt.datetime.strptime(value, "%Y-%m").date()
+
+
+class Command(BaseCommand):
+    help = (
+        "List the monthly partitions of collected points, create the ones "
+        "of the upcoming months and detach old ones, either moving them to "
+        "an archive schema or dropping them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--create-ahead",
+            type=int,
+            metavar="MONTHS",
+            help=(
+                "Create the partitions of the current month and of this "
+                "many following months. Ingestion does not create "
+                "partitions, so this should be scheduled, e.g. daily"
+            )
+        )
+        parser.add_argument(
+            "--detach-before",
+            type=_parse_month,
+            metavar="YYYY-MM",
+            help="Detach the partitions of the months before this one"
+        )
+        parser.add_argument(
+            "--archive-schema",
+            default=partitions.DEFAULT_ARCHIVE_SCHEMA,
+            help="Schema where detached partitions are moved to"
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop detached partitions instead of archiving them"
+        )
+
+    def handle(self, *args, **options):
+        create_ahead = options["create_ahead"]
+        if create_ahead is not None and create_ahead < 0:
+            raise CommandError("--create-ahead must not be negative")
+        db_connection = datareceiver.get_db_connection(**get_db_settings())
+        if create_ahead is not None:
+            num_created = partitions.create_upcoming_partitions(
+                db_connection, num_months=create_ahead)
+            self.stdout.write(f"Created {num_created} partitions")
+        with db_connection.cursor() as cursor:
+            existing = partitions.list_partitions(cursor)
+        db_connection.commit()
+        before = options["detach_before"]
+        if before is None:
+            for partition in existing:
+                self.stdout.write(
+                    f"{partition.name}: {partition.bounds} - "
+                    f"~{partition.estimated_rows} rows - "
+                    f"{partition.size_bytes / 1024 ** 2:.1f} MiB"
+                )
+        else:
+            to_detach = [
+                p for p in existing
+                if p.month is not None and p.month < before
+            ]
+            if len(to_detach) == 0:
+                raise CommandError(f"There are no partitions before {before}")
+            for partition in to_detach:
+                partitions.detach_partition(
+                    partition.name,
+                    db_connection,
+                    archive_schema=options["archive_schema"],
+                    drop=options["drop"]
+                )
+                destination = (
+                    "dropped" if options["drop"] else
+                    f"moved to schema {options['archive_schema']!r}"
+                )
+                self.stdout.write(
+                    f"Detached {partition.name} and {destination}")
+        db_connection.close()
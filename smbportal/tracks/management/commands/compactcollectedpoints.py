@@ -0,0 +1,105 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import datetime as dt
+import time
+
+from django.core.management.base import BaseCommand
+import pytz
+
+from faas import datareceiver
+from faas import sensorarrays
+from .runingestionworker import get_db_settings
+
+
+def _parse_date(value):
+    return dt.datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=pytz.utc)
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the collected points of existing tracks as compact per-track "
+        "sensor arrays. Points that are still in the "
+        "tracks_collectedpoint_legacy table must be moved with the "
+        "migratecollectedpoints command first"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-b",
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of tracks compacted in each transaction"
+        )
+        parser.add_argument(
+            "--before",
+            type=_parse_date,
+            metavar="YYYY-MM-DD",
+            help="Only compact tracks that ended before this date"
+        )
+        parser.add_argument(
+            "--start-id",
+            type=int,
+            default=0,
+            help="Only compact tracks whose id is greater than this one. "
+                 "Useful for resuming an interrupted run"
+        )
+        parser.add_argument(
+            "--delete-rows",
+            action="store_true",
+            help="Delete the collected point rows of tracks once they are "
+                 "stored as sensor arrays"
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to wait between batches, in order to reduce the "
+                 "load on the database"
+        )
+
+    def handle(self, *args, **options):
+        db_connection = datareceiver.get_db_connection(**get_db_settings())
+        started_at = time.monotonic()
+        last_track_id = options["start_id"]
+        num_tracks = 0
+        num_points = 0
+        num_bytes = 0
+        num_deleted = 0
+        while True:
+            result = sensorarrays.compact_tracks(
+                db_connection,
+                after_track_id=last_track_id,
+                batch_size=options["batch_size"],
+                before=options["before"],
+                delete_rows=options["delete_rows"]
+            )
+            if result.num_candidates == 0:
+                break
+            last_track_id = result.last_track_id
+            num_tracks += result.num_tracks
+            num_points += result.num_points
+            num_bytes += result.num_bytes
+            num_deleted += result.num_deleted_rows
+            elapsed = time.monotonic() - started_at
+            self.stdout.write(
+                f"Processed tracks up to id {last_track_id} - "
+                f"compacted {num_tracks} tracks, {num_points} points into "
+                f"{num_bytes} bytes - deleted {num_deleted} rows - "
+                f"points/s: {num_points / elapsed:.0f}"
+            )
+            time.sleep(options["pause"])
+        db_connection.close()
+        bytes_per_point = num_bytes / num_points if num_points else 0
+        self.stdout.write(
+            f"Done. Compacted {num_tracks} tracks ({num_points} points, "
+            f"{bytes_per_point:.1f} bytes per point)"
+        )
@@ -0,0 +1,88 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from django.core.management.base import BaseCommand
+
+from faas import datareceiver
+from faas import failures
+from faas import metrics
+from .runingestionworker import get_db_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "List, replay or purge failed track ingestions. By default, dead "
+        "letters are listed, that is, ingestions that are no longer retried"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--status",
+            action="append",
+            choices=failures.STATUSES,
+            help="Only consider failures with this status. This option may "
+                 "be specified multiple times. Defaults to dead"
+        )
+        parser.add_argument(
+            "--stage",
+            choices=metrics.STAGES,
+            help="Only consider failures of this ingestion stage"
+        )
+        parser.add_argument(
+            "--prefix",
+            default="",
+            help="Only consider failures whose object key starts with this "
+                 "prefix"
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=100,
+            help="Maximum number of failures to list"
+        )
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument(
+            "--replay",
+            action="store_true",
+            help="Schedule the matching failures for an immediate retry by "
+                 "the runretryscheduler command, with a fresh attempt count"
+        )
+        action.add_argument(
+            "--purge",
+            action="store_true",
+            help="Delete the matching failures"
+        )
+
+    def handle(self, *args, **options):
+        db_connection = datareceiver.get_db_connection(**get_db_settings())
+        filters = {
+            "statuses": options["status"],
+            "stage": options["stage"],
+            "key_prefix": options["prefix"],
+        }
+        if options["replay"]:
+            num_replayed = failures.replay_failures(db_connection, **filters)
+            self.stdout.write(f"Replayed {num_replayed} failures")
+        elif options["purge"]:
+            num_purged = failures.purge_failures(db_connection, **filters)
+            self.stdout.write(f"Purged {num_purged} failures")
+        else:
+            found = failures.list_failures(
+                db_connection, limit=options["limit"], **filters)
+            for failure in found:
+                self.stdout.write(
+                    f"{failure.last_failed_at:%Y-%m-%d %H:%M:%S} "
+                    f"{failure.status} {failure.bucket}/{failure.object_key} "
+                    f"- stage: {failure.stage or '-'} - attempts: "
+                    f"{failure.attempts} - {failure.exception}: "
+                    f"{failure.error}"
+                )
+            self.stdout.write(f"{len(found)} failures")
+        db_connection.close()
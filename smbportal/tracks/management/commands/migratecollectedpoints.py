@@ -0,0 +1,74 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from faas import datareceiver
+from faas import partitions
+from .runingestionworker import get_db_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the collected points stored before partitioning from the "
+        "tracks_collectedpoint_legacy table to the partitioned "
+        "tracks_collectedpoint table"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-b",
+            "--batch-size",
+            type=int,
+            default=50000,
+            help="Number of points moved in each transaction"
+        )
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            help="Stop after moving this many batches. The command may be "
+                 "run again later in order to resume moving points"
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to wait between batches, in order to reduce the "
+                 "load on the database"
+        )
+
+    def handle(self, *args, **options):
+        db_connection = datareceiver.get_db_connection(**get_db_settings())
+        with db_connection.cursor() as cursor:
+            estimated_total = partitions.estimate_legacy_points(cursor)
+        db_connection.commit()
+        self.stdout.write(f"About {estimated_total} points to move")
+        started_at = time.monotonic()
+        num_moved = 0
+        num_batches = 0
+        while (options["max_batches"] is None or
+               num_batches < options["max_batches"]):
+            moved = partitions.move_legacy_points(
+                db_connection, batch_size=options["batch_size"])
+            if moved == 0:
+                break
+            num_moved += moved
+            num_batches += 1
+            elapsed = time.monotonic() - started_at
+            self.stdout.write(
+                f"Moved {num_moved} points "
+                f"({num_moved / max(estimated_total, num_moved):.1%}) - "
+                f"points/s: {num_moved / elapsed:.0f}"
+            )
+            time.sleep(options["pause"])
+        db_connection.close()
+        self.stdout.write(f"Done. Moved {num_moved} points")
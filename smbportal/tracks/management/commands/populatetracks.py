@@ -8,14 +8,20 @@
 #
 #########################################################################
 
+from collections import Counter
+from collections import namedtuple
+from concurrent import futures
 from glob import iglob
 import pathlib
+import signal
+import time
 from typing import Dict
 from typing import List
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import connections
+from django.db import transaction
 from smbbackend import processor
 from smbbackend.calculateindexes import calculate_indexes
 from smbbackend.updatebadges import update_badges
@@ -26,6 +32,64 @@ from keycloakauth.keycloakadmin import get_manager
 from keycloakauth.utils import create_user
 from profiles.models import SmbUser
 import profiles.models as pm
+from tracks.models import Track
+
+VALID = "valid"
+INVALID = "invalid"
+REJECTED = "rejected"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+FileResult = namedtuple("FileResult", [
+    "path",
+    "status",
+    "track_id",
+    "message",
+])
+
+
+def ingest_file(path: pathlib.Path, owner_uuid: str) -> FileResult:
+    """Ingest a file with recorded track data
+
+    Each file is ingested in its own transaction. Files whose session has
+    already been ingested are skipped, so that an interrupted run may be
+    started again with the same files.
+
+    """
+
+    try:
+        with path.open() as fh:
+            raw_data = fh.read()
+        points = processor.parse_point_raw_data(raw_data)
+        session_id = processor.get_session_id(points)
+        if Track.objects.filter(session_id=session_id).exists():
+            return FileResult(path, SKIPPED, None, f"session {session_id}")
+        with transaction.atomic(), connections["default"].cursor() as cursor:
+            try:
+                segments_data = processor.process_data(
+                    points,
+                    cursor,
+                    **processor.DATA_PROCESSING_PARAMETERS
+                )
+            except NonRecoverableError as exc:
+                return FileResult(path, REJECTED, None, str(exc))
+            is_valid = processor.is_track_valid(segments_data)
+            track_id = processor.save_track(
+                session_id, segments_data, owner_uuid, cursor)
+            smbbackend.utils.update_track_info(track_id, cursor)
+            if is_valid:
+                calculate_indexes(track_id, cursor)
+                update_badges(track_id, cursor)
+    except Exception as exc:
+        return FileResult(path, FAILED, None, repr(exc))
+    return FileResult(
+        path, VALID if is_valid else INVALID, track_id, "")
+
+
+def _init_worker():
+    # a Ctrl-C in the terminal reaches every process of the group, but only
+    # the parent should react to it, after letting in-flight files finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
 
 
 class Command(BaseCommand):
@@ -54,6 +118,14 @@ class Command(BaseCommand):
             help="Occupation for the user. This will only be used if the user "
                  "is created from scratch"
         )
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes that ingest files in parallel, each "
+                 "with its own database connection"
+        )
 
     def handle(self, *args, **options):
         owner = self.get_user(
@@ -61,12 +133,62 @@ class Command(BaseCommand):
             age=options.get("user-age-group"),
             occupation=options.get("user-occupation"),
         )
-        for pattern in options["file-patterns"]:
+        paths = self.get_paths(options["file-patterns"])
+        started_at = time.monotonic()
+        counts = Counter()
+        for result in self.ingest_files(
+                paths, owner.keycloak.UID, options["workers"]):
+            counts[result.status] += 1
+            self.stdout.write(
+                f"{result.path}: {result.status} "
+                f"{result.track_id or ''} {result.message}".rstrip()
+            )
+        elapsed = time.monotonic() - started_at
+        num_files = sum(counts.values())
+        self.stdout.write(
+            f"Files: {num_files} - "
+            f"files/s: {num_files / elapsed if elapsed else 0:.2f} - "
+            f"valid: {counts[VALID]} - invalid: {counts[INVALID]} - "
+            f"rejected: {counts[REJECTED]} - "
+            f"already ingested: {counts[SKIPPED]} - failed: {counts[FAILED]}"
+        )
+
+    def get_paths(self, patterns: List[str]) -> List[pathlib.Path]:
+        paths = []
+        for pattern in patterns:
             for path_name in iglob(pattern, recursive=True):
-                self.stdout.write(f"Processing file {path_name}...")
                 path = pathlib.Path(path_name)
                 if path.is_file():
-                    self.ingest_file(path, owner)
+                    paths.append(path)
+        return paths
+
+    def ingest_files(self, paths: List[pathlib.Path], owner_uuid: str,
+                     num_workers: int = 1):
+        """Yield the result of ingesting each file, as soon as it is done"""
+        if num_workers <= 1:
+            for path in paths:
+                self.stdout.write(f"Processing file {path}...")
+                yield ingest_file(path, owner_uuid)
+            return
+        # worker processes must open their own database connections rather
+        # than share the ones inherited from this process
+        connections.close_all()
+        with futures.ProcessPoolExecutor(
+                max_workers=num_workers,
+                initializer=_init_worker) as executor:
+            pending = [
+                executor.submit(ingest_file, path, owner_uuid)
+                for path in paths
+            ]
+            try:
+                for future in futures.as_completed(pending):
+                    yield future.result()
+            except KeyboardInterrupt:
+                self.stdout.write(
+                    "Interrupted, waiting for files in progress...")
+                for future in pending:
+                    future.cancel()
+                raise
 
     def get_user(self, username: str, password="123456",
                  **profile_kwargs) -> SmbUser:
@@ -92,30 +214,3 @@ class Command(BaseCommand):
                 profile_kwargs=profile_kwargs
             )
         return user
-
-    def ingest_file(self, path: pathlib.Path, owner: SmbUser):
-        with path.open() as fh:
-            raw_data = fh.read()
-        points = processor.parse_point_raw_data(raw_data)
-        session_id = processor.get_session_id(points)
-        connections["default"].connect()
-        connection = connections["default"]
-        with connection.cursor() as cursor:
-            try:
-                segments_data = processor.process_data(
-                    points,
-                    cursor,
-                    **processor.DATA_PROCESSING_PARAMETERS
-                )
-                self.stdout.write(f"segments_data: {segments_data}")
-            except NonRecoverableError as exc:
-                self.stdout.write(str(exc))
-            else:
-                is_valid = processor.is_track_valid(segments_data)
-                track_id = processor.save_track(
-                    session_id, segments_data, owner.keycloak.UID, cursor)
-                smbbackend.utils.update_track_info(track_id, cursor)
-                self.stdout.write(f"track: {track_id} - valid: {is_valid}")
-                if is_valid:
-                    calculate_indexes(track_id, cursor)
-                    update_badges(track_id, cursor)
@@ -0,0 +1,149 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import math
+import pathlib
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from faas import backfill
+from .runingestionworker import get_db_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalculate emissions, costs and health of existing segments, "
+        "together with the aggregated data of their tracks"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-p",
+            "--processes",
+            type=int,
+            default=4,
+            help="Number of processes"
+        )
+        parser.add_argument(
+            "-b",
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of track ids recalculated in each transaction"
+        )
+        parser.add_argument(
+            "--start-id",
+            type=int,
+            help="Id of the first track to recalculate"
+        )
+        parser.add_argument(
+            "--end-id",
+            type=int,
+            help="Id of the last track to recalculate"
+        )
+        parser.add_argument(
+            "--checkpoint-file",
+            help="File where the id to resume from is saved after each "
+                 "batch. If the file exists, the recalculation resumes from "
+                 "the id saved in it. The file is removed once all tracks "
+                 "have been recalculated"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would change, without saving anything"
+        )
+        parser.add_argument(
+            "--report-interval",
+            type=float,
+            default=10,
+            help="Minimum number of seconds between progress reports"
+        )
+
+    def handle(self, *args, **options):
+        checkpoint_path = None
+        if options["checkpoint_file"] is not None and not options["dry_run"]:
+            checkpoint_path = pathlib.Path(
+                options["checkpoint_file"]).expanduser()
+        start_id = options["start_id"]
+        if (start_id is None and checkpoint_path is not None and
+                checkpoint_path.exists()):
+            start_id = int(checkpoint_path.read_text())
+            self.stdout.write(f"Resuming from track {start_id}")
+        track_metrics_backfill = backfill.TrackMetricsBackfill(
+            get_db_settings(),
+            batch_size=options["batch_size"],
+            num_processes=options["processes"],
+            dry_run=options["dry_run"]
+        )
+        last_report = time.monotonic()
+
+        def report_progress(progress: backfill.BackfillProgress):
+            nonlocal last_report
+            if checkpoint_path is not None:
+                checkpoint_path.write_text(str(progress.resume_from_id))
+            if time.monotonic() - last_report >= options["report_interval"]:
+                last_report = time.monotonic()
+                self._write_progress(progress)
+
+        previous_handler = signal.signal(
+            signal.SIGINT, track_metrics_backfill.stop)
+        try:
+            progress = track_metrics_backfill.run(
+                start_id=start_id,
+                end_id=options["end_id"],
+                progress_callback=report_progress
+            )
+        finally:
+            signal.signal(signal.SIGINT, previous_handler)
+        self._write_progress(progress)
+        self._write_diff(track_metrics_backfill, options["dry_run"])
+        if len(progress.failed_batches) > 0:
+            failed = ", ".join(
+                f"{first}-{last}" for first, last in progress.failed_batches)
+            self.stderr.write(f"Failed track id ranges: {failed}")
+        if progress.fraction_done < 1:
+            self.stdout.write(
+                f"Not finished. Resume with --start-id "
+                f"{progress.resume_from_id}"
+            )
+        elif checkpoint_path is not None and checkpoint_path.exists():
+            checkpoint_path.unlink()
+
+    def _write_progress(self, progress: backfill.BackfillProgress):
+        self.stdout.write(
+            f"{progress.fraction_done:.1%} done - "
+            f"tracks: {progress.num_tracks} - "
+            f"segments: {progress.num_segments} - "
+            f"changed tracks: {progress.num_changed} - "
+            f"tracks/s: {progress.tracks_per_second:.1f} - "
+            f"segments/s: {progress.segments_per_second:.1f} - "
+            f"resume from: {progress.resume_from_id}"
+        )
+
+    def _write_diff(self, track_metrics_backfill, dry_run: bool):
+        verb = "would change" if dry_run else "changed"
+        self.stdout.write(f"Totals that {verb}:")
+        for (field, key), (previous, current) in sorted(
+                track_metrics_backfill.totals.items()):
+            if math.isclose(
+                    previous, current, rel_tol=backfill.RELATIVE_TOLERANCE):
+                continue
+            relative = (current - previous) / previous if previous else 0
+            self.stdout.write(
+                f"  {field}.{key}: {previous:.6g} -> {current:.6g} "
+                f"({relative:+.2%})"
+            )
+        if len(track_metrics_backfill.changed_track_ids) > 0:
+            track_ids = ", ".join(
+                str(id_) for id_ in track_metrics_backfill.changed_track_ids)
+            self.stdout.write(f"Some of the tracks that {verb}: {track_ids}")
@@ -0,0 +1,229 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from faas import datareceiver
+from faas import failures
+from faas import storage
+from faas import worker
+
+
+def get_db_settings(database="default") -> dict:
+    """Return the connection parameters of a Django database for faas"""
+    db = settings.DATABASES[database]
+    return {
+        "dbname": db["NAME"],
+        "user": db["USER"],
+        "password": db["PASSWORD"],
+        "host": db["HOST"] or "localhost",
+        "port": str(db["PORT"] or "5432"),
+    }
+
+
+def add_retry_policy_arguments(parser):
+    default = failures.DEFAULT_RETRY_POLICY
+    parser.add_argument(
+        "--base-delay",
+        type=float,
+        default=default.base_delay,
+        help="Seconds to wait before retrying a failed ingestion for the "
+             "first time. The delay doubles after each failed attempt"
+    )
+    parser.add_argument(
+        "--max-delay",
+        type=float,
+        default=default.max_delay,
+        help="Maximum number of seconds to wait between retries"
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=default.max_attempts,
+        help="Number of failed attempts after which an ingestion is "
+             "considered a dead letter and is no longer retried"
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=default.jitter,
+        help="Fraction of each delay that is randomly removed, so that "
+             "failed ingestions are not all retried at the same time"
+    )
+
+
+def get_retry_policy(options: dict) -> failures.RetryPolicy:
+    return failures.RetryPolicy(
+        base_delay=options["base_delay"],
+        max_delay=options["max_delay"],
+        max_attempts=options["max_attempts"],
+        jitter=options["jitter"]
+    )
+
+
+class Command(BaseCommand):
+    help = "Ingest the track uploads that are queued in the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-p",
+            "--processes",
+            type=int,
+            default=4,
+            help="Number of worker processes"
+        )
+        parser.add_argument(
+            "--max-in-flight",
+            type=int,
+            help="Maximum number of jobs being processed at the same time. "
+                 "Defaults to twice the number of processes"
+        )
+        parser.add_argument(
+            "--pool-size",
+            type=int,
+            default=2,
+            help="Maximum number of database connections of each worker "
+                 "process"
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5,
+            help="Seconds to wait before checking an empty queue again"
+        )
+        parser.add_argument(
+            "--visibility-timeout",
+            type=float,
+            default=15 * 60,
+            help="Seconds after which a job that is still being processed is "
+                 "considered abandoned and may be claimed again"
+        )
+        parser.add_argument(
+            "--max-job-attempts",
+            type=int,
+            default=worker.MAX_JOB_ATTEMPTS,
+            help="Number of times a job may be claimed. Jobs that are still "
+                 "not finished by then, e.g. because processing them kills "
+                 "the worker process, are marked as dead"
+        )
+        parser.add_argument(
+            "--stop-when-empty",
+            action="store_true",
+            help="Exit once all queued jobs have been processed"
+        )
+        parser.add_argument(
+            "--decimate",
+            action="store_true",
+            help="Decimate GPS points before storing them, using the default "
+                 "tolerances of the faas.decimation module"
+        )
+        parser.add_argument(
+            "--validate",
+            action="store_true",
+            help="Validate tracks before storing them, using the default "
+                 "rules of the faas.validation module. Invalid tracks are "
+                 "rejected, unless --flag-invalid is also specified"
+        )
+        parser.add_argument(
+            "--flag-invalid",
+            action="store_true",
+            help="Store invalid tracks, flagged as not valid and without "
+                 "segments, instead of rejecting them"
+        )
+        parser.add_argument(
+            "--sensor-arrays",
+            action="store_true",
+            help="Also store collected points as compact per-track sensor "
+                 "arrays"
+        )
+        parser.add_argument(
+            "--points-per-chunk",
+            type=int,
+            help="Stream the points of each track into the database in "
+                 "chunks of this many points, each in its own transaction, "
+                 "so that very long tracks are ingested with bounded memory. "
+                 "Cannot be combined with --decimate, --sensor-arrays, "
+                 "--use-ledger or --validate"
+        )
+        parser.add_argument(
+            "--use-ledger",
+            action="store_true",
+            help="Register ingestions in the ingestion ledger, in order to "
+                 "skip uploads that have already been ingested and to resume "
+                 "failed ingestions"
+        )
+        parser.add_argument(
+            "--record-failures",
+            action="store_true",
+            help="Record failed ingestions in the failure store, so that "
+                 "they are retried by the runretryscheduler command"
+        )
+        add_retry_policy_arguments(parser)
+        parser.add_argument(
+            "--object-store",
+            help="URL of the object store to read uploads from, such as "
+                 "s3:// or file:///path/to/directory. Defaults to S3"
+        )
+        parser.add_argument(
+            "--enqueue",
+            nargs=2,
+            action="append",
+            metavar=("BUCKET", "OBJECT_KEY"),
+            help="Add a job to the queue before starting. This option may be "
+                 "specified multiple times"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            ingestion_options = datareceiver.IngestionOptions(
+                use_ledger=options["use_ledger"],
+                decimation={} if options["decimate"] else None,
+                sensor_arrays=options["sensor_arrays"],
+                points_per_chunk=options["points_per_chunk"],
+                validation={} if options["validate"] else None,
+                reject_invalid=not options["flag_invalid"],
+                retry_policy=(
+                    get_retry_policy(options)
+                    if options["record_failures"] else None
+                )
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        db_settings = get_db_settings()
+        job_queue = worker.PostgresJobQueue(
+            datareceiver.get_db_connection(**db_settings),
+            visibility_timeout=options["visibility_timeout"],
+            max_attempts=options["max_job_attempts"]
+        )
+        for bucket, object_key in options.get("enqueue") or []:
+            job_id = job_queue.put(bucket, object_key)
+            self.stdout.write(f"Enqueued job {job_id}: {bucket}/{object_key}")
+        self.stdout.write(
+            f"Pending jobs: {job_queue.pending_count()}. Starting "
+            f"{options['processes']} worker processes...")
+        ingestion_worker = worker.IngestionWorker(
+            job_queue,
+            db_settings=dict(db_settings, max_size=options["pool_size"]),
+            num_processes=options["processes"],
+            max_in_flight=options["max_in_flight"],
+            poll_interval=options["poll_interval"],
+            options=ingestion_options,
+            object_store=storage.get_object_store(options["object_store"]),
+        )
+        stats = ingestion_worker.run(
+            stop_when_empty=options["stop_when_empty"])
+        self.stdout.write(
+            f"Processed: {stats.processed} - failed: {stats.failed} - "
+            f"jobs/s: {stats.jobs_per_second:.2f} - "
+            f"latency p50/p95/p99 (s): {stats.latency_p50} / "
+            f"{stats.latency_p95} / {stats.latency_p99}"
+        )
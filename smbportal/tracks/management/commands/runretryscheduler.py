@@ -0,0 +1,86 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from django.core.management.base import BaseCommand
+
+from faas import datareceiver
+from faas import failures
+from faas import storage
+from faas import worker
+from .runingestionworker import add_retry_policy_arguments
+from .runingestionworker import get_db_settings
+from .runingestionworker import get_retry_policy
+
+
+class Command(BaseCommand):
+    help = (
+        "Retry failed track ingestions, with exponential backoff, once they "
+        "are due"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-c",
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Maximum number of ingestions retried at the same time"
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5,
+            help="Seconds to wait before checking for due failures again"
+        )
+        parser.add_argument(
+            "--lease",
+            type=float,
+            default=15 * 60,
+            help="Seconds after which a failure that is still being retried "
+                 "is considered abandoned and may be retried again"
+        )
+        parser.add_argument(
+            "--stop-when-idle",
+            action="store_true",
+            help="Exit once no failed ingestions are due"
+        )
+        add_retry_policy_arguments(parser)
+        parser.add_argument(
+            "--use-ledger",
+            action="store_true",
+            help="Register retries in the ingestion ledger, in order to "
+                 "resume them from the stage that failed"
+        )
+        parser.add_argument(
+            "--object-store",
+            help="URL of the object store to read uploads from, such as "
+                 "s3:// or file:///path/to/directory. Defaults to S3"
+        )
+
+    def handle(self, *args, **options):
+        db_settings = get_db_settings()
+        scheduler = worker.RetryScheduler(
+            db_settings,
+            policy=get_retry_policy(options),
+            max_concurrency=options["concurrency"],
+            poll_interval=options["poll_interval"],
+            lease_seconds=options["lease"],
+            options=datareceiver.IngestionOptions(
+                use_ledger=options["use_ledger"]),
+            object_store=storage.get_object_store(options["object_store"]),
+        )
+        db_connection = datareceiver.get_db_connection(**db_settings)
+        self.stdout.write(
+            f"Due failures: {failures.count_due_failures(db_connection)}. "
+            f"Retrying up to {options['concurrency']} at a time...")
+        db_connection.close()
+        stats = scheduler.run(stop_when_idle=options["stop_when_idle"])
+        self.stdout.write(
+            f"Resolved: {stats.resolved} - failed again: {stats.failed}")
@@ -0,0 +1,36 @@
+# Generated by Django 2.0 on 2026-10-18 10:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0032_delete_regionofinterest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=255, verbose_name='bucket')),
+                ('object_key', models.CharField(max_length=1024, verbose_name='object key')),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('processing', 'processing'), ('done', 'done'), ('failed', 'failed')], default='pending', max_length=20, verbose_name='status')),
+                ('enqueued_at', models.DateTimeField(auto_now_add=True, verbose_name='enqueued at')),
+                ('claimed_at', models.DateTimeField(blank=True, help_text='When the job was last claimed by a worker', null=True, verbose_name='claimed at')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='finished at')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='attempts')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+                ('track', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='tracks.Track', verbose_name='track')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ingestionjob',
+            index=models.Index(fields=['status', 'id'], name='tracks_inge_status_dd0057_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.0 on 2026-10-18 11:00
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0033_ingestionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=255, verbose_name='bucket')),
+                ('object_key', models.CharField(max_length=1024, verbose_name='object key')),
+                ('etag', models.CharField(help_text='ETag of the uploaded S3 object', max_length=255, verbose_name='ETag')),
+                ('session_id', models.BigIntegerField(blank=True, null=True, verbose_name='session id')),
+                ('status', models.CharField(choices=[('processing', 'processing'), ('done', 'done'), ('failed', 'failed'), ('skipped', 'skipped')], default='processing', max_length=20, verbose_name='status')),
+                ('stage', models.CharField(blank=True, help_text='Last ingestion stage that has been completed', max_length=20, verbose_name='stage')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='attempts')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+                ('started_at', models.DateTimeField(help_text='When the last ingestion attempt started', verbose_name='started at')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='finished at')),
+                ('timings', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, help_text='Duration of each ingestion stage, measured in seconds', verbose_name='timings')),
+                ('track', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='tracks.Track', verbose_name='track')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='ingestionrecord',
+            unique_together={('object_key', 'etag')},
+        ),
+    ]
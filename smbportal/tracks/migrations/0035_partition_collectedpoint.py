@@ -0,0 +1,148 @@
+# Generated by Django 2.0 on 2026-10-18 12:00
+
+from django.db import migrations
+
+# The existing table is kept as ``tracks_collectedpoint_legacy`` and its rows
+# are moved over to the partitioned table with the ``migratecollectedpoints``
+# management command. The foreign key of the legacy table is recreated with
+# ON DELETE CASCADE, since Django no longer knows about the legacy table when
+# deleting tracks.
+#
+# The primary key on ``id`` is replaced by a unique index on ``(id,
+# timestamp)``, since the unique indexes of a partitioned table must include
+# its partition key. Ids still come from the same sequence.
+#
+# ``tracks_create_collectedpoint_partitions`` attaches partitions, which
+# locks the whole partitioned table. It is meant to be called out of band,
+# by the ``collectedpointpartitions --create-ahead`` and
+# ``migratecollectedpoints`` management commands, and never while ingesting
+# tracks
+PARTITION_SQL = """
+ALTER TABLE tracks_collectedpoint RENAME TO tracks_collectedpoint_legacy;
+
+DO $$
+DECLARE
+  constraint_name text;
+BEGIN
+  FOR constraint_name IN
+    SELECT conname
+    FROM pg_constraint
+    WHERE conrelid = 'tracks_collectedpoint_legacy'::regclass
+      AND contype = 'f'
+  LOOP
+    EXECUTE format(
+      'ALTER TABLE tracks_collectedpoint_legacy DROP CONSTRAINT %I',
+      constraint_name
+    );
+  END LOOP;
+END $$;
+
+ALTER TABLE tracks_collectedpoint_legacy
+  ADD CONSTRAINT tracks_collectedpoint_legacy_track_id_fk
+  FOREIGN KEY (track_id) REFERENCES tracks_track (id) ON DELETE CASCADE
+  NOT VALID;
+
+CREATE TABLE tracks_collectedpoint (
+  LIKE tracks_collectedpoint_legacy INCLUDING DEFAULTS
+) PARTITION BY RANGE ("timestamp");
+
+ALTER SEQUENCE tracks_collectedpoint_id_seq
+  OWNED BY tracks_collectedpoint.id;
+
+ALTER TABLE tracks_collectedpoint
+  ADD CONSTRAINT tracks_collectedpoint_track_id_fk
+  FOREIGN KEY (track_id) REFERENCES tracks_track (id)
+  DEFERRABLE INITIALLY DEFERRED;
+
+CREATE UNIQUE INDEX tracks_collectedpoint_id_timestamp_uniq
+  ON tracks_collectedpoint (id, "timestamp");
+CREATE INDEX tracks_collectedpoint_track_id_idx
+  ON tracks_collectedpoint (track_id);
+CREATE INDEX tracks_collectedpoint_timestamp_idx
+  ON tracks_collectedpoint ("timestamp");
+CREATE INDEX tracks_collectedpoint_the_geom_idx
+  ON tracks_collectedpoint USING GIST (the_geom);
+
+CREATE TABLE tracks_collectedpoint_default
+  PARTITION OF tracks_collectedpoint DEFAULT;
+
+CREATE FUNCTION tracks_create_collectedpoint_partitions(
+  first_timestamp timestamp with time zone,
+  last_timestamp timestamp with time zone
+) RETURNS integer AS $$
+DECLARE
+  month_start timestamp;
+  partition_name text;
+  num_created integer := 0;
+BEGIN
+  IF first_timestamp IS NULL OR last_timestamp IS NULL THEN
+    RETURN 0;
+  END IF;
+  month_start := date_trunc('month', first_timestamp AT TIME ZONE 'UTC');
+  WHILE month_start <= last_timestamp AT TIME ZONE 'UTC' LOOP
+    partition_name := 'tracks_collectedpoint_' ||
+      to_char(month_start, '"y"YYYY"m"MM');
+    IF to_regclass(partition_name) IS NULL THEN
+      -- concurrent callers may try to create the same partition
+      PERFORM pg_advisory_xact_lock(hashtext(partition_name));
+      IF to_regclass(partition_name) IS NULL THEN
+        EXECUTE format(
+          'CREATE TABLE %I (LIKE tracks_collectedpoint INCLUDING DEFAULTS)',
+          partition_name
+        );
+        -- a partition cannot be attached while the default partition holds
+        -- rows that belong to it
+        EXECUTE format(
+          'WITH moved AS ('
+          '  DELETE FROM tracks_collectedpoint_default'
+          '  WHERE "timestamp" >= %L AND "timestamp" < %L'
+          '  RETURNING *'
+          ') INSERT INTO %I SELECT * FROM moved',
+          month_start AT TIME ZONE 'UTC',
+          (month_start + interval '1 month') AT TIME ZONE 'UTC',
+          partition_name
+        );
+        EXECUTE format(
+          'ALTER TABLE tracks_collectedpoint ATTACH PARTITION %I '
+          'FOR VALUES FROM (%L) TO (%L)',
+          partition_name,
+          month_start AT TIME ZONE 'UTC',
+          (month_start + interval '1 month') AT TIME ZONE 'UTC'
+        );
+        num_created := num_created + 1;
+      END IF;
+    END IF;
+    month_start := month_start + interval '1 month';
+  END LOOP;
+  RETURN num_created;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+UNPARTITION_SQL = """
+DROP FUNCTION tracks_create_collectedpoint_partitions(
+  timestamp with time zone, timestamp with time zone);
+
+INSERT INTO tracks_collectedpoint_legacy
+  SELECT * FROM tracks_collectedpoint;
+
+ALTER SEQUENCE tracks_collectedpoint_id_seq
+  OWNED BY tracks_collectedpoint_legacy.id;
+
+DROP TABLE tracks_collectedpoint;
+
+ALTER TABLE tracks_collectedpoint_legacy RENAME TO tracks_collectedpoint;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0034_ingestionrecord'),
+        # drops the foreign key that references tracks_collectedpoint
+        ('vehicles', '0020_bike_last_position_db_constraint'),
+    ]
+
+    operations = [
+        migrations.RunSQL(PARTITION_SQL, reverse_sql=UNPARTITION_SQL),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.0 on 2026-10-18 14:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0035_partition_collectedpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorChannel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Name of the collected point field', max_length=50, verbose_name='name')),
+                ('dtype', models.CharField(help_text="NumPy data type of the array's values", max_length=10, verbose_name='data type')),
+                ('encoding', models.CharField(max_length=20, verbose_name='encoding')),
+                ('num_values', models.PositiveIntegerField(verbose_name='number of values')),
+                ('data', models.BinaryField(verbose_name='data')),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sensor_channels', to='tracks.Track', verbose_name='track')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='sensorchannel',
+            unique_together={('track', 'name')},
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.0 on 2026-10-18 15:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0036_sensorchannel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionFailure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=255, verbose_name='bucket')),
+                ('object_key', models.CharField(max_length=1024, verbose_name='object key')),
+                ('status', models.CharField(choices=[('retrying', 'retrying'), ('dead', 'dead'), ('resolved', 'resolved')], default='retrying', max_length=20, verbose_name='status')),
+                ('stage', models.CharField(blank=True, help_text='Ingestion stage that failed', max_length=20, verbose_name='stage')),
+                ('exception', models.CharField(blank=True, help_text='Type of the exception that was raised', max_length=255, verbose_name='exception')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='attempts')),
+                ('first_failed_at', models.DateTimeField(verbose_name='first failed at')),
+                ('last_failed_at', models.DateTimeField(verbose_name='last failed at')),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True, verbose_name='next attempt at')),
+                ('track', models.ForeignKey(blank=True, help_text='Track created by the retry that succeeded', null=True, on_delete=django.db.models.deletion.SET_NULL, to='tracks.Track', verbose_name='track')),
+            ],
+            options={
+                'ordering': ['-last_failed_at'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='ingestionfailure',
+            unique_together={('bucket', 'object_key')},
+        ),
+        migrations.AddIndex(
+            model_name='ingestionfailure',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='tracks_inge_status_b86b4c_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.0 on 2026-10-18 16:00
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0037_ingestionfailure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='segment',
+            name='geom_z10',
+            field=django.contrib.gis.db.models.fields.LineStringField(blank=True, help_text='geometry simplified for maps at zoom level 10', null=True, srid=4326, verbose_name='geometry at zoom 10'),
+        ),
+        migrations.AddField(
+            model_name='segment',
+            name='geom_z13',
+            field=django.contrib.gis.db.models.fields.LineStringField(blank=True, help_text='geometry simplified for maps at zoom level 13', null=True, srid=4326, verbose_name='geometry at zoom 13'),
+        ),
+        migrations.AddField(
+            model_name='segment',
+            name='geom_z16',
+            field=django.contrib.gis.db.models.fields.LineStringField(blank=True, help_text='geometry simplified for maps at zoom level 16', null=True, srid=4326, verbose_name='geometry at zoom 16'),
+        ),
+    ]
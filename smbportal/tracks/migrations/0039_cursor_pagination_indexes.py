@@ -0,0 +1,21 @@
+# Generated by Django 2.0 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0038_segment_simplified_geometry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='track',
+            index=models.Index(fields=['-start_date', '-id'], name='tracks_trac_start_d_7b4489_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='segment',
+            index=models.Index(fields=['start_date', 'id'], name='tracks_segm_start_d_08add0_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.0 on 2026-10-18 18:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0039_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='track',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='When the track or any of its segments last changed', verbose_name='updated at'),
+            preserve_default=False,
+        ),
+        # tracks are also inserted with raw SQL, e.g. by smb-backend
+        migrations.RunSQL(
+            "ALTER TABLE tracks_track ALTER COLUMN updated_at "
+            "SET DEFAULT now()",
+            reverse_sql=(
+                "ALTER TABLE tracks_track ALTER COLUMN updated_at "
+                "DROP DEFAULT"
+            ),
+        ),
+    ]
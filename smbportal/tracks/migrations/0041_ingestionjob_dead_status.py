@@ -0,0 +1,18 @@
+# Generated by Django 2.0 on 2026-10-18 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracks', '0040_track_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingestionjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'pending'), ('processing', 'processing'), ('done', 'done'), ('failed', 'failed'), ('dead', 'dead')], default='pending', max_length=20, verbose_name='status'),
+        ),
+    ]
@@ -32,12 +32,36 @@ VEHICLE_CHOICES = (
 )
 
 
+class TrackQuerySet(models.QuerySet):
+
+    def exclude_in_progress(self):
+        """Exclude tracks whose chunks are still being ingested
+
+        Chunked ingestion (see ``faas.chunked``) stores the end date of a
+        track with each chunk, but only sets its start date once the last
+        chunk has been stored. Older tracks stored without a start date
+        have no end date either and are thus kept.
+
+        """
+
+        return self.exclude(start_date__isnull=True, end_date__isnull=False)
+
+
 class Track(models.Model):
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # The column defaults to now() in the database, for tracks inserted with
+    # raw SQL. Raw SQL that modifies a track or its segments, such as that of
+    # faas and smb-backend, must set it as well, since it is used as the
+    # cache validator of the track API endpoints
+    updated_at = models.DateTimeField(
+        _("updated at"),
+        auto_now=True,
+        help_text=_("When the track or any of its segments last changed"),
+    )
     session_id = models.BigIntegerField(
         _("session id"),
         unique=True
@@ -105,8 +129,13 @@ class Track(models.Model):
         help_text=_("Reason for the track not being valid")
     )
 
+    objects = TrackQuerySet.as_manager()
+
     class Meta:
         ordering = ["-start_date"]
+        indexes = [
+            models.Index(fields=["-start_date", "-id"]),
+        ]
 
 
 class CollectedPoint(gismodels.Model):
@@ -154,6 +183,49 @@ class CollectedPoint(gismodels.Model):
         ordering = ["timestamp"]
 
 
+class SensorChannel(models.Model):
+    """Compact storage of a track's collected points
+
+    Each channel stores the values of a :model:`tracks.CollectedPoint`
+    field for all of a track's points, as a compressed array. Channels are
+    encoded and decoded by the ``faas.sensorarrays`` module.
+
+    """
+
+    track = models.ForeignKey(
+        "Track",
+        on_delete=models.CASCADE,
+        verbose_name=_("track"),
+        related_name="sensor_channels",
+    )
+    name = models.CharField(
+        _("name"),
+        max_length=50,
+        help_text=_("Name of the collected point field")
+    )
+    dtype = models.CharField(
+        _("data type"),
+        max_length=10,
+        help_text=_("NumPy data type of the array's values")
+    )
+    encoding = models.CharField(
+        _("encoding"),
+        max_length=20,
+    )
+    num_values = models.PositiveIntegerField(
+        _("number of values"),
+    )
+    data = models.BinaryField(
+        _("data"),
+    )
+
+    class Meta:
+        unique_together = ("track", "name")
+
+    def __str__(self):
+        return "{0.track_id} - {0.name}".format(self)
+
+
 class Segment(gismodels.Model):
     """Stores a computed segment from a track.
 
@@ -188,6 +260,24 @@ class Segment(gismodels.Model):
     geom = gismodels.LineStringField(
         _("geometry"),
     )
+    geom_z10 = gismodels.LineStringField(
+        _("geometry at zoom 10"),
+        null=True,
+        blank=True,
+        help_text=_("geometry simplified for maps at zoom level 10"),
+    )
+    geom_z13 = gismodels.LineStringField(
+        _("geometry at zoom 13"),
+        null=True,
+        blank=True,
+        help_text=_("geometry simplified for maps at zoom level 13"),
+    )
+    geom_z16 = gismodels.LineStringField(
+        _("geometry at zoom 16"),
+        null=True,
+        blank=True,
+        help_text=_("geometry simplified for maps at zoom level 16"),
+    )
     start_date = models.DateTimeField(
         _("start date"),
         help_text=_("timestamp of first collected point of the segment"),
@@ -199,6 +289,9 @@ class Segment(gismodels.Model):
 
     class Meta:
         ordering = ["start_date"]
+        indexes = [
+            models.Index(fields=["start_date", "id"]),
+        ]
 
     @property
     def duration(self):
@@ -355,3 +448,258 @@ class Health(models.Model):
 
     def __str__(self):
         return "{0.segment} - {0.benefit_index}".format(self)
+
+
+class IngestionJob(models.Model):
+    """A track upload waiting to be ingested by the ``faas.worker`` module
+
+    Jobs are claimed by workers with ``SELECT ... FOR UPDATE SKIP LOCKED``,
+    so that multiple workers may drain the table concurrently. Jobs that have
+    been claimed too many times without finishing, e.g. because processing
+    them kills the worker, are given up as dead.
+
+    """
+
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+    DEAD = "dead"
+    STATUS_CHOICES = (
+        (PENDING, _("pending")),
+        (PROCESSING, _("processing")),
+        (DONE, _("done")),
+        (FAILED, _("failed")),
+        (DEAD, _("dead")),
+    )
+
+    bucket = models.CharField(
+        _("bucket"),
+        max_length=255,
+    )
+    object_key = models.CharField(
+        _("object key"),
+        max_length=1024,
+    )
+    status = models.CharField(
+        _("status"),
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+    )
+    enqueued_at = models.DateTimeField(
+        _("enqueued at"),
+        auto_now_add=True
+    )
+    claimed_at = models.DateTimeField(
+        _("claimed at"),
+        null=True,
+        blank=True,
+        help_text=_("When the job was last claimed by a worker")
+    )
+    finished_at = models.DateTimeField(
+        _("finished at"),
+        null=True,
+        blank=True,
+    )
+    attempts = models.PositiveIntegerField(
+        _("attempts"),
+        default=0,
+    )
+    error = models.TextField(
+        _("error"),
+        blank=True,
+    )
+    track = models.ForeignKey(
+        "Track",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name=_("track"),
+    )
+
+    class Meta:
+        ordering = [
+            "id",
+        ]
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
+
+    def __str__(self):
+        return "{0.bucket}/{0.object_key} - {0.status}".format(self)
+
+
+class IngestionRecord(models.Model):
+    """Ledger entry for the ingestion of an uploaded track data file
+
+    Records are managed by the ``faas.ledger`` module. They are used to skip
+    duplicate upload notifications and to resume failed ingestions.
+
+    """
+
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+    STATUS_CHOICES = (
+        (PROCESSING, _("processing")),
+        (DONE, _("done")),
+        (FAILED, _("failed")),
+        (SKIPPED, _("skipped")),
+    )
+
+    bucket = models.CharField(
+        _("bucket"),
+        max_length=255,
+    )
+    object_key = models.CharField(
+        _("object key"),
+        max_length=1024,
+    )
+    etag = models.CharField(
+        _("ETag"),
+        max_length=255,
+        help_text=_("ETag of the uploaded S3 object")
+    )
+    session_id = models.BigIntegerField(
+        _("session id"),
+        null=True,
+        blank=True,
+    )
+    track = models.ForeignKey(
+        "Track",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name=_("track"),
+    )
+    status = models.CharField(
+        _("status"),
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=PROCESSING,
+    )
+    stage = models.CharField(
+        _("stage"),
+        max_length=20,
+        blank=True,
+        help_text=_("Last ingestion stage that has been completed")
+    )
+    attempts = models.PositiveIntegerField(
+        _("attempts"),
+        default=0,
+    )
+    error = models.TextField(
+        _("error"),
+        blank=True,
+    )
+    started_at = models.DateTimeField(
+        _("started at"),
+        help_text=_("When the last ingestion attempt started")
+    )
+    finished_at = models.DateTimeField(
+        _("finished at"),
+        null=True,
+        blank=True,
+    )
+    timings = JSONField(
+        _("timings"),
+        default=dict,
+        blank=True,
+        help_text=_("Duration of each ingestion stage, measured in seconds")
+    )
+
+    class Meta:
+        unique_together = ("object_key", "etag")
+        ordering = [
+            "-started_at",
+        ]
+
+    def __str__(self):
+        return "{0.object_key} ({0.etag}) - {0.status}".format(self)
+
+
+class IngestionFailure(models.Model):
+    """Failed ingestion of an uploaded track data file
+
+    Failures are managed by the ``faas.failures`` module, which retries them
+    with exponential backoff until they succeed or run out of attempts, at
+    which point they become dead letters.
+
+    """
+
+    RETRYING = "retrying"
+    DEAD = "dead"
+    RESOLVED = "resolved"
+    STATUS_CHOICES = (
+        (RETRYING, _("retrying")),
+        (DEAD, _("dead")),
+        (RESOLVED, _("resolved")),
+    )
+
+    bucket = models.CharField(
+        _("bucket"),
+        max_length=255,
+    )
+    object_key = models.CharField(
+        _("object key"),
+        max_length=1024,
+    )
+    status = models.CharField(
+        _("status"),
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=RETRYING,
+    )
+    stage = models.CharField(
+        _("stage"),
+        max_length=20,
+        blank=True,
+        help_text=_("Ingestion stage that failed")
+    )
+    exception = models.CharField(
+        _("exception"),
+        max_length=255,
+        blank=True,
+        help_text=_("Type of the exception that was raised")
+    )
+    error = models.TextField(
+        _("error"),
+        blank=True,
+    )
+    attempts = models.PositiveIntegerField(
+        _("attempts"),
+        default=0,
+    )
+    first_failed_at = models.DateTimeField(
+        _("first failed at"),
+    )
+    last_failed_at = models.DateTimeField(
+        _("last failed at"),
+    )
+    next_attempt_at = models.DateTimeField(
+        _("next attempt at"),
+        null=True,
+        blank=True,
+    )
+    track = models.ForeignKey(
+        "Track",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name=_("track"),
+        help_text=_("Track created by the retry that succeeded")
+    )
+
+    class Meta:
+        unique_together = ("bucket", "object_key")
+        ordering = [
+            "-last_failed_at",
+        ]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return "{0.bucket}/{0.object_key} - {0.status}".format(self)
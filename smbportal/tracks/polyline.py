@@ -0,0 +1,126 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Encoded polylines
+
+Geometries are encoded with Google's encoded polyline algorithm, which
+stores the difference between consecutive coordinates, rounded to
+``precision`` decimal digits, as a sequence of printable ASCII characters.
+As in Google's format, each vertex is encoded as ``latitude, longitude``,
+while the functions of this module take and return ``(x, y)`` coordinates,
+like GEOS geometries.
+
+Sequences of integers, such as timestamps, are delta-encoded with the same
+algorithm by ``encode_values``.
+
+"""
+
+from typing import Iterable
+from typing import List
+from typing import Tuple
+
+DEFAULT_PRECISION = 5
+
+MAX_PRECISION = 7
+
+
+def encode(coordinates: Iterable[Tuple[float, float]],
+           precision: int = DEFAULT_PRECISION) -> str:
+    """Encode ``(x, y)`` coordinates as a polyline
+
+    >>> encode([(-120.2, 38.5), (-120.95, 40.7), (-126.453, 43.252)])
+    '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+    """
+
+    factor = 10 ** precision
+    chunks = []
+    previous_x = previous_y = 0
+    for x, y, *_ in coordinates:
+        current_x = round(x * factor)
+        current_y = round(y * factor)
+        _encode_number(current_y - previous_y, chunks)
+        _encode_number(current_x - previous_x, chunks)
+        previous_x = current_x
+        previous_y = current_y
+    return "".join(chunks)
+
+
+def decode(polyline: str,
+           precision: int = DEFAULT_PRECISION) -> List[Tuple[float, float]]:
+    """Decode a polyline into ``(x, y)`` coordinates
+
+    >>> decode("_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+    [(-120.2, 38.5), (-120.95, 40.7), (-126.453, 43.252)]
+
+    """
+
+    factor = 10 ** precision
+    values = _decode_numbers(polyline)
+    coordinates = []
+    x = y = 0
+    for index in range(0, len(values) - 1, 2):
+        y += values[index]
+        x += values[index + 1]
+        coordinates.append((x / factor, y / factor))
+    return coordinates
+
+
+def encode_values(values: Iterable[int]) -> str:
+    """Delta-encode a sequence of integers
+
+    >>> encode_values([1526312460000, 1526312461000, 1526312462500])
+    '_mn~h~ywAo}@w|A'
+
+    """
+
+    chunks = []
+    previous = 0
+    for value in values:
+        _encode_number(value - previous, chunks)
+        previous = value
+    return "".join(chunks)
+
+
+def decode_values(encoded: str) -> List[int]:
+    """Decode a sequence of integers encoded by ``encode_values``
+
+    >>> decode_values("_mn~h~ywAo}@w|A")
+    [1526312460000, 1526312461000, 1526312462500]
+
+    """
+
+    result = []
+    current = 0
+    for delta in _decode_numbers(encoded):
+        current += delta
+        result.append(current)
+    return result
+
+
+def _encode_number(value: int, chunks: List[str]):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+
+
+def _decode_numbers(encoded: str) -> List[int]:
+    numbers = []
+    value = shift = 0
+    for char in encoded:
+        chunk = ord(char) - 63
+        value |= (chunk & 0x1f) << shift
+        shift += 5
+        if chunk < 0x20:
+            numbers.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    return numbers
@@ -17,6 +17,8 @@ from rest_framework import mixins
 from rest_framework import viewsets
 from rest_framework_gis.pagination import GeoJsonPagination
 
+from base.pagination import CursorPagination
+
 from .. import models
 from . import filters
 from . import serializers
@@ -54,6 +56,8 @@ class BikeObservationViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
         "vehiclemonitor.can_list_own_bike_observation"
     )
     queryset = models.BikeObservation.objects.all()
+    pagination_class = CursorPagination
+    cursor_ordering = ("-observed_at", "-id")
 
     def perform_create(self, serializer):
         serializer.save(reporter_name=self.request.user.email, reporter_id=self.request.user.pk)
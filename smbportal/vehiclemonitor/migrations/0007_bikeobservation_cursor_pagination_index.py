@@ -0,0 +1,17 @@
+# Generated by Django 2.0 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiclemonitor', '0006_auto_20180711_2210'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bikeobservation',
+            index=models.Index(fields=['-observed_at', '-id'], name='vehiclemoni_observe_d838da_idx'),
+        ),
+    ]
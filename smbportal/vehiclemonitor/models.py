@@ -69,6 +69,9 @@ class BikeObservation(gis_models.Model):
         ordering = (
             "-observed_at",
         )
+        indexes = [
+            models.Index(fields=["-observed_at", "-id"]),
+        ]
 
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None):
@@ -14,6 +14,8 @@ from django.db.models import Q
 from rest_framework import mixins
 from rest_framework import viewsets
 
+from base.pagination import CursorPagination
+
 from . import filters
 from . import serializers
 from .. import models
@@ -121,6 +123,8 @@ class BikeStatusViewSet(viewsets.ReadOnlyModelViewSet):
     required_permissions = (
         "vehicles.can_list_bike_status",
     )
+    pagination_class = CursorPagination
+    cursor_ordering = ("-creation_date", "-id")
 
     def get_queryset(self):
         return models.BikeStatus.objects.all()
@@ -0,0 +1,17 @@
+# Generated by Django 2.0 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0020_bike_last_position_db_constraint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bikestatus',
+            index=models.Index(fields=['-creation_date', '-id'], name='vehicles_bi_creatio_dd0f49_idx'),
+        ),
+    ]
@@ -38,12 +38,16 @@ class Vehicle(models.Model):
         unique=True,
         null=False
     )
+    # collected points are stored in a partitioned table, where ids are not
+    # guaranteed to be unique, so they cannot be referenced by a database
+    # constraint
     last_position = models.ForeignKey(
         "tracks.CollectedPoint",
         models.CASCADE,
         verbose_name=_("last position"),
         blank=True,
-        null=True
+        null=True,
+        db_constraint=False
     )
 
     def save(self, *args, **kwargs):
@@ -273,6 +277,9 @@ class BikeStatus(models.Model):
         ordering = [
             "-creation_date",
         ]
+        indexes = [
+            models.Index(fields=["-creation_date", "-id"]),
+        ]
 
 
 class PhysicalTag(models.Model):
@@ -0,0 +1,77 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Fixtures for the performance benchmarks
+
+Benchmarks use the test database and are meant to be run explicitly, with:
+
+    py.test -m benchmark -s tests/benchmarks
+
+"""
+
+import time
+
+from bossoidc.models import Keycloak
+import pytest
+
+from faas import synthetic
+from tracks.models import Track
+
+# object keys of uploads include the owner's UID, which is 36 characters long
+TRACK_OWNER_UID = "keycloakuuid-bench-00000000000000123"
+
+
+@pytest.fixture
+def point_generator():
+    return synthetic.generate_points
+
+
+@pytest.fixture
+def point_iterator():
+    return synthetic.iter_points
+
+
+@pytest.fixture
+def upload_builder():
+    return synthetic.build_upload
+
+
+@pytest.fixture
+def upload_writer():
+    return synthetic.write_upload
+
+
+@pytest.fixture
+def track_owner(db, django_user_model):
+    user = django_user_model.objects.create(username="benchmarker")
+    Keycloak.objects.create(user=user, UID=TRACK_OWNER_UID)
+    return user
+
+
+@pytest.fixture
+def track_factory(track_owner):
+    counter = iter(range(1, 1_000_000))
+
+    def factory():
+        return Track.objects.create(
+            owner=track_owner, session_id=next(counter))
+
+    return factory
+
+
+@pytest.fixture
+def stopwatch():
+
+    def timer(func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        return time.perf_counter() - start, result
+
+    return timer
@@ -0,0 +1,67 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import tracemalloc
+
+from django.db import connection
+import pytest
+
+from faas import datareceiver
+from faas import storage
+
+pytestmark = pytest.mark.benchmark
+
+BUCKET = "smb-uploads"
+
+
+def _get_db_connection():
+    settings = connection.settings_dict
+    return datareceiver.get_db_connection(
+        dbname=settings["NAME"],
+        user=settings["USER"],
+        password=settings["PASSWORD"],
+        host=settings["HOST"] or "localhost",
+        port=str(settings["PORT"] or "5432")
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_chunked_ingestion_memory_does_not_grow_with_track_length(
+        tmp_path, track_owner, point_iterator, upload_writer, stopwatch):
+    object_store = storage.LocalObjectStore(tmp_path)
+    db_connection = _get_db_connection()
+    peaks = {}
+    for session_id, num_points in enumerate([100_000, 1_000_000], start=1):
+        object_key = "cognito/smb/{}/{}.zip".format(
+            track_owner.keycloak.UID, session_id)
+        upload_writer(
+            point_iterator(
+                num_points, session_id=session_id,
+                vehicle_modes=("1", "2", "4")
+            ),
+            tmp_path / BUCKET / object_key
+        )
+        tracemalloc.start()
+        elapsed = stopwatch(
+            datareceiver.handle_track_upload,
+            BUCKET,
+            object_key,
+            db_connection,
+            object_store=object_store,
+            options=datareceiver.IngestionOptions(points_per_chunk=50_000)
+        )[0]
+        peaks[num_points] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(
+            "\n{} points - {:.1f} points/s - peak memory: {:.1f} MB".format(
+                num_points, num_points / elapsed, peaks[num_points] / 1e6)
+        )
+    db_connection.close()
+    assert peaks[1_000_000] < 2 * peaks[100_000]
@@ -0,0 +1,40 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from django.db import connection
+import pytest
+
+from faas import datareceiver
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.mark.parametrize("num_points", [1_000, 10_000, 100_000])
+@pytest.mark.django_db
+def test_collected_points_insertion(num_points, point_generator,
+                                    track_factory, stopwatch):
+    points = point_generator(num_points)
+    timings = {}
+    for name, handler in {
+        "per-row": datareceiver.insert_collected_points,
+        "copy": datareceiver.insert_collected_points_bulk,
+    }.items():
+        with connection.cursor() as cursor:
+            timings[name] = stopwatch(
+                handler, track_factory().id, points, cursor)[0]
+    print(
+        "\n{} points - per-row: {:.3f}s - copy: {:.3f}s - "
+        "speedup: {:.1f}x".format(
+            num_points,
+            timings["per-row"],
+            timings["copy"],
+            timings["per-row"] / timings["copy"]
+        )
+    )
@@ -0,0 +1,121 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import pathlib
+from xml.etree import ElementTree
+
+from django.db import connection
+import numpy as np
+import pytest
+
+from faas import columnar
+from faas import datareceiver
+from faas import decimation
+from faas._constants import VehicleType
+from tracks.models import CollectedPoint
+
+pytestmark = pytest.mark.benchmark
+
+GPX_PATH = pathlib.Path(__file__).parents[1] / "data" / "tracks.gpx"
+
+GPX_NAMESPACES = {"gpx": "http://www.topografix.com/GPX/1/0"}
+
+
+def _load_fixture_tracks(min_points=20):
+    """Load the timestamped track segments of the GPX fixture as track data
+
+    The first half of each track is ridden by bike and the second half is
+    walked, so that there is a vehicle mode change to preserve.
+
+    """
+
+    root = ElementTree.parse(str(GPX_PATH)).getroot()
+    result = []
+    for segment in root.iterfind(".//gpx:trkseg", GPX_NAMESPACES):
+        points = segment.findall("gpx:trkpt", GPX_NAMESPACES)
+        times = [point.find("gpx:time", GPX_NAMESPACES) for point in points]
+        if len(points) < min_points or any(time is None for time in times):
+            continue
+        num_points = len(points)
+        track_data = {
+            name: np.zeros(num_points, dtype=type_)
+            for name, type_ in columnar.COLUMN_TYPES.items()
+        }
+        track_data["longitude"] = np.array(
+            [float(point.get("lon")) for point in points])
+        track_data["latitude"] = np.array(
+            [float(point.get("lat")) for point in points])
+        track_data["timeStamp"] = np.array(
+            [time.text.rstrip("Z") for time in times],
+            dtype=columnar.COLUMN_TYPES["timeStamp"]
+        )
+        track_data["vehicleMode"] = np.where(
+            np.arange(num_points) < num_points // 2,
+            VehicleType.bike.value,
+            VehicleType.foot.value
+        ).astype(columnar.COLUMN_TYPES["vehicleMode"])
+        track_data["accuracy"][:] = 5
+        result.append(track_data)
+    return result
+
+
+def _ingest(track, track_data):
+    with connection.cursor() as cursor:
+        datareceiver.insert_collected_point_columns(
+            track.id, track_data, cursor)
+        datareceiver.insert_segments(
+            track.id, track.owner.keycloak.UID, cursor)
+        datareceiver.update_track_aggregated_data(track.id, cursor)
+    track.refresh_from_db()
+    return track
+
+
+@pytest.mark.django_db
+def test_decimation_of_fixture_tracks(track_factory, stopwatch):
+    fixture_tracks = _load_fixture_tracks()
+    assert len(fixture_tracks) > 0
+    totals = {"points": 0, "kept": 0, "length": 0, "decimated_length": 0}
+    print(
+        "\npoints -> kept (reduction) - length drift - duration drift - "
+        "decimation time")
+    for track_data in fixture_tracks:
+        elapsed, decimated = stopwatch(decimation.decimate, track_data)
+        full = _ingest(track_factory(), track_data)
+        reduced = _ingest(track_factory(), decimated)
+        num_points = CollectedPoint.objects.filter(track=full).count()
+        num_kept = CollectedPoint.objects.filter(track=reduced).count()
+        length_drift = (reduced.length - full.length) / full.length
+        duration_drift = reduced.duration - full.duration
+        print(
+            "{:>6} -> {:>5} ({:.1%}) - {:+.2%} - {:+.3f} min - "
+            "{:.1f} ms".format(
+                num_points,
+                num_kept,
+                1 - num_kept / num_points,
+                length_drift,
+                duration_drift,
+                elapsed * 1000
+            )
+        )
+        totals["points"] += num_points
+        totals["kept"] += num_kept
+        totals["length"] += full.length
+        totals["decimated_length"] += reduced.length
+        assert duration_drift == 0
+        assert full.segments.count() == reduced.segments.count()
+    print(
+        "total: {} -> {} points ({:.1%} fewer rows) - length drift: "
+        "{:+.2%}".format(
+            totals["points"],
+            totals["kept"],
+            1 - totals["kept"] / totals["points"],
+            totals["decimated_length"] / totals["length"] - 1
+        )
+    )
@@ -0,0 +1,53 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import json
+
+from django.db import connection
+import pytest
+
+from faas import benchmark
+from faas import datareceiver
+from tracks.models import Track
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.mark.parametrize("options", [
+    datareceiver.IngestionOptions(),
+    datareceiver.IngestionOptions(columnar=True, validation={}),
+])
+@pytest.mark.django_db(transaction=True)
+def test_ingestion_throughput(options, track_owner):
+    settings = connection.settings_dict
+    db_connection = datareceiver.get_db_connection(
+        settings["NAME"],
+        settings["USER"],
+        settings["PASSWORD"],
+        host=settings["HOST"] or "localhost",
+        port=str(settings["PORT"] or "5432")
+    )
+    try:
+        results = benchmark.run_benchmark(
+            db_connection,
+            track_owner.keycloak.UID,
+            num_tracks=20,
+            num_points=2000,
+            options=options,
+            vehicle_modes=("1", "2", "4")
+        )
+    finally:
+        db_connection.close()
+    print("\n{}: {}".format(options, json.dumps(results, indent=2)))
+    assert results["failures"] == []
+    assert results["num_points"] == 20 * 2000
+    assert {"parse", "point_insert", "segmentation", "metrics"} <= set(
+        results["stages"])
+    assert Track.objects.count() == 0
@@ -0,0 +1,63 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from django.db import connection
+import pytest
+
+from faas import loadtest
+from faas import storage
+from tracks.models import Track
+
+pytestmark = pytest.mark.benchmark
+
+BUCKET = "smb-uploads"
+
+
+@pytest.mark.parametrize("num_processes", [1, 4])
+@pytest.mark.django_db(transaction=True)
+def test_replay_recorded_uploads(num_processes, tmp_path, track_owner,
+                                 point_generator, upload_builder):
+    num_uploads = 200
+    object_store = storage.LocalObjectStore(tmp_path)
+    for session_id in range(1, num_uploads + 1):
+        object_store.put(
+            BUCKET,
+            "cognito/smb/{}/{}.zip".format(
+                track_owner.keycloak.UID, session_id),
+            upload_builder(
+                point_generator(500, session_id=session_id, seed=session_id))
+        )
+    settings = connection.settings_dict
+    stats = loadtest.replay_uploads(
+        object_store,
+        BUCKET,
+        {
+            "dbname": settings["NAME"],
+            "user": settings["USER"],
+            "password": settings["PASSWORD"],
+            "host": settings["HOST"] or "localhost",
+            "port": str(settings["PORT"] or "5432"),
+            "max_size": 1,
+        },
+        num_processes=num_processes
+    )
+    print(
+        "\n{} processes - {} uploads - {:.1f} uploads/s - latency "
+        "p50: {:.3f}s, p95: {:.3f}s, p99: {:.3f}s".format(
+            num_processes,
+            num_uploads,
+            stats.jobs_per_second,
+            stats.latency_p50,
+            stats.latency_p95,
+            stats.latency_p99
+        )
+    )
+    assert stats.failed == 0
+    assert Track.objects.count() == num_uploads
@@ -0,0 +1,55 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import datetime as dt
+
+import pytest
+
+from faas import columnar
+from faas import datareceiver
+
+pytestmark = pytest.mark.benchmark
+
+
+def _parse_rows(lines):
+    """Parse track data and convert its values one row at a time"""
+    result = []
+    for pt in datareceiver.parse_track_data(lines):
+        values = [float(value) for value in pt[:17]]
+        values.extend(float(value) for value in pt[18:20])
+        values.append(int(pt.sessionId))
+        values.append(
+            dt.datetime.fromtimestamp(
+                int(pt.timeStamp) / 1000, dt.timezone.utc))
+        values.append(datareceiver._get_vehicle_type(pt.vehicleMode))
+        result.append(values)
+    return result
+
+
+@pytest.mark.parametrize("num_points", [10_000, 100_000, 1_000_000])
+def test_parser_throughput(num_points, point_generator, stopwatch):
+    template = point_generator(
+        1_000, vehicle_modes=("1", "2", "3", "4", "5", "6"))
+    lines = [",".join(datareceiver.PointData._fields)]
+    lines.extend(
+        ",".join(template[index % len(template)])
+        for index in range(num_points)
+    )
+    row_time = stopwatch(_parse_rows, lines)[0]
+    columnar_time, columns = stopwatch(columnar.parse_track_data, lines)
+    print(
+        "\n{} points - per-row: {:,.0f} points/s - "
+        "columnar: {:,.0f} points/s".format(
+            num_points,
+            num_points / row_time,
+            num_points / columnar_time
+        )
+    )
+    assert columnar.get_num_points(columns) == num_points
@@ -0,0 +1,40 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from django.db import connection
+import pytest
+
+from faas import datareceiver
+from faas import segmentmetrics
+
+pytestmark = pytest.mark.benchmark
+
+VEHICLE_MODES = ("1", "2", "3", "4", "5", "6")
+
+
+@pytest.mark.parametrize("num_segments", [10, 100, 1_000])
+@pytest.mark.django_db
+def test_segment_metrics_calculation(num_segments, point_generator,
+                                     track_factory, stopwatch):
+    track = track_factory()
+    points = point_generator(
+        num_segments * 20,
+        vehicle_modes=VEHICLE_MODES * (num_segments // len(VEHICLE_MODES) + 1)
+    )
+    with connection.cursor() as cursor:
+        datareceiver.insert_collected_points_bulk(track.id, points, cursor)
+        datareceiver.insert_segments(
+            track.id, track.owner.keycloak.UID, cursor)
+        elapsed, num_calculated = stopwatch(
+            segmentmetrics.insert_segments_data, track.id, cursor)
+    print(
+        "\n{} segments - {:.3f}s, {:,.0f} segments/s".format(
+            num_calculated, elapsed, num_calculated / elapsed)
+    )
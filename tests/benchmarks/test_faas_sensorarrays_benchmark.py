@@ -0,0 +1,85 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from django.db import connection
+import pytest
+
+from dashboard import exporter
+from faas import columnar
+from faas import datareceiver
+from faas import sensorarrays
+from tracks.collectedpoints import get_collected_points
+from tracks.models import CollectedPoint
+
+pytestmark = pytest.mark.benchmark
+
+
+def _parse(points):
+    lines = [",".join(datareceiver.PointData._fields)]
+    lines.extend(",".join(point) for point in points)
+    return columnar.parse_track_data(lines)
+
+
+@pytest.mark.parametrize("num_points", [1_000, 10_000, 100_000])
+@pytest.mark.django_db
+def test_sensor_arrays_storage_and_export(num_points, point_generator,
+                                          track_factory, stopwatch,
+                                          tmp_path):
+    track_data = _parse(point_generator(num_points))
+    row_track_id = track_factory().id
+    compact_track_id = track_factory().id
+    with connection.cursor() as cursor:
+        datareceiver.insert_collected_point_columns(
+            row_track_id, track_data, cursor)
+        insert_time = stopwatch(
+            sensorarrays.insert_track_channels,
+            compact_track_id, track_data, cursor
+        )[0]
+        cursor.execute(
+            "SELECT sum(pg_column_size(p.*)) FROM tracks_collectedpoint AS p "
+            "WHERE track_id = %s",
+            (row_track_id,)
+        )
+        row_bytes = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT sum(pg_column_size(c.*)) FROM tracks_sensorchannel AS c "
+            "WHERE track_id = %s",
+            (compact_track_id,)
+        )
+        compact_bytes = cursor.fetchone()[0]
+    row_export_time = stopwatch(
+        exporter.export_collected_points,
+        CollectedPoint.objects.filter(track_id=row_track_id).iterator(),
+        tmp_path / "rows.csv"
+    )[0]
+    compact_export_time = stopwatch(
+        exporter.export_collected_points,
+        get_collected_points(tracks=[compact_track_id]),
+        tmp_path / "compact.csv"
+    )[0]
+    print(
+        "\n{} points - storage rows: {:.1f} B/point - sensor arrays: "
+        "{:.1f} B/point ({:.1f}x smaller, channel insertion {:.3f}s) - "
+        "export rows: {:.3f}s - sensor arrays: {:.3f}s".format(
+            num_points,
+            row_bytes / num_points,
+            compact_bytes / num_points,
+            row_bytes / compact_bytes,
+            insert_time,
+            row_export_time,
+            compact_export_time
+        )
+    )
+    with (tmp_path / "rows.csv").open() as fh:
+        num_row_lines = sum(1 for _ in fh)
+    with (tmp_path / "compact.csv").open() as fh:
+        num_compact_lines = sum(1 for _ in fh)
+    assert num_row_lines == num_compact_lines == num_points + 1
+    assert compact_bytes < row_bytes
@@ -0,0 +1,93 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import time
+import tracemalloc
+import zipfile
+
+import pytest
+
+from faas import datareceiver
+
+pytestmark = pytest.mark.benchmark
+
+MEGABYTE = 1024 * 1024
+
+
+def _read_concatenated(archive):
+    """Read track data like ``retrieve_track_data`` used to do"""
+    result = ""
+    with zipfile.ZipFile(archive) as zip_handler:
+        for member_name in zip_handler.namelist():
+            result += zip_handler.read(member_name).decode("utf-8")
+    return datareceiver.parse_track_data(result)
+
+
+def _read_streamed(archive):
+    points = datareceiver.iter_track_points(
+        datareceiver.iter_track_data_lines(archive))
+    return sum(1 for _ in points)
+
+
+def _measure(func, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with path.open("rb") as archive:
+        func(archive)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+@pytest.fixture
+def archive_factory(tmp_path, point_generator):
+
+    def factory(size_mb, num_members):
+        line_template = ",".join(
+            str(i) for i in point_generator(1)[0]) + "\n"
+        header = ",".join(datareceiver.PointData._fields) + "\n"
+        member_size = size_mb * MEGABYTE // num_members
+        lines_per_member = member_size // len(line_template)
+        path = tmp_path / "track-{}mb.zip".format(size_mb)
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_handler:
+            for index in range(num_members):
+                member_name = "part-{}.csv".format(index)
+                with zip_handler.open(member_name, "w") as member:
+                    if index == 0:
+                        member.write(header.encode("utf-8"))
+                    chunk = (line_template * 1000).encode("utf-8")
+                    for _ in range(lines_per_member // 1000):
+                        member.write(chunk)
+        return path
+
+    return factory
+
+
+@pytest.mark.parametrize("size_mb, num_members", [
+    (50, 5),
+    (100, 10),
+])
+def test_zip_reader_peak_memory(size_mb, num_members, archive_factory):
+    path = archive_factory(size_mb, num_members)
+    concatenated_time, concatenated_peak = _measure(_read_concatenated, path)
+    streamed_time, streamed_peak = _measure(_read_streamed, path)
+    print(
+        "\n{} MB in {} members - concatenated: {:.1f}s, {:.1f} MB peak - "
+        "streamed: {:.1f}s, {:.1f} MB peak".format(
+            size_mb,
+            num_members,
+            concatenated_time,
+            concatenated_peak / MEGABYTE,
+            streamed_time,
+            streamed_peak / MEGABYTE
+        )
+    )
+    assert streamed_peak < 10 * datareceiver.CHUNK_SIZE
@@ -0,0 +1,75 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import datetime as dt
+
+from django.contrib.gis.geos import LineString
+import pytest
+import pytz
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from tracks import models
+from tracks.api import renderers
+from tracks.api import serializers
+from tracks.api import views
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.mark.parametrize("num_segments, num_points", [
+    (50, 500),
+    (10, 5000),
+])
+@pytest.mark.django_db
+def test_polyline_payload(num_segments, num_points, point_generator,
+                          track_factory, stopwatch):
+    start = dt.datetime(2018, 5, 14, 15, 41, tzinfo=pytz.utc)
+    for index in range(num_segments):
+        track = track_factory()
+        points = point_generator(num_points, seed=index)
+        geom = LineString([
+            (float(point.longitude), float(point.latitude))
+            for point in points
+        ])
+        models.Segment.objects.create(
+            track=track,
+            user_uuid=track.owner.keycloak,
+            vehicle_type=models.BIKE,
+            geom=geom,
+            start_date=start,
+            end_date=start + dt.timedelta(seconds=num_points),
+        )
+    segments = list(views.get_segment_queryset())
+    request = Request(APIRequestFactory().get("/"))
+    print(
+        "\n{} segments of {} points: format - payload - serialization "
+        "time".format(num_segments, num_points)
+    )
+    sizes = {}
+    for name, renderer, polyline_options in [
+        ("geojson", JSONRenderer(), None),
+        ("polyline", renderers.PolylineJSONRenderer(),
+         renderers.PolylineOptions(precision=5, timestamps=False)),
+        ("polyline6", renderers.PolylineJSONRenderer(),
+         renderers.PolylineOptions(precision=6, timestamps=False)),
+    ]:
+        serializer = serializers.SegmentSerializer(
+            segments,
+            many=True,
+            context={"request": request, "polyline": polyline_options}
+        )
+        elapsed, payload = stopwatch(
+            lambda: renderer.render(serializer.data))
+        sizes[name] = len(payload)
+        print("{:>9} - {:>6.1f} KiB - {:.1f} ms".format(
+            name, len(payload) / 1024, elapsed * 1000))
+    assert sizes["polyline"] * 5 < sizes["geojson"]
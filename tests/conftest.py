@@ -24,3 +24,7 @@ def pytest_configure(config):
         "markers",
         "acceptance: Run only acceptance tests",
     )
+    config.addinivalue_line(
+        "markers",
+        "benchmark: Run only performance benchmarks",
+    )
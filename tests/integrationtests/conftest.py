@@ -1,11 +1,19 @@
+import datetime as dt
+from itertools import count
+
 from bossoidc.models import Keycloak
 from django.contrib.auth.models import Group
+from django.contrib.gis.geos import LineString
 import pytest
+import pytz
 from rest_framework.test import APIClient
 
 import profiles.models
+from tracks import models as tracks_models
 from vehicles.models import Bike
 
+TRACK_START = dt.datetime(2018, 5, 14, 15, 41, tzinfo=pytz.utc)
+
 
 @pytest.fixture
 def api_client():
@@ -54,3 +62,49 @@ def bike_owned_by_end_user(db, end_user):
         owner=end_user
     )
     return bike
+
+
+@pytest.fixture
+def track_factory(db, end_user):
+    """Return a function that creates ten minute long tracks of the end user
+
+    Tracks get a segment for each of the input ``vehicle_types``, with a
+    straight geometry unless ``geom`` is given. Segments also get emissions,
+    costs and health data if ``metrics`` is true. Other keyword arguments
+    are set on each segment.
+
+    """
+
+    session_ids = count(1)
+
+    def factory(vehicle_types=(tracks_models.BIKE,), geom=None,
+                metrics=False, **segment_fields):
+        end_date = TRACK_START + dt.timedelta(minutes=10)
+        track = tracks_models.Track.objects.create(
+            owner=end_user,
+            session_id=next(session_ids),
+            start_date=TRACK_START,
+            end_date=end_date,
+            aggregated_emissions={},
+            aggregated_costs={},
+            aggregated_health={},
+        )
+        for vehicle_type in vehicle_types:
+            segment = tracks_models.Segment.objects.create(
+                track=track,
+                user_uuid=end_user.keycloak,
+                vehicle_type=vehicle_type,
+                geom=geom or LineString((10.5, 43.8), (10.6, 43.9)),
+                start_date=TRACK_START,
+                end_date=end_date,
+                **segment_fields
+            )
+            if metrics:
+                tracks_models.Emission.objects.create(segment=segment, co2=1)
+                tracks_models.Cost.objects.create(
+                    segment=segment, total_cost=1)
+                tracks_models.Health.objects.create(
+                    segment=segment, calories_consumed=1)
+        return track
+
+    return factory
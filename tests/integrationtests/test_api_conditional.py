@@ -0,0 +1,187 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Tests for conditional GET requests on the track and competition endpoints"""
+
+import datetime as dt
+
+from django.db.models import F
+import pytest
+import pytz
+from rest_framework.reverse import reverse
+
+from prizes import models as prizes_models
+from tracks import models
+
+pytestmark = pytest.mark.integration
+
+START = dt.datetime(2018, 5, 14, 15, 41, tzinfo=pytz.utc)
+
+
+def _touch(track):
+    models.Track.objects.filter(pk=track.pk).update(
+        updated_at=F("updated_at") + dt.timedelta(minutes=1))
+
+
+def _get_detail_urls(track):
+    segment = track.segments.get()
+    return [
+        reverse("api:my-tracks-detail", kwargs={"pk": track.pk}),
+        reverse("api:my-segments-detail", kwargs={"pk": segment.pk}),
+    ]
+
+
+def _get_list_urls():
+    return [
+        reverse("api:my-tracks-list"),
+        reverse("api:my-segments-list"),
+    ]
+
+
+def _get_urls(track):
+    return _get_detail_urls(track) + _get_list_urls()
+
+
+@pytest.mark.django_db
+def test_unmodified_resources_are_not_sent(api_client, end_user,
+                                           track_factory):
+    api_client.force_authenticate(user=end_user)
+    track = track_factory()
+    for url in _get_detail_urls(track):
+        response = api_client.get(url)
+        assert response.status_code == 200
+        etag = response["ETag"]
+        last_modified = response["Last-Modified"]
+        assert api_client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        assert api_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 304
+
+
+@pytest.mark.django_db
+def test_unmodified_lists_are_not_sent(api_client, end_user, track_factory):
+    api_client.force_authenticate(user=end_user)
+    track_factory()
+    for url in _get_list_urls():
+        response = api_client.get(url)
+        assert response.status_code == 200
+        # deleting an item does not change the most recent modification
+        assert "Last-Modified" not in response
+        assert api_client.get(
+            url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code == 304
+
+
+@pytest.mark.django_db
+def test_global_lists_have_no_validators(api_client, privileged_user,
+                                         end_user, track_factory):
+    api_client.force_authenticate(user=privileged_user)
+    track_factory()
+    for url in (reverse("api:tracks-list"), reverse("api:segments-list")):
+        response = api_client.get(url)
+        assert response.status_code == 200
+        assert "ETag" not in response
+
+
+@pytest.mark.django_db
+def test_modified_resources_are_sent(api_client, end_user, track_factory):
+    api_client.force_authenticate(user=end_user)
+    track = track_factory()
+    urls = _get_urls(track)
+    etags = [api_client.get(url)["ETag"] for url in urls]
+    _touch(track)
+    for url, etag in zip(urls, etags):
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_etag_depends_on_representation(api_client, end_user, track_factory):
+    api_client.force_authenticate(user=end_user)
+    track = track_factory()
+    url = reverse("api:my-tracks-detail", kwargs={"pk": track.pk})
+    etag = api_client.get(url)["ETag"]
+    for params in ({"format": "polyline"}, {"zoom": 10}):
+        response = api_client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_list_etag_changes_when_items_are_added(api_client, end_user,
+                                                track_factory):
+    api_client.force_authenticate(user=end_user)
+    track_factory()
+    url = reverse("api:my-tracks-list")
+    etag = api_client.get(url)["ETag"]
+    track_factory()
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_list_etag_changes_when_items_are_deleted(api_client, end_user,
+                                                  track_factory):
+    api_client.force_authenticate(user=end_user)
+    track_factory()
+    track = track_factory()
+    url = reverse("api:my-tracks-list")
+    etag = api_client.get(url)["ETag"]
+    api_client.delete(
+        reverse("api:my-tracks-detail", kwargs={"pk": track.pk}))
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_deleting_a_segment_modifies_its_track(api_client, end_user,
+                                               track_factory):
+    api_client.force_authenticate(user=end_user)
+    track = track_factory()
+    url = reverse("api:my-tracks-detail", kwargs={"pk": track.pk})
+    etag = api_client.get(url)["ETag"]
+    segment = track.segments.get()
+    api_client.delete(
+        reverse("api:my-segments-detail", kwargs={"pk": segment.pk}))
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def _create_competition():
+    return prizes_models.Competition.objects.create(
+        name="competition",
+        start_date=START,
+        end_date=START + dt.timedelta(days=30),
+        criteria=[prizes_models.Competition.CRITERIUM_BIKE_DISTANCE],
+    )
+
+
+def _get_updated_at(competition):
+    return prizes_models.Competition.objects.values_list(
+        "updated_at", flat=True).get(pk=competition.pk)
+
+
+@pytest.mark.django_db
+def test_related_changes_modify_competitions():
+    competition = _create_competition()
+    sponsor = prizes_models.Sponsor.objects.create(name="sponsor")
+    prize = prizes_models.Prize.objects.create(name="prize", sponsor=sponsor)
+    changes = [
+        lambda: competition.sponsors.add(sponsor),
+        lambda: prizes_models.CompetitionPrize.objects.create(
+            prize=prize, competition=competition),
+        lambda: prizes_models.Prize.objects.filter(pk=prize.pk).get().save(),
+        lambda: sponsor.save(),
+        lambda: sponsor.competition_set.clear(),
+        lambda: prize.delete(),
+    ]
+    for change in changes:
+        updated_at = _get_updated_at(competition)
+        change()
+        assert _get_updated_at(competition) > updated_at
@@ -0,0 +1,166 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Tests for the endpoints that are paginated with cursors
+
+Items that share the same value of the ordering field are spread over
+several pages, so that the id tie-breaker is exercised.
+
+"""
+
+import datetime as dt
+
+from django.contrib.gis.geos import LineString
+import pytest
+import pytz
+from rest_framework.reverse import reverse
+
+from tracks import models as tracks_models
+from vehiclemonitor import models as vehiclemonitor_models
+from vehicles import models as vehicles_models
+
+pytestmark = pytest.mark.integration
+
+NUM_ITEMS = 120
+
+START = dt.datetime(2018, 5, 14, 15, 41, tzinfo=pytz.utc)
+
+
+@pytest.fixture
+def superuser(db, django_user_model):
+    return django_user_model.objects.create(
+        username="admin", is_superuser=True)
+
+
+def _get_dates():
+    # every three consecutive items share the same date
+    return [
+        START + dt.timedelta(minutes=index // 3) for index in range(NUM_ITEMS)]
+
+
+def _walk_pages(api_client, url):
+    ids = []
+    num_pages = 0
+    while url is not None:
+        response = api_client.get(url)
+        assert response.status_code == 200
+        page = response.json()
+        assert "count" not in page
+        results = page["results"]
+        if isinstance(results, dict):  # GeoJSON feature collection
+            ids.extend(feature["id"] for feature in results["features"])
+        else:
+            ids.extend(item["id"] for item in results)
+        url = page["next"]
+        num_pages += 1
+    return ids, num_pages
+
+
+@pytest.mark.django_db
+def test_tracks_are_paginated_with_cursors(api_client, privileged_user,
+                                           end_user):
+    api_client.force_authenticate(user=privileged_user)
+    for index, start_date in enumerate(_get_dates()):
+        tracks_models.Track.objects.create(
+            owner=end_user,
+            session_id=index,
+            start_date=start_date,
+            aggregated_emissions={},
+            aggregated_costs={},
+            aggregated_health={},
+        )
+    # tracks without a start date are not listed
+    tracks_models.Track.objects.create(owner=end_user, session_id=1000)
+    ids, num_pages = _walk_pages(api_client, reverse("api:tracks-list"))
+    assert num_pages == 3
+    assert ids == list(
+        tracks_models.Track.objects.filter(
+            start_date__isnull=False
+        ).order_by(
+            "-start_date", "-id"
+        ).values_list(
+            "id", flat=True
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_segments_are_paginated_with_cursors(api_client, privileged_user,
+                                             end_user):
+    api_client.force_authenticate(user=privileged_user)
+    track = tracks_models.Track.objects.create(
+        owner=end_user,
+        session_id=1,
+        aggregated_emissions={},
+        aggregated_costs={},
+        aggregated_health={},
+    )
+    for start_date in reversed(_get_dates()):
+        tracks_models.Segment.objects.create(
+            track=track,
+            user_uuid=end_user.keycloak,
+            vehicle_type=tracks_models.BIKE,
+            geom=LineString((10.5, 43.8), (10.6, 43.9)),
+            start_date=start_date,
+            end_date=start_date + dt.timedelta(seconds=30),
+        )
+    ids, num_pages = _walk_pages(api_client, reverse("api:segments-list"))
+    assert num_pages == 3
+    assert ids == list(
+        tracks_models.Segment.objects.order_by(
+            "start_date", "id").values_list("id", flat=True)
+    )
+
+
+@pytest.mark.django_db
+def test_bike_observations_are_paginated_with_cursors(api_client, superuser,
+                                                      bike_owned_by_end_user):
+    api_client.force_authenticate(user=superuser)
+    for observed_at in _get_dates():
+        vehiclemonitor_models.BikeObservation.objects.create(
+            bike=bike_owned_by_end_user,
+            reporter_id=superuser.pk,
+            address="somewhere",
+            observed_at=observed_at,
+        )
+    ids, num_pages = _walk_pages(
+        api_client, reverse("api:bike-observations-list"))
+    assert num_pages == 3
+    assert ids == list(
+        vehiclemonitor_models.BikeObservation.objects.order_by(
+            "-observed_at", "-id").values_list("id", flat=True)
+    )
+
+
+@pytest.mark.django_db
+def test_bike_statuses_are_paginated_with_cursors(api_client, superuser,
+                                                  bike_owned_by_end_user):
+    api_client.force_authenticate(user=superuser)
+    for creation_date in _get_dates():
+        status = vehicles_models.BikeStatus.objects.create(
+            bike=bike_owned_by_end_user)
+        # the creation date is set automatically when saving
+        vehicles_models.BikeStatus.objects.filter(pk=status.pk).update(
+            creation_date=creation_date)
+    ids, num_pages = _walk_pages(
+        api_client, reverse("api:bike-statuses-list"))
+    assert num_pages == 3
+    assert ids == list(
+        vehicles_models.BikeStatus.objects.order_by(
+            "-creation_date", "-id").values_list("id", flat=True)
+    )
+
+
+@pytest.mark.django_db
+def test_invalid_cursor_is_rejected(api_client, privileged_user):
+    api_client.force_authenticate(user=privileged_user)
+    response = api_client.get(
+        reverse("api:segments-list"), {"cursor": "not-a-cursor"})
+    assert response.status_code == 404
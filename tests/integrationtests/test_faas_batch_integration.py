@@ -0,0 +1,97 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Tests for the batch ingestion of several track uploads"""
+
+import logging
+
+from bossoidc.models import Keycloak
+from django.db import connection
+import pytest
+
+from faas import batch
+from faas import datareceiver
+from faas import storage
+from faas import synthetic
+from tracks import models
+
+pytestmark = pytest.mark.integration
+
+BUCKET = "smb-uploads"
+# object keys include the owner's UID, which must be 36 characters long
+OWNER_UUID = "11111111-2222-3333-4444-555555555555"
+NUM_POINTS = 200
+
+
+@pytest.fixture
+def track_owner(db, django_user_model):
+    user = django_user_model.objects.create(username="uploader")
+    Keycloak.objects.create(user=user, UID=OWNER_UUID)
+    return user
+
+
+@pytest.fixture
+def db_connection():
+    settings = connection.settings_dict
+    db_connection = datareceiver.get_db_connection(
+        dbname=settings["NAME"],
+        user=settings["USER"],
+        password=settings["PASSWORD"],
+        host=settings["HOST"] or "localhost",
+        port=str(settings["PORT"] or "5432")
+    )
+    yield db_connection
+    db_connection.close()
+
+
+def _put_upload(object_store, name, points):
+    object_key = "cognito/smb/{}/{}.zip".format(OWNER_UUID, name)
+    object_store.put(BUCKET, object_key, synthetic.build_upload(points))
+    return object_key
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_batch_is_saved_one_track_at_a_time(track_owner,
+                                                   db_connection, caplog):
+    object_store = storage.InMemoryObjectStore()
+    points = {
+        session_id: synthetic.generate_points(
+            NUM_POINTS, session_id=session_id, vehicle_modes=("1", "2"),
+            seed=session_id
+        ) for session_id in (1, 2, 3)
+    }
+    # the database rejects the timestamp, so the whole batch fails
+    points[2][-1] = points[2][-1]._replace(timeStamp=str(10 ** 17))
+    object_keys = [
+        _put_upload(object_store, session_id, session_points)
+        for session_id, session_points in points.items()
+    ]
+    object_keys.append(_put_upload(object_store, "duplicate", points[1]))
+    with caplog.at_level(logging.ERROR, logger=batch.__name__):
+        results = batch.handle_track_uploads(
+            BUCKET, object_keys, db_connection, object_store=object_store,
+            metrics_sinks=[]
+        )
+    assert "saving them one at a time" in caplog.text
+    assert [result.status for result in results] == [
+        batch.INGESTED, batch.FAILED, batch.INGESTED, batch.SKIPPED]
+    assert "timestamp out of range" in results[1].error
+    assert results[3].track_id == results[0].track_id
+    tracks = models.Track.objects.order_by("session_id")
+    assert [track.session_id for track in tracks] == [1, 3]
+    for track in tracks:
+        assert models.CollectedPoint.objects.filter(
+            track=track).count() == NUM_POINTS
+        assert [
+            segment.vehicle_type for segment in track.segments.all()
+        ] == ["foot", "bike"]
+        assert track.aggregated_emissions is not None
+    assert not models.CollectedPoint.objects.filter(
+        sessionid=2).exists()
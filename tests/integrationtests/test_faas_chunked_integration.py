@@ -0,0 +1,120 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Tests for the chunked ingestion of long tracks
+
+Tracks ingested one chunk at a time, by means of
+``insert-staged-track-segments.sql`` and
+``update-staged-track-aggregates.sql``, must end up the same as those
+ingested in a single transaction.
+
+"""
+
+from django.db import connection
+import pytest
+
+from faas import chunked
+from faas import datareceiver
+from faas import synthetic
+from tracks import models
+
+pytestmark = pytest.mark.integration
+
+NUM_POINTS = 5000
+
+
+@pytest.fixture
+def db_connection():
+    settings = connection.settings_dict
+    db_connection = datareceiver.get_db_connection(
+        dbname=settings["NAME"],
+        user=settings["USER"],
+        password=settings["PASSWORD"],
+        host=settings["HOST"] or "localhost",
+        port=str(settings["PORT"] or "5432")
+    )
+    yield db_connection
+    db_connection.close()
+
+
+def _get_metrics(instance):
+    return {
+        field.name: getattr(instance, field.name)
+        for field in type(instance)._meta.concrete_fields
+        if field.name not in ("id", "segment")
+    }
+
+
+def _get_track(track_id):
+    track = models.Track.objects.get(pk=track_id)
+    segments = []
+    for segment in track.segments.select_related(
+            "emission", "cost", "health").order_by("start_date"):
+        segments.append({
+            "vehicle_type": segment.vehicle_type,
+            "start_date": segment.start_date,
+            "end_date": segment.end_date,
+            "geom": segment.geom.coords,
+            "geom_z16": segment.geom_z16.coords,
+            "emission": _get_metrics(segment.emission),
+            "cost": _get_metrics(segment.cost),
+            "health": _get_metrics(segment.health),
+        })
+    return {
+        "start_date": track.start_date,
+        "end_date": track.end_date,
+        "geom": track.geom.coords,
+        "num_points": models.CollectedPoint.objects.filter(
+            track_id=track_id).count(),
+    }, {
+        "length": track.length,
+        "duration": track.duration,
+        "emissions": track.aggregated_emissions,
+        "costs": track.aggregated_costs,
+        "health": track.aggregated_health,
+    }, segments
+
+
+def _assert_same_segments(segments, expected):
+    assert len(segments) == len(expected)
+    for segment, expected_segment in zip(segments, expected):
+        for name in ("emission", "cost", "health"):
+            assert segment.pop(name) == pytest.approx(
+                expected_segment.pop(name))
+        assert segment == expected_segment
+
+
+@pytest.mark.parametrize("points_per_chunk", [999, 1000, 2500, NUM_POINTS])
+@pytest.mark.django_db(transaction=True)
+def test_chunked_ingestion_matches_single_transaction(
+        end_user, db_connection, points_per_chunk):
+    owner_uuid = end_user.keycloak.UID
+    points = synthetic.generate_points(
+        NUM_POINTS, vehicle_modes=("1", "2", "4", "2"), seed=3)
+    expected_id = datareceiver.save_track(
+        1, points, owner_uuid, db_connection)
+    track_id = chunked.save_track_chunks(
+        2, points, owner_uuid, db_connection,
+        points_per_chunk=points_per_chunk
+    )
+    expected_track, expected_aggregates, expected_segments = _get_track(
+        expected_id)
+    track, aggregates, segments = _get_track(track_id)
+    assert track == expected_track
+    assert track["num_points"] == NUM_POINTS
+    assert aggregates["length"] == pytest.approx(expected_aggregates["length"])
+    assert aggregates["duration"] == pytest.approx(
+        expected_aggregates["duration"])
+    for name in ("emissions", "costs", "health"):
+        assert aggregates[name] == pytest.approx(expected_aggregates[name])
+    assert [
+        segment["vehicle_type"] for segment in segments
+    ] == ["foot", "bike", "car", "bike"]
+    _assert_same_segments(segments, expected_segments)
@@ -0,0 +1,65 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Tests for the insertion of collected points by means of COPY"""
+
+from django.db import connection
+import pytest
+
+from faas import columnar
+from faas import datareceiver
+from faas import synthetic
+from tracks import models
+
+pytestmark = pytest.mark.integration
+
+FIELDS = [
+    field.name for field in models.CollectedPoint._meta.concrete_fields
+    if field.name not in ("id", "track")
+]
+
+
+def _insert_rows(track_id, points, db_cursor):
+    datareceiver.insert_collected_points(track_id, points, db_cursor)
+
+
+def _copy_rows(track_id, points, db_cursor):
+    datareceiver.insert_collected_points_bulk(track_id, points, db_cursor)
+
+
+def _copy_columns(track_id, points, db_cursor):
+    lines = [",".join(datareceiver.PointData._fields)]
+    lines.extend(",".join(point) for point in points)
+    datareceiver.insert_collected_point_columns(
+        track_id, columnar.parse_track_data(lines), db_cursor)
+
+
+def _get_points(track_id):
+    return list(
+        models.CollectedPoint.objects.filter(
+            track_id=track_id).order_by("timestamp").values_list(*FIELDS)
+    )
+
+
+@pytest.mark.django_db
+def test_copied_points_match_inserted_rows(end_user):
+    points = synthetic.generate_points(
+        200, vehicle_modes=("1", "2", "3", "4", "5", "6", "42"))
+    result = {}
+    for session_id, inserter in enumerate(
+            (_insert_rows, _copy_rows, _copy_columns), start=1):
+        track = models.Track.objects.create(
+            owner=end_user, session_id=session_id)
+        with connection.cursor() as cursor:
+            inserter(track.id, points, cursor)
+        result[inserter] = _get_points(track.id)
+    assert len(result[_insert_rows]) == len(points)
+    assert result[_copy_rows] == result[_insert_rows]
+    assert result[_copy_columns] == result[_insert_rows]
@@ -0,0 +1,139 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Tests for the set-based calculation of segment metrics
+
+The emissions, costs and health calculated by ``insert-segments-data.sql``
+are compared with those of a plain Python implementation of the formulas.
+
+"""
+
+from django.db import connection
+import pytest
+
+from faas import _constants
+from faas import datareceiver
+from faas import queries
+from faas import segmentmetrics
+from faas import synthetic
+from faas._constants import VehicleType
+from tracks import models
+
+pytestmark = pytest.mark.integration
+
+VEHICLE_MODES = ("1", "2", "3", "4", "5", "6")
+
+
+def _calculate_emissions(vehicle_type, length_km):
+    result = {}
+    for pollutant, coeffs in _constants.EMISSIONS.items():
+        emitted = (
+            coeffs.get(vehicle_type, 0) * length_km /
+            _constants.AVERAGE_PASSENGER_COUNT.get(vehicle_type, 1)
+        )
+        reference = (
+            coeffs[VehicleType.car] * length_km /
+            _constants.AVERAGE_PASSENGER_COUNT[VehicleType.car]
+        )
+        saved = reference - emitted if vehicle_type != VehicleType.car else 0
+        result[pollutant.name] = emitted
+        result["{}_saved".format(pollutant.name)] = saved
+    return result
+
+
+def _calculate_costs(vehicle_type, length_km, duration_hours):
+    if vehicle_type in (VehicleType.bus, VehicleType.train):
+        fuel_cost = depreciation_cost = operation_cost = 0
+    else:
+        fuel_cost = (
+            length_km *
+            _constants.FUEL_CONSUMPTION.get(vehicle_type, 0) *
+            _constants.FUEL_PRICE.get(vehicle_type, 0)
+        )
+        depreciation_cost = (
+            length_km * _constants.DEPRECIATION_COST.get(vehicle_type, 0))
+        operation_cost = (
+            length_km * _constants.OPERATION_COST.get(vehicle_type, 0))
+    time_cost = duration_hours * _constants.TIME_COST_PER_HOUR_EURO
+    total_cost = (
+        (fuel_cost + time_cost + depreciation_cost + operation_cost) *
+        (1 + _constants.TOTAL_COST_OVERHEAD.get(vehicle_type, 0))
+    )
+    return {
+        "fuel_cost": fuel_cost,
+        "time_cost": time_cost,
+        "depreciation_cost": depreciation_cost,
+        "operation_cost": operation_cost,
+        "total_cost": total_cost,
+    }
+
+
+def _calculate_health(vehicle_type, duration_hours, speed_km_h):
+    try:
+        steps = _constants.CALORY_CONSUMPTION[vehicle_type]["steps"]
+    except KeyError:
+        return {"calories_consumed": 0}
+    for step in steps:
+        if speed_km_h < step["speed"]:
+            calories_per_minute = step["calories"]
+            break
+    else:
+        calories_per_minute = steps[-1]["calories"]
+    return {"calories_consumed": calories_per_minute * duration_hours * 60}
+
+
+def _get_expected_metrics(track_id):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT id, vehicle_type, ST_Length(geom::geography), "
+            "end_date - start_date "
+            "FROM tracks_segment WHERE track_id = %s ORDER BY id",
+            [track_id]
+        )
+        rows = cursor.fetchall()
+    result = []
+    for segment_id, vehicle_type, length_meters, duration in rows:
+        vehicle_type = VehicleType[vehicle_type]
+        length_km = length_meters / 1000
+        duration_hours = duration.days * 24 + duration.seconds / 3600
+        result.append((
+            segment_id,
+            _calculate_emissions(vehicle_type, length_km),
+            _calculate_costs(vehicle_type, length_km, duration_hours),
+            _calculate_health(
+                vehicle_type, duration_hours, length_km / duration_hours),
+        ))
+    return result
+
+
+def _get_metrics(segment, names):
+    return {name: getattr(segment, name) for name in names}
+
+
+@pytest.mark.django_db
+def test_set_based_metrics_match_python_formulas(end_user):
+    track = models.Track.objects.create(owner=end_user, session_id=1)
+    points = synthetic.generate_points(
+        len(VEHICLE_MODES) * 2 * 20, vehicle_modes=VEHICLE_MODES * 2)
+    with connection.cursor() as cursor:
+        datareceiver.insert_collected_points_bulk(track.id, points, cursor)
+        datareceiver.insert_segments(track.id, end_user.keycloak.UID, cursor)
+        queries.registry.reset_stats()
+        num_segments = segmentmetrics.insert_segments_data(track.id, cursor)
+    assert queries.registry.get_stats()["insert-segments-data.sql"].calls == 1
+    expected = _get_expected_metrics(track.id)
+    assert num_segments == len(expected) == len(VEHICLE_MODES) * 2
+    for segment_id, emissions, costs, health in expected:
+        segment = models.Segment.objects.select_related(
+            "emission", "cost", "health").get(pk=segment_id)
+        assert _get_metrics(segment.emission, emissions) == pytest.approx(
+            emissions)
+        assert _get_metrics(segment.cost, costs) == pytest.approx(costs)
+        assert _get_metrics(segment.health, health) == pytest.approx(health)
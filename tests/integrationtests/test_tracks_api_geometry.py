@@ -0,0 +1,214 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Tests for the geometries served by the track endpoints
+
+Segment geometries may be simplified and encoded as polylines.
+
+"""
+
+import datetime as dt
+import json
+
+from django.contrib.gis.geos import LineString
+from django.contrib.gis.geos import Point
+import pytest
+from rest_framework.reverse import reverse
+
+from tracks import models
+from tracks import polyline
+from tracks.api import renderers
+
+pytestmark = pytest.mark.integration
+
+NUM_VERTICES = 1000
+
+
+def _create_track(track_factory, simplified=False):
+    # a straight line with a zigzag of about 10 cm
+    geom = LineString([
+        (10.5 + index * 0.00001, 43.8 + (index % 2) * 0.000001)
+        for index in range(NUM_VERTICES)
+    ])
+    simplified_geom = LineString(geom[0], geom[-1]) if simplified else None
+    return track_factory(
+        geom=geom,
+        geom_z10=simplified_geom,
+        geom_z13=simplified_geom,
+        geom_z16=simplified_geom,
+    )
+
+
+def _get_vertices(segment):
+    return json.loads(segment["geom"])["coordinates"]
+
+
+@pytest.mark.parametrize("endpoint, user_fixture", [
+    ("api:my-tracks-list", "end_user"),
+    ("api:tracks-list", "privileged_user"),
+])
+@pytest.mark.django_db
+def test_zoom_shrinks_track_list(endpoint, user_fixture, request, api_client,
+                                 track_factory):
+    api_client.force_authenticate(user=request.getfixturevalue(user_fixture))
+    _create_track(track_factory)
+    url = reverse(endpoint)
+    full_response = api_client.get(url)
+    simplified_response = api_client.get(url, {"zoom": 10})
+    assert simplified_response.status_code == 200
+    full_segment, = full_response.json()["results"][0]["segments"]
+    simplified_segment, = simplified_response.json()["results"][0][
+        "segments"]
+    assert len(_get_vertices(full_segment)) == NUM_VERTICES
+    assert len(_get_vertices(simplified_segment)) == 2
+    assert len(simplified_response.content) * 10 < len(full_response.content)
+
+
+@pytest.mark.parametrize("params, num_vertices", [
+    ({"zoom": 10}, 2),
+    ({"zoom": 24}, NUM_VERTICES),
+    ({"simplify": 1}, 2),
+    ({"simplify": 0.01}, NUM_VERTICES),
+])
+@pytest.mark.django_db
+def test_segment_geometry_is_simplified_on_the_fly(params, num_vertices,
+                                                   api_client,
+                                                   privileged_user,
+                                                   track_factory):
+    api_client.force_authenticate(user=privileged_user)
+    _create_track(track_factory)
+    response = api_client.get(reverse("api:segments-list"), params)
+    assert response.status_code == 200
+    segment, = response.json()["results"]
+    assert len(_get_vertices(segment)) == num_vertices
+
+
+@pytest.mark.django_db
+def test_precomputed_geometry_is_used(api_client, end_user, track_factory):
+    api_client.force_authenticate(user=end_user)
+    track = _create_track(track_factory, simplified=True)
+    segment = track.segments.get()
+    models.Segment.objects.filter(pk=segment.pk).update(
+        geom_z13=LineString((0, 0), (1, 1)))
+    response = api_client.get(
+        reverse("api:my-segments-detail", kwargs={"pk": segment.pk}),
+        {"zoom": 12}
+    )
+    assert _get_vertices(response.json()) == [[0, 0], [1, 1]]
+
+
+@pytest.mark.parametrize("params", [
+    {"zoom": "high"},
+    {"zoom": 25},
+    {"simplify": -1},
+    {"simplify": "nan"},
+    {"zoom": 10, "simplify": 1},
+])
+@pytest.mark.django_db
+def test_invalid_simplification_is_rejected(params, api_client,
+                                            privileged_user):
+    api_client.force_authenticate(user=privileged_user)
+    response = api_client.get(reverse("api:tracks-list"), params)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("endpoint, user_fixture", [
+    ("api:my-tracks-list", "end_user"),
+    ("api:tracks-list", "privileged_user"),
+    ("api:my-segments-list", "end_user"),
+    ("api:segments-list", "privileged_user"),
+])
+@pytest.mark.django_db
+def test_polyline_format(endpoint, user_fixture, request, api_client,
+                         track_factory):
+    api_client.force_authenticate(user=request.getfixturevalue(user_fixture))
+    track = _create_track(track_factory)
+    geojson_response = api_client.get(reverse(endpoint))
+    response = api_client.get(reverse(endpoint), {"format": "polyline"})
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith(
+        renderers.PolylineJSONRenderer.media_type)
+    result = response.json()["results"][0]
+    segment = result["segments"][0] if "segments" in result else result
+    coordinates = polyline.decode(segment["geom"])
+    expected = track.segments.get().geom.coords
+    assert len(coordinates) == NUM_VERTICES
+    for (x, y), (expected_x, expected_y) in zip(coordinates, expected):
+        assert x == pytest.approx(expected_x, abs=1e-5)
+        assert y == pytest.approx(expected_y, abs=1e-5)
+    assert len(response.content) * 5 < len(geojson_response.content)
+
+
+@pytest.mark.django_db
+def test_polyline_format_is_negotiated(api_client, end_user, track_factory):
+    api_client.force_authenticate(user=end_user)
+    segment = _create_track(track_factory).segments.get()
+    response = api_client.get(
+        reverse("api:my-segments-detail", kwargs={"pk": segment.pk}),
+        {"precision": 6},
+        HTTP_ACCEPT=renderers.PolylineJSONRenderer.media_type
+    )
+    assert response.status_code == 200
+    assert response.json()["geom"] == polyline.encode(segment.geom.coords, 6)
+
+
+@pytest.mark.django_db
+def test_polyline_format_with_simplified_geometry(api_client, end_user,
+                                                  track_factory):
+    api_client.force_authenticate(user=end_user)
+    _create_track(track_factory)
+    response = api_client.get(
+        reverse("api:my-tracks-list"), {"format": "polyline", "zoom": 10})
+    segment, = response.json()["results"][0]["segments"]
+    assert len(polyline.decode(segment["geom"])) == 2
+
+
+@pytest.mark.django_db
+def test_polyline_timestamps(api_client, end_user, track_factory):
+    api_client.force_authenticate(user=end_user)
+    points = [(10.5, 43.8), (10.6, 43.9), (10.7, 43.8)]
+    track = track_factory(geom=LineString(points))
+    segment = track.segments.get()
+    timestamps = [
+        segment.start_date + dt.timedelta(seconds=index)
+        for index in range(3)
+    ]
+    for (x, y), timestamp in zip(points, timestamps):
+        models.CollectedPoint.objects.create(
+            track=track,
+            vehicle_type=models.BIKE,
+            the_geom=Point(x, y),
+            timestamp=timestamp,
+        )
+    url = reverse("api:my-segments-detail", kwargs={"pk": segment.pk})
+    response = api_client.get(url, {"format": "polyline", "timestamps": 1})
+    assert response.status_code == 200
+    assert polyline.decode_values(response.json()["timestamps"]) == [
+        int(timestamp.timestamp() * 1000) for timestamp in timestamps]
+    # timestamps do not match a geometry with more vertices than points
+    models.Segment.objects.filter(pk=segment.pk).update(
+        geom=LineString(points + [(10.8, 43.9)]))
+    response = api_client.get(url, {"format": "polyline", "timestamps": 1})
+    assert response.json()["timestamps"] is None
+    response = api_client.get(url, {"format": "polyline"})
+    assert "timestamps" not in response.json()
+
+
+@pytest.mark.parametrize("params", [
+    {"format": "polyline", "precision": "high"},
+    {"format": "polyline", "precision": polyline.MAX_PRECISION + 1},
+    {"format": "polyline", "timestamps": "true", "zoom": 10},
+])
+@pytest.mark.django_db
+def test_invalid_polyline_options_are_rejected(params, api_client,
+                                               privileged_user):
+    api_client.force_authenticate(user=privileged_user)
+    response = api_client.get(reverse("api:tracks-list"), params)
+    assert response.status_code == 400
@@ -0,0 +1,64 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Tests for the visibility of tracks that are still being ingested
+
+Chunked ingestion stores the end date of a track with each chunk and only
+sets its start date once the last chunk has been stored.
+
+"""
+
+import datetime as dt
+
+import pytest
+import pytz
+from rest_framework.reverse import reverse
+
+from tracks import models
+
+pytestmark = pytest.mark.integration
+
+END_DATE = dt.datetime(2018, 5, 14, 15, 51, tzinfo=pytz.utc)
+
+
+def _create_track(owner, session_id, **fields):
+    return models.Track.objects.create(
+        owner=owner,
+        session_id=session_id,
+        aggregated_emissions={},
+        aggregated_costs={},
+        aggregated_health={},
+        **fields
+    )
+
+
+def _get_ids(api_client, url):
+    response = api_client.get(url)
+    assert response.status_code == 200
+    return {item["id"] for item in response.json()["results"]}
+
+
+@pytest.mark.django_db
+def test_tracks_in_progress_are_not_shown(api_client, privileged_user,
+                                          end_user, track_factory):
+    ingested = track_factory()
+    legacy = _create_track(end_user, 1000)
+    in_progress = _create_track(end_user, 1001, end_date=END_DATE)
+    api_client.force_authenticate(user=end_user)
+    assert _get_ids(api_client, reverse("api:my-tracks-list")) == {
+        ingested.id, legacy.id}
+    assert api_client.get(
+        reverse("api:my-tracks-detail", kwargs={"pk": in_progress.pk})
+    ).status_code == 404
+    api_client.force_authenticate(user=privileged_user)
+    assert _get_ids(api_client, reverse("api:tracks-list")) == {ingested.id}
+    assert api_client.get(
+        reverse("api:tracks-detail", kwargs={"pk": in_progress.pk})
+    ).status_code == 404
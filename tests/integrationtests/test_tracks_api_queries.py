@@ -0,0 +1,116 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+"""Regression tests for the number of queries issued by the track endpoints
+
+Each endpoint must issue the same number of queries no matter how many
+tracks and segments are being serialized.
+
+"""
+
+from django.contrib.gis.geos import LineString
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import pytest
+from rest_framework.reverse import reverse
+
+from tracks import models
+
+pytestmark = pytest.mark.integration
+
+
+def _create_tracks(track_factory, num_tracks):
+    return [
+        track_factory(
+            vehicle_types=(models.FOOT, models.BIKE, models.FOOT),
+            metrics=True
+        ) for _ in range(num_tracks)
+    ]
+
+
+def _count_queries(api_client, url):
+    # the first request fills per-user caches, such as permissions
+    api_client.get(url)
+    with CaptureQueriesContext(connection) as context:
+        response = api_client.get(url)
+    assert response.status_code == 200
+    return len(context), response.json()
+
+
+@pytest.mark.parametrize("endpoint, user_fixture, num_items", [
+    ("api:my-tracks-list", "end_user", 11),
+    ("api:tracks-list", "privileged_user", 11),
+    ("api:my-segments-list", "end_user", 33),
+    ("api:segments-list", "privileged_user", 33),
+])
+@pytest.mark.django_db
+def test_list_endpoint_issues_constant_queries(endpoint, user_fixture,
+                                               num_items, request,
+                                               api_client, track_factory):
+    api_client.force_authenticate(user=request.getfixturevalue(user_fixture))
+    _create_tracks(track_factory, 1)
+    few_queries, _ = _count_queries(api_client, reverse(endpoint))
+    _create_tracks(track_factory, 10)
+    many_queries, response = _count_queries(api_client, reverse(endpoint))
+    assert len(response["results"]) == num_items
+    assert many_queries == few_queries
+
+
+@pytest.mark.parametrize("endpoint, user_fixture", [
+    ("api:my-tracks-detail", "end_user"),
+    ("api:tracks-detail", "privileged_user"),
+])
+@pytest.mark.django_db
+def test_track_detail_endpoint_issues_constant_queries(endpoint, user_fixture,
+                                                       request, api_client,
+                                                       end_user,
+                                                       track_factory):
+    api_client.force_authenticate(user=request.getfixturevalue(user_fixture))
+    short_track, = _create_tracks(track_factory, 1)
+    long_track, = _create_tracks(track_factory, 1)
+    for _ in range(10):
+        segment = models.Segment.objects.create(
+            track=long_track,
+            user_uuid=end_user.keycloak,
+            vehicle_type=models.CAR,
+            geom=LineString((10.5, 43.8), (10.6, 43.9)),
+            start_date=long_track.start_date,
+            end_date=long_track.end_date,
+        )
+        models.Emission.objects.create(segment=segment, co2=1)
+    few_queries, _ = _count_queries(
+        api_client, reverse(endpoint, kwargs={"pk": short_track.pk}))
+    many_queries, response = _count_queries(
+        api_client, reverse(endpoint, kwargs={"pk": long_track.pk}))
+    assert many_queries == few_queries
+    assert len(response["segments"]) == 13
+    assert sorted(response["vehicle_types"]) == [
+        models.BIKE, models.CAR, models.FOOT]
+    assert sum(
+        1 for segment in response["segments"] if segment["costs"] is None
+    ) == 10
+
+
+@pytest.mark.django_db
+def test_track_list_annotates_distinct_vehicle_types(api_client, end_user,
+                                                     track_factory):
+    api_client.force_authenticate(user=end_user)
+    _create_tracks(track_factory, 2)
+    models.Track.objects.create(owner=end_user, session_id=50)
+    response = api_client.get(reverse("api:my-tracks-list"))
+    vehicle_types = {
+        track["session_id"]: sorted(track["vehicle_types"])
+        for track in response.json()["results"]
+    }
+    assert vehicle_types == {
+        1: [models.BIKE, models.FOOT],
+        2: [models.BIKE, models.FOOT],
+        50: [],
+    }
@@ -0,0 +1,113 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from concurrent import futures
+from unittest import mock
+
+import pytest
+
+from faas import backfill
+
+pytestmark = pytest.mark.unit
+
+
+def _fake_recompute_batch(first_track_id, last_track_id, dry_run=False):
+    if first_track_id == 41:
+        raise RuntimeError("Could not recalculate segment data")
+    return backfill.BatchResult(
+        first_track_id=first_track_id,
+        last_track_id=last_track_id,
+        num_tracks=last_track_id - first_track_id + 1,
+        num_segments=2 * (last_track_id - first_track_id + 1),
+        changed_track_ids=[first_track_id],
+        num_changed=1,
+        totals={("aggregated_costs", "total_cost"): [1.0, 2.0]}
+    )
+
+
+@pytest.fixture
+def patched_recompute_batch():
+    with mock.patch.object(
+            backfill,
+            "recompute_batch",
+            side_effect=_fake_recompute_batch) as recompute_batch:
+        yield recompute_batch
+
+
+def test_diff_ignores_rounding_errors():
+    changed, totals = backfill.diff_aggregated_data(
+        {1: ({"co2": 0.1 + 0.2}, {"total_cost": 1.0}, None)},
+        {1: ({"co2": 0.3}, {"total_cost": 1.0}, None)},
+    )
+    assert changed == []
+    assert totals[("aggregated_costs", "total_cost")] == [1.0, 1.0]
+
+
+def test_diff_detects_new_keys():
+    changed, _ = backfill.diff_aggregated_data(
+        {1: (None, None, None)},
+        {1: (None, None, {"calories_consumed": 0})},
+    )
+    assert changed == [1]
+
+
+def test_backfill_processes_all_ranges(patched_recompute_batch):
+    progress_reports = []
+    with futures.ThreadPoolExecutor(max_workers=2) as executor:
+        track_metrics_backfill = backfill.TrackMetricsBackfill(
+            db_settings={},
+            batch_size=10,
+            num_processes=2,
+            executor=executor
+        )
+        progress = track_metrics_backfill.run(
+            start_id=1, end_id=35, progress_callback=progress_reports.append)
+    assert patched_recompute_batch.call_count == 4
+    assert len(progress_reports) == 4
+    assert progress.num_batches == 4
+    assert progress.num_tracks == 35
+    assert progress.num_segments == 70
+    assert progress.resume_from_id == 36
+    assert progress.fraction_done == 1
+    assert sorted(track_metrics_backfill.changed_track_ids) == [1, 11, 21, 31]
+    assert track_metrics_backfill.totals == {
+        ("aggregated_costs", "total_cost"): [4.0, 8.0]}
+
+
+def test_backfill_does_not_resume_past_failed_batch(patched_recompute_batch):
+    with futures.ThreadPoolExecutor(max_workers=2) as executor:
+        track_metrics_backfill = backfill.TrackMetricsBackfill(
+            db_settings={},
+            batch_size=10,
+            num_processes=2,
+            executor=executor
+        )
+        progress = track_metrics_backfill.run(start_id=1, end_id=50)
+    assert progress.num_batches == 4
+    assert progress.failed_batches == [(41, 50)]
+    assert progress.resume_from_id == 41
+    assert progress.fraction_done == pytest.approx(0.8)
+
+
+def test_dry_run_rolls_back():
+    db_connection = mock.MagicMock()
+    cursor = db_connection.cursor.return_value.__enter__.return_value
+    cursor.fetchall.side_effect = [
+        [(1, {"co2": 1.0}, None, None)],
+        [(1, {"co2": 2.0}, None, None)],
+    ]
+    cursor.fetchone.return_value = (3, 3, 3)
+    result = backfill.recompute_batch(
+        1, 10, dry_run=True, db_connection=db_connection)
+    assert db_connection.rollback.call_count == 1
+    assert db_connection.commit.call_count == 0
+    assert result.num_tracks == 1
+    assert result.num_segments == 3
+    assert result.changed_track_ids == [1]
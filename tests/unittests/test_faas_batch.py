@@ -0,0 +1,122 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import io
+from unittest import mock
+import zipfile
+
+import pytest
+
+from faas import batch
+from faas import datareceiver
+from faas import metrics
+from faas import storage
+
+pytestmark = pytest.mark.unit
+
+HEADER = ",".join(datareceiver.PointData._fields)
+POINT_LINE = (
+    "0.1,0.2,9.8,5,1,90,180,10,20,15,45,50,43.84,10.50,100,1010,1,"
+    "1530000000,3.5,21,1530000000000,{vehicle_mode},1"
+)
+OWNER_UUID = "11111111-2222-3333-4444-555555555555"
+
+
+def _build_archive(contents):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_handler:
+        zip_handler.writestr("part-0.csv", contents)
+    buffer.seek(0)
+    return buffer
+
+
+def _get_pending_upload(name, session_id):
+    return batch._PendingUpload(
+        object_key="cognito/smb/{}/{}.zip".format(OWNER_UUID, name),
+        owner_uuid=OWNER_UUID,
+        session_id=session_id,
+        track_data=None,
+        timer=metrics.StageTimer()
+    )
+
+
+def test_handle_track_uploads_reports_unreadable_uploads():
+    object_store = storage.InMemoryObjectStore()
+    valid_key = "cognito/smb/{}/valid.zip".format(OWNER_UUID)
+    invalid_key = "cognito/smb/{}/invalid.zip".format(OWNER_UUID)
+    object_store.put(
+        "bucket",
+        valid_key,
+        _build_archive(
+            "{}\n{}\n".format(HEADER, POINT_LINE.format(vehicle_mode=1))
+        ).getvalue()
+    )
+    object_store.put("bucket", invalid_key, b"not a zip file")
+    with mock.patch.object(batch, "_save_uploads") as save_uploads:
+        save_uploads.return_value = {
+            valid_key: batch.UploadResult(
+                valid_key, batch.INGESTED, 1, None)
+        }
+        results = batch.handle_track_uploads(
+            "bucket",
+            ["no-owner.zip", valid_key, invalid_key],
+            mock.MagicMock(),
+            object_store=object_store,
+            metrics_sinks=[]
+        )
+    uploads = save_uploads.call_args[0][0]
+    assert [upload.object_key for upload in uploads] == [valid_key]
+    assert uploads[0].session_id == 1530000000
+    assert [result.status for result in results] == [
+        batch.FAILED, batch.INGESTED, batch.FAILED]
+
+
+def test_save_uploads_falls_back_to_a_savepoint_per_track():
+    uploads = [
+        _get_pending_upload("first", 1),
+        _get_pending_upload("bad", 2),
+        _get_pending_upload("duplicate", 1),
+        _get_pending_upload("ingested", 3),
+    ]
+
+    def save_batch(batch, user_ids, db_cursor, sensor_arrays, timer):
+        if len(batch) > 1 or batch[0].session_id == 2:
+            raise RuntimeError("Could not save tracks")
+        return [10]
+
+    db_connection = mock.MagicMock()
+    cursor = db_connection.cursor.return_value.__enter__.return_value
+    with mock.patch.multiple(
+            datareceiver,
+            get_track_owner_internal_ids=mock.Mock(
+                return_value={OWNER_UUID: 1}),
+            get_track_ids_by_sessions=mock.Mock(return_value={3: 5})), \
+            mock.patch.object(
+                batch, "_save_upload_batch",
+                mock.Mock(side_effect=save_batch)):
+        results = batch._save_uploads(uploads, db_connection)
+    assert [
+        (results[upload.object_key].status,
+         results[upload.object_key].track_id) for upload in uploads
+    ] == [
+        (batch.INGESTED, 10),
+        (batch.FAILED, None),
+        (batch.SKIPPED, 10),
+        (batch.SKIPPED, 5),
+    ]
+    statements = [call[0][0] for call in cursor.execute.call_args_list]
+    assert statements == [
+        "SAVEPOINT track_uploads",
+        "ROLLBACK TO SAVEPOINT track_uploads",
+        "SAVEPOINT track_upload",
+        "RELEASE SAVEPOINT track_upload",
+        "SAVEPOINT track_upload",
+        "ROLLBACK TO SAVEPOINT track_upload",
+    ]
@@ -0,0 +1,66 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import json
+from unittest import mock
+
+import pytest
+
+from faas import benchmark
+from faas import datareceiver
+from faas import metrics
+
+pytestmark = pytest.mark.unit
+
+OWNER_UUID = "11111111-2222-3333-4444-555555555555"
+
+
+def _ingest(bucket, object_key, db_connection, object_store=None,
+            metrics_sinks=None, **options):
+    assert object_store.get_size(bucket, object_key) > 0
+    if object_key.endswith("-1.zip"):
+        raise RuntimeError("Could not ingest")
+    timer = metrics.StageTimer()
+    timer.num_points = 100
+    with timer.stage("parse"):
+        pass
+    track_id = int(object_key[-5])
+    for sink in metrics_sinks:
+        sink.record(timer.get_metrics(object_key, track_id))
+    return track_id
+
+
+@pytest.mark.parametrize("keep_tracks, deleted", [
+    (False, [0, 2]),
+    (True, []),
+])
+def test_run_benchmark(keep_tracks, deleted):
+    handle_track_upload = mock.Mock(side_effect=_ingest)
+    with mock.patch.multiple(
+            datareceiver,
+            handle_track_upload=handle_track_upload,
+            _delete_track=mock.DEFAULT) as patched:
+        results = benchmark.run_benchmark(
+            mock.MagicMock(), OWNER_UUID, num_tracks=3, num_points=100,
+            keep_tracks=keep_tracks,
+            options=datareceiver.IngestionOptions(columnar=True),
+            vehicle_modes=("1", "2")
+        )
+    assert results["num_tracks"] == 2
+    assert results["num_points"] == 200
+    assert results["failures"] == ["RuntimeError: Could not ingest"]
+    assert list(results["stages"]) == ["parse"]
+    assert results["options"]["ingestion_options"]["columnar"]
+    assert [
+        call[0][0] for call in patched["_delete_track"].call_args_list
+    ] == deleted
+    for call in handle_track_upload.call_args_list:
+        assert call[1]["options"].columnar
+    json.dumps(results)
@@ -0,0 +1,85 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from unittest import mock
+
+import pytest
+
+from faas import chunked
+from faas import datareceiver
+from faas import metrics
+
+pytestmark = pytest.mark.unit
+
+OWNER_UUID = "11111111-2222-3333-4444-555555555555"
+
+
+def _stage_points(track_id, points, first_seq, db_cursor):
+    return len(list(points))
+
+
+@pytest.mark.parametrize("chunk_segments, expected_open, expected_completed", [
+    # the open segment is extended by the next chunk
+    ([[1, 2], [2], [3]], [None, 2, 2], [[1], [], [2], [3]]),
+    # a chunk starts with a different vehicle type
+    ([[1], [2, 3], [4]], [None, 1, 3], [[], [1, 2], [3], [4]]),
+])
+def test_chunked_ingestion_only_calculates_completed_segments(
+        chunk_segments, expected_open, expected_completed):
+    segments = iter(chunk_segments)
+    insert_segments = mock.Mock(
+        side_effect=lambda *args: [
+            (id_, "bike", None) for id_ in next(segments)])
+    with mock.patch.multiple(
+            datareceiver,
+            get_track_owner_internal_id=mock.Mock(return_value=1),
+            _insert_track=mock.Mock(return_value=10),
+            _delete_track=mock.DEFAULT) as patched, \
+            mock.patch.multiple(
+                chunked,
+                queries=mock.DEFAULT,
+                segmentmetrics=mock.DEFAULT,
+                _stage_collected_points=mock.Mock(side_effect=_stage_points),
+                _insert_staged_segments=insert_segments,
+                _insert_completed_segments_data=mock.DEFAULT) as chunked_:
+        timer = metrics.StageTimer()
+        track_id = chunked.save_track_chunks(
+            1, range(5), OWNER_UUID, mock.MagicMock(), points_per_chunk=2,
+            timer=timer
+        )
+    assert track_id == 10
+    assert [
+        call[0][2] for call in insert_segments.call_args_list
+    ] == expected_open
+    assert [
+        call[0][1] for call in
+        chunked_["_insert_completed_segments_data"].call_args_list
+    ] == expected_completed
+    assert timer.num_segments == len(set(sum(chunk_segments, [])))
+    patched["_delete_track"].assert_not_called()
+
+
+def test_chunked_ingestion_deletes_track_when_a_chunk_fails():
+    with mock.patch.multiple(
+            datareceiver,
+            get_track_owner_internal_id=mock.Mock(return_value=1),
+            _insert_track=mock.Mock(return_value=10),
+            _delete_track=mock.DEFAULT) as patched, \
+            mock.patch.multiple(
+                chunked,
+                _stage_collected_points=mock.Mock(side_effect=_stage_points),
+                _insert_staged_segments=mock.Mock(
+                    side_effect=RuntimeError("Could not segment track"))):
+        with pytest.raises(RuntimeError):
+            chunked.save_track_chunks(
+                1, range(5), OWNER_UUID, mock.MagicMock(),
+                points_per_chunk=2
+            )
+    patched["_delete_track"].assert_called_once_with(10, mock.ANY)
@@ -0,0 +1,191 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import io
+from unittest import mock
+import zipfile
+
+import numpy as np
+import pytest
+
+from faas import columnar
+from faas import datareceiver
+from faas import storage
+from faas import validation
+from faas._constants import VehicleType
+
+pytestmark = pytest.mark.unit
+
+HEADER = ",".join(datareceiver.PointData._fields)
+POINT_LINE = (
+    "0.1,0.2,9.8,5,1,90,180,10,20,15,45,50,43.84,10.50,100,1010,1,"
+    "1530000000,3.5,21,1530000000000,{vehicle_mode},1"
+)
+OWNER_UUID = "11111111-2222-3333-4444-555555555555"
+
+
+def _build_archive(*members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_handler:
+        for index, contents in enumerate(members):
+            zip_handler.writestr("part-{}.csv".format(index), contents)
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.mark.parametrize("members", [
+    ["{}\n{}\n".format(HEADER, POINT_LINE)],
+    ["{}\r\n{}\r\n\r\n".format(HEADER, POINT_LINE), POINT_LINE],
+    ["{}\n{}".format(HEADER, POINT_LINE[:10]), POINT_LINE[10:] + "\n"],
+    ["{}\n{}\r".format(HEADER, POINT_LINE), "\n" + POINT_LINE],
+])
+@pytest.mark.parametrize("chunk_size", [1, 7, datareceiver.CHUNK_SIZE])
+def test_iter_track_data_lines_matches_concatenated_members(members,
+                                                            chunk_size):
+    archive = _build_archive(*members)
+    result = list(
+        datareceiver.iter_track_data_lines(archive, chunk_size=chunk_size))
+    assert result == "".join(members).splitlines()
+
+
+def test_parse_track_data_accepts_lines():
+    raw_data = "\n".join([HEADER, POINT_LINE.format(vehicle_mode=2), ""])
+    from_text = datareceiver.parse_track_data(raw_data)
+    from_lines = datareceiver.parse_track_data(iter(raw_data.splitlines()))
+    assert from_text == from_lines
+    assert len(from_text) == 1
+
+
+def test_columnar_parse_track_data():
+    lines = [
+        HEADER,
+        POINT_LINE.format(vehicle_mode=1),
+        "",
+        POINT_LINE.format(vehicle_mode=5) + ",extra-field",
+        POINT_LINE.format(vehicle_mode=42),
+    ]
+    result = columnar.parse_track_data(lines)
+    assert columnar.get_num_points(result) == 3
+    assert set(result.keys()) == set(datareceiver.PointData._fields)
+    assert result["latitude"].dtype == np.float64
+    np.testing.assert_array_equal(result["latitude"], [43.84] * 3)
+    np.testing.assert_array_equal(
+        result["timeStamp"],
+        np.array(["2018-06-26T08:00:00"] * 3, dtype="datetime64[ms]")
+    )
+    np.testing.assert_array_equal(
+        result["vehicleMode"],
+        [
+            VehicleType.foot.value,
+            VehicleType.average_motorbike.value,
+            VehicleType.unknown.value,
+        ]
+    )
+
+
+def test_columnar_parse_track_data_without_points():
+    result = columnar.parse_track_data([HEADER])
+    assert columnar.get_num_points(result) == 0
+
+
+def test_columnar_parse_track_data_rejects_missing_fields():
+    lines = [
+        HEADER,
+        POINT_LINE.format(vehicle_mode=1),
+        POINT_LINE.format(vehicle_mode=1).rsplit(",", 1)[0],
+    ]
+    with pytest.raises(ValueError):
+        columnar.parse_track_data(lines)
+
+
+def test_ingestion_options_reject_chunked_column_parsing():
+    with pytest.raises(ValueError):
+        datareceiver.IngestionOptions(columnar=True, points_per_chunk=1000)
+
+
+def test_ingestion_options_replace_keeps_other_options():
+    options = datareceiver.IngestionOptions(columnar=True, validation={})
+    replaced = options.replace(use_ledger=True)
+    assert replaced == datareceiver.IngestionOptions(
+        columnar=True, validation={}, use_ledger=True)
+    assert not options.use_ledger
+
+
+def _put_short_track(object_store):
+    object_key = "cognito/smb/{}/short.zip".format(OWNER_UUID)
+    object_store.put(
+        "bucket",
+        object_key,
+        _build_archive(
+            "{}\n{}\n".format(HEADER, POINT_LINE.format(vehicle_mode=1))
+        ).getvalue()
+    )
+    return object_key
+
+
+def test_invalid_track_is_rejected_before_creating_records():
+    object_store = storage.InMemoryObjectStore()
+    object_key = _put_short_track(object_store)
+    db_connection = mock.MagicMock()
+    with mock.patch.object(datareceiver, "save_track") as save_track:
+        with pytest.raises(validation.InvalidTrackError) as exc_info:
+            datareceiver.handle_track_upload(
+                "bucket", object_key, db_connection,
+                options=datareceiver.IngestionOptions(validation={}),
+                object_store=object_store, metrics_sinks=[]
+            )
+    assert exc_info.value.errors[0].startswith("too few points")
+    save_track.assert_not_called()
+    db_connection.cursor.assert_not_called()
+
+
+def test_already_ingested_session_is_not_saved_again():
+    object_store = storage.InMemoryObjectStore()
+    object_key = _put_short_track(object_store)
+    with mock.patch.multiple(
+            datareceiver,
+            _get_ingested_track_id=mock.DEFAULT,
+            save_track=mock.DEFAULT) as patched:
+        patched["_get_ingested_track_id"].return_value = 7
+        track_id = datareceiver.handle_track_upload(
+            "bucket", object_key, mock.MagicMock(),
+            object_store=object_store, metrics_sinks=[]
+        )
+    assert track_id == 7
+    patched["_get_ingested_track_id"].assert_called_once_with(
+        "1530000000", mock.ANY)
+    patched["save_track"].assert_not_called()
+
+
+def test_invalid_track_is_flagged_without_segments():
+    result = validation.ValidationResult(False, ["too few points"])
+    with mock.patch.multiple(
+            datareceiver,
+            get_track_owner_internal_id=mock.Mock(return_value=1),
+            _insert_track=mock.Mock(return_value=10),
+            insert_segments=mock.DEFAULT,
+            update_track_aggregated_data=mock.DEFAULT,
+            _execute=mock.DEFAULT) as patched, \
+            mock.patch.object(datareceiver, "segmentmetrics") as metrics_:
+        track_id = datareceiver.save_track(
+            1, None, OWNER_UUID, mock.MagicMock(),
+            point_inserter=mock.Mock(), validation_result=result
+        )
+    assert track_id == 10
+    patched["insert_segments"].assert_not_called()
+    metrics_.insert_segments_data.assert_not_called()
+    patched["update_track_aggregated_data"].assert_called_once_with(
+        10, mock.ANY)
+    patched["_execute"].assert_called_once_with(
+        mock.ANY,
+        "update-track-validation.sql",
+        {"track_id": 10, "is_valid": False,
+         "validation_error": "too few points"}
+    )
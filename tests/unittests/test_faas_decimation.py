@@ -0,0 +1,124 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import numpy as np
+import pytest
+
+from faas import columnar
+from faas import decimation
+from faas._constants import VehicleType
+
+pytestmark = pytest.mark.unit
+
+# approximate length of a degree of latitude, in meters
+DEGREE = 111_195
+
+
+def _build_track_data(north_meters, east_meters=None, seconds=None,
+                      vehicle_modes=None):
+    num_points = len(north_meters)
+    track_data = {
+        name: np.zeros(num_points, dtype=type_)
+        for name, type_ in columnar.COLUMN_TYPES.items()
+    }
+    east_meters = (
+        np.zeros(num_points) if east_meters is None else east_meters)
+    seconds = np.arange(num_points) if seconds is None else seconds
+    vehicle_modes = (
+        [VehicleType.bike.value] * num_points if vehicle_modes is None
+        else vehicle_modes
+    )
+    track_data["latitude"] = np.asarray(north_meters, dtype=float) / DEGREE
+    track_data["longitude"] = np.asarray(east_meters, dtype=float) / DEGREE
+    track_data["timeStamp"] = (
+        np.datetime64("2018-05-14T15:41:00") +
+        (np.asarray(seconds) * 1000).astype("timedelta64[ms]")
+    )
+    track_data["vehicleMode"] = np.asarray(vehicle_modes, dtype=np.int8)
+    track_data["sessionId"][:] = 1
+    return track_data
+
+
+def test_constant_speed_line_is_reduced_to_its_ends():
+    track_data = _build_track_data(np.arange(100) * 5.0)
+    mask = decimation.get_decimation_mask(track_data)
+    assert np.flatnonzero(mask).tolist() == [0, 99]
+
+
+def test_vehicle_mode_changes_are_kept():
+    track_data = _build_track_data(
+        np.arange(40) * 5.0,
+        vehicle_modes=[VehicleType.foot.value] * 20 +
+        [VehicleType.bike.value] * 20
+    )
+    mask = decimation.get_decimation_mask(track_data)
+    assert np.flatnonzero(mask).tolist() == [0, 19, 20, 39]
+
+
+def test_speed_changes_are_kept():
+    # moving 5 m/s for 20 seconds then 1 m/s for 20 more seconds
+    north = np.concatenate([np.arange(20) * 5.0, 100 + np.arange(20) * 1.0])
+    mask = decimation.get_decimation_mask(
+        track_data=_build_track_data(north), stationary_radius=0)
+    kept = np.flatnonzero(mask).tolist()
+    assert kept[0] == 0 and kept[-1] == 39
+    assert any(index in kept for index in (19, 20))
+
+
+def test_stationary_points_are_collapsed():
+    rng = np.random.RandomState(0)
+    north = np.concatenate([
+        rng.uniform(-1, 1, 60),  # waiting at a traffic light for a minute
+        np.arange(1, 21) * 5.0,
+    ])
+    east = np.concatenate([rng.uniform(-1, 1, 60), np.zeros(20)])
+    track_data = _build_track_data(north, east)
+    result = decimation.decimate(track_data)
+    timestamps = result["timeStamp"]
+    assert len(timestamps) < 10
+    assert timestamps[0] == track_data["timeStamp"][0]
+    assert timestamps[-1] == track_data["timeStamp"][-1]
+    # the point where the device started moving again is kept
+    departures = track_data["timeStamp"][59:61]
+    assert any(departure in timestamps for departure in departures)
+
+
+@pytest.mark.parametrize("vehicle_type, expected_points", [
+    (VehicleType.foot, 30),
+    (VehicleType.bike, 2),
+])
+def test_tolerance_depends_on_vehicle_type(vehicle_type, expected_points):
+    # zigzag, 4 meters from the line between the first and last points
+    east = np.array([0.0] + [4.0, -4.0] * 14 + [0.0])
+    track_data = _build_track_data(
+        np.arange(30) * 10.0,
+        east,
+        vehicle_modes=[vehicle_type.value] * 30
+    )
+    result = decimation.decimate(
+        track_data,
+        tolerances={VehicleType.foot: 3, VehicleType.bike: 5},
+        stationary_radius=0
+    )
+    assert columnar.get_num_points(result) == expected_points
+
+
+def test_all_columns_are_decimated():
+    track_data = _build_track_data(np.arange(50) * 5.0)
+    track_data["speed"] = np.arange(50, dtype=float)
+    result = decimation.decimate(track_data)
+    assert set(result) == set(track_data)
+    assert all(len(column) == 2 for column in result.values())
+    assert result["speed"].tolist() == [0, 49]
+
+
+def test_empty_track_data():
+    result = decimation.decimate(_build_track_data(np.array([])))
+    assert columnar.get_num_points(result) == 0
@@ -0,0 +1,94 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from unittest import mock
+
+import pytest
+
+from faas import datareceiver
+from faas import failures
+
+pytestmark = pytest.mark.unit
+
+OBJECT_KEY = "cognito/smb/keycloakuuid-abcd-123456789012345678901234/1.zip"
+
+POLICY = failures.RetryPolicy(
+    base_delay=10, max_delay=100, max_attempts=3, jitter=0.5)
+
+
+@pytest.mark.parametrize("attempts, min_delay, max_delay", [
+    (1, 5, 10),
+    (2, 10, 20),
+    (4, 40, 80),
+    (5, 50, 100),
+    (20, 50, 100),
+])
+def test_delay_grows_exponentially_within_jitter(attempts, min_delay,
+                                                 max_delay):
+    delays = [failures.get_delay(POLICY, attempts) for _ in range(100)]
+    assert all(min_delay <= delay <= max_delay for delay in delays)
+    assert len(set(delays)) > 1
+
+
+@pytest.mark.parametrize("attempts, expected_status", [
+    (1, failures.RETRYING),
+    (2, failures.RETRYING),
+    (3, failures.DEAD),
+])
+def test_failure_becomes_dead_letter_after_max_attempts(attempts,
+                                                        expected_status):
+    db_connection = mock.MagicMock()
+    cursor = db_connection.cursor.return_value.__enter__.return_value
+    cursor.fetchone.return_value = (7, attempts)
+    with mock.patch.object(failures.queries, "registry") as registry:
+        status = failures.record_failure(
+            "bucket", OBJECT_KEY, "parse", ValueError("bad line"),
+            db_connection, policy=POLICY
+        )
+    assert status == expected_status
+    record_params = registry.execute.call_args_list[0][0][2]
+    assert record_params["exception"] == "ValueError"
+    assert record_params["error"] == "bad line"
+    schedule_params = registry.execute.call_args_list[1][0][2]
+    assert schedule_params["failure_id"] == 7
+    assert schedule_params["status"] == expected_status
+
+
+def test_invalid_status_filter_is_rejected():
+    with pytest.raises(ValueError):
+        failures.list_failures(mock.MagicMock(), statuses=["gone"])
+
+
+def test_failed_ingestion_is_recorded_with_its_stage():
+    with mock.patch.object(
+            datareceiver, "download_track_data",
+            side_effect=IOError("timeout")), \
+            mock.patch.object(
+                datareceiver.failures, "record_failure") as record_failure:
+        with pytest.raises(IOError):
+            datareceiver.handle_track_upload(
+                "bucket", OBJECT_KEY, mock.MagicMock(),
+                options=datareceiver.IngestionOptions(retry_policy=POLICY))
+    args = record_failure.call_args[0]
+    assert args[:3] == ("bucket", OBJECT_KEY, "download")
+    assert isinstance(args[3], IOError)
+
+
+def test_recording_failure_does_not_mask_original_exception():
+    with mock.patch.object(
+            datareceiver, "download_track_data",
+            side_effect=IOError("timeout")), \
+            mock.patch.object(
+                datareceiver.failures, "record_failure",
+                side_effect=RuntimeError("database is down")):
+        with pytest.raises(IOError):
+            datareceiver.handle_track_upload(
+                "bucket", OBJECT_KEY, mock.MagicMock(),
+                options=datareceiver.IngestionOptions(retry_policy=POLICY))
@@ -0,0 +1,90 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from unittest import mock
+
+import pytest
+
+from faas import datareceiver
+from faas import ledger
+
+pytestmark = pytest.mark.unit
+
+OBJECT_KEY = "cognito/smb/keycloakuuid-abcd-123456789012345678901234/1.zip"
+
+
+@pytest.fixture
+def patched_ledger():
+    with mock.patch.object(datareceiver, "ledger") as patched:
+        patched.STAGES = ledger.STAGES
+        patched.SKIPPED = ledger.SKIPPED
+        patched.FAILED = ledger.FAILED
+        patched.get_object_etag.return_value = '"etag"'
+        yield patched
+
+
+def test_duplicate_delivery_is_not_downloaded(patched_ledger):
+    patched_ledger.start_ingestion.return_value = None
+    patched_ledger.get_ingested_track_id.return_value = 3
+    with mock.patch.object(
+            datareceiver, "download_track_data") as mock_download:
+        result = datareceiver.handle_track_upload(
+            "bucket", OBJECT_KEY, mock.MagicMock(),
+            options=datareceiver.IngestionOptions(use_ledger=True))
+    assert result == 3
+    mock_download.assert_not_called()
+    patched_ledger.get_ingested_track_id.assert_called_once_with(
+        OBJECT_KEY, '"etag"', mock.ANY)
+
+
+def test_failed_ingestion_resumes_after_last_completed_stage(
+        patched_ledger):
+    patched_ledger.start_ingestion.return_value = ledger.LedgerRecord(
+        id=1, stage="segments", track_id=10, session_id=20, attempts=2)
+    with mock.patch.object(
+            datareceiver, "download_track_data") as mock_download, \
+            mock.patch.object(datareceiver, "insert_segments") as segments, \
+            mock.patch.object(
+                datareceiver.segmentmetrics,
+                "insert_segments_data") as metrics, \
+            mock.patch.object(
+                datareceiver, "update_track_aggregated_data") as aggregates:
+        result = datareceiver.handle_track_upload(
+            "bucket", OBJECT_KEY, mock.MagicMock(),
+            options=datareceiver.IngestionOptions(use_ledger=True))
+    assert result == 10
+    mock_download.assert_not_called()
+    segments.assert_not_called()
+    metrics.assert_called_once_with(10, mock.ANY)
+    aggregates.assert_called_once_with(10, mock.ANY)
+    recorded_stages = [
+        call[0][1] for call in patched_ledger.record_stage.call_args_list]
+    assert recorded_stages == ["metrics", "aggregates"]
+    patched_ledger.finish_ingestion.assert_called_once_with(1, mock.ANY)
+
+
+def test_failed_stage_is_recorded(patched_ledger):
+    patched_ledger.start_ingestion.return_value = ledger.LedgerRecord(
+        id=1, stage="points", track_id=10, session_id=20, attempts=1)
+    with mock.patch.object(
+            datareceiver,
+            "insert_segments",
+            side_effect=ValueError("invalid geometry")):
+        with pytest.raises(ValueError):
+            datareceiver.handle_track_upload(
+                "bucket", OBJECT_KEY, mock.MagicMock(),
+                options=datareceiver.IngestionOptions(use_ledger=True))
+    patched_ledger.record_stage.assert_not_called()
+    patched_ledger.finish_ingestion.assert_called_once_with(
+        1,
+        mock.ANY,
+        status=ledger.FAILED,
+        error="ValueError: invalid geometry"
+    )
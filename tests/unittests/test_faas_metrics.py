@@ -0,0 +1,99 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import logging
+from unittest import mock
+
+import pytest
+
+from faas import metrics
+
+pytestmark = pytest.mark.unit
+
+
+def _build_metrics(**kwargs):
+    values = {
+        "object_key": "cognito/smb/key.zip",
+        "track_id": 1,
+        "succeeded": True,
+        "num_points": 100,
+        "num_segments": 2,
+        "total_seconds": 0.3,
+        "stage_seconds": {"download": 0.1, "parse": 0.02},
+    }
+    values.update(kwargs)
+    return metrics.IngestionMetrics(**values)
+
+
+def test_nested_stages_are_timed_exclusively():
+    clock = iter([0, 1, 3, 4, 10, 11])
+    with mock.patch.object(
+            metrics.time, "perf_counter", side_effect=lambda: next(clock)):
+        timer = metrics.StageTimer()  # starts at 0
+        with timer.stage("point_insert"):  # 1
+            with timer.stage("parse"):  # 3
+                pass  # 4
+        # point_insert exits at 10
+        result = timer.get_metrics("key", track_id=2)  # 11
+    assert result.stage_seconds == {"point_insert": 8, "parse": 1}
+    assert result.total_seconds == 11
+    assert result.track_id == 2
+
+
+def test_iter_stage_times_only_iteration():
+    timer = metrics.StageTimer()
+    with timer.stage("point_insert"):
+        items = list(timer.iter_stage("parse", iter([1, 2, 3])))
+    assert items == [1, 2, 3]
+    assert set(timer.stage_seconds) == {"point_insert", "parse"}
+
+
+def test_in_memory_sink_collects_records():
+    sink = metrics.InMemorySink()
+    record = _build_metrics()
+    metrics.emit(record, sinks=[sink])
+    assert sink.records == [record]
+
+
+def test_logging_sink_writes_json(caplog):
+    sink = metrics.LoggingSink(level=logging.INFO)
+    with caplog.at_level(logging.INFO, logger=metrics.logger.name):
+        sink.record(_build_metrics())
+    assert '"num_points": 100' in caplog.text
+
+
+def test_failing_sink_does_not_break_ingestion():
+    broken_sink = mock.MagicMock()
+    broken_sink.record.side_effect = ValueError()
+    sink = metrics.InMemorySink()
+    metrics.emit(_build_metrics(), sinks=[broken_sink, sink])
+    assert len(sink.records) == 1
+
+
+def test_prometheus_sink_renders_histograms():
+    sink = metrics.PrometheusSink(buckets=[0.05, 0.5])
+    sink.record(_build_metrics())
+    sink.record(_build_metrics(succeeded=False, num_segments=None))
+    rendered = sink.render()
+    assert 'smb_ingestion_tracks_total{status="failed"} 1' in rendered
+    assert "smb_ingestion_points_total 200" in rendered
+    assert "smb_ingestion_segments_total 2" in rendered
+    assert (
+        'smb_ingestion_stage_seconds_bucket{stage="download",le="0.05"} 0'
+        in rendered
+    )
+    assert (
+        'smb_ingestion_stage_seconds_bucket{stage="parse",le="0.05"} 2'
+        in rendered
+    )
+    assert 'smb_ingestion_seconds_bucket{le="+Inf"} 2' in rendered
+    assert "smb_ingestion_seconds_count 2" in rendered
+    assert rendered.index('stage="download"') < rendered.index(
+        'stage="parse"')
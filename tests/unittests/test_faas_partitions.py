@@ -0,0 +1,69 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import datetime as dt
+from unittest import mock
+
+import pytest
+
+from faas import partitions
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.mark.parametrize("month", [
+    dt.date(2018, 1, 1),
+    dt.date(2018, 12, 1),
+    dt.date(2019, 6, 1),
+])
+def test_partition_names_round_trip(month):
+    name = partitions.get_partition_name(month)
+    assert partitions.get_partition_month(name) == month
+
+
+def test_move_legacy_points_creates_partitions_first():
+    db_connection = mock.MagicMock()
+    cursor = db_connection.cursor.return_value.__enter__.return_value
+    cursor.rowcount = 10
+    moved = partitions.move_legacy_points(db_connection, batch_size=10)
+    assert moved == 10
+    queries = [call[0][0] for call in cursor.execute.call_args_list]
+    assert "tracks_create_collectedpoint_partitions" in queries[0]
+    assert "DELETE FROM tracks_collectedpoint_legacy" in queries[1]
+
+
+def test_create_upcoming_partitions_spans_the_next_months():
+    db_connection = mock.MagicMock()
+    cursor = db_connection.cursor.return_value.__enter__.return_value
+    cursor.fetchone.return_value = (2,)
+    created = partitions.create_upcoming_partitions(
+        db_connection, num_months=2, today=dt.date(2018, 11, 20))
+    assert created == 2
+    query, params = cursor.execute.call_args[0]
+    assert "tracks_create_collectedpoint_partitions" in query
+    assert params["first_timestamp"] == dt.datetime(
+        2018, 11, 1, tzinfo=dt.timezone.utc)
+    assert params["last_timestamp"] == dt.datetime(
+        2019, 1, 1, tzinfo=dt.timezone.utc)
+
+
+@pytest.mark.parametrize("drop, expected_statements", [
+    (False, ["DETACH PARTITION", "CREATE SCHEMA", "SET SCHEMA"]),
+    (True, ["DETACH PARTITION", "DROP TABLE"]),
+])
+def test_detach_partition(drop, expected_statements):
+    db_connection = mock.MagicMock()
+    cursor = db_connection.cursor.return_value.__enter__.return_value
+    partitions.detach_partition(
+        "tracks_collectedpoint_y2018m05", db_connection, drop=drop)
+    statements = [call[0][0] for call in cursor.execute.call_args_list]
+    assert len(statements) == len(expected_statements)
+    for statement, expected in zip(statements, expected_statements):
+        assert expected in repr(statement)
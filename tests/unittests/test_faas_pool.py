@@ -0,0 +1,101 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from unittest import mock
+
+import psycopg2
+import psycopg2.extensions
+import pytest
+
+from faas import pool
+
+pytestmark = pytest.mark.unit
+
+
+def _build_connection():
+    connection = mock.MagicMock(closed=0)
+    connection.get_transaction_status.return_value = (
+        psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+    return connection
+
+
+@pytest.fixture
+def connection_pool():
+    return pool.ConnectionPool(
+        _build_connection,
+        min_size=1,
+        max_size=2,
+        timeout=0.01,
+        prepare_statements=False
+    )
+
+
+def test_pool_opens_min_size_connections(connection_pool):
+    stats = connection_pool.get_stats()
+    assert stats.size == 1
+    assert stats.idle == 1
+
+
+def test_pool_reuses_connections(connection_pool):
+    with connection_pool.connection() as first:
+        pass
+    with connection_pool.connection() as second:
+        pass
+    assert first is second
+    assert connection_pool.get_stats().acquisitions == 2
+
+
+def test_pool_times_out_when_saturated(connection_pool):
+    first = connection_pool.getconn()
+    second = connection_pool.getconn()
+    with pytest.raises(pool.PoolTimeoutError):
+        connection_pool.getconn()
+    stats = connection_pool.get_stats()
+    assert stats.in_use == 2
+    assert stats.timeouts == 1
+    connection_pool.putconn(first)
+    connection_pool.putconn(second)
+    assert connection_pool.get_stats().idle == 2
+
+
+def test_pool_resets_connections_in_transaction(connection_pool):
+    with connection_pool.connection() as connection:
+        connection.get_transaction_status.return_value = (
+            psycopg2.extensions.TRANSACTION_STATUS_INERROR)
+    connection.rollback.assert_called_once_with()
+    assert connection_pool.get_stats().idle == 1
+
+
+def test_pool_discards_closed_connections(connection_pool):
+    with connection_pool.connection() as connection:
+        connection.closed = 1
+    stats = connection_pool.get_stats()
+    assert stats.size == 0
+    assert stats.discarded == 1
+
+
+def test_pool_replaces_unhealthy_connections(connection_pool):
+    connection_pool.health_check_interval = 0
+    with connection_pool.connection() as connection:
+        pass
+    connection.cursor.side_effect = psycopg2.OperationalError
+    with connection_pool.connection() as replacement:
+        assert replacement is not connection
+    connection.close.assert_called_once_with()
+    assert connection_pool.get_stats().size == 1
+
+
+def test_pool_prepares_statements_on_new_connections():
+    registry = mock.MagicMock()
+    connection_pool = pool.ConnectionPool(
+        _build_connection, min_size=2, query_registry=registry)
+    assert registry.prepare.call_count == 2
+    connection_pool.close()
+    assert connection_pool.get_stats().size == 0
@@ -0,0 +1,79 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from unittest import mock
+
+import pytest
+
+from faas import queries
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def registry():
+    return queries.QueryRegistry(
+        prepared_queries=["insert-track.sql", "get-track-owner-ids.sql"])
+
+
+def test_registry_loads_all_queries(registry):
+    sql_files = sorted(i.name for i in queries.QUERIES_DIR.glob("*.sql"))
+    assert sorted(registry.queries.keys()) == sql_files
+
+
+def test_prepared_query_with_positional_parameters(registry):
+    prepared = registry.prepared_queries["insert-track.sql"]
+    assert "VALUES ($1, $2, $3, now())" in prepared.prepare_statement
+    assert prepared.execute_statement == (
+        "EXECUTE faas_insert_track (%s, %s, %s)")
+
+
+def test_registry_executes_plain_query_on_unprepared_connection(registry):
+    cursor = mock.MagicMock()
+    params = {"user_uuids": ["abcd"]}
+    registry.execute(cursor, "get-track-owner-ids.sql", params)
+    cursor.execute.assert_called_with(
+        registry.get("get-track-owner-ids.sql"), params)
+
+
+def test_registry_executes_prepared_statement(registry):
+    connection = mock.MagicMock()
+    registry.prepare(connection)
+    cursor = mock.MagicMock(connection=connection)
+    params = {"user_uuids": ["abcd"]}
+    registry.execute(cursor, "get-track-owner-ids.sql", params)
+    cursor.execute.assert_called_with(
+        "EXECUTE faas_get_track_owner_ids (%(user_uuids)s)", params)
+
+
+def test_registry_commits_prepared_statements(registry):
+    connection = mock.MagicMock()
+    registry.prepare(connection)
+    registry.prepare(connection)
+    assert connection.commit.call_count == 1
+
+
+def test_registry_records_stats(registry):
+    cursor = mock.MagicMock()
+    for _ in range(3):
+        registry.execute(cursor, "delete-track.sql", {"track_id": 1})
+    cursor.execute.side_effect = RuntimeError
+    with pytest.raises(RuntimeError):
+        registry.execute(cursor, "insert-track.sql", (1, 2, 3))
+    stats = registry.get_stats()
+    assert stats["delete-track.sql"].calls == 3
+    assert stats["insert-track.sql"].calls == 1
+    registry.reset_stats()
+    assert registry.get_stats() == {}
+
+
+def test_registry_rejects_unknown_query(registry):
+    with pytest.raises(RuntimeError):
+        registry.get("fake.sql")
@@ -0,0 +1,64 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from unittest import mock
+
+import pytest
+
+from faas import _constants
+from faas import segmentmetrics
+from faas._constants import VehicleType
+
+pytestmark = pytest.mark.unit
+
+
+def test_coefficients_cover_all_vehicle_types():
+    coefficients = segmentmetrics.get_coefficients()
+    num_vehicle_types = len(VehicleType)
+    for name, values in coefficients.items():
+        if not name.startswith("step_"):
+            assert len(values) == num_vehicle_types
+    assert coefficients["vehicle_type"] == [i.name for i in VehicleType]
+
+
+@pytest.mark.parametrize("vehicle_type, expected", [
+    (VehicleType.car, (11.5, 1.417, 0.106, 0.072)),
+    (VehicleType.bus, (None, None, 0, 0)),
+    (VehicleType.bike, (None, None, 0, 0)),
+])
+def test_coefficients_costs(vehicle_type, expected):
+    coefficients = segmentmetrics.get_coefficients()
+    index = coefficients["vehicle_type"].index(vehicle_type.name)
+    result = tuple(coefficients[name][index] for name in (
+        "fuel_consumption",
+        "fuel_price",
+        "depreciation_cost",
+        "operation_cost",
+    ))
+    assert result == expected
+
+
+def test_coefficients_calory_steps():
+    coefficients = segmentmetrics.get_coefficients()
+    steps = _constants.CALORY_CONSUMPTION[VehicleType.bike]["steps"]
+    bike_speeds = [
+        speed for vehicle_type, speed in zip(
+            coefficients["step_vehicle_type"], coefficients["step_speed"])
+        if vehicle_type == VehicleType.bike.name
+    ]
+    assert bike_speeds == [step["speed"] for step in steps]
+
+
+def test_insert_segments_data_runs_a_single_query():
+    cursor = mock.MagicMock()
+    segmentmetrics.insert_segments_data(1, cursor)
+    assert cursor.execute.call_count == 1
+    query_params = cursor.execute.call_args[0][1]
+    assert query_params["track_ids"] == [1]
@@ -0,0 +1,65 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import datetime as dt
+
+import numpy as np
+import pytest
+
+from faas import sensorarrays
+
+pytestmark = pytest.mark.unit
+
+
+def _get_row(timestamp_millis, vehicle_type="bike", humidity=50.5):
+    sensor_values = [1.0] * len(sensorarrays.SENSOR_CHANNELS)
+    sensor_values[sensorarrays.SENSOR_CHANNELS.index("humidity")] = humidity
+    return [timestamp_millis, 10.5, 43.8, vehicle_type, 7] + sensor_values
+
+
+@pytest.mark.parametrize("dtype, encoding, values", [
+    ("<i8", sensorarrays.ZLIB_DELTA, [1526312460000, 1526312461000, 0]),
+    ("<f8", sensorarrays.ZLIB, [10.5082121, 10.5082456]),
+    ("<f4", sensorarrays.ZLIB, [1.5, float("nan")]),
+    ("|i1", sensorarrays.ZLIB, []),
+])
+def test_encode_round_trip(dtype, encoding, values):
+    data = sensorarrays.encode(np.array(values), dtype, encoding)
+    decoded = sensorarrays.decode(data, dtype, encoding)
+    np.testing.assert_array_equal(decoded, np.array(values, dtype=dtype))
+
+
+def test_invalid_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        sensorarrays.encode(np.array([1]), "<i8", "lz4")
+
+
+def test_track_columns_from_rows():
+    rows = [
+        _get_row(1526312460000),
+        _get_row(1526312461000, vehicle_type=None, humidity=None),
+    ]
+    columns = sensorarrays._get_track_columns(rows)
+    assert columns["timeStamp"][1] == np.datetime64(
+        dt.datetime(2018, 5, 14, 15, 41, 1), "ms")
+    assert columns["vehicleMode"].tolist() == [2, 0]
+    assert columns["humidity"][0] == 50.5
+    assert np.isnan(columns["humidity"][1])
+
+
+def test_encoded_track_decodes_to_original_values():
+    rows = [_get_row(1526312460000 + index * 1000) for index in range(10)]
+    channels = sensorarrays.encode_track(sensorarrays._get_track_columns(rows))
+    assert [c.name for c in channels] == list(sensorarrays.CHANNELS)
+    assert all(c.num_values == 10 for c in channels)
+    decoded = sensorarrays.decode_channels(channels)
+    assert decoded["timestamp"].tolist() == [row[0] for row in rows]
+    assert decoded["latitude"].tolist() == [43.8] * 10
+    assert decoded["humidity"].dtype == np.float32
@@ -0,0 +1,59 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from unittest import mock
+
+import pytest
+
+from faas import simplification
+
+pytestmark = pytest.mark.unit
+
+
+def test_tolerance_halves_with_each_zoom_level():
+    for zoom in range(simplification.MAX_ZOOM_LEVEL):
+        assert simplification.get_tolerance(zoom + 1) == pytest.approx(
+            simplification.get_tolerance(zoom) / 2)
+
+
+def test_meters_tolerance():
+    assert simplification.get_meters_tolerance(
+        simplification.METERS_PER_DEGREE) == 1
+
+
+@pytest.mark.parametrize("zoom, expected", [
+    (0, 10),
+    (10, 10),
+    (12, 13),
+    (16, 16),
+    (simplification.MAX_ZOOM_LEVEL, None),
+])
+def test_precomputed_zoom(zoom, expected):
+    assert simplification.get_precomputed_zoom(zoom) == expected
+
+
+def test_update_segments_geometry_runs_a_single_query():
+    cursor = mock.MagicMock()
+    simplification.update_segments_geometry([1, 2], cursor)
+    assert cursor.execute.call_count == 1
+    query, query_params = cursor.execute.call_args[0]
+    for zoom in simplification.ZOOM_LEVELS:
+        assert "geom_z{}".format(zoom) in query
+        assert query_params["tolerance_z{}".format(zoom)] == (
+            simplification.get_tolerance(zoom))
+    assert query_params["track_ids"] == [1, 2]
+    assert query_params["segment_ids"] is None
+
+
+def test_update_segments_geometry_of_some_segments():
+    cursor = mock.MagicMock()
+    simplification.update_segments_geometry([1], cursor, segment_ids=(3, 4))
+    query_params = cursor.execute.call_args[0][1]
+    assert query_params["segment_ids"] == [3, 4]
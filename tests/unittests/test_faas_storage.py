@@ -0,0 +1,117 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import io
+import pickle
+import zipfile
+
+import pytest
+
+from faas import datareceiver
+from faas import storage
+
+pytestmark = pytest.mark.unit
+
+DATA = bytes(range(256)) * 40
+
+
+@pytest.fixture(params=["memory", "local"])
+def object_store(request, tmp_path):
+    if request.param == "memory":
+        store = storage.InMemoryObjectStore()
+    else:
+        store = storage.LocalObjectStore(tmp_path)
+    store.put("bucket", "cognito/smb/a.zip", DATA)
+    store.put("bucket", "cognito/smb/b.zip", b"b")
+    store.put("other", "c.zip", b"c")
+    return store
+
+
+def test_object_store_streaming_read(object_store):
+    chunks = list(object_store.iter_chunks(
+        "bucket", "cognito/smb/a.zip", chunk_size=1000))
+    assert len(chunks) == 11
+    assert b"".join(chunks) == DATA
+
+
+def test_object_store_ranged_read(object_store):
+    assert object_store.read_range(
+        "bucket", "cognito/smb/a.zip", 10, 5) == DATA[10:15]
+    assert object_store.read_range(
+        "bucket", "cognito/smb/a.zip", len(DATA) - 2, 5) == DATA[-2:]
+
+
+def test_object_store_lists_objects(object_store):
+    assert list(object_store.list_objects("bucket")) == [
+        "cognito/smb/a.zip", "cognito/smb/b.zip"]
+    filtered = object_store.list_objects("bucket", prefix="cognito/smb/b")
+    assert list(filtered) == ["cognito/smb/b.zip"]
+
+
+def test_object_store_etag_changes_with_content(object_store):
+    etag = object_store.get_etag("bucket", "cognito/smb/b.zip")
+    assert etag == object_store.get_etag("bucket", "cognito/smb/b.zip")
+    object_store.put("bucket", "cognito/smb/b.zip", b"changed")
+    assert etag != object_store.get_etag("bucket", "cognito/smb/b.zip")
+
+
+def test_object_store_missing_object(object_store):
+    with pytest.raises(storage.ObjectNotFoundError):
+        object_store.download("bucket", "missing.zip")
+
+
+def test_object_store_prefetch_keeps_order(object_store):
+    objects = [
+        ("bucket", "cognito/smb/b.zip"),
+        ("other", "c.zip"),
+        ("bucket", "cognito/smb/a.zip"),
+    ]
+    result = []
+    for bucket, key, downloaded in object_store.prefetch(
+            objects, max_workers=2):
+        with downloaded:
+            result.append((bucket, key, downloaded.read()))
+    assert result == [
+        ("bucket", "cognito/smb/b.zip", b"b"),
+        ("other", "c.zip", b"c"),
+        ("bucket", "cognito/smb/a.zip", DATA),
+    ]
+
+
+def test_ranged_reader_opens_zip_archive():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_handler:
+        zip_handler.writestr("track.csv", "header\nline 1\nline 2")
+    object_store = storage.InMemoryObjectStore(
+        {("bucket", "track.zip"): buffer.getvalue()})
+    with object_store.open_ranged("bucket", "track.zip") as archive:
+        lines = list(datareceiver.iter_track_data_lines(archive))
+    assert lines == ["header", "line 1", "line 2"]
+
+
+def test_local_object_store_rejects_keys_outside_bucket(tmp_path):
+    object_store = storage.LocalObjectStore(tmp_path)
+    with pytest.raises(ValueError):
+        object_store.put("bucket", "../other/file.zip", b"")
+
+
+def test_s3_object_store_can_be_pickled():
+    object_store = storage.S3ObjectStore(region_name="eu-west-1")
+    unpickled = pickle.loads(pickle.dumps(object_store))
+    assert unpickled.session_kwargs == {"region_name": "eu-west-1"}
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("s3://", storage.S3ObjectStore),
+    ("file:///tmp", storage.LocalObjectStore),
+    ("memory://", storage.InMemoryObjectStore),
+])
+def test_get_object_store(url, expected):
+    assert isinstance(storage.get_object_store(url), expected)
@@ -0,0 +1,89 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import io
+import zipfile
+
+import numpy as np
+import pytest
+
+from faas import columnar
+from faas import datareceiver
+from faas import synthetic
+from faas import validation
+
+pytestmark = pytest.mark.unit
+
+
+def _parse(upload: bytes) -> columnar.TrackColumns:
+    with zipfile.ZipFile(io.BytesIO(upload)) as zip_handler:
+        lines = zip_handler.read("track.csv").decode().splitlines()
+    return columnar.parse_track_data(lines)
+
+
+@pytest.mark.parametrize("vehicle_modes, sampling_seconds", [
+    (("1",), 1),
+    (("2",), 5),
+    (("6",), 1),
+    (("1", "2", "4", "2", "1"), 2),
+])
+def test_generated_tracks_are_valid(vehicle_modes, sampling_seconds):
+    track_data = _parse(
+        synthetic.build_upload(
+            synthetic.generate_points(
+                500, vehicle_modes=vehicle_modes,
+                sampling_seconds=sampling_seconds
+            )
+        )
+    )
+    assert columnar.get_num_points(track_data) == 500
+    assert validation.validate(track_data).is_valid
+    assert np.all(
+        np.diff(track_data["timeStamp"]) ==
+        np.timedelta64(sampling_seconds * 1000, "ms")
+    )
+
+
+def test_vehicle_modes_are_switched_evenly():
+    points = synthetic.generate_points(9, vehicle_modes=("1", "4", "1"))
+    assert [point.vehicleMode for point in points] == list("111444111")
+
+
+def test_speed_depends_on_vehicle_mode():
+    lengths = {}
+    for vehicle_mode in ("1", "4"):
+        track_data = _parse(
+            synthetic.build_upload(
+                synthetic.generate_points(
+                    200, vehicle_modes=(vehicle_mode,), gps_noise=0)
+            )
+        )
+        lengths[vehicle_mode] = validation.get_step_distances(
+            track_data["longitude"], track_data["latitude"]).sum()
+    assert lengths["1"] == pytest.approx(200 * 1.4, rel=0.1)
+    assert lengths["4"] == pytest.approx(200 * 14, rel=0.1)
+
+
+def test_generated_points_are_reproducible():
+    assert (
+        synthetic.generate_points(10, seed=3) ==
+        synthetic.generate_points(10, seed=3) !=
+        synthetic.generate_points(10, seed=4)
+    )
+
+
+def test_written_upload_matches_built_upload(tmp_path):
+    points = synthetic.generate_points(20)
+    path = tmp_path / "uploads" / "track.zip"
+    synthetic.write_upload(iter(points), path)
+    with zipfile.ZipFile(str(path)) as zip_handler:
+        lines = zip_handler.read("track.csv").decode().splitlines()
+    assert lines[0] == ",".join(datareceiver.PointData._fields)
+    assert lines[1:] == [",".join(point) for point in points]
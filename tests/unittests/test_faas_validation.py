@@ -0,0 +1,133 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import numpy as np
+import pytest
+
+from faas import columnar
+from faas import validation
+from faas._constants import VehicleType
+
+pytestmark = pytest.mark.unit
+
+# approximate length of a degree of latitude, in meters
+DEGREE = 111_195
+
+
+def _build_track_data(north_meters, seconds=None, vehicle_modes=None,
+                      accuracies=None):
+    num_points = len(north_meters)
+    track_data = {
+        name: np.zeros(num_points, dtype=type_)
+        for name, type_ in columnar.COLUMN_TYPES.items()
+    }
+    seconds = np.arange(num_points) if seconds is None else seconds
+    vehicle_modes = (
+        [VehicleType.bike.value] * num_points if vehicle_modes is None
+        else vehicle_modes
+    )
+    track_data["latitude"] = np.asarray(north_meters, dtype=float) / DEGREE
+    track_data["timeStamp"] = (
+        np.datetime64("2018-05-14T15:41:00") +
+        (np.asarray(seconds) * 1000).astype("timedelta64[ms]")
+    )
+    track_data["vehicleMode"] = np.asarray(vehicle_modes, dtype=np.int8)
+    track_data["accuracy"] = (
+        np.full(num_points, 5.0) if accuracies is None
+        else np.asarray(accuracies, dtype=float)
+    )
+    track_data["sessionId"][:] = 1
+    return track_data
+
+
+def test_plausible_track_is_valid():
+    # 5 m/s, i.e. 18 km/h
+    result = validation.validate(_build_track_data(np.arange(100) * 5.0))
+    assert result == validation.ValidationResult(True, [])
+
+
+def test_short_track_is_not_valid():
+    result = validation.validate(_build_track_data(np.arange(5) * 5.0))
+    assert not result.is_valid
+    assert result.errors[0].startswith("too few points")
+
+
+def test_timestamp_regressions_are_detected():
+    seconds = np.arange(50)
+    seconds[20] = 10
+    result = validation.validate(
+        _build_track_data(np.arange(50) * 5.0, seconds=seconds))
+    assert result.errors == ["timestamps go back in time 1 times"]
+
+
+@pytest.mark.parametrize("vehicle_type, is_valid", [
+    (VehicleType.foot, False),
+    (VehicleType.car, True),
+])
+def test_max_speed_depends_on_vehicle_type(vehicle_type, is_valid):
+    # 25 m/s, i.e. 90 km/h
+    track_data = _build_track_data(
+        np.arange(50) * 25.0, vehicle_modes=[vehicle_type.value] * 50)
+    result = validation.validate(track_data)
+    assert result.is_valid == is_valid
+    if not is_valid:
+        assert "for foot" in result.errors[0]
+
+
+def test_speeding_is_measured_per_vehicle_type():
+    north_meters = np.concatenate([
+        np.arange(50) * 1.0,  # walking
+        49 + np.arange(1, 51) * 30.0,  # driving at 108 km/h
+    ])
+    vehicle_modes = (
+        [VehicleType.foot.value] * 50 + [VehicleType.car.value] * 50)
+    result = validation.validate(
+        _build_track_data(north_meters, vehicle_modes=vehicle_modes))
+    assert result.is_valid
+
+
+def test_gps_jumps_are_detected():
+    north_meters = np.arange(100) * 5.0
+    north_meters[[20, 50, 80]] += 5000
+    result = validation.validate(_build_track_data(north_meters))
+    assert "6 GPS jumps of more than 500 m" in result.errors
+
+
+def test_isolated_gps_jump_is_tolerated():
+    north_meters = np.arange(100) * 5.0
+    north_meters[50] += 5000
+    result = validation.validate(_build_track_data(north_meters))
+    assert result.is_valid
+
+
+def test_low_accuracy_is_detected():
+    accuracies = [100.0] * 60 + [5.0] * 40
+    result = validation.validate(
+        _build_track_data(np.arange(100) * 5.0, accuracies=accuracies))
+    assert result.errors == [
+        "accuracy is worse than 50 m for 60% of points"]
+
+
+def test_missing_accuracy_is_ignored():
+    accuracies = [np.nan] * 100
+    result = validation.validate(
+        _build_track_data(np.arange(100) * 5.0, accuracies=accuracies))
+    assert result.is_valid
+
+
+def test_rules_may_be_overridden():
+    track_data = _build_track_data(np.arange(100) * 5.0)
+    result = validation.validate(
+        track_data, min_points=200, max_speeds={VehicleType.bike: 10})
+    assert result.errors[0].startswith("too few points")
+    result = validation.validate(
+        track_data, max_speeds={VehicleType.bike: 10})
+    assert result.errors == [
+        "speed exceeds 10 km/h for bike during 100% of the track"]
@@ -0,0 +1,246 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+from concurrent import futures
+from concurrent.futures.process import BrokenProcessPool
+import threading
+from unittest import mock
+
+import pytest
+
+from faas import failures
+from faas import worker
+
+pytestmark = pytest.mark.unit
+
+
+def _fake_handle_track_upload(bucket, object_key, db_connection, **kwargs):
+    if object_key == "broken":
+        raise RuntimeError("Could not find track data")
+    return int(object_key)
+
+
+@pytest.fixture
+def job_queue():
+    queue = worker.InMemoryJobQueue()
+    for object_key in ["1", "2", "broken", "4", "5"]:
+        queue.put("bucket", object_key)
+    return queue
+
+
+@pytest.fixture
+def patched_handler():
+    with mock.patch.object(
+            worker.datareceiver,
+            "handle_track_upload",
+            side_effect=_fake_handle_track_upload) as handler:
+        yield handler
+
+
+def test_in_memory_queue_claims_in_order(job_queue):
+    jobs = job_queue.claim(2)
+    assert [job.object_key for job in jobs] == ["1", "2"]
+    assert all(job.attempts == 1 for job in jobs)
+    assert job_queue.pending_count() == 3
+
+
+def test_worker_drains_queue(job_queue, patched_handler):
+    with futures.ThreadPoolExecutor(max_workers=2) as executor:
+        ingestion_worker = worker.IngestionWorker(
+            job_queue,
+            db_settings={},
+            num_processes=2,
+            poll_interval=0.01,
+            executor=executor
+        )
+        stats = ingestion_worker.run(
+            stop_when_empty=True, handle_signals=False)
+    assert stats.processed == 4
+    assert stats.failed == 1
+    assert stats.in_flight == 0
+    assert stats.latency_p50 is not None
+    assert job_queue.pending_count() == 0
+    assert sorted(track_id for _, track_id in job_queue.done.values()) == [
+        1, 2, 4, 5]
+    failed_job, error = list(job_queue.failed.values())[0]
+    assert failed_job.object_key == "broken"
+    assert "RuntimeError" in error
+
+
+def test_worker_does_not_exceed_max_in_flight(job_queue):
+    concurrent_jobs = []
+    release = threading.Event()
+    lock = threading.Lock()
+    running = [0]
+
+    def slow_handler(*args, **kwargs):
+        with lock:
+            running[0] += 1
+            concurrent_jobs.append(running[0])
+        release.wait(1)
+        with lock:
+            running[0] -= 1
+        return 1
+
+    with mock.patch.object(
+            worker.datareceiver, "handle_track_upload",
+            side_effect=slow_handler):
+        with futures.ThreadPoolExecutor(max_workers=5) as executor:
+            ingestion_worker = worker.IngestionWorker(
+                job_queue,
+                db_settings={},
+                num_processes=1,
+                max_in_flight=2,
+                poll_interval=0.01,
+                executor=executor
+            )
+            threading.Timer(0.1, release.set).start()
+            ingestion_worker.run(stop_when_empty=True, handle_signals=False)
+    assert max(concurrent_jobs) <= 2
+    assert len(job_queue.done) + len(job_queue.failed) == 5
+
+
+def test_stopped_worker_finishes_in_flight_jobs(job_queue, patched_handler):
+    with futures.ThreadPoolExecutor(max_workers=2) as executor:
+        ingestion_worker = worker.IngestionWorker(
+            job_queue,
+            db_settings={},
+            max_in_flight=2,
+            poll_interval=0.01,
+            executor=executor
+        )
+        original_claim = job_queue.claim
+
+        def claim_once(limit):
+            ingestion_worker.stop()
+            return original_claim(limit)
+
+        job_queue.claim = claim_once
+        stats = ingestion_worker.run(handle_signals=False)
+    assert stats.processed == 2
+    assert job_queue.pending_count() == 3
+    assert len(job_queue.processing) == 0
+
+
+def test_in_memory_queue_gives_up_jobs_after_max_attempts():
+    queue = worker.InMemoryJobQueue(max_attempts=2)
+    queue.put("bucket", "crashing")
+    queue.put("bucket", "1")
+    for _ in range(2):
+        queue.release(queue.claim(1))
+    assert [job.object_key for job in queue.claim(2)] == ["1"]
+    dead_job, error = queue.dead[1]
+    assert dead_job.attempts == 2
+    assert error == "Gave up after 2 attempts"
+
+
+def test_worker_reports_started_jobs(job_queue, patched_handler):
+    job_queue = mock.Mock(wraps=job_queue)
+    with futures.ThreadPoolExecutor(max_workers=2) as executor:
+        ingestion_worker = worker.IngestionWorker(
+            job_queue,
+            db_settings={},
+            num_processes=2,
+            poll_interval=0.01,
+            executor=executor
+        )
+        ingestion_worker.run(stop_when_empty=True, handle_signals=False)
+    started = [
+        job.id for call in job_queue.start.call_args_list
+        for job in call[0][0]
+    ]
+    assert sorted(started) == [1, 2, 3, 4, 5]
+
+
+class _BrokenExecutor(futures.Executor):
+    """An executor whose process pool broke after some jobs were submitted"""
+
+    def __init__(self, num_jobs):
+        self.num_jobs = num_jobs
+
+    def submit(self, fn, *args, **kwargs):
+        if self.num_jobs == 0:
+            raise BrokenProcessPool("A child process terminated abruptly")
+        self.num_jobs -= 1
+        future = futures.Future()
+        future.set_exception(
+            BrokenProcessPool("A child process terminated abruptly"))
+        return future
+
+
+def test_worker_replaces_broken_process_pool(job_queue, patched_handler):
+    with futures.ThreadPoolExecutor(max_workers=2) as executor:
+        with mock.patch.object(
+                worker.futures,
+                "ProcessPoolExecutor",
+                side_effect=[_BrokenExecutor(2), executor]):
+            ingestion_worker = worker.IngestionWorker(
+                job_queue,
+                db_settings={},
+                num_processes=2,
+                poll_interval=0.01
+            )
+            stats = ingestion_worker.run(
+                stop_when_empty=True, handle_signals=False)
+    assert stats.processed == 4
+    assert stats.failed == 1
+    assert len(job_queue.processing) == 0
+    assert {
+        job.object_key: job.attempts for job, _ in job_queue.done.values()
+    } == {"1": 2, "2": 2, "4": 2, "5": 1}
+
+
+def test_retry_scheduler_respects_concurrency_cap():
+    due = [
+        failures.DueFailure(id, "bucket", str(id), "download", 1)
+        for id in range(1, 6)
+    ]
+    claim_limits = []
+    concurrent_retries = []
+    running = [0]
+    lock = threading.Lock()
+
+    def claim(limit, db_connection, lease_seconds):
+        claim_limits.append(limit)
+        claimed = due[:limit]
+        del due[:limit]
+        return claimed
+
+    def slow_handler(bucket, object_key, db_connection, **kwargs):
+        assert kwargs["options"].retry_policy == failures.DEFAULT_RETRY_POLICY
+        with lock:
+            running[0] += 1
+            concurrent_retries.append(running[0])
+        threading.Event().wait(0.02)
+        with lock:
+            running[0] -= 1
+        if object_key == "3":
+            raise RuntimeError("still broken")
+        return int(object_key)
+
+    with mock.patch.object(
+            worker.failures, "claim_due_failures", side_effect=claim), \
+            mock.patch.object(
+                worker.failures, "resolve_failure") as resolve, \
+            mock.patch.object(
+                worker.datareceiver, "handle_track_upload",
+                side_effect=slow_handler):
+        scheduler = worker.RetryScheduler(
+            max_concurrency=2,
+            poll_interval=0.01,
+            connection_pool=mock.MagicMock()
+        )
+        stats = scheduler.run(stop_when_idle=True, handle_signals=False)
+    assert max(concurrent_retries) <= 2
+    assert all(limit <= 2 for limit in claim_limits)
+    assert stats.resolved == 4
+    assert stats.failed == 1
+    assert sorted(call[0][0] for call in resolve.call_args_list) == [
+        1, 2, 4, 5]
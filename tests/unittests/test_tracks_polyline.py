@@ -0,0 +1,57 @@
+#########################################################################
+#
+# Copyright 2018, GeoSolutions Sas.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+#
+#########################################################################
+
+import random
+
+import pytest
+
+from tracks import polyline
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.mark.parametrize("precision", [0, 5, 6, polyline.MAX_PRECISION])
+def test_polyline_round_trip(precision):
+    rng = random.Random(precision)
+    coordinates = [
+        (rng.uniform(-180, 180), rng.uniform(-90, 90)) for _ in range(100)]
+    decoded = polyline.decode(
+        polyline.encode(coordinates, precision), precision)
+    assert len(decoded) == len(coordinates)
+    for (x, y), (decoded_x, decoded_y) in zip(coordinates, decoded):
+        assert decoded_x == pytest.approx(x, abs=10 ** -precision)
+        assert decoded_y == pytest.approx(y, abs=10 ** -precision)
+
+
+def test_rounding_errors_do_not_accumulate():
+    coordinates = [(10.5 + index * 0.0000049, 43.8) for index in range(1000)]
+    decoded = polyline.decode(polyline.encode(coordinates))
+    assert decoded[-1][0] == pytest.approx(coordinates[-1][0], abs=1e-5)
+
+
+def test_extra_dimensions_are_ignored():
+    assert polyline.encode([(10.5, 43.8, 15.0)]) == polyline.encode(
+        [(10.5, 43.8)])
+
+
+def test_empty_polyline():
+    assert polyline.encode([]) == ""
+    assert polyline.decode("") == []
+
+
+def test_values_round_trip():
+    values = [1526312460000, 1526312461000, 1526312461000, 1526312460500]
+    assert polyline.decode_values(polyline.encode_values(values)) == values
+
+
+def test_regular_timestamps_are_compact():
+    values = [1526312460000 + index * 1000 for index in range(1000)]
+    # each delta of one second takes three characters
+    assert len(polyline.encode_values(values)) < 3 * len(values) + 10